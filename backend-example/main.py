@@ -6,12 +6,14 @@ from typing import List, Optional, Dict, Any
 import imaplib
 import smtplib
 import ssl
-import email
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from email import encoders
+from email.header import decode_header, make_header
+from email.utils import parsedate_to_datetime
 import json
+import re
 import sqlite3
 import uuid
 from datetime import datetime
@@ -117,6 +119,75 @@ def init_database():
 init_database()
 
 # Utilidades para IMAP/SMTP
+# Respuestas FETCH de imaplib -> valores Python (para ENVELOPE / BODYSTRUCTURE)
+_IMAP_TOKEN = re.compile(rb'\s*(?:(\()|(\))|"((?:[^"\\]|\\.)*)"|\{(\d+)\}\r\n|([^\s()"]+))')
+
+def _fetch_buffer(data: list) -> bytes:
+    """Reconstruir la respuesta: imaplib separa cada literal en una tupla (prefijo, literal)"""
+    buffer = b""
+    for part in data:
+        if isinstance(part, tuple):
+            buffer += part[0] + b"\r\n" + part[1]
+        elif part:
+            buffer += part + b"\r\n"
+    return buffer
+
+def _imap_values(data: bytes) -> list:
+    stack, pos = [[]], 0
+    while True:
+        match = _IMAP_TOKEN.match(data, pos)
+        if not match:
+            return stack[0]
+        pos = match.end()
+        if match.group(1):
+            stack.append([])
+        elif match.group(2):
+            value = stack.pop()
+            stack[-1].append(value)
+        elif match.group(3) is not None:
+            stack[-1].append(re.sub(rb'\\(.)', rb'\1', match.group(3)).decode("utf-8", "replace"))
+        elif match.group(4):
+            size = int(match.group(4))
+            stack[-1].append(data[pos:pos + size])
+            pos += size
+        else:
+            atom = match.group(5).decode("utf-8", "replace")
+            stack[-1].append(None if atom.upper() == "NIL" else int(atom) if atom.isdigit() else atom)
+
+def _text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bytes):
+        value = value.decode("utf-8", "replace")
+    value = str(value)
+    if "=?" in value:
+        try:
+            return str(make_header(decode_header(value)))
+        except Exception:
+            pass
+    return value
+
+def _envelope_addresses(value) -> List[Dict[str, str]]:
+    return [
+        {"name": _text(address[0]), "email": f"{_text(address[2])}@{_text(address[3])}"}
+        for address in value or []
+        if isinstance(address, list) and len(address) >= 4 and address[3] is not None
+    ]
+
+def _has_attachments(structure) -> bool:
+    """BODYSTRUCTURE: alguna parte con disposición attachment o con nombre de fichero"""
+    if not isinstance(structure, list) or not structure:
+        return False
+    if isinstance(structure[0], list):
+        return any(_has_attachments(part) for part in structure if isinstance(part, list))
+    kind = f"{_text(structure[0])}/{_text(structure[1])}".lower()
+    extension = 8 if kind.startswith("text/") else 10 if kind == "message/rfc822" else 7
+    disposition = structure[extension + 1] if len(structure) > extension + 1 else None
+    if isinstance(disposition, list) and disposition:
+        return _text(disposition[0]).lower() == "attachment"
+    params = structure[2] if isinstance(structure[2], list) else []
+    return kind == "message/rfc822" or any(_text(name).upper() == "NAME" for name in params[::2])
+
 class MailConnectionManager:
     @staticmethod
     def test_imap_connection(settings: ServerSettings) -> Dict[str, Any]:
@@ -230,57 +301,56 @@ class MailConnectionManager:
                     mail.starttls()
             
             mail.login(settings.username, settings.password)
-            mail.select(folder)
-            
-            # Buscar todos los mensajes
-            result, messages = mail.search(None, 'ALL')
-            message_ids = messages[0].split()
+            result, data = mail.select(folder, readonly=True)
+            total_messages = int(data[0]) if result == 'OK' else 0
             
-            # Aplicar paginación
-            total_messages = len(message_ids)
-            start_idx = max(0, total_messages - offset - limit)
+            # Paginación por número de secuencia (el más reciente es el último)
             end_idx = total_messages - offset
+            start_idx = max(1, end_idx - limit + 1)
+            if end_idx < 1:
+                mail.logout()
+                return []
             
-            selected_ids = message_ids[start_idx:end_idx]
-            selected_ids.reverse()  # Más recientes primero
+            # Un solo FETCH para toda la página: ENVELOPE y BODYSTRUCTURE sin descargar cuerpos
+            result, data = mail.fetch(f"{start_idx}:{end_idx}", '(UID FLAGS RFC822.SIZE ENVELOPE BODYSTRUCTURE)')
+            values = _imap_values(_fetch_buffer(data)) if result == 'OK' else []
             
             message_list = []
             
-            for msg_id in selected_ids:
+            for msg_id, items in zip(values[::2], values[1::2]):
                 try:
-                    result, msg_data = mail.fetch(msg_id, '(RFC822.HEADER)')
-                    if result == 'OK':
-                        email_message = email.message_from_bytes(msg_data[0][1])
-                        
-                        # Parsear información básica
-                        message_info = {
-                            "id": f"msg_{msg_id.decode()}",
-                            "messageId": email_message.get('Message-ID', ''),
-                            "subject": email_message.get('Subject', 'Sin asunto'),
-                            "from": {
-                                "name": email_message.get('From', ''),
-                                "email": email_message.get('From', '')
-                            },
-                            "to": [{
-                                "name": email_message.get('To', ''),
-                                "email": email_message.get('To', '')
-                            }],
-                            "receivedAt": email_message.get('Date', ''),
-                            "isRead": False,  # TODO: Implementar flags
-                            "isStarred": False,
-                            "hasAttachments": False,
-                            "snippet": "Mensaje de muestra...",
-                            "size": len(str(email_message))
-                        }
-                        
-                        message_list.append(message_info)
-                        
+                    fields = {str(items[i]).upper(): items[i + 1] for i in range(0, len(items) - 1, 2)}
+                    envelope = fields.get("ENVELOPE") or [None] * 10
+                    flags = {str(flag).lower() for flag in fields.get("FLAGS") or []}
+                    sender = _envelope_addresses(envelope[2])
+                    try:
+                        received_at = parsedate_to_datetime(_text(envelope[0])).isoformat()
+                    except (TypeError, ValueError, IndexError):
+                        received_at = _text(envelope[0])
+                    
+                    message_info = {
+                        "id": f"msg_{msg_id}",
+                        "uid": fields.get("UID"),
+                        "messageId": _text(envelope[9]),
+                        "subject": _text(envelope[1]) or 'Sin asunto',
+                        "from": sender[0] if sender else {"name": "", "email": ""},
+                        "to": _envelope_addresses(envelope[5]),
+                        "receivedAt": received_at,
+                        "isRead": "\\seen" in flags,
+                        "isStarred": "\\flagged" in flags,
+                        "hasAttachments": _has_attachments(fields.get("BODYSTRUCTURE")),
+                        "snippet": "",
+                        "size": fields.get("RFC822.SIZE") or 0
+                    }
+                    
+                    message_list.append(message_info)
+                    
                 except Exception as e:
                     logger.error(f"Error processing message {msg_id}: {str(e)}")
                     continue
             
-            mail.close()
             mail.logout()
+            message_list.reverse()  # Más recientes primero
             return message_list
             
         except Exception as e:
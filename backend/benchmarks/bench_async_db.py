@@ -0,0 +1,89 @@
+"""
+Benchmark: sesiones síncronas vs AsyncSession en handlers async
+
+Lanza N peticiones concurrentes contra dos endpoints equivalentes que ejecutan
+una consulta lenta (simulada con una función SQLite `sleep_ms`):
+
+  /sync   -> Depends(get_db)        (bloquea el event loop durante la consulta)
+  /async  -> Depends(get_async_db)  (la consulta se espera sin bloquear)
+
+Uso:
+    python benchmarks/bench_async_db.py --requests 200 --query-ms 20
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import event, text
+
+from src.config.settings import get_settings
+from src.database import connection
+
+
+def _sleep_ms(ms):
+    time.sleep(ms / 1000.0)
+    return ms
+
+
+def build_app(query_ms: int) -> FastAPI:
+    """App mínima con un endpoint por tipo de sesión"""
+    for engine in (connection.get_engine(), connection.get_async_engine().sync_engine):
+        event.listen(engine, "connect", lambda dbapi_conn, _: dbapi_conn.create_function("sleep_ms", 1, _sleep_ms))
+
+    app = FastAPI()
+    statement = text("SELECT sleep_ms(:ms)")
+
+    @app.get("/sync")
+    async def sync_endpoint(db=Depends(connection.get_db)):
+        return {"value": db.execute(statement, {"ms": query_ms}).scalar()}
+
+    @app.get("/async")
+    async def async_endpoint(db=Depends(connection.get_async_db)):
+        return {"value": (await db.execute(statement, {"ms": query_ms})).scalar()}
+
+    return app
+
+
+async def run(app: FastAPI, path: str, total: int, concurrency: int) -> float:
+    """Devuelve peticiones por segundo"""
+    transport = httpx.ASGITransport(app=app)
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one():
+            async with semaphore:
+                response = await client.get(path)
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        return total / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--query-ms", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        settings = get_settings()
+        settings.debug = False
+        settings.database.url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        app = build_app(args.query_ms)
+
+        for path in ("/sync", "/async"):
+            rps = asyncio.run(run(app, path, args.requests, args.concurrency))
+            print(f"{path:7s} {rps:8.1f} req/s  ({args.requests} peticiones, concurrencia {args.concurrency}, consulta {args.query_ms} ms)")
+        asyncio.run(connection.dispose_engines())
+
+
+if __name__ == "__main__":
+    main()
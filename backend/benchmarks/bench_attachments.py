@@ -0,0 +1,105 @@
+"""
+Benchmark: mensaje completo vs partes bajo demanda y caché de adjuntos en disco
+
+Contra el servidor IMAP de pruebas (benchmarks/imap_stub.py) con mensajes
+que llevan un adjunto de S bytes y una latencia de red simulada:
+
+  full        -> BODY.PEEK[] del mensaje entero para mostrarlo (anterior)
+  parts       -> BODYSTRUCTURE + BODY.PEEK[1] (solo el texto)
+  download    -> adjunto por tramos (BODY.PEEK[2]<n.m>) guardado en disco
+  cached      -> mismo adjunto desde el almacén por contenido (sin IMAP)
+
+Uso:
+    python benchmarks/bench_attachments.py --messages 20 --size 5000000 --latency 0.02
+"""
+import argparse
+import asyncio
+import email
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from imap_stub import StubImapServer, generate_messages
+
+from src.modules.mail.envelope import walk_parts
+from src.modules.mail.imap_client import ImapClient
+from src.modules.mail.parts import PartStore, fetch_part, fetch_texts
+
+
+async def full(imap: ImapClient, store: PartStore, uid: int) -> int:
+    items = await imap.fetch(str(uid), "(BODY.PEEK[])")
+    message = email.message_from_bytes(items[0]["BODY[]"])
+    return sum(len(part.get_payload(decode=True) or b"") for part in message.walk() if not part.is_multipart())
+
+
+async def parts(imap: ImapClient, store: PartStore, uid: int) -> int:
+    items = await imap.fetch(str(uid), "(UID BODYSTRUCTURE)")
+    texts = [part for part in walk_parts(items[0]["BODYSTRUCTURE"]) if part.type == "text/plain"]
+    return sum(len(text) for text in (await fetch_texts(imap, uid, texts)).values())
+
+
+async def download(imap: ImapClient, store: PartStore, uid: int) -> int:
+    items = await imap.fetch(str(uid), "(UID BODYSTRUCTURE)")
+    part = next(part for part in walk_parts(items[0]["BODYSTRUCTURE"]) if part.is_attachment)
+    _, size = await store.save(fetch_part(imap, uid, part, store.chunk_size))
+    return size
+
+
+async def cached(imap: ImapClient, store: PartStore, uid: int) -> int:
+    relative = next(iter(_saved(store)))
+    return sum(len(chunk) for chunk in await asyncio.to_thread(list, store.iter_file(relative)))
+
+
+def _saved(store: PartStore):
+    for directory in store.root.iterdir():
+        if directory.is_dir():
+            for path in directory.iterdir():
+                yield f"{directory.name}/{path.name}"
+
+
+async def main_async(messages: int, size: int, latency: float, chunk_size: int):
+    stub = StubImapServer(latency=latency)
+    stub.add_mailbox("INBOX", generate_messages(messages, attachment_every=1, attachment_size=size))
+    port = await stub.start()
+    imap = await ImapClient.connect("127.0.0.1", port, use_ssl=False)
+    await imap.login("user", "secret")
+    await imap.select("INBOX", readonly=True)
+    # Precalentar el análisis MIME del servidor de pruebas (un servidor real ya
+    # tiene BODYSTRUCTURE y las partes indexadas): se mide la red, no el stub
+    await imap.fetch(f"1:{messages}", "(BODYSTRUCTURE BODY.PEEK[1] BODY.PEEK[2]<0.1>)")
+
+    with tempfile.TemporaryDirectory() as root:
+        store = PartStore(root, chunk_size)
+        print(f"{messages} mensajes con un adjunto de {size // 1024} KB, latencia {latency * 1000:.0f} ms, "
+              f"tramos de {chunk_size // 1024} KB\n")
+        print(f"{'modo':<10} {'ms/mensaje':>11} {'KB IMAP/mensaje':>16} {'comandos':>9}")
+        for name, mode in (("full", full), ("parts", parts), ("download", download), ("cached", cached)):
+            commands, sent = sum(stub.commands.values()), stub.bytes_sent
+            begin = time.perf_counter()
+            for uid in range(1, messages + 1):
+                await mode(imap, store, uid)
+            elapsed = (time.perf_counter() - begin) / messages
+            print(f"{name:<10} {elapsed * 1000:>11.1f} {(stub.bytes_sent - sent) / messages / 1024:>16.1f} "
+                  f"{(sum(stub.commands.values()) - commands) / messages:>9.1f}")
+        print(f"\nalmacén: {store.stats()['stored']} fichero(s), {store.stats()['deduplicated']} deduplicados, "
+              f"{store.stats()['bytes_written'] // 1024} KB escritos")
+
+    await imap.logout()
+    await stub.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=20)
+    parser.add_argument("--size", type=int, default=5_000_000)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--chunk-size", type=int, default=262144)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.messages, args.size, args.latency, args.chunk_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark: contadores de carpeta con SELECT + SEARCH vs STATUS
+
+Contra el servidor IMAP de pruebas (benchmarks/imap_stub.py) con F carpetas
+de M mensajes y una latencia de red simulada, obtiene total y no leídos de
+todas las carpetas:
+
+  select+search  -> EXAMINE + SEARCH ALL + SEARCH UNSEEN por carpeta (anterior)
+  status         -> un STATUS por carpeta, en pipelining (sin LIST-STATUS)
+  list-status    -> LIST ... RETURN (STATUS (...)) en un solo comando
+
+Uso:
+    python benchmarks/bench_folder_status.py --folders 40 --messages 5000 --latency 0.02
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from imap_stub import StubImapServer, generate_messages
+
+from src.modules.mail.folder_status import list_with_status
+from src.modules.mail.imap_client import ImapClient
+
+
+async def select_search(imap: ImapClient):
+    counts = {}
+    for mailbox in await imap.list():
+        await imap.select(mailbox.name, readonly=True)
+        total = len(await imap.search("ALL"))
+        counts[mailbox.name] = (total, len(await imap.search("UNSEEN")))
+    return counts
+
+
+async def status(imap: ImapClient):
+    _, statuses = await list_with_status(imap)
+    return {name: (values["MESSAGES"], values["UNSEEN"]) for name, values in statuses.items()}
+
+
+async def run(name: str, folders: int, messages: int, latency: float):
+    stub = StubImapServer(latency=latency)
+    if name != "list-status":
+        stub.capabilities = [cap for cap in StubImapServer.capabilities if cap != "LIST-STATUS"]
+    shared = generate_messages(messages)
+    for i in range(folders):
+        stub.add_mailbox("INBOX" if i == 0 else f"Folder{i}", shared)
+    port = await stub.start()
+
+    imap = await ImapClient.connect("127.0.0.1", port, use_ssl=False)
+    await imap.login("user", "secret")
+    await imap.capability()
+    sent = stub.bytes_sent
+    start = time.perf_counter()
+    counts = await (select_search(imap) if name == "select+search" else status(imap))
+    elapsed = time.perf_counter() - start
+    received = stub.bytes_sent - sent
+    await imap.logout()
+    await stub.stop()
+    return elapsed, received, sum(total for total, _ in counts.values())
+
+
+async def main_async(folders: int, messages: int, latency: float):
+    print(f"{folders} carpetas x {messages} mensajes, latencia {latency * 1000:.0f} ms\n")
+    print(f"{'modo':<14} {'s':>8} {'KB recibidos':>13} {'mensajes':>9}")
+    for name in ("select+search", "status", "list-status"):
+        elapsed, received, total = await run(name, folders, messages, latency)
+        print(f"{name:<14} {elapsed:>8.3f} {received / 1024:>13.1f} {total:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--folders", type=int, default=40)
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.folders, args.messages, args.latency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark: sesión IMAP nueva por operación vs pool de sesiones autenticadas
+
+Contra el servidor IMAP de pruebas (benchmarks/imap_stub.py) con un retardo de
+LOGIN que simula el handshake TLS + autenticación de un proveedor remoto,
+ejecuta N operaciones de "probar conexión" (LOGIN + EXAMINE INBOX):
+
+  fresh  -> conexión, LOGIN y LOGOUT en cada operación (comportamiento anterior)
+  pooled -> imap_pool.session(...) (LOGIN solo la primera vez por sesión)
+
+Uso:
+    python benchmarks/bench_imap_pool.py --operations 50 --login-delay 0.2
+"""
+import argparse
+import asyncio
+import imaplib
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from imap_stub import StubImapServer, generate_messages
+
+from src.api.routers.mail import ServerSettings
+from src.modules.mail.imap_client import ImapClient
+from src.modules.mail.imap_pool import ConnectionPool
+
+
+def fresh_operation(settings: ServerSettings):
+    mail = imaplib.IMAP4(settings.server, settings.port)
+    mail.login(settings.username, settings.password)
+    mail.select("INBOX", readonly=True)
+    mail.logout()
+
+
+async def main_async(operations: int, concurrency: int, login_delay: float):
+    stub = StubImapServer(login_delay=login_delay, max_connections_per_user=10)
+    stub.add_mailbox("INBOX", generate_messages(100))
+    port = await stub.start()
+    settings = ServerSettings(server="127.0.0.1", port=port, ssl=False, username="user", password="secret")
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fresh():
+        async with semaphore:
+            await asyncio.to_thread(fresh_operation, settings)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(fresh() for _ in range(operations)))
+    fresh_seconds = time.perf_counter() - start
+    fresh_logins = stub.logins
+
+    pool = ConnectionPool(factory=ImapClient.open, max_per_account=concurrency, idle_timeout=300,
+                          health_after=30, acquire_timeout=30, timeout=10)
+
+    async def pooled():
+        async with pool.session(settings) as imap:
+            await imap.select("INBOX", readonly=True)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(pooled() for _ in range(operations)))
+    pooled_seconds = time.perf_counter() - start
+    pooled_logins = stub.logins - fresh_logins
+
+    await pool.close()
+    await stub.stop()
+
+    print(f"{operations} operaciones, concurrencia {concurrency}, LOGIN simulado de {login_delay * 1000:.0f} ms\n")
+    print(f"{'modo':<8} {'total s':>8} {'ms/op':>8} {'LOGINs':>7}")
+    print(f"{'fresh':<8} {fresh_seconds:>8.2f} {fresh_seconds / operations * 1000:>8.1f} {fresh_logins:>7}")
+    print(f"{'pooled':<8} {pooled_seconds:>8.2f} {pooled_seconds / operations * 1000:>8.1f} {pooled_logins:>7}")
+    print(f"\nPool: {pool.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--operations", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=3)
+    parser.add_argument("--login-delay", type=float, default=0.2)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.operations, args.concurrency, args.login_delay))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark: retardo del event loop con un servidor de correo que no responde
+
+Un servidor "agujero negro" acepta la conexión TCP pero nunca envía el saludo
+IMAP/SMTP. Se lanzan N pruebas de conexión concurrentes mientras una tarea
+sonda duerme 10 ms en bucle y mide cuánto se retrasa (= cuánto tiempo estuvo
+el loop bloqueado y sin atender otras peticiones):
+
+  blocking -> imaplib/smtplib llamados desde la corrutina (comportamiento anterior)
+  asyncio  -> ImapClient/SmtpClient con plazo de conexión
+
+Uso:
+    python benchmarks/bench_mail_blocking.py --tests 4 --timeout 1
+"""
+import argparse
+import asyncio
+import imaplib
+import os
+import smtplib
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.modules.mail.imap_client import ImapClient, ImapError
+from src.modules.mail.smtp_client import SmtpClient, SmtpError
+
+
+async def black_hole():
+    connections = []
+
+    async def handle(reader, writer):
+        connections.append(writer)
+        await reader.read()  # nunca responde
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return server, server.sockets[0].getsockname()[1], connections
+
+
+async def probe(stop: asyncio.Event, lags: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        lags.append(time.perf_counter() - start - 0.01)
+
+
+async def blocking_test(port: int, timeout: float):
+    for connect in (lambda: imaplib.IMAP4("127.0.0.1", port, timeout=timeout),
+                    lambda: smtplib.SMTP("127.0.0.1", port, timeout=timeout)):
+        try:
+            connect()
+        except (OSError, imaplib.IMAP4.error, smtplib.SMTPException):
+            pass
+
+
+async def asyncio_test(port: int, timeout: float):
+    async def imap():
+        try:
+            await ImapClient.connect("127.0.0.1", port, use_ssl=False, timeout=timeout)
+        except ImapError:
+            pass
+
+    async def smtp():
+        try:
+            await SmtpClient.connect("127.0.0.1", port, timeout=timeout)
+        except SmtpError:
+            pass
+
+    await asyncio.gather(imap(), smtp())
+
+
+async def run(mode, tests: int, timeout: float, port: int):
+    stop, lags = asyncio.Event(), []
+    prober = asyncio.create_task(probe(stop, lags))
+    await asyncio.sleep(0.05)
+    start = time.perf_counter()
+    await asyncio.gather(*(mode(port, timeout) for _ in range(tests)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await prober
+    return elapsed, max(lags) * 1000
+
+
+async def main_async(tests: int, timeout: float):
+    server, port, connections = await black_hole()
+    print(f"{tests} pruebas de conexión (IMAP + SMTP) contra un servidor que no responde, plazo {timeout}s\n")
+    print(f"{'modo':<9} {'total s':>8} {'lag máx ms':>11}")
+    for name, mode in (("blocking", blocking_test), ("asyncio", asyncio_test)):
+        elapsed, max_lag = await run(mode, tests, timeout, port)
+        print(f"{name:<9} {elapsed:>8.2f} {max_lag:>11.1f}")
+    for writer in connections:
+        writer.close()
+    server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tests", type=int, default=4)
+    parser.add_argument("--timeout", type=float, default=1.0)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.tests, args.timeout))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Benchmark: mensaje con adjuntos en memoria (email.mime) vs en disco por bloques
+
+C envíos simultáneos, cada uno con un adjunto de --size MB que ya está en
+disco (como las subidas que Starlette guarda en ficheros temporales), hasta
+el servidor SMTP de pruebas (benchmarks/smtp_stub.py):
+
+  memory  -> MIMEMultipart + MIMEBase + encode_base64 + as_bytes() y
+             SmtpClient.send(bytes) (lo que hacía POST /send)
+  stream  -> compose.write_message a un fichero (base64 por bloques) y
+             SmtpClient.send_file (lectura por bloques)
+
+Mide el pico de memoria Python (tracemalloc) y el tiempo total. El servidor
+de pruebas corre en otro proceso para no contar su memoria.
+
+Uso:
+    python benchmarks/bench_mail_compose.py --size 20 --concurrency 10
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from email import encoders
+from email.mime.base import MIMEBase
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from smtp_stub import StubSmtpServer
+
+from src.modules.mail.compose import OutgoingAttachment, write_message
+from src.modules.mail.smtp_client import SmtpClient
+
+HEADERS = [("From", "a@example.com"), ("To", "b@example.com"), ("Subject", "Informe")]
+
+
+def build_in_memory(path: str) -> bytes:
+    message = MIMEMultipart("mixed")
+    message.attach(MIMEText("Adjunto el informe", "plain", "utf-8"))
+    part = MIMEBase("application", "pdf")
+    with open(path, "rb") as handle:
+        part.set_payload(handle.read())
+    encoders.encode_base64(part)
+    part.add_header("Content-Disposition", "attachment", filename="informe.pdf")
+    message.attach(part)
+    for name, value in HEADERS:
+        message[name] = value
+    return message.as_bytes()
+
+
+def build_on_disk(path: str, target: str):
+    with open(path, "rb") as source, open(target, "wb") as handle:
+        write_message(handle, HEADERS, "Adjunto el informe",
+                      attachments=[OutgoingAttachment("informe.pdf", "application/pdf", source)])
+
+
+async def send(mode: str, port: int, path: str, spool: str, index: int):
+    smtp = await SmtpClient.connect("127.0.0.1", port, timeout=300)
+    try:
+        if mode == "memory":
+            message = await asyncio.to_thread(build_in_memory, path)
+            await smtp.send("a@example.com", ["b@example.com"], message)
+        else:
+            target = os.path.join(spool, f"{index}.eml")
+            await asyncio.to_thread(build_on_disk, path, target)
+            await smtp.send_file("a@example.com", ["b@example.com"], target)
+            os.remove(target)
+    finally:
+        await smtp.quit()
+
+
+def serve(ports: multiprocessing.Queue, received: multiprocessing.Queue, messages: int):
+    async def run_stub():
+        stub = StubSmtpServer(keep=False)
+        ports.put(await stub.start())
+        while stub.delivered < messages:
+            await asyncio.sleep(0.05)
+        received.put(stub.bytes_received)
+        await asyncio.sleep(0.5)  # QUIT de los clientes
+        await stub.stop()
+
+    asyncio.run(run_stub())
+
+
+async def run(mode: str, path: str, concurrency: int):
+    ports, received = multiprocessing.Queue(), multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve, args=(ports, received, concurrency))
+    server.start()
+    port = await asyncio.to_thread(ports.get)
+    with tempfile.TemporaryDirectory() as spool:
+        tracemalloc.start()
+        begin = time.perf_counter()
+        await asyncio.gather(*(send(mode, port, path, spool, i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - begin
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    total = await asyncio.to_thread(received.get)
+    await asyncio.to_thread(server.join)
+    return peak, elapsed, total
+
+
+async def main_async(size: int, concurrency: int):
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as upload:
+        for _ in range(size):
+            upload.write(os.urandom(1024 * 1024))
+    try:
+        print(f"{concurrency} envíos simultáneos con un adjunto de {size} MB\n")
+        print(f"{'modo':<8} {'pico memoria':>13} {'tiempo':>9} {'MB enviados':>12}")
+        for mode in ("memory", "stream"):
+            peak, elapsed, received = await run(mode, upload.name, concurrency)
+            print(f"{mode:<8} {peak / 1024 / 1024:>10.1f} MB {elapsed:>8.2f}s {received / 1024 / 1024:>12.1f}")
+    finally:
+        os.remove(upload.name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=20, help="MB por adjunto")
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.size, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
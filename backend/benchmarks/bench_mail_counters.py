@@ -0,0 +1,120 @@
+"""
+Benchmark: contadores incrementales (counters.py) vs recalcularlos con COUNT
+
+Crea en SQLite una cuenta con N mensajes repartidos en varias carpetas y mide
+el coste de mantener los contadores tras un cambio pequeño (marcar 1..50
+mensajes como leídos, como una sincronización incremental):
+
+  count -> UPDATE de los mensajes + COUNT / SUM por carpeta + SUM de la
+           cuenta (lo que hacía la sincronización y el trigger de MySQL)
+  delta -> UPDATE de los mensajes + CounterDeltas.apply (UPDATE n = n + d)
+
+y la pasada completa de reconcile_account (el job periódico).
+Usa SQLite en un directorio temporal.
+
+Uso:
+    python benchmarks/bench_mail_counters.py --messages 200000 --folders 8
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.config.settings import get_settings
+
+_directory = tempfile.TemporaryDirectory()
+get_settings().debug = False
+get_settings().database.url = f"sqlite:///{_directory.name}/counters.db"
+
+from sqlalchemy import func, insert, select, update
+
+from src.database.connection import get_async_session_local, get_engine
+from src.database.models import Base, MailAccount, MailFolder, MailMessage
+from src.modules.mail.counters import CounterDeltas, reconcile_account, unread_sum
+
+
+async def populate(messages: int, folders: int):
+    Base.metadata.create_all(get_engine())
+    base = datetime(2020, 1, 1)
+    async with get_async_session_local()() as db:
+        await db.execute(insert(MailAccount), [{
+            "id": 1, "user_id": 1, "name": "bench", "email": "a@example.com",
+            **{f"{kind}_{field}": "x" for kind in ("imap", "smtp") for field in ("server", "username", "password")},
+        }])
+        await db.execute(insert(MailFolder), [
+            {"id": i + 1, "account_id": 1, "name": f"F{i}", "display_name": f"F{i}", "path": f"F{i}", "uid_validity": 1}
+            for i in range(folders)
+        ])
+        for start in range(0, messages, 10000):
+            await db.execute(insert(MailMessage), [
+                {"account_id": 1, "folder_id": 1 + i % folders, "uid": str(i + 1), "message_id": f"<m{i}@bench>",
+                 "from_email": "x@example.com", "subject": f"Asunto {i}",
+                 "received_at": base + timedelta(minutes=i), "is_read": i % 3 != 0}
+                for i in range(start, min(messages, start + 10000))
+            ])
+        await db.commit()
+        await reconcile_account(db, 1)
+
+
+async def change(db, mode: str, ids):
+    """Alternar is_read de `ids` (carpeta 1) y mantener los contadores"""
+    rows = (await db.execute(select(MailMessage.id, MailMessage.is_read).where(MailMessage.id.in_(ids)))).all()
+    await db.execute(update(MailMessage).where(MailMessage.id.in_(ids)).values(is_read=~MailMessage.is_read))
+    if mode == "delta":
+        deltas = CounterDeltas()
+        deltas.add(1, 1, unread=sum(1 if row.is_read else -1 for row in rows))
+        await deltas.apply(db)
+    else:
+        total, unread = (await db.execute(
+            select(func.count(MailMessage.id), unread_sum()).where(MailMessage.folder_id == 1)
+        )).one()
+        await db.execute(update(MailFolder).where(MailFolder.id == 1).values(total_count=total, unread_count=unread))
+        sums = (await db.execute(
+            select(func.sum(MailFolder.total_count), func.sum(MailFolder.unread_count)).where(MailFolder.account_id == 1)
+        )).one()
+        await db.execute(update(MailAccount).where(MailAccount.id == 1).values(total_count=sums[0], unread_count=sums[1]))
+    await db.commit()
+
+
+async def main_async(messages: int, folders: int, runs: int):
+    await populate(messages, folders)
+    print(f"{messages} mensajes en {folders} carpetas, mediana de {runs}\n")
+    print(f"{'cambiados':>10} {'count':>10} {'delta':>10}")
+    async with get_async_session_local()() as db:
+        ids = (await db.execute(
+            select(MailMessage.id).where(MailMessage.folder_id == 1).order_by(MailMessage.id).limit(50)
+        )).scalars().all()
+        for size in (1, 10, 50):
+            timings = {}
+            for mode in ("count", "delta"):
+                samples = []
+                for _ in range(runs):
+                    begin = time.perf_counter()
+                    await change(db, mode, ids[:size])
+                    samples.append((time.perf_counter() - begin) * 1000)
+                timings[mode] = statistics.median(samples)
+            print(f"{size:>10} {timings['count']:>8.2f}ms {timings['delta']:>8.2f}ms")
+
+        drift = await reconcile_account(db, 1)
+        begin = time.perf_counter()
+        await reconcile_account(db, 1)
+        print(f"\nreconcile_account: {(time.perf_counter() - begin) * 1000:.1f} ms (deriva tras las pruebas: {drift[2]})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=200000)
+    parser.add_argument("--folders", type=int, default=8)
+    parser.add_argument("--runs", type=int, default=21)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.messages, args.folders, args.runs))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark: listado de una carpeta por OFFSET con filas completas vs cursor
+con las columnas del listado
+
+Crea en SQLite una carpeta con N mensajes (con cuerpo guardado, como los ya
+abiertos) y mide una página de 50 a distintas profundidades:
+
+  offset   -> ORDER BY received_at DESC OFFSET n con todas las columnas y sin
+              el índice (folder_id, received_at, id) (lo que haría el listado
+              desde mail_messages sin este cambio)
+  offset+i -> igual, con el índice compuesto
+  cursor*  -> keyset_after sobre (received_at, id) con el índice, todas las columnas
+  cursor   -> igual, solo LIST_COLUMNS (GET .../folders/{id}/messages)
+
+Uso:
+    python benchmarks/bench_mail_folder_listing.py --messages 100000 --body-kb 4
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session, load_only
+
+from src.api.routers.mail import LIST_COLUMNS
+from src.database.models import Base, MailMessage
+from src.database.pagination import keyset_after
+
+PAGE = 50
+SORT_COLUMNS = [MailMessage.received_at, MailMessage.id]
+
+
+def populate(engine, messages: int, body_kb: int):
+    base = datetime(2020, 1, 1)
+    text = ("Hola, te envío el presupuesto revisado. " * 40)[:body_kb * 256]
+    html = f"<html><body><p>{text}</p></body></html>" * 3
+    with engine.begin() as conn:
+        for start in range(0, messages, 5000):
+            conn.execute(insert(MailMessage), [
+                {
+                    "account_id": 1, "folder_id": 1 + i % 4, "uid": str(i + 1), "message_id": f"<m{i}@bench>",
+                    "subject": f"Asunto {i}", "from_name": "Remitente", "from_email": "x@example.com",
+                    "to_addresses": [{"name": "", "email": "a@example.com"}], "snippet": text[:200],
+                    "body_text": text, "body_html": html, "received_at": base + timedelta(minutes=(i * 7919) % messages),
+                }
+                for i in range(start, min(messages, start + 5000))
+            ])
+
+
+def page_query(mode: str, last, offset: int):
+    query = select(MailMessage).where(MailMessage.folder_id == 1).order_by(*(c.desc() for c in SORT_COLUMNS))
+    if mode.startswith("cursor"):
+        if mode == "cursor":
+            query = query.options(load_only(*LIST_COLUMNS))
+        return query.where(keyset_after(SORT_COLUMNS, list(last), descending=True, dialect_name="sqlite")) if last else query
+    return query.offset(offset)
+
+
+def measure(engine, mode: str, keys, position: int, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        with Session(engine) as session:
+            begin = time.perf_counter()
+            rows = session.execute(page_query(mode, keys[position - 1] if position else None, position).limit(PAGE)).scalars().all()
+            timings.append((time.perf_counter() - begin) * 1000)
+            assert [row.id for row in rows] == [key[1] for key in keys[position:position + PAGE]]
+    return statistics.median(timings)
+
+
+def page_kb(engine, columns) -> float:
+    """Datos de una página (lo que viaja del servidor MySQL a la aplicación)"""
+    with engine.connect() as conn:
+        rows = conn.execute(
+            select(*columns).where(MailMessage.folder_id == 1)
+            .order_by(*(c.desc() for c in SORT_COLUMNS)).limit(PAGE)
+        ).all()
+    return sum(len(str(value)) for row in rows for value in row if value is not None) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=100000, help="mensajes en total (1/4 en la carpeta medida)")
+    parser.add_argument("--body-kb", type=int, default=4, help="KB de cuerpo de texto por mensaje (el HTML ~3x)")
+    parser.add_argument("--runs", type=int, default=15)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{directory}/listing.db")
+        index = next(i for i in MailMessage.__table__.indexes if i.name == "ix_mail_messages_folder_received")
+        MailMessage.__table__.indexes.discard(index)
+        Base.metadata.create_all(engine)
+        populate(engine, args.messages, args.body_kb)
+        with engine.connect() as conn:
+            keys = conn.execute(
+                select(*SORT_COLUMNS).where(MailMessage.folder_id == 1).order_by(*(c.desc() for c in SORT_COLUMNS))
+            ).all()
+        positions = [0, len(keys) // 10, len(keys) // 2, len(keys) - PAGE]
+
+        results = {"offset": [measure(engine, "offset", keys, p, args.runs) for p in positions]}
+        index.create(engine)
+        MailMessage.__table__.indexes.add(index)
+        results["offset+i"] = [measure(engine, "offset", keys, p, args.runs) for p in positions]
+        results["cursor*"] = [measure(engine, "cursor*", keys, p, args.runs) for p in positions]
+        results["cursor"] = [measure(engine, "cursor", keys, p, args.runs) for p in positions]
+
+        print(f"Carpeta con {len(keys)} mensajes (de {args.messages}), página de {PAGE}, mediana de {args.runs}\n")
+        print(f"{'posición':>10}" + "".join(f"{mode:>12}" for mode in results))
+        for i, position in enumerate(positions):
+            print(f"{position:>10}" + "".join(f"{results[mode][i]:>10.2f}ms" for mode in results))
+        full, listed = page_kb(engine, MailMessage.__table__.columns), page_kb(engine, LIST_COLUMNS)
+        print(f"{'KB/página':>10}{full:>10.0f}KB{full:>10.0f}KB{full:>10.0f}KB{listed:>10.0f}KB")
+
+
+if __name__ == "__main__":
+    main()
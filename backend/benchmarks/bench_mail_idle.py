@@ -0,0 +1,126 @@
+"""
+Benchmark: aviso de correo nuevo con IMAP IDLE vs sondeo
+
+Contra el servidor IMAP de pruebas (benchmarks/imap_stub.py): N cuentas (un
+buzón y una conexión cada una) reciben mensajes en momentos aleatorios y se
+mide cuánto tarda el cliente en enterarse y cuánto tráfico IMAP genera:
+
+  idle       -> IDLE en la INBOX, renovado cada --idle-timeout s (idle.py)
+  noop       -> NOOP cada --poll s sobre la conexión abierta (servidor sin IDLE)
+  examine    -> EXAMINE cada --poll s comparando UIDNEXT (lo mínimo que hace una
+                sincronización periódica para ver si hay correo nuevo)
+
+Uso:
+    python benchmarks/bench_mail_idle.py --accounts 50 --seconds 30 --poll 5
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from imap_stub import StubImapServer, generate_messages
+
+from src.modules.mail.idle import CHANGE_KINDS
+from src.modules.mail.imap_client import ImapClient
+
+
+async def watch(mode: str, imap: ImapClient, mailbox: str, poll: float, idle_timeout: float,
+                delivered: dict, latencies: list):
+    info = await imap.select(mailbox, readonly=True)
+    uidnext = info.uidnext
+    while True:
+        if mode == "idle":
+            changed = any(r.kind in CHANGE_KINDS for r in await imap.idle(idle_timeout))
+        elif mode == "noop":
+            await asyncio.sleep(poll)
+            changed = any(r.kind in CHANGE_KINDS for r in (await imap.command("NOOP")).responses)
+        else:
+            await asyncio.sleep(poll)
+            info = await imap.select(mailbox, readonly=True)
+            changed, uidnext = info.uidnext != uidnext, info.uidnext
+        if changed:
+            now = time.perf_counter()
+            for sent in delivered.pop(mailbox, []):
+                latencies.append(now - sent)
+
+
+async def run(mode: str, accounts: int, seconds: float, poll: float, idle_timeout: float,
+              rate: float, latency: float):
+    stub = StubImapServer(latency=latency)
+    names = [f"user{i}/INBOX" for i in range(accounts)]
+    for name in names:
+        stub.add_mailbox(name, generate_messages(20))
+    port = await stub.start()
+    clients = []
+    for _ in names:
+        imap = await ImapClient.connect("127.0.0.1", port, use_ssl=False, timeout=idle_timeout + 30)
+        await imap.login("user", "secret")
+        clients.append(imap)
+
+    delivered, latencies = {}, []
+    tasks = [asyncio.create_task(watch(mode, imap, name, poll, idle_timeout, delivered, latencies))
+             for imap, name in zip(clients, names)]
+    await asyncio.sleep(0.5)
+    commands, sent = sum(stub.commands.values()), stub.bytes_sent
+
+    rng = random.Random(5)
+    end = time.perf_counter() + seconds
+    deliveries = 0
+    while time.perf_counter() < end:
+        await asyncio.sleep(rng.expovariate(rate))
+        name = rng.choice(names)
+        stub.deliver(name, generate_messages(1, start_uid=stub.mailboxes[name].uidnext))
+        delivered.setdefault(name, []).append(time.perf_counter())
+        deliveries += 1
+    await asyncio.sleep(poll + 1)
+
+    commands, sent = sum(stub.commands.values()) - commands, stub.bytes_sent - sent
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    for imap in clients:
+        imap._abort()
+    await asyncio.sleep(0.5)  # que el servidor de pruebas cierre sus sesiones
+    await stub.stop()
+
+    minutes = (seconds + poll + 1) / 60
+    latencies.sort()
+    return {
+        "deliveries": deliveries,
+        "seen": len(latencies),
+        "p50": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "p95": latencies[max(0, int(len(latencies) * 0.95) - 1)] * 1000 if latencies else 0.0,
+        "commands": commands / accounts / minutes,
+        "kb": sent / accounts / minutes / 1024,
+    }
+
+
+async def main_async(accounts: int, seconds: float, poll: float, idle_timeout: float, rate: float, latency: float):
+    print(f"{accounts} cuentas, {rate:.1f} mensajes/s en total, {seconds:.0f} s, sondeo cada {poll:.0f} s, "
+          f"latencia de red {latency * 1000:.0f} ms\n")
+    print(f"{'modo':<9} {'avisos':>9} {'p50':>9} {'p95':>9} {'comandos/cuenta/min':>20} {'KB/cuenta/min':>14}")
+    for mode in ("idle", "noop", "examine"):
+        result = await run(mode, accounts, seconds, poll, idle_timeout, rate, latency)
+        print(f"{mode:<9} {result['seen']:>4}/{result['deliveries']:<4} {result['p50']:>7.0f}ms {result['p95']:>7.0f}ms "
+              f"{result['commands']:>20.1f} {result['kb']:>14.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--accounts", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=30.0)
+    parser.add_argument("--poll", type=float, default=5.0)
+    parser.add_argument("--idle-timeout", type=float, default=1500.0)
+    parser.add_argument("--rate", type=float, default=2.0)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.accounts, args.seconds, args.poll, args.idle_timeout, args.rate, args.latency))
+
+
+if __name__ == "__main__":
+    main()
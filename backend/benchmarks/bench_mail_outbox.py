@@ -0,0 +1,152 @@
+"""
+Benchmark: envío directo (una sesión SMTP por mensaje) vs cola de envío
+
+Contra el servidor SMTP de pruebas (benchmarks/smtp_stub.py) con latencia
+de red y coste de autenticación simulados, N mensajes de A cuentas enviados
+por C peticiones concurrentes:
+
+  direct  -> la petición abre SMTP, autentica, envía y cierra (lo que haría
+             POST /send enviando en línea)
+  outbox  -> la petición solo encola (fichero + fila en mail_outbox); los
+             workers entregan con sesiones del pool, varios mensajes por
+             sesión con RSET entre ellos
+
+Mide la latencia de la petición, el tiempo hasta entregar todo y las
+conexiones / autenticaciones SMTP. Usa SQLite en un directorio temporal.
+
+Uso:
+    python benchmarks/bench_mail_outbox.py --messages 400 --accounts 4 --concurrency 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from smtp_stub import StubSmtpServer
+
+from src.config.settings import get_settings
+
+_directory = tempfile.TemporaryDirectory()
+get_settings().debug = False
+get_settings().database.url = f"sqlite:///{_directory.name}/outbox.db"
+
+from src.database.connection import get_async_session_local, get_engine
+from src.database.models import Base, MailAccount
+from src.modules.mail.imap_pool import ConnectionPool
+from src.modules.mail.outbox import MailOutboxQueue
+from src.modules.mail.smtp_client import SmtpClient
+from src.modules.mail.transport import ConnectionSettings
+
+MESSAGE = b"From: a@example.com\r\nTo: b@example.com\r\nSubject: prueba\r\n\r\n" + b"linea de texto\r\n" * 200
+
+
+async def create_accounts(count: int, port: int):
+    async with get_async_session_local()() as db:
+        accounts = [
+            MailAccount(user_id=1, name=f"cuenta {i}", email=f"cuenta{i}@example.com",
+                        imap_server="127.0.0.1", imap_port=1, imap_ssl=False,
+                        imap_username=f"cuenta{i}", imap_password="secret",
+                        smtp_server="127.0.0.1", smtp_port=port, smtp_ssl=False,
+                        smtp_username=f"cuenta{i}", smtp_password="secret")
+            for i in range(count)
+        ]
+        db.add_all(accounts)
+        await db.commit()
+        return accounts
+
+
+def percentile(values, ratio):
+    values = sorted(values)
+    return values[max(0, int(len(values) * ratio) - 1)]
+
+
+async def run_requests(messages: int, concurrency: int, request):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(index: int):
+        async with semaphore:
+            begin = time.perf_counter()
+            await request(index)
+            latencies.append(time.perf_counter() - begin)
+
+    await asyncio.gather(*(one(i) for i in range(messages)))
+    return latencies
+
+
+async def direct(stub: StubSmtpServer, accounts, messages: int, concurrency: int):
+    async def request(index: int):
+        settings = ConnectionSettings.smtp(accounts[index % len(accounts)])
+        smtp = await SmtpClient.open(settings, timeout=30)
+        try:
+            await smtp.send(settings.username + "@example.com", [f"destino{index}@example.com"], MESSAGE)
+        finally:
+            await smtp.quit()
+
+    begin = time.perf_counter()
+    latencies = await run_requests(messages, concurrency, request)
+    return latencies, time.perf_counter() - begin
+
+
+async def outbox(stub: StubSmtpServer, accounts, messages: int, concurrency: int, root: str):
+    pool = ConnectionPool(factory=SmtpClient.open, max_per_account=2, idle_timeout=60, health_after=30,
+                          acquire_timeout=30, timeout=30, protocol="SMTP")
+    queue = MailOutboxQueue(pool=pool, root=root, tick=0.5, max_concurrent=len(accounts), batch_size=20,
+                            max_attempts=3, backoff=1, max_backoff=10)
+    pool.start()
+    queue.start()
+
+    async def request(index: int):
+        account = accounts[index % len(accounts)]
+        async with get_async_session_local()() as db:
+            await queue.enqueue(db, account, account.email, [f"destino{index}@example.com"],
+                                MESSAGE, f"<bench-{index}@example.com>", "prueba")
+
+    begin = time.perf_counter()
+    latencies = await run_requests(messages, concurrency, request)
+    while queue.sent + queue.failed < messages:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - begin
+    await queue.stop()
+    await pool.close()
+    return latencies, elapsed
+
+
+async def main_async(messages: int, accounts_count: int, concurrency: int, login_delay: float, latency: float):
+    Base.metadata.create_all(get_engine())
+    print(f"{messages} mensajes, {accounts_count} cuentas, {concurrency} peticiones simultáneas, "
+          f"RTT {latency * 1000:.0f} ms, autenticación {login_delay * 1000:.0f} ms\n")
+    print(f"{'modo':<8} {'petición p50':>13} {'petición p95':>13} {'todo entregado':>15} "
+          f"{'mensajes/s':>11} {'conexiones':>11} {'AUTH':>6}")
+    for name in ("direct", "outbox"):
+        stub = StubSmtpServer(login_delay=login_delay, latency=latency, keep=False)
+        port = await stub.start()
+        accounts = await create_accounts(accounts_count, port)
+        with tempfile.TemporaryDirectory() as root:
+            if name == "direct":
+                latencies, elapsed = await direct(stub, accounts, messages, concurrency)
+            else:
+                latencies, elapsed = await outbox(stub, accounts, messages, concurrency, root)
+        await stub.stop()
+        print(f"{name:<8} {statistics.median(latencies) * 1000:>11.1f}ms {percentile(latencies, 0.95) * 1000:>11.1f}ms "
+              f"{elapsed:>14.2f}s {messages / elapsed:>11.0f} {stub.connections:>11} {stub.commands['AUTH']:>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=400)
+    parser.add_argument("--accounts", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--login-delay", type=float, default=0.15)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.messages, args.accounts, args.concurrency, args.login_delay, args.latency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Benchmark: planificador de sincronización (jitter + límite + backoff) vs ingenuo
+
+Simula N cuentas con el mismo sync_interval (escalado a segundos) y
+sincronizaciones de duración aleatoria; una fracción de cuentas falla
+siempre (servidor caído). Compara:
+
+  naive      -> sin jitter ni límite de concurrencia; reintento al siguiente intervalo
+  scheduler  -> MailSyncScheduler con jitter, límite global y backoff exponencial
+
+Mide el pico de sincronizaciones simultáneas (sesiones IMAP abiertas a la
+vez), el retraso sobre la hora prevista y los intentos contra cuentas caídas.
+
+Uso:
+    python benchmarks/bench_mail_scheduler.py --accounts 200 --interval 1 --seconds 20
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import statistics
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.modules.mail.scheduler import MailSyncScheduler
+
+
+class SimulatedScheduler(MailSyncScheduler):
+    """Cuentas en memoria y sincronización simulada (sin base de datos ni IMAP)"""
+
+    def __init__(self, accounts: int, interval: float, failing: set, duration: float, **kwargs):
+        super().__init__(unit=interval, **kwargs)
+        self.account_ids = list(range(1, accounts + 1))
+        self.failing = failing
+        self.duration = duration
+        self.active = 0
+        self.peak = 0
+        self.lags = []
+        self.failed_attempts = 0
+
+    async def _load_accounts(self):
+        return [(account_id, self.unit, None) for account_id in self.account_ids]
+
+    async def _sync(self, account_id: int):
+        self.lags.append(self._accounts[account_id].last_lag)
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(random.uniform(0.5, 1.5) * self.duration)
+            if account_id in self.failing:
+                self.failed_attempts += 1
+                raise ConnectionError("server down")
+        finally:
+            self.active -= 1
+
+
+async def run(name: str, accounts: int, interval: float, seconds: float, failing: set, duration: float):
+    if name == "naive":
+        scheduler = SimulatedScheduler(accounts, interval, failing, duration, tick=0.02,
+                                       max_concurrent=accounts, jitter=0.0, backoff=interval, max_backoff=interval)
+    else:
+        scheduler = SimulatedScheduler(accounts, interval, failing, duration, tick=0.02,
+                                       max_concurrent=8, jitter=0.1, backoff=interval / 10, max_backoff=interval * 4)
+    if name == "naive":
+        # Todas a la vez al arrancar (sin reparto inicial)
+        scheduler._schedule = _aligned(scheduler)
+    scheduler.start()
+    await asyncio.sleep(seconds)
+    await scheduler.stop()
+    lags = sorted(scheduler.lags) or [0.0]
+    return {
+        "syncs": scheduler.runs,
+        "peak": scheduler.peak,
+        "lag_p50": statistics.median(lags) * 1000,
+        "lag_p95": lags[max(0, int(len(lags) * 0.95) - 1)] * 1000,
+        "failed_attempts": scheduler.failed_attempts / max(1, len(failing)),
+    }
+
+
+def _aligned(scheduler: SimulatedScheduler):
+    original = scheduler._schedule
+
+    def schedule(accounts, now):
+        new = [account for account in accounts if account[0] not in scheduler._accounts]
+        original(accounts, now)
+        for account_id, _, _ in new:
+            scheduler._accounts[account_id].next_run = now
+    return schedule
+
+
+async def main_async(accounts: int, interval: float, seconds: float, failing_ratio: float, duration: float):
+    logging.getLogger("src.modules.mail.scheduler").setLevel(logging.ERROR)
+    failing = set(random.Random(3).sample(range(1, accounts + 1), int(accounts * failing_ratio)))
+    print(f"{accounts} cuentas, intervalo {interval}s, sincronización ~{duration * 1000:.0f} ms, "
+          f"{len(failing)} cuentas caídas, {seconds}s\n")
+    print(f"{'modo':<10} {'syncs':>6} {'pico simult.':>13} {'retraso p50':>12} {'retraso p95':>12} {'intentos/caída':>15}")
+    for name in ("naive", "scheduler"):
+        result = await run(name, accounts, interval, seconds, failing, duration)
+        print(f"{name:<10} {result['syncs']:>6} {result['peak']:>13} {result['lag_p50']:>10.0f}ms "
+              f"{result['lag_p95']:>10.0f}ms {result['failed_attempts']:>15.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--accounts", type=int, default=200)
+    parser.add_argument("--interval", type=float, default=1.0)
+    parser.add_argument("--seconds", type=float, default=20.0)
+    parser.add_argument("--failing", type=float, default=0.1)
+    parser.add_argument("--duration", type=float, default=0.02)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.accounts, args.interval, args.seconds, args.failing, args.duration))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Benchmark: búsqueda de correo con el índice de texto completo vs ILIKE
+
+Crea en SQLite (FTS5, el backend de tests) una cuenta con N mensajes
+sintéticos (asunto, remitente y extracto con un vocabulario de palabras
+inventadas), aplica las migraciones (que crean y rellenan el índice) y mide
+la latencia de `search_query` por tipo de búsqueda:
+
+  date       -> search_query(sort="date"): índice, más recientes primero
+                (GET /api/mail/{id}/search por defecto)
+  relevance  -> search_query(sort="relevance"): índice + bm25
+  ilike      -> mismas palabras con ILIKE sobre las columnas (sin índice)
+
+Uso:
+    python benchmarks/bench_mail_search.py --messages 1000000 --runs 50
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import and_, create_engine, insert, or_, select
+from sqlalchemy.orm import Session
+
+from src.database.migrations import run_migrations
+from src.database.models import Base, MailMessage
+from src.database.search import MAIL_MESSAGE_SEARCH
+from src.modules.mail.search import search_query
+
+LETTERS = "abcdefghijklmnopqrstuvwxyzáéíóúñ"
+
+
+def vocabulary(size: int, rng: random.Random):
+    """Palabras inventadas de 3 a 10 letras; las primeras serán las más frecuentes"""
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(LETTERS) for _ in range(rng.randint(3, 10))))
+    words = sorted(words)
+    rng.shuffle(words)
+    return words
+
+
+def populate(engine, messages: int, rng: random.Random):
+    words = vocabulary(20000, rng)
+    # Zipf aproximado: pocas palabras muy frecuentes, muchas raras
+    cumulative, total = [], 0.0
+    for rank in range(len(words)):
+        total += 1 / (rank + 1)
+        cumulative.append(total)
+    base = datetime(2020, 1, 1)
+    batch = []
+    with engine.begin() as conn:
+        for i in range(1, messages + 1):
+            sender = rng.randrange(5000)
+            batch.append({
+                "account_id": 1,
+                "folder_id": 1 + i % 8,
+                "message_id": f"<bench-{i}@example.com>",
+                "uid": str(i),
+                "subject": " ".join(rng.choices(words, cum_weights=cumulative, k=6)),
+                "from_name": f"Contacto {sender}",
+                "from_email": f"contacto{sender}@empresa{sender % 300}.com",
+                "snippet": " ".join(rng.choices(words, cum_weights=cumulative, k=25)),
+                "received_at": base + timedelta(minutes=i),
+                "is_deleted": False,
+            })
+            if len(batch) == 10000:
+                conn.execute(insert(MailMessage.__table__), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(MailMessage.__table__), batch)
+    return words
+
+
+def ilike_query(text: str):
+    clauses = [
+        or_(*(MAIL_MESSAGE_SEARCH.column(name).ilike(f"%{word}%") for name in MAIL_MESSAGE_SEARCH.columns))
+        for word in text.split()
+    ]
+    return (
+        select(MailMessage).where(MailMessage.account_id == 1, and_(*clauses))
+        .order_by(MailMessage.received_at.desc(), MailMessage.id.desc())
+    )
+
+
+def measure(session: Session, build, queries, limit: int):
+    timings = []
+    for text in queries:
+        begin = time.perf_counter()
+        session.execute(build(text).limit(limit)).scalars().all()
+        timings.append((time.perf_counter() - begin) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[max(0, int(len(timings) * 0.95) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--ilike-runs", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{directory}/search.db")
+        Base.metadata.create_all(engine)
+        begin = time.perf_counter()
+        words = populate(engine, args.messages, rng)
+        loaded = time.perf_counter() - begin
+        begin = time.perf_counter()
+        run_migrations(engine, Base.metadata)  # crea la tabla FTS5 e indexa las filas
+        indexed = time.perf_counter() - begin
+        print(f"{args.messages} mensajes: carga {loaded:.1f} s, índice {indexed:.1f} s\n")
+
+        kinds = {
+            "palabra rara": lambda: rng.choice(words[-5000:]),
+            "palabra frecuente": lambda: rng.choice(words[:20]),
+            "dos palabras": lambda: f"{rng.choice(words[:2000])} {rng.choice(words[:2000])}",
+            "remitente+palabra": lambda: f"contacto{rng.randrange(5000)}@ {rng.choice(words[:200])}",
+            "remitente": lambda: f"contacto{rng.randrange(5000)}@",
+        }
+        print(f"{'búsqueda':<18} {'date p50':>9} {'date p95':>9} {'relev p50':>10} {'relev p95':>10} "
+              f"{'ilike p50':>10} {'ilike p95':>10}  (ms, 20 resultados)")
+        with Session(engine) as session:
+            for name, make in kinds.items():
+                queries = [make() for _ in range(args.runs)]
+                date = measure(session, lambda text: search_query(1, text, "sqlite"), queries, 20)
+                relevance = measure(session, lambda text: search_query(1, text, "sqlite", sort="relevance"), queries, 20)
+                ilike = measure(session, ilike_query, queries[:args.ilike_runs], 20)
+                print(f"{name:<18} {date[0]:>9.1f} {date[1]:>9.1f} {relevance[0]:>10.1f} {relevance[1]:>10.1f} "
+                      f"{ilike[0]:>10.1f} {ilike[1]:>10.1f}")
+
+if __name__ == "__main__":
+    main()
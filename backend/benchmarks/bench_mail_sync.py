@@ -0,0 +1,103 @@
+"""
+Benchmark: sincronización IMAP completa vs incremental (UIDVALIDITY/UID/CONDSTORE)
+
+Contra el servidor IMAP de pruebas (benchmarks/imap_stub.py) con una carpeta
+de N mensajes y una base SQLite temporal (una cuenta por modo), mide tres
+rondas por modo:
+
+  inicial  -> primera sincronización (carpeta vacía en la base)
+  estable  -> sin cambios en el servidor
+  cambios  -> algunos cambios de flags y mensajes nuevos
+
+Modos:
+  full         -> MailSync.sync_account(full=True): se descarga todo cada vez
+  incremental  -> sin CONDSTORE: solo mensajes nuevos + FLAGS de los conocidos
+  condstore    -> con CONDSTORE: solo mensajes nuevos + FLAGS CHANGEDSINCE
+
+Uso:
+    python benchmarks/bench_mail_sync.py --messages 50000 --changes 20
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.config.settings import get_settings
+
+_directory = tempfile.TemporaryDirectory()
+get_settings().debug = False
+# MailSync reserva las cuentas con la sesión global (sync_claimed_by)
+get_settings().database.url = f"sqlite:///{_directory.name}/sync.db"
+
+from imap_stub import StubImapServer, generate_messages
+
+from src.database.connection import dispose_engines, get_async_session_local, get_engine
+from src.database.models import Base, MailAccount
+from src.modules.mail.imap_client import ImapClient
+from src.modules.mail.imap_pool import ConnectionPool
+from src.modules.mail.sync import MailSync
+
+
+async def run_mode(name: str, messages: int, changes: int, batch_size: int):
+    stub = StubImapServer()
+    if name != "condstore":
+        stub.capabilities = [cap for cap in StubImapServer.capabilities if cap != "CONDSTORE"]
+    stub.add_mailbox("INBOX", generate_messages(messages))
+    port = await stub.start()
+
+    pool = ConnectionPool(factory=ImapClient.open, max_per_account=1, idle_timeout=300,
+                          health_after=30, acquire_timeout=30, timeout=120)
+    sync = MailSync(pool=pool, batch_size=batch_size)
+
+    async with get_async_session_local()() as db:
+        account = MailAccount(user_id=1, name=name, email="user@example.com", provider="stub",
+                              imap_server="127.0.0.1", imap_port=port, imap_ssl=False,
+                              imap_username="user", imap_password="secret",
+                              smtp_server="127.0.0.1", smtp_username="user", smtp_password="secret")
+        db.add(account)
+        await db.commit()
+
+        rows = []
+        for label in ("inicial", "estable", "cambios"):
+            if label == "cambios":
+                mailbox = stub.mailboxes["INBOX"]
+                for uid in random.sample(mailbox.uids, changes):
+                    stub.set_flags("INBOX", uid, {"\\Seen", "\\Flagged"})
+                stub.deliver("INBOX", generate_messages(changes, start_uid=mailbox.uidnext))
+            fetched = sync.messages_fetched
+            start = time.perf_counter()
+            result = await sync.sync_account(db, account, full=name == "full")
+            elapsed = time.perf_counter() - start
+            rows.append((label, elapsed, sync.messages_fetched - fetched, result.updated))
+
+    await pool.close()
+    await stub.stop()
+    return rows
+
+
+async def main_async(messages: int, changes: int, batch_size: int):
+    print(f"INBOX con {messages} mensajes, {changes} cambios de flags + {changes} mensajes nuevos\n")
+    print(f"{'modo':<12} {'ronda':<8} {'s':>8} {'descargados':>12} {'flags':>6}")
+    Base.metadata.create_all(get_engine())
+    for name in ("full", "incremental", "condstore"):
+        for label, elapsed, fetched, updated in await run_mode(name, messages, changes, batch_size):
+            print(f"{name:<12} {label:<8} {elapsed:>8.2f} {fetched:>12} {updated:>6}")
+    await dispose_engines()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=50000)
+    parser.add_argument("--changes", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.messages, args.changes, args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
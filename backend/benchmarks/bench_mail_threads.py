@@ -0,0 +1,159 @@
+"""
+Benchmark: conversaciones incrementales (threads.py) vs recalcular el buzón
+
+Se guardan N mensajes sintéticos por lotes (como la sincronización), con
+respuestas a mensajes anteriores y algunos padres que llegan tarde:
+
+  incremental -> assign_threads por lote (índice Message-ID en mail_thread_refs)
+  rescan      -> por lote, leer las cabeceras de todos los mensajes de la
+                 cuenta y recalcular las conversaciones (JWZ completo)
+
+Se mide el coste por lote al principio y al final (el incremental no crece
+con el buzón) y una página de GET /threads por cursor frente a OFFSET a
+distintas profundidades.
+Usa SQLite en un directorio temporal.
+
+Uso:
+    python benchmarks/bench_mail_threads.py --messages 20000 --batch 200
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.config.settings import get_settings
+
+_directory = tempfile.TemporaryDirectory()
+get_settings().debug = False
+get_settings().database.url = f"sqlite:///{_directory.name}/threads.db"
+
+from sqlalchemy import insert, select
+
+from src.database.connection import get_async_session_local, get_engine
+from src.database.models import Base, MailMessage, MailThread
+from src.database.pagination import keyset_after
+from src.modules.mail.threads import _Components, assign_threads, message_keys
+
+
+def generate(count: int, seed: int = 7):
+    """Mensajes con conversaciones: ~60% responden a uno anterior; 5% de los
+    padres se retrasan unos lotes (llegan después que sus respuestas)"""
+    rng = random.Random(seed)
+    base = datetime(2024, 1, 1)
+    messages, chains = [], []
+    for i in range(count):
+        mid = f"<m{i}@bench>"
+        refs = ""
+        if chains and rng.random() < 0.6:
+            parent = rng.choice(chains[-500:])
+            refs = f"{parent[1]} {parent[0]}".strip()
+        chains.append((mid, refs))
+        messages.append({
+            "account_id": 1, "folder_id": 1, "uid": str(i + 1), "message_id": mid,
+            "subject": f"Re: asunto {i % 997}" if refs else f"asunto {i % 997}",
+            "from_email": "x@example.com", "references": refs[-2000:] or None,
+            "in_reply_to": refs.split()[-1] if refs else None,
+            "received_at": base + timedelta(minutes=i), "is_read": rng.random() < 0.7,
+        })
+    late = [i for i in range(count) if rng.random() < 0.05]
+    for i in late:
+        j = min(count - 1, i + rng.randint(50, 600))
+        messages[i], messages[j] = messages[j], messages[i]
+    return messages
+
+
+async def rescan(db, account_id: int):
+    rows = (await db.execute(
+        select(MailMessage.id, MailMessage.message_id, MailMessage.in_reply_to, MailMessage.references)
+        .where(MailMessage.account_id == account_id)
+    )).all()
+    components = _Components()
+    for row in rows:
+        keys = message_keys(row.message_id, row.in_reply_to, row.references)
+        for key in keys[1:]:
+            components.union(("m", keys[0]), ("m", key))
+    return len({components.find(("m", message_keys(row.message_id, None, None)[0])) for row in rows})
+
+
+async def ingest(mode: str, messages, batch: int):
+    Base.metadata.drop_all(get_engine())
+    Base.metadata.create_all(get_engine())
+    timings = []
+    async with get_async_session_local()() as db:
+        for start in range(0, len(messages), batch):
+            rows = [dict(row) for row in messages[start:start + batch]]
+            begin = time.perf_counter()
+            if mode == "incremental":
+                await assign_threads(db, 1, rows)
+                await db.execute(insert(MailMessage), rows)
+            else:
+                await db.execute(insert(MailMessage), rows)
+                await rescan(db, 1)
+            await db.commit()
+            timings.append(time.perf_counter() - begin)
+    return timings
+
+
+async def page(db, account_id: int, cursor_values, offset: int):
+    sort_columns = [MailThread.last_message_at, MailThread.id]
+    query = (select(MailThread).where(MailThread.account_id == account_id)
+             .order_by(*(column.desc() for column in sort_columns)))
+    begin = time.perf_counter()
+    if cursor_values is not None:
+        query = query.where(keyset_after(sort_columns, cursor_values, descending=True, dialect_name="sqlite"))
+        rows = (await db.execute(query.limit(25))).scalars().all()
+    else:
+        rows = (await db.execute(query.offset(offset).limit(25))).scalars().all()
+    return (time.perf_counter() - begin) * 1000, len(rows)
+
+
+async def main_async(count: int, batch: int, threads: int):
+    messages = generate(count)
+    print(f"{count} mensajes en lotes de {batch}\n")
+    print(f"{'modo':<12} {'primer 10% ms/lote':>19} {'último 10% ms/lote':>19} {'total':>9}")
+    for mode in ("rescan", "incremental"):
+        timings = await ingest(mode, messages, batch)
+        tenth = max(1, len(timings) // 10)
+        print(f"{mode:<12} {sum(timings[:tenth]) / tenth * 1000:>19.1f} "
+              f"{sum(timings[-tenth:]) / tenth * 1000:>19.1f} {sum(timings):>8.1f}s")
+
+    # Listado: cuenta aparte con `threads` conversaciones
+    base = datetime(2020, 1, 1)
+    async with get_async_session_local()() as db:
+        for start in range(0, threads, 10000):
+            await db.execute(insert(MailThread), [
+                {"account_id": 2, "subject": f"asunto {i}", "last_message_at": base + timedelta(seconds=i * 37 % threads)}
+                for i in range(start, min(threads, start + 10000))
+            ])
+        await db.commit()
+        keys = (await db.execute(
+            select(MailThread.last_message_at, MailThread.id).where(MailThread.account_id == 2)
+            .order_by(MailThread.last_message_at.desc(), MailThread.id.desc())
+        )).all()
+        print(f"\nGET /threads con {threads} conversaciones, página de 25 (mediana de 20):")
+        print(f"{'posición':>10} {'offset':>10} {'cursor':>10}")
+        for position in (25, threads // 10, threads // 2, threads - 50):
+            timings = {}
+            for name, values, offset in (("offset", None, position), ("cursor", list(keys[position - 1]), 0)):
+                samples = [await page(db, 2, values, offset) for _ in range(20)]
+                timings[name] = sorted(ms for ms, _ in samples)[10]
+            print(f"{position:>10} {timings['offset']:>8.2f}ms {timings['cursor']:>8.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--batch", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=200000, help="conversaciones para medir el listado")
+    args = parser.parse_args()
+    asyncio.run(main_async(args.messages, args.batch, args.threads))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark: listado de mensajes con un FETCH por mensaje vs un FETCH por página
+
+Contra el servidor IMAP de pruebas (benchmarks/imap_stub.py) con una latencia
+de red simulada, obtiene una página de N mensajes de INBOX:
+
+  per-message -> FETCH n (RFC822.HEADER) por mensaje (backend-example anterior)
+  ranged      -> un FETCH a:b (UID FLAGS INTERNALDATE RFC822.SIZE ENVELOPE
+                 BODYSTRUCTURE) para toda la página
+
+Uso:
+    python benchmarks/bench_message_listing.py --page 50 --latency 0.02
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from imap_stub import StubImapServer, generate_messages
+
+from src.modules.mail.envelope import LIST_ITEMS, has_attachments, parse_envelope
+from src.modules.mail.imap_client import ImapClient
+
+
+async def per_message(imap: ImapClient, start: int, end: int) -> int:
+    count = 0
+    for seq in range(end, start - 1, -1):
+        count += len(await imap.fetch(str(seq), "(RFC822.HEADER)", uid=False))
+    return count
+
+
+async def ranged(imap: ImapClient, start: int, end: int) -> int:
+    items = await imap.fetch(f"{start}:{end}", LIST_ITEMS, uid=False)
+    for item in items:
+        parse_envelope(item["ENVELOPE"])
+        has_attachments(item["BODYSTRUCTURE"])
+    return len(items)
+
+
+async def main_async(messages: int, page: int, latency: float, rounds: int):
+    stub = StubImapServer(latency=latency)
+    stub.add_mailbox("INBOX", generate_messages(messages, attachment_every=5))
+    port = await stub.start()
+    imap = await ImapClient.connect("127.0.0.1", port, use_ssl=False)
+    await imap.login("user", "secret")
+    info = await imap.select("INBOX", readonly=True)
+    start, end = max(1, info.exists - page + 1), info.exists
+
+    print(f"Página de {page} mensajes de {messages}, latencia {latency * 1000:.0f} ms, {rounds} rondas\n")
+    print(f"{'modo':<12} {'ms/página':>10} {'comandos':>9} {'KB':>8}")
+    for name, mode in (("per-message", per_message), ("ranged", ranged)):
+        commands, sent = sum(stub.commands.values()), stub.bytes_sent
+        begin = time.perf_counter()
+        for _ in range(rounds):
+            assert await mode(imap, start, end) == end - start + 1
+        elapsed = (time.perf_counter() - begin) / rounds
+        print(f"{name:<12} {elapsed * 1000:>10.1f} {(sum(stub.commands.values()) - commands) // rounds:>9} "
+              f"{(stub.bytes_sent - sent) / rounds / 1024:>8.1f}")
+
+    await imap.logout()
+    await stub.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--page", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.messages, args.page, args.latency, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
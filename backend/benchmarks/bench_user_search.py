@@ -0,0 +1,105 @@
+"""
+Benchmark: búsqueda de usuarios con ILIKE '%x%' vs índice de texto completo
+
+Genera N usuarios sintéticos y mide la latencia de la condición `search` de
+GET /api/users con los dos métodos:
+
+  ilike     -> OR de ILIKE '%term%' sobre las cuatro columnas (recorrido completo)
+  fulltext  -> search_condition(USER_SEARCH, ...) (FTS5 trigram en SQLite,
+               FULLTEXT ngram en MySQL)
+
+Por defecto usa un SQLite temporal; con --url se puede apuntar a un MySQL de pruebas
+(la tabla users debe estar vacía o ser desechable).
+
+Uso:
+    python benchmarks/bench_user_search.py --users 100000 --repeat 20
+"""
+import argparse
+import os
+import random
+import statistics
+import string
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import and_, create_engine, func, insert, or_, select
+
+from src.database.migrations import run_migrations
+from src.database.models import Base, User
+from src.database.search import USER_SEARCH, search_condition, search_terms
+
+FIRST_NAMES = ["Ana", "Luis", "María", "Carlos", "Lucía", "Javier", "Elena", "Pablo", "Sofía", "Diego"]
+LAST_NAMES = ["García", "Martínez", "López", "Sánchez", "Pérez", "Gómez", "Fernández", "Ruiz", "Díaz", "Moreno"]
+TERMS = ["garcía", "martínez lucía", "user0421", "xq7", "example.org", "nomatchzz"]
+
+
+def populate(engine, total: int, batch: int = 5000):
+    rng = random.Random(42)
+    with engine.begin() as conn:
+        for start in range(0, total, batch):
+            rows = []
+            for i in range(start, min(start + batch, total)):
+                tag = "".join(rng.choices(string.ascii_lowercase + string.digits, k=6))
+                rows.append({
+                    "username": f"user{i:06d}_{tag}",
+                    "email": f"user{i:06d}.{tag}@example.{rng.choice(['com', 'org', 'es'])}",
+                    "password_hash": "x",
+                    "first_name": rng.choice(FIRST_NAMES),
+                    "last_name": rng.choice(LAST_NAMES),
+                })
+            conn.execute(insert(User), rows)
+
+
+def ilike_condition(text: str):
+    """La misma semántica (cada palabra en alguna columna) sin índice"""
+    return and_(*(
+        or_(*(getattr(User, name).ilike(f"%{word}%") for name in USER_SEARCH.columns))
+        for word in search_terms(text)
+    ))
+
+
+def measure(engine, condition, repeat: int):
+    query = select(func.count()).select_from(User).where(condition)
+    timings = []
+    with engine.connect() as conn:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            count = conn.execute(query).scalar()
+            timings.append((time.perf_counter() - start) * 1000)
+    return count, statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--url", default=None, help="URL de base de datos (por defecto SQLite temporal)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        engine = create_engine(url)
+        Base.metadata.create_all(bind=engine, tables=[User.__table__])
+
+        start = time.perf_counter()
+        populate(engine, args.users)
+        print(f"{args.users} usuarios insertados en {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        run_migrations(engine, Base.metadata)
+        print(f"Índice de texto completo creado en {time.perf_counter() - start:.1f}s\n")
+
+        print(f"{'término':<18} {'filas':>7} {'ilike ms':>10} {'fulltext ms':>12} {'x':>6}")
+        for term in TERMS:
+            rows, ilike_ms = measure(engine, ilike_condition(term), args.repeat)
+            fts_rows, fts_ms = measure(engine, search_condition(USER_SEARCH, term, engine.dialect.name), args.repeat)
+            assert rows == fts_rows, f"resultados distintos para {term!r}: {rows} vs {fts_rows}"
+            print(f"{term:<18} {rows:>7} {ilike_ms:>10.2f} {fts_ms:>12.2f} {ilike_ms / fts_ms:>5.1f}x")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
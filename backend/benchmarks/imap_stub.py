@@ -0,0 +1,634 @@
+"""
+Servidor IMAP de pruebas (asyncio, en memoria)
+
+Implementa el subconjunto de IMAP4rev1 que usa el backend, sin TLS, para
+probar y medir el código de correo sin un proveedor real:
+
+    CAPABILITY, NOOP, IDLE, LOGIN, LOGOUT, LIST (y RETURN (STATUS ...) de
+    LIST-STATUS), STATUS, SELECT, EXAMINE, CLOSE, UNSELECT,
+    SEARCH / UID SEARCH (ALL, UNSEEN, UID <rango>),
+    FETCH / UID FETCH (UID, FLAGS, INTERNALDATE, RFC822.SIZE, MODSEQ,
+    ENVELOPE, BODYSTRUCTURE, RFC822.HEADER,
+    BODY[]/BODY[HEADER]/BODY[TEXT]/BODY[HEADER.FIELDS (...)]/BODY[1.2],
+    fetch parcial BODY[...]<origen.longitud> y CHANGEDSINCE)
+
+CONDSTORE: cada mensaje tiene su MODSEQ y SELECT/EXAMINE informan de
+HIGHESTMODSEQ. Para simular actividad en el buzón desde el benchmark:
+    stub.deliver("INBOX", generate_messages(10, start_uid=mailbox.uidnext))
+    stub.set_flags("INBOX", uid, {"\\Seen"})
+    stub.expunge("INBOX", [uid, ...])
+Las sesiones con el buzón seleccionado reciben esos cambios como en un
+servidor real: en la respuesta a NOOP o, durante IDLE, en cuanto ocurren
+(* n EXPUNGE, * n EXISTS, * n FETCH (UID x FLAGS (...))).
+
+Opciones para simular un proveedor remoto:
+    login_delay               segundos de espera en LOGIN (TLS + autenticación)
+    latency                   segundos que tarda cada respuesta en llegar al
+                              cliente (RTT); los comandos en pipelining se
+                              solapan como en una red real
+    max_connections_per_user  rechaza LOGIN por encima de ese número de sesiones
+
+Uso desde un script:
+    stub = StubImapServer(users={"user": "secret"})
+    stub.add_mailbox("INBOX", generate_messages(100))
+    port = await stub.start()
+    ...
+    await stub.stop()
+
+O como proceso independiente:
+    python benchmarks/imap_stub.py --port 1143 --messages 1000
+"""
+import argparse
+import asyncio
+import base64
+import bisect
+import email
+import functools
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from email.message import Message
+from email.utils import format_datetime, getaddresses
+from typing import Dict, List, Optional, Set, Tuple
+
+_TOKEN = re.compile(r'"((?:[^"\\]|\\.)*)"|(\S+)')
+
+
+def parse_arguments(text: str) -> List[str]:
+    """Argumentos de un comando: átomos y cadenas entre comillas"""
+    return [
+        match.group(1).replace('\\"', '"').replace("\\\\", "\\") if match.group(1) is not None else match.group(2)
+        for match in _TOKEN.finditer(text)
+    ]
+
+
+_FETCH_SECTION = re.compile(r"BODY(?:\.PEEK)?\[([^\]]*)\](?:<(\d+)\.(\d+)>)?", re.IGNORECASE)
+_CHANGEDSINCE = re.compile(r"\(CHANGEDSINCE (\d+)\)\s*$", re.IGNORECASE)
+
+
+@dataclass
+class StubMessage:
+    uid: int
+    raw: bytes
+    flags: Set[str] = field(default_factory=set)
+    internal_date: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    modseq: int = 1
+
+
+@dataclass
+class StubMailbox:
+    name: str
+    uidvalidity: int
+    messages: List[StubMessage] = field(default_factory=list)
+    uidnext: int = 1
+    highestmodseq: int = 1
+    uids: List[int] = field(default_factory=list)
+
+    def append(self, message: StubMessage):
+        # Los mensajes se mantienen ordenados por UID (los UIDs solo crecen)
+        self.messages.append(message)
+        self.uids.append(message.uid)
+        self.uidnext = max(self.uidnext, message.uid + 1)
+        self.highestmodseq += 1
+        message.modseq = self.highestmodseq
+
+    def resolve(self, sequence_set: str, uid: bool) -> List[Tuple[int, StubMessage]]:
+        """Conjunto de secuencia ("1:5,9,20:*") -> [(número de secuencia, mensaje)]"""
+        if not self.messages:
+            return []
+        last = self.uids[-1] if uid else len(self.messages)
+        selected: Dict[int, StubMessage] = {}
+        for part in sequence_set.split(","):
+            low, _, high = part.partition(":")
+            low = last if low == "*" else int(low)
+            high = low if not high else (last if high == "*" else int(high))
+            low, high = min(low, high), max(low, high)
+            if uid:
+                start = bisect.bisect_left(self.uids, low)
+                end = bisect.bisect_right(self.uids, high)
+            else:
+                start, end = max(low - 1, 0), min(high, len(self.messages))
+            for index in range(start, end):
+                selected[index + 1] = self.messages[index]
+        return sorted(selected.items())
+
+
+def generate_messages(count: int, start_uid: int = 1, unseen_every: int = 3,
+                      attachment_every: int = 0, attachment_size: int = 2048) -> List[StubMessage]:
+    """Mensajes sintéticos con uids consecutivos: texto plano o, cada
+    `attachment_every`, multipart/mixed con un adjunto de `attachment_size` bytes"""
+    base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    messages = []
+    for i in range(count):
+        uid = start_uid + i
+        date = base + timedelta(minutes=uid)
+        headers = (
+            f"Message-ID: <stub-{uid}@stub.local>\r\n"
+            f"Date: {format_datetime(date)}\r\n"
+            f"From: Remitente {uid % 50} <sender{uid % 50}@example.com>\r\n"
+            f"To: Buzón <inbox@stub.local>\r\n"
+            f"Subject: Mensaje de prueba {uid}\r\n"
+        )
+        text = f"Contenido del mensaje {uid}.\r\n"
+        if attachment_every and uid % attachment_every == 0:
+            attachment = base64.encodebytes((bytes(range(256)) * (attachment_size // 256 + 1))[:attachment_size])
+            raw = (
+                headers
+                + "MIME-Version: 1.0\r\n"
+                + f'Content-Type: multipart/mixed; boundary="stub-{uid}"\r\n\r\n'
+                + f"--stub-{uid}\r\nContent-Type: text/plain; charset=utf-8\r\n\r\n{text}"
+                + f"--stub-{uid}\r\nContent-Type: application/octet-stream; name=\"datos-{uid}.bin\"\r\n"
+                + f"Content-Disposition: attachment; filename=\"datos-{uid}.bin\"\r\n"
+                + "Content-Transfer-Encoding: base64\r\n\r\n"
+                + attachment.decode("ascii").replace("\n", "\r\n")
+                + f"--stub-{uid}--\r\n"
+            )
+        else:
+            raw = headers + "Content-Type: text/plain; charset=utf-8\r\n\r\n" + text
+        flags = set() if uid % unseen_every == 0 else {"\\Seen"}
+        messages.append(StubMessage(uid=uid, raw=raw.encode("utf-8"), flags=flags, internal_date=date))
+    return messages
+
+
+@functools.lru_cache(maxsize=1024)
+def _parsed(raw: bytes) -> Message:
+    """Mensaje analizado para ENVELOPE / BODYSTRUCTURE (un servidor real los tiene precalculados)"""
+    return email.message_from_string(raw.decode("utf-8", "replace"))
+
+
+@functools.lru_cache(maxsize=64)
+def _mime_part(raw: bytes, section: str) -> bytes:
+    """Parte MIME numerada ("2", "1.2"): su cuerpo tal cual, con su codificación
+    (en caché: un adjunto grande se pide por tramos)"""
+    part = email.message_from_bytes(raw)
+    for number in section.split("."):
+        if not part.is_multipart():
+            if number != "1":
+                return b""
+            continue
+        children = part.get_payload()
+        if not number.isdigit() or not 0 < int(number) <= len(children):
+            return b""
+        part = children[int(number) - 1]
+    return part.get_payload().encode("utf-8", "surrogateescape")
+
+
+# ENVELOPE / BODYSTRUCTURE (RFC 3501 7.4.2) a partir del mensaje
+
+def _nstring(value) -> str:
+    if value is None:
+        return "NIL"
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _address_list(value) -> str:
+    if not value:
+        return "NIL"
+    addresses = []
+    for name, address in getaddresses([str(value)]):
+        mailbox, _, host = address.partition("@")
+        addresses.append(f"({_nstring(name or None)} NIL {_nstring(mailbox)} {_nstring(host)})")
+    return "(" + "".join(addresses) + ")"
+
+
+def envelope(message: Message) -> str:
+    sender = message["From"]
+    fields = [
+        _nstring(message["Date"]), _nstring(message["Subject"]), _address_list(sender),
+        _address_list(message["Sender"] or sender), _address_list(message["Reply-To"] or sender),
+        _address_list(message["To"]), _address_list(message["Cc"]), _address_list(message["Bcc"]),
+        _nstring(message["In-Reply-To"]), _nstring(message["Message-ID"]),
+    ]
+    return "(" + " ".join(fields) + ")"
+
+
+def bodystructure(part: Message) -> str:
+    if part.is_multipart():
+        return "(" + "".join(bodystructure(child) for child in part.get_payload()) + \
+            f' "{part.get_content_subtype().upper()}")'
+    main, sub = part.get_content_maintype().upper(), part.get_content_subtype().upper()
+    params = " ".join(f"{_nstring(key.upper())} {_nstring(value)}" for key, value in (part.get_params() or [])[1:])
+    body = part.get_payload()
+    fields = [f'"{main}"', f'"{sub}"', f"({params})" if params else "NIL", "NIL", "NIL",
+              _nstring((part["Content-Transfer-Encoding"] or "7BIT").upper()), str(len(body.encode("utf-8")))]
+    if main == "TEXT":
+        fields.append(str(body.count("\n")))
+    disposition = part.get_content_disposition()
+    filename = part.get_filename()
+    fields += ["NIL", f'("{disposition.upper()}" ("FILENAME" {_nstring(filename)}))' if disposition and filename
+               else f'("{disposition.upper()}" NIL)' if disposition else "NIL", "NIL", "NIL"]
+    return "(" + " ".join(fields) + ")"
+
+
+class _StubWriter:
+    """Cuenta los bytes enviados; con `latency` entrega cada escritura ese
+    tiempo después de producirse, en orden"""
+
+    def __init__(self, server: "StubImapServer", writer: asyncio.StreamWriter, latency: float):
+        self._server = server
+        self._writer = writer
+        self._latency = latency
+        self._queue: asyncio.Queue = asyncio.Queue()
+        if latency:
+            asyncio.create_task(self._deliver())
+
+    async def _deliver(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            due, data = await self._queue.get()
+            if data is None:
+                self._writer.close()
+                return
+            if due > loop.time():
+                await asyncio.sleep(due - loop.time())
+            self._writer.write(data)
+
+    def write(self, data: bytes):
+        self._server.bytes_sent += len(data)
+        if self._latency:
+            self._queue.put_nowait((asyncio.get_running_loop().time() + self._latency, data))
+        else:
+            self._writer.write(data)
+
+    async def drain(self):
+        await self._writer.drain()
+
+    def close(self):
+        if self._latency:
+            self._queue.put_nowait((0, None))
+        else:
+            self._writer.close()
+
+
+class StubImapServer:
+    """Servidor IMAP mínimo en memoria"""
+
+    capabilities = ["IMAP4rev1", "UNSELECT", "CONDSTORE", "LIST-STATUS", "IDLE"]
+
+    def __init__(self, users: Optional[Dict[str, str]] = None, login_delay: float = 0.0,
+                 max_connections_per_user: Optional[int] = None, latency: float = 0.0):
+        self.users = users or {"user": "secret"}
+        self.login_delay = login_delay
+        self.latency = latency
+        self.max_connections_per_user = max_connections_per_user
+        self.mailboxes: Dict[str, StubMailbox] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._sessions: Counter = Counter()
+        self.connections = 0
+        self.logins = 0
+        self.bytes_sent = 0
+        self.commands: Counter = Counter()
+        self._watchers: Dict[str, Set[asyncio.Event]] = {}
+
+    def add_mailbox(self, name: str, messages: List[StubMessage] = (), uidvalidity: Optional[int] = None) -> StubMailbox:
+        mailbox = StubMailbox(name=name, uidvalidity=uidvalidity or int(time.time()))
+        for message in messages:
+            mailbox.append(message)
+        self.mailboxes[name] = mailbox
+        return mailbox
+
+    # Cambios en el buzón (simulan otros clientes o la entrega de correo)
+
+    def deliver(self, name: str, messages: List[StubMessage]):
+        for message in messages:
+            self.mailboxes[name].append(message)
+        self._notify(name)
+
+    def set_flags(self, name: str, uid: int, flags: Set[str]):
+        mailbox = self.mailboxes[name]
+        for _, message in mailbox.resolve(str(uid), uid=True):
+            mailbox.highestmodseq += 1
+            message.flags = set(flags)
+            message.modseq = mailbox.highestmodseq
+        self._notify(name)
+
+    def expunge(self, name: str, uids: List[int]):
+        mailbox = self.mailboxes[name]
+        gone = set(uids)
+        mailbox.messages = [message for message in mailbox.messages if message.uid not in gone]
+        mailbox.uids = [message.uid for message in mailbox.messages]
+        mailbox.highestmodseq += 1
+        self._notify(name)
+
+    def _notify(self, name: str):
+        for event in self._watchers.get(name, ()):
+            event.set()
+
+    @staticmethod
+    def _updates(session) -> List[str]:
+        """Cambios del buzón seleccionado desde la última vez que la sesión los vio"""
+        mailbox = session["mailbox"]
+        if mailbox is None:
+            return []
+        lines = []
+        known, current = session["uids"], set(mailbox.uids)
+        # EXPUNGE de mayor a menor: cada uno desplaza los números de los siguientes
+        for index in range(len(known) - 1, -1, -1):
+            if known[index] not in current:
+                lines.append(f"* {index + 1} EXPUNGE")
+        old = set(known)
+        changed = [
+            (number, message) for number, message in enumerate(mailbox.messages, 1)
+            if message.uid in old and message.modseq > session["modseq"]
+        ]
+        if mailbox.uids and mailbox.uids[-1] not in old:  # los UIDs nuevos van al final
+            lines.append(f"* {len(mailbox.messages)} EXISTS")
+        for number, message in changed:
+            lines.append(f"* {number} FETCH (UID {message.uid} FLAGS ({' '.join(sorted(message.flags))}))")
+        session["uids"], session["modseq"] = list(mailbox.uids), mailbox.highestmodseq
+        return lines
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        if "INBOX" not in self.mailboxes:
+            self.add_mailbox("INBOX")
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    # Protocolo
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        writer = _StubWriter(self, writer, self.latency)
+        session = {"user": None, "mailbox": None, "readonly": False, "uids": [], "modseq": 0}
+        write = lambda line: writer.write(line.encode("utf-8") + b"\r\n")
+        write(f"* OK [CAPABILITY {' '.join(self.capabilities)}] IMAP stub ready")
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                parts = line.decode("utf-8").rstrip("\r\n").split(" ", 2)
+                if len(parts) < 2:
+                    write("* BAD Missing command")
+                    continue
+                tag, command = parts[0], parts[1].upper()
+                args = parse_arguments(parts[2]) if len(parts) > 2 else []
+                self.commands[command] += 1
+                handler = getattr(self, f"_cmd_{command.lower()}", None)
+                if handler is None:
+                    write(f"{tag} BAD Unknown command {command}")
+                    continue
+                keep_going = await handler(tag, args, session, write, reader, writer)
+                await writer.drain()
+                if keep_going is False:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            if session["user"]:
+                self._sessions[session["user"]] -= 1
+            writer.close()
+
+    async def _cmd_capability(self, tag, args, session, write, reader, writer):
+        write(f"* CAPABILITY {' '.join(self.capabilities)}")
+        write(f"{tag} OK CAPABILITY completed")
+
+    async def _cmd_noop(self, tag, args, session, write, reader, writer):
+        for line in self._updates(session):
+            write(line)
+        write(f"{tag} OK NOOP completed")
+
+    async def _cmd_idle(self, tag, args, session, write, reader, writer):
+        if session["mailbox"] is None:
+            write(f"{tag} BAD No mailbox selected")
+            return
+        write("+ idling")
+        await writer.drain()
+        event = asyncio.Event()
+        watchers = self._watchers.setdefault(session["mailbox"].name, set())
+        watchers.add(event)
+        done = asyncio.ensure_future(reader.readline())
+        try:
+            while True:
+                for line in self._updates(session):
+                    write(line)
+                await writer.drain()
+                changed = asyncio.ensure_future(event.wait())
+                await asyncio.wait({done, changed}, return_when=asyncio.FIRST_COMPLETED)
+                changed.cancel()
+                event.clear()
+                if done.done():
+                    break
+        finally:
+            watchers.discard(event)
+            done.cancel()
+        line = done.result()
+        if not line:
+            return False
+        if line.strip().upper() != b"DONE":
+            write(f"{tag} BAD Expected DONE")
+            return
+        write(f"{tag} OK IDLE terminated")
+
+    async def _cmd_login(self, tag, args, session, write, reader, writer):
+        if self.login_delay:
+            await asyncio.sleep(self.login_delay)
+        username, password = (args + ["", ""])[:2]
+        if self.users.get(username) != password:
+            write(f"{tag} NO [AUTHENTICATIONFAILED] Invalid credentials")
+            return
+        if self.max_connections_per_user and self._sessions[username] >= self.max_connections_per_user:
+            write(f"{tag} NO [LIMIT] Too many simultaneous connections")
+            return
+        session["user"] = username
+        self._sessions[username] += 1
+        self.logins += 1
+        write(f"{tag} OK LOGIN completed")
+
+    async def _cmd_logout(self, tag, args, session, write, reader, writer):
+        write("* BYE IMAP stub logging out")
+        write(f"{tag} OK LOGOUT completed")
+        return False
+
+    def _status_line(self, mailbox: StubMailbox, items: List[str]) -> str:
+        values = {
+            "MESSAGES": len(mailbox.messages),
+            "RECENT": 0,
+            "UNSEEN": sum(1 for message in mailbox.messages if "\\Seen" not in message.flags),
+            "UIDNEXT": mailbox.uidnext,
+            "UIDVALIDITY": mailbox.uidvalidity,
+            "HIGHESTMODSEQ": mailbox.highestmodseq,
+        }
+        pairs = " ".join(f"{item} {values[item]}" for item in items if item in values)
+        return f'* STATUS "{mailbox.name}" ({pairs})'
+
+    @staticmethod
+    def _status_items(args: List[str]) -> List[str]:
+        return [arg.strip("()").upper() for arg in args if arg.strip("()").upper() != "STATUS"]
+
+    async def _cmd_list(self, tag, args, session, write, reader, writer):
+        # LIST "" "*" RETURN (STATUS (MESSAGES UNSEEN ...))
+        upper = [arg.upper() for arg in args]
+        items = self._status_items(args[upper.index("RETURN") + 1:]) if "RETURN" in upper else []
+        for name, mailbox in self.mailboxes.items():
+            write(f'* LIST (\\HasNoChildren) "/" "{name}"')
+            if items:
+                write(self._status_line(mailbox, items))
+        write(f"{tag} OK LIST completed")
+
+    async def _cmd_status(self, tag, args, session, write, reader, writer):
+        mailbox = self.mailboxes.get(args[0] if args else "")
+        if mailbox is None:
+            write(f"{tag} NO Mailbox does not exist")
+            return
+        write(self._status_line(mailbox, self._status_items(args[1:])))
+        write(f"{tag} OK STATUS completed")
+
+    async def _select(self, tag, args, session, write, readonly: bool):
+        mailbox = self.mailboxes.get(args[0] if args else "")
+        if mailbox is None:
+            write(f"{tag} NO Mailbox does not exist")
+            return
+        session["mailbox"], session["readonly"] = mailbox, readonly
+        session["uids"], session["modseq"] = list(mailbox.uids), mailbox.highestmodseq
+        write("* FLAGS (\\Answered \\Flagged \\Deleted \\Seen \\Draft)")
+        write(f"* {len(mailbox.messages)} EXISTS")
+        write("* 0 RECENT")
+        write(f"* OK [UIDVALIDITY {mailbox.uidvalidity}] UIDs valid")
+        write(f"* OK [UIDNEXT {mailbox.uidnext}] Predicted next UID")
+        write(f"* OK [HIGHESTMODSEQ {mailbox.highestmodseq}] Highest")
+        mode = "READ-ONLY" if readonly else "READ-WRITE"
+        write(f"{tag} OK [{mode}] {'EXAMINE' if readonly else 'SELECT'} completed")
+
+    async def _cmd_select(self, tag, args, session, write, reader, writer):
+        await self._select(tag, args, session, write, readonly=False)
+
+    async def _cmd_examine(self, tag, args, session, write, reader, writer):
+        await self._select(tag, args, session, write, readonly=True)
+
+    async def _cmd_search(self, tag, args, session, write, reader, writer, uid: bool = False):
+        mailbox = session["mailbox"]
+        if mailbox is None:
+            write(f"{tag} BAD No mailbox selected")
+            return
+        criteria = [arg.upper() for arg in args]
+        candidates = list(enumerate(mailbox.messages, start=1))
+        if "UID" in criteria[:-1]:
+            candidates = mailbox.resolve(criteria[criteria.index("UID") + 1], uid=True)
+        numbers = [
+            str(message.uid if uid else seq) for seq, message in candidates
+            if "UNSEEN" not in criteria or "\\Seen" not in message.flags
+        ]
+        write("* SEARCH" + ("" if not numbers else " " + " ".join(numbers)))
+        write(f"{tag} OK {'UID ' if uid else ''}SEARCH completed")
+
+    async def _cmd_fetch(self, tag, args, session, write, reader, writer, uid: bool = False):
+        mailbox = session["mailbox"]
+        if mailbox is None or len(args) < 2:
+            write(f"{tag} BAD No mailbox selected" if mailbox is None else f"{tag} BAD Missing arguments")
+            return
+        items = " ".join(args[1:])
+        changedsince = None
+        match = _CHANGEDSINCE.search(items)
+        if match:
+            changedsince = int(match.group(1))
+            items = items[:match.start()].strip()
+        sections = _FETCH_SECTION.findall(items)
+        words = set(_FETCH_SECTION.sub(" ", items).strip("() ").upper().split())
+        if uid:
+            words.add("UID")
+        if changedsince is not None:
+            words.add("MODSEQ")
+
+        for seq, message in mailbox.resolve(args[0], uid=uid):
+            if changedsince is not None and message.modseq <= changedsince:
+                continue
+            parts = []
+            if "UID" in words:
+                parts.append(f"UID {message.uid}".encode())
+            if "FLAGS" in words:
+                parts.append(f"FLAGS ({' '.join(sorted(message.flags))})".encode())
+            if "INTERNALDATE" in words:
+                parts.append(f'INTERNALDATE "{message.internal_date.strftime("%d-%b-%Y %H:%M:%S +0000")}"'.encode())
+            if "RFC822.SIZE" in words:
+                parts.append(f"RFC822.SIZE {len(message.raw)}".encode())
+            if "MODSEQ" in words:
+                parts.append(f"MODSEQ ({message.modseq})".encode())
+            if "ENVELOPE" in words or "BODYSTRUCTURE" in words:
+                parsed = _parsed(message.raw)
+                if "ENVELOPE" in words:
+                    parts.append(f"ENVELOPE {envelope(parsed)}".encode("utf-8"))
+                if "BODYSTRUCTURE" in words:
+                    parts.append(f"BODYSTRUCTURE {bodystructure(parsed)}".encode("utf-8"))
+            if "RFC822.HEADER" in words:
+                data = self._section(message.raw, "HEADER")
+                parts.append(f"RFC822.HEADER {{{len(data)}}}\r\n".encode() + data)
+            for section, origin, length in sections:
+                data = self._section(message.raw, section)
+                label = f"BODY[{section}]"
+                if origin:
+                    # Fetch parcial: BODY[1]<origen.longitud> -> BODY[1]<origen>
+                    data = data[int(origin):int(origin) + int(length)]
+                    label += f"<{origin}>"
+                parts.append(f"{label} {{{len(data)}}}\r\n".encode() + data)
+            writer.write(f"* {seq} FETCH (".encode() + b" ".join(parts) + b")\r\n")
+        write(f"{tag} OK {'UID ' if uid else ''}FETCH completed")
+
+    @staticmethod
+    def _section(raw: bytes, section: str) -> bytes:
+        header, _, body = raw.partition(b"\r\n\r\n")
+        name = section.upper()
+        if name == "":
+            return raw
+        if name[0].isdigit():
+            return _mime_part(raw, name)
+        if name == "TEXT":
+            return body
+        if name == "HEADER":
+            return header + b"\r\n\r\n"
+        if name.startswith("HEADER.FIELDS"):
+            wanted = set(name[name.index("(") + 1:name.rindex(")")].split())
+            lines = [line for line in header.split(b"\r\n")
+                     if line.split(b":", 1)[0].decode("ascii", "replace").upper() in wanted]
+            return b"\r\n".join(lines) + b"\r\n\r\n"
+        return b""
+
+    async def _cmd_uid(self, tag, args, session, write, reader, writer):
+        command = args[0].upper() if args else ""
+        if command == "FETCH":
+            return await self._cmd_fetch(tag, args[1:], session, write, reader, writer, uid=True)
+        if command == "SEARCH":
+            return await self._cmd_search(tag, args[1:], session, write, reader, writer, uid=True)
+        write(f"{tag} BAD Unsupported UID command {command}")
+
+    async def _cmd_close(self, tag, args, session, write, reader, writer):
+        session["mailbox"] = None
+        write(f"{tag} OK CLOSE completed")
+
+    async def _cmd_unselect(self, tag, args, session, write, reader, writer):
+        session["mailbox"] = None
+        write(f"{tag} OK UNSELECT completed")
+
+
+async def _serve(port: int, messages: int, login_delay: float, latency: float):
+    stub = StubImapServer(login_delay=login_delay, latency=latency)
+    stub.add_mailbox("INBOX", generate_messages(messages))
+    stub.add_mailbox("Sent", generate_messages(messages // 10))
+    port = await stub.start(port=port)
+    print(f"IMAP stub escuchando en 127.0.0.1:{port} (usuario 'user', contraseña 'secret')")
+    await asyncio.Event().wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=1143)
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--login-delay", type=float, default=0.0)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve(args.port, args.messages, args.login_delay, args.latency))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Servidor SMTP de pruebas (asyncio, en memoria)
+
+Implementa lo que usa el backend (EHLO, AUTH PLAIN/LOGIN, MAIL, RCPT, DATA,
+RSET, NOOP, QUIT), sin TLS, para probar y medir la cola de envío sin un
+servidor real. Los destinatarios permiten simular errores:
+
+    ...reject...@   -> 550 (rechazo definitivo)
+    ...tempfail...@ -> 451 (error temporal)
+
+Opciones para simular un proveedor remoto:
+    login_delay   segundos de espera en AUTH (además del RTT)
+    latency       segundos que tarda cada respuesta en llegar al cliente (RTT)
+    keep          guardar los mensajes recibidos en `messages`
+
+Uso desde un script:
+    stub = StubSmtpServer(latency=0.02)
+    port = await stub.start()
+    ...
+    await stub.stop()
+"""
+import asyncio
+from collections import Counter
+from typing import List, Optional, Tuple
+
+
+class StubSmtpServer:
+    """Servidor SMTP mínimo en memoria"""
+
+    def __init__(self, login_delay: float = 0.0, latency: float = 0.0, keep: bool = True):
+        self.login_delay = login_delay
+        self.latency = latency
+        self.keep = keep
+        self.messages: List[Tuple[str, List[str], bytes]] = []
+        self.commands: Counter = Counter()
+        self.connections = 0
+        self.delivered = 0
+        self.bytes_received = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+
+        async def reply(*lines: str):
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            writer.write(b"".join(
+                f"{line[:3]}{'-' if index < len(lines) - 1 else ' '}{line[4:]}\r\n".encode("utf-8")
+                for index, line in enumerate(lines)
+            ))
+            await writer.drain()
+
+        sender, recipients = None, []
+        try:
+            await reply("220 stub ESMTP ready")
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode("utf-8", "replace").rstrip("\r\n")
+                verb = command.split(" ", 1)[0].upper()
+                self.commands[verb] += 1
+                if verb in ("EHLO", "HELO"):
+                    await reply("250 stub", "250 AUTH PLAIN LOGIN", "250 8BITMIME")
+                elif verb == "AUTH":
+                    if self.login_delay:
+                        await asyncio.sleep(self.login_delay)
+                    if command.upper().startswith("AUTH LOGIN"):
+                        await reply("334 VXNlcm5hbWU6")
+                        await reader.readline()
+                        await reply("334 UGFzc3dvcmQ6")
+                        await reader.readline()
+                    await reply("235 Authentication successful")
+                elif verb == "MAIL":
+                    sender, recipients = command[10:].strip("<> "), []
+                    await reply("250 OK")
+                elif verb == "RCPT":
+                    address = command[8:].strip("<> ")
+                    if "reject" in address:
+                        await reply("550 No such user")
+                    elif "tempfail" in address:
+                        await reply("451 Try again later")
+                    else:
+                        recipients.append(address)
+                        await reply("250 OK")
+                elif verb == "DATA":
+                    if not recipients:
+                        await reply("503 No valid recipients")
+                        continue
+                    await reply("354 End data with <CR><LF>.<CR><LF>")
+                    chunks = []
+                    while True:
+                        data = await reader.readline()
+                        if not data or data == b".\r\n":
+                            break
+                        self.bytes_received += len(data)
+                        if self.keep:
+                            chunks.append(data)
+                    self.delivered += 1
+                    if self.keep:
+                        self.messages.append((sender, recipients, b"".join(chunks)))
+                    sender, recipients = None, []
+                    await reply(f"250 OK queued as {self.delivered}")
+                elif verb == "RSET":
+                    sender, recipients = None, []
+                    await reply("250 OK")
+                elif verb == "NOOP":
+                    await reply("250 OK")
+                elif verb == "QUIT":
+                    await reply("221 Bye")
+                    break
+                else:
+                    await reply("502 Command not implemented")
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
@@ -18,11 +18,28 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Database imports
-from src.database.connection import test_connection, get_engine
+from src.database.connection import test_connection, get_engine, dispose_engines, get_replica_status
+from src.database.registry import get_engine_registry
+from src.database import instrumentation
 from src.database.models import init_db, Base
+from src.database.migrations import run_migrations
 
 # Services
 from src.services.auth import AuthService, get_current_user
+from src.services.password_hashing import password_hasher
+from src.services.user_cache import user_cache
+from src.modules.mail.counters import counter_reconciler
+from src.modules.mail.imap_pool import imap_pool
+from src.modules.mail.folder_status import folder_status
+from src.modules.mail.parts import part_store
+from src.modules.mail.scheduler import mail_scheduler
+from src.modules.mail.events import mail_events
+from src.modules.mail.idle import mail_idle
+from src.modules.mail.outbox import mail_outbox, smtp_pool
+from src.modules.mail.sync import mail_sync
+from src.services.permissions import permission_cache
+from src.services.session_sweeper import session_sweeper
+from src.services.write_behind import login_write_buffer
 
 # Import all routers
 from src.api.routers import (
@@ -66,6 +83,7 @@ async def lifespan(app: FastAPI):
     try:
         # Create tables if they don't exist
         Base.metadata.create_all(bind=get_engine())
+        run_migrations(get_engine(), Base.metadata)
         
         # Initialize with default data
         init_db()
@@ -74,6 +92,19 @@ async def lifespan(app: FastAPI):
         logger.error(f"❌ Database initialization failed: {e}")
         raise
     
+    login_write_buffer.start()
+    session_sweeper.start()
+    imap_pool.start()
+    mail_scheduler.start()
+    mail_idle.start()
+    settings = get_engine_registry().settings
+    if settings.database.workers > 1 and settings.mail.idle_enabled:
+        logger.warning(f"Mail events are in-process: with {settings.database.workers} workers, "
+                       "/api/mail/events may miss changes made by another worker")
+    smtp_pool.start()
+    mail_outbox.start()
+    counter_reconciler.start()
+    
     logger.info("Loading AI models...")
     logger.info("Setting up external integrations...")
     logger.info("📧 Mail endpoints enabled")
@@ -84,8 +115,20 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Shutting down CRM ARI API...")
+    logger.info("Flushing pending login writes...")
+    await login_write_buffer.stop()
+    await session_sweeper.stop()
+    await counter_reconciler.stop()
+    await mail_outbox.stop()
+    await smtp_pool.close()
+    await mail_idle.stop()
+    await mail_scheduler.stop()
+    await mail_sync.release_all()
+    await imap_pool.close()
     logger.info("Closing database connections...")
+    await dispose_engines()
     logger.info("Cleaning up resources...")
+    password_hasher.shutdown()
     logger.info("✅ CRM ARI API shut down successfully")
 
 
@@ -211,6 +254,26 @@ async def log_requests(request: Request, call_next):
     
     return response
 
+# Per-request SQL instrumentation (Server-Timing + N+1 detection)
+@app.middleware("http")
+async def sql_instrumentation(request: Request, call_next):
+    """Count queries and DB time for each request"""
+    stats, token = instrumentation.begin_request()
+    try:
+        response = await call_next(request)
+    finally:
+        instrumentation.end_request(token)
+    
+    threshold = get_engine_registry().settings.database.n_plus_one_threshold
+    response.headers["Server-Timing"] = stats.server_timing(threshold)
+    for shape, count in stats.repeated_shapes(threshold):
+        logger.warning(
+            f"Possible N+1 in {request.method} {request.url.path}: "
+            f"{count}x {shape[:300]}"
+        )
+    
+    return response
+
 
 # Health check endpoints
 @app.get("/health")
@@ -236,6 +299,30 @@ async def api_health_check():
     }
 
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics(username: str = Depends(get_current_docs_user)):
+    """Runtime metrics (protected with the docs credentials)"""
+    return {
+        "database": get_engine_registry().status(),
+        "replicas": get_replica_status(),
+        "auth_user_cache": user_cache.stats(),
+        "password_hashing": password_hasher.stats(),
+        "login_write_behind": login_write_buffer.stats(),
+        "session_sweeper": session_sweeper.stats(),
+        "permission_cache": permission_cache.stats(),
+        "imap_pool": imap_pool.stats(),
+        "mail_sync": mail_sync.stats(),
+        "mail_folder_status": folder_status.stats(),
+        "mail_counters": counter_reconciler.stats(),
+        "mail_part_store": part_store.stats(),
+        "mail_scheduler": mail_scheduler.stats(),
+        "mail_events": mail_events.stats(),
+        "mail_idle": mail_idle.stats(),
+        "mail_outbox": mail_outbox.stats(),
+        "mail_smtp_pool": smtp_pool.stats()
+    }
+
+
 # Include routers
 app.include_router(auth_router, prefix="/api/auth", tags=["authentication"])
 app.include_router(users_router, prefix="/api/users", tags=["users"])
@@ -2,16 +2,20 @@
 Authentication router
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Query
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, EmailStr
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import List, Optional
 
-from ...database.connection import get_db
-from ...database.models import User
-from ...services.auth import AuthService, create_user, get_current_user
+from sqlalchemy import select
+
+from ...database.connection import get_async_db, get_async_read_db
+from ...database.models import User, UserSession
+from ...database.pagination import decode_cursor, encode_cursor, keyset_after
+from ...services.auth import AuthService, create_user, get_current_admin_user, get_current_user_record
+from ...services.user_cache import UserPrincipal
 
 router = APIRouter()
 
@@ -50,15 +54,30 @@ class Token(BaseModel):
 class TokenData(BaseModel):
     username: Optional[str] = None
 
+class SessionResponse(BaseModel):
+    id: str
+    user_id: int
+    username: str
+    ip_address: Optional[str]
+    user_agent: Optional[str]
+    created_at: Optional[datetime]
+    expires_at: datetime
+    is_active: bool
+
+class SessionList(BaseModel):
+    sessions: List[SessionResponse]
+    size: int
+    next_cursor: Optional[str] = None
+
 # Authentication endpoints
 @router.post("/login", response_model=Token)
 async def login(
     user_credentials: UserLogin,
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Login endpoint"""
-    user = AuthService.authenticate_user(db, user_credentials.username, user_credentials.password)
+    user = await AuthService.authenticate_user(db, user_credentials.username, user_credentials.password)
     
     if not user:
         raise HTTPException(
@@ -83,7 +102,7 @@ async def login(
     # Create user session
     ip_address = request.client.host if request.client else None
     user_agent = request.headers.get("user-agent")
-    session_id = AuthService.create_user_session(db, user.id, ip_address, user_agent)
+    session_id = await AuthService.create_user_session(db, user.id, ip_address, user_agent)
     
     return {
         "access_token": access_token,
@@ -95,11 +114,11 @@ async def login(
 @router.post("/register", response_model=UserResponse)
 async def register(
     user_data: UserRegister,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Register new user"""
     try:
-        user = create_user(
+        user = await create_user(
             db=db,
             username=user_data.username,
             email=user_data.email,
@@ -119,26 +138,81 @@ async def register(
 @router.post("/logout")
 async def logout(
     session_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Logout endpoint"""
-    success = AuthService.logout_user(db, session_id)
+    success = await AuthService.logout_user(db, session_id)
     if success:
         return {"message": "Successfully logged out"}
     else:
         return {"message": "Session not found"}
 
+@router.get("/sessions", response_model=SessionList)
+async def list_sessions(
+    user_id: Optional[int] = Query(None),
+    active_only: bool = Query(True),
+    size: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: UserPrincipal = Depends(get_current_admin_user)
+):
+    """List user sessions, newest expiry first (admin only)"""
+    # Filtros y orden sobre (user_id,) is_active, expires_at: el índice resuelve
+    # tanto el WHERE como el ORDER BY, sin ordenar en memoria; sin filtros,
+    # ix_user_sessions_expires (expires_at, id)
+    query = select(UserSession, User.username).join(User, User.id == UserSession.user_id)
+    if user_id is not None:
+        query = query.where(UserSession.user_id == user_id)
+    if active_only:
+        query = query.where(UserSession.is_active == True, UserSession.expires_at > datetime.utcnow())
+    
+    sort_columns = [UserSession.expires_at, UserSession.id]
+    query = query.order_by(*(column.desc() for column in sort_columns))
+    if cursor:
+        try:
+            values = decode_cursor(cursor, kind="sessions")
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        query = query.where(keyset_after(
+            sort_columns, values, descending=True, dialect_name=db.bind.dialect.name
+        ))
+    
+    rows = (await db.execute(query.limit(size + 1))).all()
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        last = rows[-1][0]
+        next_cursor = encode_cursor("sessions", [last.expires_at, last.id])
+    
+    return SessionList(
+        sessions=[
+            SessionResponse(
+                id=session.id,
+                user_id=session.user_id,
+                username=username,
+                ip_address=session.ip_address,
+                user_agent=session.user_agent,
+                created_at=session.created_at,
+                expires_at=session.expires_at,
+                is_active=session.is_active
+            )
+            for session, username in rows
+        ],
+        size=size,
+        next_cursor=next_cursor
+    )
+
 @router.get("/me", response_model=UserResponse)
 async def get_current_user_info(
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user_record)
 ):
     """Get current user information"""
     return UserResponse.model_validate(current_user)
 
 @router.post("/refresh-token", response_model=Token)
 async def refresh_token(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_record),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Refresh access token"""
     access_token_expires = timedelta(minutes=30)
@@ -159,10 +233,10 @@ async def refresh_token(
 async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
     request: Request = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """OAuth2 compatible login endpoint"""
-    user = AuthService.authenticate_user(db, form_data.username, form_data.password)
+    user = await AuthService.authenticate_user(db, form_data.username, form_data.password)
     
     if not user:
         raise HTTPException(
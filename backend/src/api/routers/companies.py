@@ -7,6 +7,9 @@ from fastapi import APIRouter, Depends, HTTPException, status, Query
 from pydantic import BaseModel, Field
 from datetime import datetime
 
+from ...services.permissions import require_permission
+from ...services.user_cache import UserPrincipal
+
 # Pydantic models for request/response
 class CompanyCreate(BaseModel):
     name: str = Field(..., min_length=2, max_length=255, description="Company name")
@@ -41,7 +44,10 @@ router = APIRouter()
 
 
 @router.post("/", response_model=CompanyResponse, status_code=status.HTTP_201_CREATED)
-async def create_company(company_data: CompanyCreate):
+async def create_company(
+    company_data: CompanyCreate,
+    current_user: UserPrincipal = Depends(require_permission("companies.write"))
+):
     """Create a new company"""
     try:
         # In a real implementation, this would use dependency injection
@@ -148,7 +154,11 @@ async def get_company(company_id: int):
 
 
 @router.put("/{company_id}", response_model=CompanyResponse)
-async def update_company(company_id: int, company_data: CompanyUpdate):
+async def update_company(
+    company_id: int,
+    company_data: CompanyUpdate,
+    current_user: UserPrincipal = Depends(require_permission("companies.write"))
+):
     """Update company information"""
     try:
         # In a real implementation, this would use the company service
@@ -189,7 +199,10 @@ async def update_company(company_id: int, company_data: CompanyUpdate):
 
 
 @router.delete("/{company_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_company(company_id: int):
+async def delete_company(
+    company_id: int,
+    current_user: UserPrincipal = Depends(require_permission("companies.write"))
+):
     """Delete company"""
     try:
         # In a real implementation, this would use the company service
@@ -212,7 +225,10 @@ async def delete_company(company_id: int):
 
 
 @router.post("/{company_id}/activate", response_model=CompanyResponse)
-async def activate_company(company_id: int):
+async def activate_company(
+    company_id: int,
+    current_user: UserPrincipal = Depends(require_permission("companies.write"))
+):
     """Activate company"""
     try:
         # In a real implementation, this would use the company service
@@ -247,7 +263,10 @@ async def activate_company(company_id: int):
 
 
 @router.post("/{company_id}/deactivate", response_model=CompanyResponse)
-async def deactivate_company(company_id: int):
+async def deactivate_company(
+    company_id: int,
+    current_user: UserPrincipal = Depends(require_permission("companies.write"))
+):
     """Deactivate company"""
     try:
         # In a real implementation, this would use the company service
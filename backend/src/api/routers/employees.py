@@ -9,7 +9,9 @@ from pydantic import BaseModel, Field
 from datetime import datetime
 import logging
 
-from ...database.connection import get_db_session
+from ...database.connection import get_db
+from ...services.permissions import require_permission
+from ...services.user_cache import UserPrincipal
 
 logger = logging.getLogger(__name__)
 
@@ -121,7 +123,7 @@ async def get_employees(
     skip: int = 0,
     limit: int = 100,
     active_only: bool = True,
-    db: Session = Depends(get_db_session)
+    db: Session = Depends(get_db)
 ):
     """
     Get all employees with optional filtering
@@ -151,7 +153,7 @@ async def get_employees(
 @router.get("/{employee_id}", response_model=EmployeeResponse)
 async def get_employee(
     employee_id: str,
-    db: Session = Depends(get_db_session)
+    db: Session = Depends(get_db)
 ):
     """
     Get a specific employee by ID
@@ -182,7 +184,8 @@ async def get_employee(
 @router.post("/", response_model=EmployeeResponse, status_code=status.HTTP_201_CREATED)
 async def create_employee(
     employee: EmployeeCreate,
-    db: Session = Depends(get_db_session)
+    db: Session = Depends(get_db),
+    current_user: UserPrincipal = Depends(require_permission("employees.write"))
 ):
     """
     Create a new employee
@@ -224,7 +227,8 @@ async def create_employee(
 async def update_employee(
     employee_id: str,
     employee_update: EmployeeUpdate,
-    db: Session = Depends(get_db_session)
+    db: Session = Depends(get_db),
+    current_user: UserPrincipal = Depends(require_permission("employees.write"))
 ):
     """
     Update a specific employee
@@ -272,7 +276,8 @@ async def update_employee(
 @router.delete("/{employee_id}")
 async def delete_employee(
     employee_id: str,
-    db: Session = Depends(get_db_session)
+    db: Session = Depends(get_db),
+    current_user: UserPrincipal = Depends(require_permission("employees.write"))
 ):
     """
     Delete a specific employee
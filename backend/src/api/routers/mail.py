@@ -1,21 +1,43 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, UploadFile, File, Form
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, EmailStr
-from typing import List, Optional, Dict, Any
-import imaplib
-import smtplib
-import ssl
-import email
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.mime.base import MIMEBase
-from email import encoders
+from typing import List, Optional, Dict, Any, Tuple
+import asyncio
 import json
-import uuid
-import random
+from contextlib import asynccontextmanager
 from datetime import datetime
+from functools import partial
+from email.utils import formataddr, formatdate, make_msgid
+from urllib.parse import quote
 import logging
 
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import defer, load_only, selectinload
+
+from ...config.settings import get_settings
+from ...database.connection import get_async_db
+from ...database.pagination import decode_cursor, encode_cursor, keyset_after
+from ...database.models import (
+    MailAccount as MailAccountRecord, MailAttachment, MailFolder, MailMessage, MailOutbox, MailThread, MailThreadRef
+)
+from ...modules.mail.compose import OutgoingAttachment, write_message
+from ...modules.mail.envelope import LIST_ITEMS, BodyPart, has_attachments, parse_envelope, walk_parts
+from ...modules.mail.events import mail_events
+from ...modules.mail.folder_status import folder_status, list_with_status
+from ...modules.mail.imap_client import ImapClient
+from ...modules.mail.imap_pool import imap_pool
+from ...modules.mail.outbox import mail_outbox, outbox_status
+from ...modules.mail.parts import fetch_part, fetch_texts, make_snippet, part_store
+from ...modules.mail.scheduler import mail_scheduler
+from ...modules.mail.search import search_query
+from ...modules.mail.smtp_client import SmtpClient
+from ...modules.mail.sync import SyncBusy, flag_values, internal_date, mail_sync
+from ...modules.mail.threads import latest_messages, thread_counts
+from ...modules.mail.transport import ConnectionSettings
+from ...services.auth import get_current_active_user, get_current_stream_user
+from ...services.user_cache import UserPrincipal
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["mail"])
@@ -57,19 +79,24 @@ class SendMessageRequest(BaseModel):
 # Utilidades para IMAP/SMTP
 class MailConnectionManager:
     @staticmethod
-    def test_imap_connection(settings: ServerSettings) -> Dict[str, Any]:
+    @asynccontextmanager
+    async def one_shot_imap(settings: ServerSettings):
+        """Sesión IMAP fuera del pool, cerrada al salir: solo las cuentas guardadas usan imap_pool
+        (si no, cualquiera podría llenarlo con sesiones abiertas para credenciales arbitrarias)"""
+        mail_settings = get_settings().mail
+        imap = await ImapClient.open(
+            settings, timeout=mail_settings.imap_timeout, connect_timeout=mail_settings.connect_timeout
+        )
         try:
-            if settings.ssl:
-                mail = imaplib.IMAP4_SSL(settings.server, settings.port)
-            else:
-                mail = imaplib.IMAP4(settings.server, settings.port)
-                if settings.port == 143:  # STARTTLS para puerto estándar
-                    mail.starttls()
-            
-            mail.login(settings.username, settings.password)
-            mail.select('INBOX')
-            mail.close()
-            mail.logout()
+            yield imap
+        finally:
+            await imap.logout()
+
+    @staticmethod
+    async def test_imap_connection(settings: ServerSettings) -> Dict[str, Any]:
+        try:
+            async with MailConnectionManager.one_shot_imap(settings) as imap:
+                await imap.select('INBOX', readonly=True)
             
             return {
                 "success": True,
@@ -84,17 +111,13 @@ class MailConnectionManager:
             }
     
     @staticmethod
-    def test_smtp_connection(settings: ServerSettings) -> Dict[str, Any]:
+    async def test_smtp_connection(settings: ServerSettings) -> Dict[str, Any]:
         try:
-            if settings.ssl and settings.port == 465:
-                server = smtplib.SMTP_SSL(settings.server, settings.port)
-            else:
-                server = smtplib.SMTP(settings.server, settings.port)
-                if settings.ssl or settings.port == 587:
-                    server.starttls()
-            
-            server.login(settings.username, settings.password)
-            server.quit()
+            mail_settings = get_settings().mail
+            server = await SmtpClient.open(
+                settings, timeout=mail_settings.smtp_timeout, connect_timeout=mail_settings.connect_timeout
+            )
+            await server.quit()
             
             return {
                 "success": True,
@@ -109,49 +132,35 @@ class MailConnectionManager:
             }
     
     @staticmethod
-    def get_imap_folders(settings: ServerSettings) -> List[Dict[str, Any]]:
-        try:
-            if settings.ssl:
-                mail = imaplib.IMAP4_SSL(settings.server, settings.port)
-            else:
-                mail = imaplib.IMAP4(settings.server, settings.port)
-                if settings.port == 143:
-                    mail.starttls()
-            
-            mail.login(settings.username, settings.password)
-            
-            # Obtener lista de carpetas
-            result, folders = mail.list()
-            folder_list = []
-            
-            for folder in folders:
-                folder_info = folder.decode().split(' ')
-                folder_name = folder_info[-1].strip('"')
-                
-                # Obtener conteo de mensajes
-                try:
-                    mail.select(folder_name)
-                    result, messages = mail.search(None, 'ALL')
-                    total_count = len(messages[0].split()) if messages[0] else 0
-                    
-                    result, unseen = mail.search(None, 'UNSEEN')
-                    unread_count = len(unseen[0].split()) if unseen[0] else 0
-                    
-                    folder_list.append({
-                        "id": folder_name.lower().replace(' ', '_'),
-                        "name": folder_name,
-                        "displayName": folder_name.replace('INBOX', 'Bandeja de entrada'),
-                        "type": "inbox" if folder_name == "INBOX" else "folder",
-                        "unreadCount": unread_count,
-                        "totalCount": total_count,
-                        "path": folder_name
-                    })
-                except:
-                    continue
+    async def _read_folders(mail: ImapClient) -> List[Dict[str, Any]]:
+        # Carpetas y contadores con STATUS (LIST-STATUS o pipelining): sin abrir
+        # cada carpeta ni transferir la lista de mensajes de SEARCH
+        mailboxes, statuses = await list_with_status(mail)
+        folder_list = []
+        
+        for folder in mailboxes:
+            status = statuses.get(folder.name)
+            if not folder.selectable or status is None:
+                continue
+            folder_name = folder.name
             
-            mail.close()
-            mail.logout()
-            return folder_list
+            folder_list.append({
+                "id": folder_name.lower().replace(' ', '_'),
+                "name": folder_name,
+                "displayName": folder_name.replace('INBOX', 'Bandeja de entrada'),
+                "type": "inbox" if folder_name == "INBOX" else "folder",
+                "unreadCount": status.get("UNSEEN", 0),
+                "totalCount": status.get("MESSAGES", 0),
+                "path": folder_name
+            })
+        
+        return folder_list
+    
+    @staticmethod
+    async def get_imap_folders(settings: ServerSettings) -> List[Dict[str, Any]]:
+        try:
+            async with MailConnectionManager.one_shot_imap(settings) as imap:
+                return await MailConnectionManager._read_folders(imap)
             
         except Exception as e:
             logger.error(f"Error getting folders: {str(e)}")
@@ -172,8 +181,11 @@ async def mail_health():
 async def test_connection(request: TestConnectionRequest):
     """Probar conectividad IMAP y SMTP sin guardar la configuración"""
     
-    imap_result = MailConnectionManager.test_imap_connection(request.incoming)
-    smtp_result = MailConnectionManager.test_smtp_connection(request.outgoing)
+    # En paralelo: la respuesta tarda lo que el más lento de los dos, no la suma
+    imap_result, smtp_result = await asyncio.gather(
+        MailConnectionManager.test_imap_connection(request.incoming),
+        MailConnectionManager.test_smtp_connection(request.outgoing)
+    )
     
     success = imap_result["success"] and smtp_result["success"]
     
@@ -189,8 +201,47 @@ async def test_connection(request: TestConnectionRequest):
         ]
     }
 
+def _account_response(record: MailAccountRecord, folder_count: int) -> Dict[str, Any]:
+    return {
+        "id": record.id,
+        "name": record.name,
+        "email": record.email,
+        "provider": record.provider,
+        "isActive": record.is_active,
+        "isDefault": record.is_default,
+        "unreadCount": record.unread_count or 0,
+        "totalCount": record.total_count or 0,
+        "lastSync": record.last_sync.isoformat() if record.last_sync else None,
+        "status": "connected" if record.is_active else "disabled",
+        "folders": folder_count
+    }
+
+async def _get_account(db: AsyncSession, account_id: int, current_user: UserPrincipal) -> MailAccountRecord:
+    """Cuenta del usuario actual (404 si no existe o es de otro usuario)"""
+    record = await db.get(MailAccountRecord, account_id)
+    if record is None or record.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Cuenta no encontrada")
+    return record
+
+async def _find_folders(db: AsyncSession, record: MailAccountRecord, folder_id: str) -> List[MailFolder]:
+    """Carpetas de la cuenta por id o por ruta (sin distinguir mayúsculas: "inbox"); 404 si no hay"""
+    folders = (await db.execute(
+        select(MailFolder).where(MailFolder.account_id == record.id)
+    )).scalars().all()
+    matches = [
+        folder for folder in folders
+        if str(folder.id) == str(folder_id) or folder.path.lower() == str(folder_id).lower()
+    ]
+    if not matches:
+        raise HTTPException(status_code=404, detail="Carpeta no encontrada")
+    return matches
+
 @router.post("/accounts")
-async def create_account(account: MailAccount):
+async def create_account(
+    account: MailAccount,
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
     """Registrar una nueva cuenta de correo"""
     
     # Verificar conectividad antes de guardar
@@ -206,205 +257,560 @@ async def create_account(account: MailAccount):
             detail=f"No se pudo conectar: {connection_test['details']}"
         )
     
-    # Generar ID y simular guardado en memoria (para demo)
-    account_id = str(uuid.uuid4())
+    incoming, outgoing = account.settings.incoming, account.settings.outgoing
+    record = MailAccountRecord(
+        user_id=current_user.id,
+        name=account.name,
+        email=account.email,
+        provider=account.provider,
+        imap_server=incoming.server,
+        imap_port=incoming.port,
+        imap_ssl=incoming.ssl,
+        imap_username=incoming.username,
+        imap_password=incoming.password,
+        smtp_server=outgoing.server,
+        smtp_port=outgoing.port,
+        smtp_ssl=outgoing.ssl,
+        smtp_username=outgoing.username,
+        smtp_password=outgoing.password,
+        is_active=account.isActive,
+        is_default=account.isDefault
+    )
+    db.add(record)
+    await db.commit()
     
-    # Simular obtener carpetas iniciales
+    # Carpetas iniciales (LIST); los mensajes llegan con la primera sincronización
     try:
-        folders = MailConnectionManager.get_imap_folders(account.settings.incoming)
+        async with imap_pool.session(incoming) as imap:
+            folders = await mail_sync.sync_folders(db, record, imap)
         folder_count = len(folders)
-        unread_count = sum(folder.get('unreadCount', 0) for folder in folders)
-    except:
-        folder_count = 1
-        unread_count = 0
+    except Exception as e:
+        logger.warning(f"Error listing folders for account {record.id}: {str(e)}")
+        await db.rollback()
+        folder_count = 0
     
     return {
-        "id": account_id,
-        "message": "Cuenta registrada exitosamente",
-        "name": account.name,
-        "email": account.email,
-        "provider": account.provider,
-        "isActive": account.isActive,
-        "isDefault": account.isDefault,
-        "unreadCount": unread_count,
-        "totalCount": 0,
-        "lastSync": datetime.now().isoformat(),
-        "folders": folder_count
+        **_account_response(record, folder_count),
+        "message": "Cuenta registrada exitosamente"
     }
 
 @router.get("/accounts")
-async def get_accounts():
-    """Obtener todas las cuentas registradas"""
-    # En un sistema real se obtendría desde la base de datos
-    # Para permitir que los usuarios agreguen sus propias cuentas, retornamos array vacío inicialmente
-    timestamp = datetime.now().isoformat()
-    
-    # Comentamos la cuenta demo para que los usuarios puedan agregar cuentas reales
-    # demo_accounts = [
-    #     {
-    #         "id": "demo-account-1",
-    #         "name": "Cuenta Demo",
-    #         "email": "demo@crm.local",
-    #         "provider": "demo",
-    #         "isActive": True,
-    #         "isDefault": True,
-    #         "unreadCount": random.randint(5, 25),
-    #         "totalCount": random.randint(50, 200),
-    #         "lastSync": timestamp,
-    #         "status": "connected",
-    #         "folders": 4
-    #     }
-    # ]
-    
-    # Retornar array vacío para permitir configuración real de cuentas
-    return []
+async def get_accounts(
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Obtener las cuentas de correo del usuario actual"""
+    folder_counts = (
+        select(MailFolder.account_id, func.count(MailFolder.id).label("folders"))
+        .group_by(MailFolder.account_id)
+        .subquery()
+    )
+    result = await db.execute(
+        select(MailAccountRecord, func.coalesce(folder_counts.c.folders, 0))
+        .outerjoin(folder_counts, folder_counts.c.account_id == MailAccountRecord.id)
+        .where(MailAccountRecord.user_id == current_user.id)
+        .order_by(MailAccountRecord.is_default.desc(), MailAccountRecord.id)
+    )
+    return [_account_response(record, folder_count) for record, folder_count in result.all()]
 
 @router.get("/accounts/{account_id}/folders")
-async def get_folders(account_id: str):
-    """Sincronizar y obtener carpetas del servidor IMAP"""
+async def get_folders(
+    account_id: int,
+    refresh: bool = False,
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Carpetas de la cuenta con contadores (STATUS en caché durante MAIL_FOLDER_STATUS_TTL segundos)
     
-    # Para demo, retornamos carpetas estándar
-    # En producción, aquí se obtendría la configuración de la cuenta desde BD
-    # y se llamaría a MailConnectionManager.get_imap_folders()
+    refresh=true fuerza la consulta al servidor
+    """
+    record = await _get_account(db, account_id, current_user)
     
-    folders = [
-        {
-            "id": "inbox",
-            "accountId": account_id,
-            "name": "INBOX",
-            "displayName": "Bandeja de entrada",
-            "type": "inbox",
-            "unreadCount": 5,
-            "totalCount": 25,
-            "path": "INBOX",
-            "attributes": []
-        },
-        {
-            "id": "sent",
-            "accountId": account_id,
-            "name": "SENT", 
-            "displayName": "Enviados",
-            "type": "sent",
-            "unreadCount": 0,
-            "totalCount": 15,
-            "path": "SENT",
-            "attributes": []
-        },
-        {
-            "id": "drafts",
-            "accountId": account_id,
-            "name": "DRAFTS",
-            "displayName": "Borradores", 
-            "type": "drafts",
-            "unreadCount": 2,
-            "totalCount": 3,
-            "path": "DRAFTS",
-            "attributes": []
-        },
+    try:
+        folders = await folder_status.folders(db, record, refresh=refresh)
+    except Exception as e:
+        logger.error(f"Error getting folders: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error obteniendo carpetas: {str(e)}")
+    
+    pending = folder_status.pending(record.id)
+    return [
         {
-            "id": "trash",
-            "accountId": account_id,
-            "name": "TRASH",
-            "displayName": "Papelera",
-            "type": "trash", 
-            "unreadCount": 0,
-            "totalCount": 8,
-            "path": "TRASH",
-            "attributes": []
+            "id": folder.id,
+            "accountId": record.id,
+            "name": folder.name,
+            "displayName": folder.display_name,
+            "type": folder.type,
+            "unreadCount": folder.unread_count or 0,
+            "totalCount": folder.total_count or 0,
+            "path": folder.path,
+            "attributes": folder.attributes or [],
+            "needsSync": pending.get(folder.path, False),
+            "statusCheckedAt": folder.status_checked_at.isoformat() if folder.status_checked_at else None
         }
+        for folder in folders
+        if folder.is_selectable
     ]
-    
-    return folders
+
+def _message_summary(record: MailAccountRecord, folder: MailFolder, item: Dict[str, Any]) -> Dict[str, Any]:
+    """FETCH con LIST_ITEMS -> mensaje en el formato de listado del frontend (sin cuerpo)"""
+    envelope = parse_envelope(item.get("ENVELOPE"))
+    flags = flag_values(item.get("FLAGS") or ())
+    received_at = internal_date(item.get("INTERNALDATE")) or envelope.date
+    return {
+        "id": str(item["UID"]),
+        "uid": item["UID"],
+        "accountId": record.id,
+        "messageId": envelope.message_id or "",
+        "subject": envelope.subject or "(Sin asunto)",
+        "from": envelope.from_[0] if envelope.from_ else {"name": "", "email": ""},
+        "to": envelope.to,
+        "cc": envelope.cc,
+        "bcc": envelope.bcc,
+        "replyTo": envelope.reply_to[0] if envelope.reply_to else None,
+        "inReplyTo": envelope.in_reply_to,
+        "body": {"text": "", "html": ""},
+        "attachments": [],
+        "isRead": flags["is_read"],
+        "isStarred": flags["is_starred"],
+        "isFlagged": flags["is_flagged"],
+        "isImportant": flags["is_important"],
+        "labels": [],
+        "folderId": str(folder.id),
+        "receivedAt": received_at.isoformat() if received_at else None,
+        "sentAt": envelope.date.isoformat() if envelope.date else None,
+        "size": item.get("RFC822.SIZE") or 0,
+        "hasAttachments": has_attachments(item.get("BODYSTRUCTURE")),
+        "snippet": ""
+    }
+
+# Columnas que usa _row_summary: el listado no lee los cuerpos ni las referencias
+LIST_COLUMNS = (
+    MailMessage.id, MailMessage.account_id, MailMessage.folder_id, MailMessage.uid, MailMessage.message_id,
+    MailMessage.subject, MailMessage.from_name, MailMessage.from_email, MailMessage.to_addresses,
+    MailMessage.cc_addresses, MailMessage.bcc_addresses, MailMessage.reply_to_email, MailMessage.in_reply_to,
+    MailMessage.snippet, MailMessage.is_read, MailMessage.is_starred, MailMessage.is_flagged,
+    MailMessage.is_important, MailMessage.size_bytes, MailMessage.has_attachments, MailMessage.labels,
+    MailMessage.sent_at, MailMessage.received_at,
+)
 
 @router.get("/accounts/{account_id}/folders/{folder_id}/messages")
-async def get_messages(account_id: str, folder_id: str, limit: int = 50, offset: int = 0):
-    """Obtener mensajes de una carpeta específica"""
+async def get_messages(
+    account_id: int,
+    folder_id: str,
+    limit: int = 50,
+    offset: int = 0,
+    cursor: Optional[str] = Query(None, description="nextCursor de la página anterior"),
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Obtener mensajes de una carpeta (más recientes primero) de mail_messages
     
-    # Para demo, generamos mensajes de ejemplo basados en el folder
-    messages = []
+    Paginación por cursor sobre (received_at, id) con el índice (folder_id,
+    received_at, id): una página lee solo sus filas y solo las columnas del
+    listado (el extracto se calcula al sincronizar). `offset` se mantiene
+    para los clientes sin cursor. Una carpeta aún sin sincronizar se
+    sincroniza antes de la primera página.
+    """
+    record = await _get_account(db, account_id, current_user)
+    folder = (await _find_folders(db, record, folder_id))[0]
+    limit = max(1, min(limit, 200))
+    offset = max(0, offset)
     
-    if folder_id == "inbox":
-        messages = [
-            {
-                "id": f"msg_{i}",
-                "accountId": account_id,
-                "messageId": f"<msg{i}@example.com>",
-                "subject": f"Mensaje de prueba {i}",
-                "from": {
-                    "name": f"Remitente {i}",
-                    "email": f"sender{i}@example.com"
-                },
-                "to": [{
-                    "name": "Mi Cuenta",
-                    "email": "micuenta@example.com"
-                }],
-                "cc": [],
-                "bcc": [],
-                "body": {
-                    "text": f"Este es el contenido del mensaje {i} en texto plano.",
-                    "html": f"<p>Este es el contenido del mensaje <strong>{i}</strong> en HTML.</p>"
-                },
-                "attachments": [],
-                "isRead": i % 3 != 0,  # Algunos no leídos
-                "isStarred": i % 5 == 0,
-                "isFlagged": False,
-                "isImportant": i % 4 == 0,
-                "labels": [],
-                "folderId": folder_id,
-                "receivedAt": datetime.now().replace(hour=10, minute=30+i).isoformat(),
-                "sentAt": datetime.now().replace(hour=10, minute=29+i).isoformat(),
-                "size": 1024 + (i * 100),
-                "hasAttachments": i % 6 == 0,
-                "snippet": f"Extracto del mensaje {i}. Este es un ejemplo de contenido..."
-            }
-            for i in range(1, min(limit + 1, 26))  # Máximo 25 mensajes de ejemplo
-        ]
-    elif folder_id == "sent":
-        messages = [
-            {
-                "id": f"sent_{i}",
-                "accountId": account_id,
-                "messageId": f"<sent{i}@example.com>",
-                "subject": f"RE: Respuesta {i}",
-                "from": {
-                    "name": "Mi Cuenta",
-                    "email": "micuenta@example.com"
-                },
-                "to": [{
-                    "name": f"Destinatario {i}",
-                    "email": f"dest{i}@example.com"
-                }],
-                "cc": [],
-                "bcc": [],
-                "body": {
-                    "text": f"Esta es mi respuesta {i} enviada.",
-                    "html": f"<p>Esta es mi <em>respuesta {i}</em> enviada.</p>"
-                },
-                "attachments": [],
-                "isRead": True,
-                "isStarred": False,
-                "isFlagged": False,
-                "isImportant": False,
-                "labels": [],
-                "folderId": folder_id,
-                "receivedAt": datetime.now().replace(hour=14, minute=30+i).isoformat(),
-                "sentAt": datetime.now().replace(hour=14, minute=30+i).isoformat(),
-                "size": 512 + (i * 50),
-                "hasAttachments": False,
-                "snippet": f"Esta es mi respuesta {i} enviada..."
-            }
-            for i in range(1, min(limit + 1, 16))  # Máximo 15 mensajes enviados
-        ]
+    if folder.uid_validity is None:
+        try:
+            await mail_sync.sync_account(db, record, paths=[folder.path])
+        except SyncBusy:
+            # La está sincronizando otro proceso: se lista lo que ya haya guardado
+            pass
+        except Exception as e:
+            logger.error(f"Error getting messages: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Error obteniendo mensajes: {str(e)}")
+    
+    sort_columns = [MailMessage.received_at, MailMessage.id]
+    query = (
+        select(MailMessage)
+        .options(load_only(*LIST_COLUMNS, raiseload=True))
+        .where(MailMessage.folder_id == folder.id)
+        .order_by(*(column.desc() for column in sort_columns))
+    )
+    if cursor:
+        try:
+            values = decode_cursor(cursor, kind="messages")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        query = query.where(keyset_after(
+            sort_columns, values, descending=True, dialect_name=db.get_bind().dialect.name
+        ))
+    else:
+        query = query.offset(offset)
+    rows = (await db.execute(query.limit(limit + 1))).scalars().all()
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor("messages", [rows[-1].received_at, rows[-1].id])
+    
+    return {
+        "messages": [_row_summary(record, row) for row in rows],
+        "pagination": {
+            "limit": limit,
+            "offset": offset,
+            "total": folder.total_count or 0,
+            "nextCursor": next_cursor
+        }
+    }
+
+async def _message_record(db: AsyncSession, folder: MailFolder, uid: int) -> Optional[MailMessage]:
+    """Fila sincronizada del mensaje (con sus adjuntos) o None"""
+    return (await db.execute(
+        select(MailMessage)
+        .where(MailMessage.folder_id == folder.id, MailMessage.uid == str(uid))
+        .options(selectinload(MailMessage.attachments))
+    )).scalars().first()
+
+def _attachment_url(record: MailAccountRecord, folder: MailFolder, uid: int, section: str) -> str:
+    return f"/api/mail/accounts/{record.id}/folders/{folder.id}/messages/{uid}/attachments/{section}"
+
+def _attachment_response(record: MailAccountRecord, folder: MailFolder, uid: int, attachment: MailAttachment) -> Dict[str, Any]:
+    return {
+        "id": attachment.section,
+        "filename": attachment.filename,
+        "size": attachment.size_bytes or 0,
+        "contentType": attachment.content_type,
+        "contentId": attachment.content_id,
+        "isInline": bool(attachment.is_inline),
+        "downloadUrl": _attachment_url(record, folder, uid, attachment.section)
+    }
+
+def _attachment_record(part: BodyPart) -> MailAttachment:
+    return MailAttachment(
+        section=part.section,
+        filename=(part.filename or f"part-{part.section}")[:500],
+        content_type=part.type,
+        content_id=(part.content_id or "").strip("<>")[:200] or None,
+        size_bytes=part.size,
+        is_inline=not part.is_attachment,
+    )
+
+def _row_summary(record: MailAccountRecord, row: MailMessage) -> Dict[str, Any]:
+    """Fila de mail_messages -> mensaje en el formato de listado del frontend (sin cuerpo)"""
+    uid = int(row.uid)
+    return {
+        "id": str(uid),
+        "uid": uid,
+        "accountId": record.id,
+        "messageId": row.message_id,
+        "subject": row.subject or "(Sin asunto)",
+        "from": {"name": row.from_name or "", "email": row.from_email},
+        "to": row.to_addresses or [],
+        "cc": row.cc_addresses or [],
+        "bcc": row.bcc_addresses or [],
+        "replyTo": {"name": "", "email": row.reply_to_email} if row.reply_to_email else None,
+        "inReplyTo": row.in_reply_to,
+        "body": {"text": "", "html": ""},
+        "attachments": [],
+        "isRead": bool(row.is_read),
+        "isStarred": bool(row.is_starred),
+        "isFlagged": bool(row.is_flagged),
+        "isImportant": bool(row.is_important),
+        "labels": row.labels or [],
+        "folderId": str(row.folder_id),
+        "receivedAt": row.received_at.isoformat() if row.received_at else None,
+        "sentAt": row.sent_at.isoformat() if row.sent_at else None,
+        "size": row.size_bytes or 0,
+        "hasAttachments": bool(row.has_attachments),
+        "snippet": row.snippet or ""
+    }
+
+def _row_detail(record: MailAccountRecord, folder: MailFolder, row: MailMessage) -> Dict[str, Any]:
+    """Mensaje con cuerpo ya guardado en mail_messages (sin IMAP)"""
+    uid = int(row.uid)
+    return {
+        **_row_summary(record, row),
+        "body": {"text": row.body_text or "", "html": row.body_html or ""},
+        "attachments": [_attachment_response(record, folder, uid, a) for a in row.attachments if not a.is_inline],
+        "references": (row.references or "").split(),
+        "threadId": row.thread_id
+    }
+
+async def _message_detail(
+    db: AsyncSession,
+    record: MailAccountRecord,
+    folder: MailFolder,
+    uid: int,
+    row: Optional[MailMessage]
+) -> Dict[str, Any]:
+    """Detalle de un mensaje: de mail_messages si el cuerpo ya se descargó; si no,
+    BODYSTRUCTURE + BODY.PEEK de las partes de texto (los adjuntos no se descargan)"""
+    if row is not None and (row.body_text is not None or row.body_html is not None):
+        return _row_detail(record, folder, row)
+    
+    try:
+        async with imap_pool.session(ConnectionSettings.imap(record)) as imap:
+            await imap.select(folder.path, readonly=True)
+            items = await imap.fetch(str(uid), LIST_ITEMS)
+            parts = list(walk_parts(items[0].get("BODYSTRUCTURE"))) if items else []
+            text_parts = [
+                part for part in parts
+                if not part.is_attachment and part.type in ("text/plain", "text/html")
+            ]
+            texts = await fetch_texts(imap, uid, text_parts) if items else {}
+    except Exception as e:
+        logger.error(f"Error getting message detail: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error obteniendo detalles del mensaje: {str(e)}")
+    if not items:
+        raise HTTPException(status_code=404, detail="Mensaje no encontrado")
+    
+    body = {"text": "", "html": ""}
+    for part in text_parts:
+        key = "html" if part.type == "text/html" else "text"
+        if not body[key]:
+            body[key] = texts.get(part.section, "")
+    attachments = [_attachment_record(part) for part in parts if part.is_attachment or part.content_id]
+    
+    if row is not None:
+        # Guardar el cuerpo y las partes: la próxima vez no hace falta IMAP
+        row.body_text, row.body_html = body["text"], body["html"]
+        if not row.snippet:  # filas sincronizadas antes de existir el extracto
+            row.snippet = make_snippet(body["text"]) or make_snippet(body["html"], is_html=True)
+        known = {attachment.section for attachment in row.attachments}
+        for attachment in attachments:
+            if attachment.section not in known:
+                row.attachments.append(attachment)
+        await db.commit()
+        return _row_detail(record, folder, row)
+    
+    return {
+        **_message_summary(record, folder, items[0]),
+        "body": body,
+        "attachments": [
+            _attachment_response(record, folder, uid, attachment)
+            for attachment in attachments if not attachment.is_inline
+        ],
+        "references": [],
+        "threadId": None
+    }
+
+@router.get("/accounts/{account_id}/folders/{folder_id}/messages/{uid}")
+async def get_message(
+    account_id: int,
+    folder_id: str,
+    uid: int,
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Detalle de un mensaje por UID: cuerpo de texto/HTML bajo demanda, adjuntos solo como enlaces"""
+    record = await _get_account(db, account_id, current_user)
+    folder = (await _find_folders(db, record, folder_id))[0]
+    return await _message_detail(db, record, folder, uid, await _message_record(db, folder, uid))
+
+@router.get("/accounts/{account_id}/folders/{folder_id}/messages/{uid}/attachments/{section}")
+async def download_attachment(
+    account_id: int,
+    folder_id: str,
+    uid: int,
+    section: str,
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Descargar una parte del mensaje (BODY[section]) en streaming
+    
+    La primera descarga la pide al servidor por tramos (MAIL_FETCH_CHUNK_SIZE) y
+    la guarda en MAIL_ATTACHMENT_DIR por su sha256; las siguientes, y los
+    adjuntos idénticos de otros mensajes, se sirven desde disco
+    """
+    record = await _get_account(db, account_id, current_user)
+    folder = (await _find_folders(db, record, folder_id))[0]
+    row = await _message_record(db, folder, uid)
+    attachment = next((a for a in row.attachments if a.section == section), None) if row else None
+    
+    if attachment is None or not part_store.exists(attachment.file_path):
+        try:
+            async with imap_pool.session(ConnectionSettings.imap(record)) as imap:
+                await imap.select(folder.path, readonly=True)
+                items = await imap.fetch(str(uid), "(UID BODYSTRUCTURE)")
+                part = next(
+                    (p for p in walk_parts(items[0].get("BODYSTRUCTURE")) if p.section == section),
+                    None
+                ) if items else None
+                if part is not None:
+                    file_path, size = await part_store.save(fetch_part(imap, uid, part, part_store.chunk_size))
+        except Exception as e:
+            logger.error(f"Error downloading attachment: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Error descargando adjunto: {str(e)}")
+        if part is None:
+            raise HTTPException(status_code=404, detail="Adjunto no encontrado")
+        
+        if attachment is None:
+            attachment = _attachment_record(part)
+            if row is not None:
+                row.attachments.append(attachment)
+        attachment.file_path = file_path
+        attachment.size_bytes = size
+        if row is not None:
+            await db.commit()
+    
+    filename = attachment.filename or f"part-{section}"
+    return StreamingResponse(
+        part_store.iter_file(attachment.file_path),
+        media_type=attachment.content_type or "application/octet-stream",
+        headers={
+            "Content-Disposition": f"attachment; filename*=UTF-8''{quote(filename)}",
+            "Content-Length": str(attachment.size_bytes or 0)
+        }
+    )
+
+@router.get("/accounts/{account_id}/search")
+@router.get("/{account_id}/search")
+async def search_messages(
+    account_id: int,
+    q: str = Query(..., min_length=1, max_length=200),
+    folder_id: Optional[str] = Query(None, description="id o ruta de la carpeta"),
+    since: Optional[datetime] = Query(None, description="recibidos desde (incluido)"),
+    until: Optional[datetime] = Query(None, description="recibidos antes de"),
+    sort: str = Query("date", pattern="^(date|relevance)$"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Buscar en los mensajes sincronizados (índice de texto completo local, sin IMAP)
+    
+    Todas las palabras deben aparecer en el asunto, remitente, extracto o
+    cuerpo; sort=date (más recientes primero) o sort=relevance
+    """
+    record = await _get_account(db, account_id, current_user)
+    folder_ids = [folder.id for folder in await _find_folders(db, record, folder_id)] if folder_id else None
+    
+    query = search_query(record.id, q, db.get_bind().dialect.name, folder_ids, since, until, sort)
+    rows = (await db.execute(query.offset(offset).limit(limit + 1))).scalars().all() if query is not None else []
     
     return {
-        "messages": messages[offset:offset+limit],
+        "query": q,
+        "sort": sort,
+        "messages": [_row_summary(record, row) for row in rows[:limit]],
         "pagination": {
             "limit": limit,
             "offset": offset,
-            "total": len(messages)
+            "hasMore": len(rows) > limit
+        }
+    }
+
+def _thread_summary(record: MailAccountRecord, thread: MailThread, counts: Dict[str, Any],
+                    latest: Optional[MailMessage]) -> Dict[str, Any]:
+    return {
+        "id": str(thread.id),
+        "accountId": record.id,
+        "subject": thread.subject or "(Sin asunto)",
+        "lastMessageAt": thread.last_message_at.isoformat() if thread.last_message_at else None,
+        "messageCount": counts.get("messages", 0),
+        "unreadCount": counts.get("unread", 0),
+        "hasAttachments": counts.get("attachments", False),
+        "lastMessage": _row_summary(record, latest) if latest is not None else None
+    }
+
+@router.get("/accounts/{account_id}/threads")
+@router.get("/{account_id}/threads")
+async def list_threads(
+    account_id: int,
+    limit: int = Query(25, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="nextCursor de la página anterior"),
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Conversaciones de la cuenta, la de actividad más reciente primero
+    
+    Paginación por cursor sobre (last_message_at, id): cada página lee solo
+    sus conversaciones, su último mensaje y sus contadores
+    """
+    record = await _get_account(db, account_id, current_user)
+    
+    sort_columns = [MailThread.last_message_at, MailThread.id]
+    query = (
+        select(MailThread)
+        .where(MailThread.account_id == record.id)
+        .order_by(*(column.desc() for column in sort_columns))
+    )
+    if cursor:
+        try:
+            values = decode_cursor(cursor, kind="threads")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        query = query.where(keyset_after(
+            sort_columns, values, descending=True, dialect_name=db.get_bind().dialect.name
+        ))
+    threads = (await db.execute(query.limit(limit + 1))).scalars().all()
+    
+    next_cursor = None
+    if len(threads) > limit:
+        threads = threads[:limit]
+        next_cursor = encode_cursor("threads", [threads[-1].last_message_at, threads[-1].id])
+    
+    counts = await thread_counts(db, record.id, [thread.id for thread in threads])
+    latest = await latest_messages(db, record.id, threads)
+    return {
+        "threads": [
+            _thread_summary(record, thread, counts.get(thread.id, {}), latest.get(thread.id))
+            for thread in threads
+        ],
+        "pagination": {
+            "limit": limit,
+            "nextCursor": next_cursor
         }
     }
 
+@router.get("/accounts/{account_id}/threads/{thread_id}")
+@router.get("/{account_id}/threads/{thread_id}")
+async def get_thread(
+    account_id: int,
+    thread_id: int,
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Mensajes de una conversación en orden cronológico, de cualquier carpeta
+    (sin cuerpos: el detalle de cada uno por su folderId y uid)"""
+    record = await _get_account(db, account_id, current_user)
+    thread = await db.get(MailThread, thread_id)
+    if thread is None or thread.account_id != record.id:
+        raise HTTPException(status_code=404, detail="Conversación no encontrada")
+    
+    rows = (await db.execute(
+        select(MailMessage)
+        .options(defer(MailMessage.body_text), defer(MailMessage.body_html))
+        .where(MailMessage.account_id == record.id, MailMessage.thread_id == str(thread.id))
+        .order_by(MailMessage.received_at, MailMessage.id)
+        .limit(500)
+    )).scalars().all()
+    return {
+        **_thread_summary(record, thread, {
+            "messages": len(rows),
+            "unread": sum(1 for row in rows if not row.is_read),
+            "attachments": any(row.has_attachments for row in rows)
+        }, rows[-1] if rows else None),
+        "messages": [_row_summary(record, row) for row in rows]
+    }
+
+PRIORITY_HEADERS = {"high": "1 (Highest)", "normal": "3 (Normal)", "low": "5 (Lowest)"}
+
+def _address_header(addresses: List[Dict[str, str]]) -> str:
+    return ", ".join(formataddr((item.get("name") or "", item["email"])) for item in addresses)
+
+def _message_headers(record: MailAccountRecord, message_id: str, to_list: List[Dict[str, str]],
+                     cc_list: List[Dict[str, str]], subject: str, priority: str) -> List[Tuple[str, str]]:
+    """Cabeceras de primer nivel (Bcc no va en las cabeceras, solo en el sobre SMTP)"""
+    headers = [
+        ("Message-ID", message_id),
+        ("Date", formatdate(localtime=True)),
+        ("From", formataddr((record.name or "", record.email))),
+        ("To", _address_header(to_list)),
+    ]
+    if cc_list:
+        headers.append(("Cc", _address_header(cc_list)))
+    headers.append(("Subject", subject))
+    if priority in PRIORITY_HEADERS and priority != "normal":
+        headers.append(("X-Priority", PRIORITY_HEADERS[priority]))
+    return headers
+
 @router.post("/send")
 async def send_message(
     accountId: str = Form(...),
@@ -414,66 +820,103 @@ async def send_message(
     cc: str = Form("[]"),
     bcc: str = Form("[]"),
     priority: str = Form("normal"),
-    attachments: List[UploadFile] = File(default=[])
+    attachments: List[UploadFile] = File(default=[]),
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Enviar un mensaje usando SMTP"""
+    """Poner un mensaje en la cola de envío
     
+    Responde al momento con el id de la cola (status "queued"); la entrega
+    SMTP es asíncrona: GET /api/mail/outbox/{id} o el evento outbox_status
+    de /api/mail/events
+    """
     try:
         # Parsear datos JSON
         to_list = json.loads(to)
         body_dict = json.loads(body)
         cc_list = json.loads(cc)
         bcc_list = json.loads(bcc)
-        
-        # Validar datos básicos
-        if not to_list or len(to_list) == 0:
-            raise HTTPException(status_code=400, detail="Se requiere al menos un destinatario")
-        
-        if not subject or not subject.strip():
-            raise HTTPException(status_code=400, detail="El asunto es requerido")
-        
-        # Procesar archivos adjuntos
-        attachment_info = []
-        for attachment in attachments:
-            if attachment.filename:
-                # En producción, aquí se guardarían los archivos
-                attachment_info.append({
-                    "filename": attachment.filename,
-                    "size": attachment.size if hasattr(attachment, 'size') else 0,
-                    "contentType": attachment.content_type
-                })
-        
-        # Simular envío exitoso
-        message_id = f"<{uuid.uuid4()}@crm.local>"
-        timestamp = datetime.now().isoformat()
-        
-        # Log para debugging
-        logger.info(f"Mensaje enviado - ID: {message_id}")
-        logger.info(f"De: {accountId} Para: {[t['email'] for t in to_list]}")
-        logger.info(f"Asunto: {subject}")
-        logger.info(f"Adjuntos: {len(attachment_info)}")
-        
-        return {
-            "success": True,
-            "message": "Mensaje enviado exitosamente",
-            "messageId": message_id,
-            "timestamp": timestamp,
-            "recipients": {
-                "to": len(to_list),
-                "cc": len(cc_list), 
-                "bcc": len(bcc_list)
-            },
-            "attachments": len(attachment_info),
-            "size": len(body_dict.get('text', '') + body_dict.get('html', ''))
-        }
-        
     except json.JSONDecodeError as e:
         logger.error(f"Error parsing JSON: {str(e)}")
         raise HTTPException(status_code=400, detail="Formato JSON inválido en los datos")
-        
+    
+    # Validar datos básicos
+    if not to_list or len(to_list) == 0:
+        raise HTTPException(status_code=400, detail="Se requiere al menos un destinatario")
+    
+    if not subject or not subject.strip():
+        raise HTTPException(status_code=400, detail="El asunto es requerido")
+    
+    if not str(accountId).isdigit():
+        raise HTTPException(status_code=404, detail="Cuenta no encontrada")
+    record = await _get_account(db, int(accountId), current_user)
+    files = [attachment for attachment in attachments if attachment.filename]
+    
+    try:
+        message_id = make_msgid(domain=record.email.rpartition("@")[2] or "crm.local")
+        # El mensaje se escribe directamente en el fichero de la cola, adjuntos por bloques
+        write = partial(
+            write_message,
+            headers=_message_headers(record, message_id, to_list, cc_list, subject, priority),
+            text=body_dict.get("text") or "",
+            html=body_dict.get("html") or "",
+            attachments=[
+                OutgoingAttachment(attachment.filename, attachment.content_type, attachment.file)
+                for attachment in files
+            ],
+        )
+        recipients = [item["email"] for item in to_list + cc_list + bcc_list]
+        queued = await mail_outbox.enqueue(db, record, record.email, recipients, write, message_id, subject)
     except Exception as e:
-        logger.error(f"Error sending message: {str(e)}")
+        logger.error(f"Error queueing message: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error enviando mensaje: {str(e)}")
+    
+    logger.info(f"Mensaje {queued.id} en cola - ID: {message_id}")
+    
+    return {
+        "success": True,
+        "message": "Mensaje en cola de envío",
+        "id": queued.id,
+        "status": queued.status,
+        "messageId": message_id,
+        "timestamp": datetime.now().isoformat(),
+        "recipients": {
+            "to": len(to_list),
+            "cc": len(cc_list), 
+            "bcc": len(bcc_list)
+        },
+        "attachments": len(files),
+        "size": queued.size_bytes
+    }
+
+@router.get("/outbox")
+async def list_outbox(
+    status: Optional[str] = Query(None, pattern="^(queued|sending|sent|failed)$"),
+    account_id: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=200),
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Mensajes de la cola de envío del usuario, más recientes primero"""
+    query = select(MailOutbox).where(MailOutbox.user_id == current_user.id)
+    if status:
+        query = query.where(MailOutbox.status == status)
+    if account_id is not None:
+        query = query.where(MailOutbox.account_id == account_id)
+    rows = (await db.execute(query.order_by(MailOutbox.id.desc()).limit(limit))).scalars().all()
+    return {"messages": [outbox_status(row) for row in rows]}
+
+@router.get("/outbox/{outbox_id}")
+async def get_outbox_message(
+    outbox_id: int,
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Estado de entrega de un mensaje enviado con POST /send"""
+    row = await db.get(MailOutbox, outbox_id)
+    if row is None or row.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Mensaje no encontrado")
+    return outbox_status(row)
 
 @router.post("/{accountId}/messages/{messageId}/move")
 async def move_message(accountId: str, messageId: str, data: dict):
@@ -576,122 +1019,179 @@ async def update_message(accountId: str, messageId: str, data: dict):
         logger.error(f"Error updating message: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error actualizando mensaje: {str(e)}")
 
-@router.post("/{accountId}/sync")
-async def sync_messages(accountId: str, data: dict = None):
-    """Sincronizar mensajes con el servidor de correo"""
+@router.post("/accounts/{account_id}/sync")
+@router.post("/{account_id}/sync")
+async def sync_messages(
+    account_id: int,
+    data: dict = None,
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Sincronizar mensajes con el servidor de correo (incremental)
+    
+    data opcional: {"folderId": ruta o id de carpeta (por defecto todas), "forceSync": resincronización completa}
+    """
+    record = await _get_account(db, account_id, current_user)
+    folder_id = data.get("folderId") if data else None
+    force_sync = bool(data.get("forceSync", False)) if data else False
+    
+    paths = None
+    if folder_id:
+        paths = [folder.path for folder in await _find_folders(db, record, folder_id)]
     
     try:
-        folder_id = data.get("folderId", "INBOX") if data else "INBOX"
-        force_sync = data.get("forceSync", False) if data else False
-        
-        # Simular sincronización
-        timestamp = datetime.now().isoformat()
-        
-        # Simular descarga de nuevos mensajes
-        new_messages = random.randint(0, 5)
-        updated_messages = random.randint(0, 3)
-        deleted_messages = random.randint(0, 2)
-        
-        logger.info(f"Sincronización completada para cuenta {accountId}, carpeta {folder_id}")
-        
-        return {
-            "success": True,
-            "message": "Sincronización completada exitosamente",
-            "accountId": accountId,
-            "folderId": folder_id,
-            "timestamp": timestamp,
-            "statistics": {
-                "newMessages": new_messages,
-                "updatedMessages": updated_messages,
-                "deletedMessages": deleted_messages,
-                "totalProcessed": new_messages + updated_messages + deleted_messages
-            },
-            "forceSync": force_sync,
-            "lastSync": timestamp
-        }
-        
+        result = await mail_sync.sync_account(db, record, paths=paths, full=force_sync)
+    except SyncBusy:
+        raise HTTPException(status_code=409, detail="La cuenta se está sincronizando en otro proceso")
     except Exception as e:
         logger.error(f"Error syncing messages: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error sincronizando mensajes: {str(e)}")
+    
+    logger.info(f"Sincronización completada para cuenta {record.id} en {result.duration_ms:.0f} ms")
+    
+    return {
+        "success": True,
+        "message": "Sincronización completada exitosamente",
+        "accountId": record.id,
+        "folderId": folder_id,
+        "timestamp": datetime.now().isoformat(),
+        "statistics": {
+            "newMessages": result.new,
+            "updatedMessages": result.updated,
+            "deletedMessages": result.deleted,
+            "totalProcessed": result.new + result.updated + result.deleted
+        },
+        "folders": [
+            {
+                "path": folder.path,
+                "newMessages": folder.new,
+                "updatedMessages": folder.updated,
+                "deletedMessages": folder.deleted,
+                "fullResync": folder.full_resync,
+                "error": folder.error
+            }
+            for folder in result.folders
+        ],
+        "durationMs": round(result.duration_ms, 1),
+        "forceSync": force_sync,
+        "lastSync": record.last_sync.isoformat() if record.last_sync else None
+    }
 
-@router.get("/{accountId}/messages/{messageId}")
-async def get_message_detail(accountId: str, messageId: str):
-    """Obtener detalles completos de un mensaje específico"""
+@router.get("/accounts/{account_id}/sync/status")
+async def get_sync_status(
+    account_id: int,
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Estado de sincronización de la cuenta y de cada carpeta"""
+    record = await _get_account(db, account_id, current_user)
+    folders = (await db.execute(
+        select(MailFolder).where(MailFolder.account_id == record.id).order_by(MailFolder.path)
+    )).scalars().all()
     
-    try:
-        # Simular búsqueda del mensaje
-        timestamp = datetime.now().isoformat()
-        
-        # Generar mensaje de ejemplo detallado
-        message = {
-            "id": messageId,
-            "accountId": accountId,
-            "messageId": f"<{messageId}@crm.local>",
-            "subject": f"Mensaje detallado - {messageId}",
-            "from": {
-                "name": "Remitente Ejemplo",
-                "email": "remitente@example.com"
-            },
-            "to": [{
-                "name": "Mi Cuenta",
-                "email": "micuenta@example.com"
-            }],
-            "cc": [],
-            "bcc": [],
-            "replyTo": [{
-                "name": "Remitente Ejemplo",
-                "email": "remitente@example.com"
-            }],
-            "body": {
-                "text": f"Este es el contenido completo del mensaje {messageId} en texto plano.\n\nIncluye múltiples párrafos y detalles completos del mensaje.",
-                "html": f"<div><p>Este es el contenido completo del mensaje <strong>{messageId}</strong> en HTML.</p><p>Incluye múltiples párrafos y <em>formato rico</em> del mensaje.</p></div>"
-            },
-            "attachments": [
-                {
-                    "id": "att_1",
-                    "filename": "documento.pdf",
-                    "size": 256000,
-                    "contentType": "application/pdf",
-                    "downloadUrl": f"/api/mail/{accountId}/messages/{messageId}/attachments/att_1"
-                }
-            ] if messageId.endswith("1") else [],
-            "headers": {
-                "Message-ID": f"<{messageId}@crm.local>",
-                "Date": timestamp,
-                "X-Mailer": "CRM ARI Mail System",
-                "X-Priority": "3"
-            },
-            "isRead": True,
-            "isStarred": messageId.endswith("5"),
-            "isFlagged": False,
-            "isImportant": messageId.endswith("0"),
-            "labels": ["inbox"],
-            "folderId": "inbox",
-            "receivedAt": timestamp,
-            "sentAt": datetime.now().replace(minute=30).isoformat(),
-            "size": 2048,
-            "hasAttachments": messageId.endswith("1"),
-            "snippet": f"Extracto del mensaje {messageId}. Este es un ejemplo de contenido...",
-            "threadId": f"thread_{messageId}",
-            "conversationId": f"conv_{messageId}",
-            "inReplyTo": None,
-            "references": []
-        }
-        
-        logger.info(f"Detalles del mensaje {messageId} obtenidos para cuenta {accountId}")
-        
-        return message
-        
-    except Exception as e:
-        logger.error(f"Error getting message detail: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error obteniendo detalles del mensaje: {str(e)}")
+    return {
+        "isActive": record.is_active,
+        "running": mail_sync.is_running(record.id),
+        "lastSync": record.last_sync.isoformat() if record.last_sync else None,
+        "autoSync": bool(record.auto_sync),
+        "syncInterval": record.sync_interval,
+        "schedule": mail_scheduler.account_stats(record.id),
+        "folders": [
+            {
+                "id": folder.id,
+                "path": folder.path,
+                "uidValidity": folder.uid_validity,
+                "lastSeenUid": folder.last_seen_uid,
+                "highestModseq": folder.highest_modseq,
+                "totalCount": folder.total_count or 0,
+                "unreadCount": folder.unread_count or 0,
+                "lastSync": folder.last_sync.isoformat() if folder.last_sync else None
+            }
+            for folder in folders
+        ]
+    }
+
+@router.get("/events")
+async def stream_events(
+    request: Request,
+    current_user: UserPrincipal = Depends(get_current_stream_user)
+):
+    """Eventos de correo en tiempo real (Server-Sent Events)
+    
+    `event: folder_changed` con {accountId, folderId, path, newMessages,
+    updatedMessages, deletedMessages, totalCount, unreadCount}: el cliente
+    refresca solo esa carpeta. Con EventSource el token va en ?access_token=.
+    Mientras hay un navegador conectado, la INBOX de sus cuentas se vigila
+    con IMAP IDLE.
+    """
+    heartbeat = get_settings().mail.events_heartbeat
+    
+    async def stream():
+        queue = mail_events.subscribe(current_user.id)
+        try:
+            yield f"retry: 5000\nevent: ready\ndata: {json.dumps({'userId': current_user.id})}\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    # Comentario SSE: mantiene abierta la conexión a través de proxies
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            mail_events.unsubscribe(current_user.id, queue)
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/{accountId}/messages/{messageId}")
+async def get_message_detail(
+    accountId: int,
+    messageId: int,
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Detalle de un mensaje sincronizado por su id en mail_messages"""
+    record = await _get_account(db, accountId, current_user)
+    row = (await db.execute(
+        select(MailMessage)
+        .where(MailMessage.id == messageId, MailMessage.account_id == record.id)
+        .options(selectinload(MailMessage.attachments))
+    )).scalar_one_or_none()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Mensaje no encontrado")
+    folder = await db.get(MailFolder, row.folder_id)
+    return await _message_detail(db, record, folder, int(row.uid), row)
 
 @router.delete("/accounts/{account_id}")
-async def delete_account(account_id: str):
-    """Eliminar una cuenta"""
+async def delete_account(
+    account_id: int,
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Eliminar una cuenta con sus carpetas y mensajes"""
+    record = await _get_account(db, account_id, current_user)
     
     try:
-        timestamp = datetime.now().isoformat()
+        # Borrado en bloque (sin cargar los mensajes en la sesión)
+        message_ids = select(MailMessage.id).where(MailMessage.account_id == record.id)
+        await db.execute(delete(MailAttachment).where(MailAttachment.message_id.in_(message_ids)))
+        await db.execute(delete(MailMessage).where(MailMessage.account_id == record.id))
+        await db.execute(delete(MailThreadRef).where(MailThreadRef.account_id == record.id))
+        await db.execute(delete(MailThread).where(MailThread.account_id == record.id))
+        await db.execute(delete(MailFolder).where(MailFolder.account_id == record.id))
+        outbox_files = (await db.execute(
+            select(MailOutbox.file_path).where(MailOutbox.account_id == record.id)
+        )).scalars().all()
+        await db.execute(delete(MailOutbox).where(MailOutbox.account_id == record.id))
+        await db.execute(delete(MailAccountRecord).where(MailAccountRecord.id == record.id))
+        await db.commit()
+        await mail_outbox.remove_files(outbox_files)
         
         logger.info(f"Cuenta {account_id} eliminada")
         
@@ -699,10 +1199,11 @@ async def delete_account(account_id: str):
             "success": True, 
             "message": "Cuenta eliminada exitosamente",
             "accountId": account_id,
-            "timestamp": timestamp,
+            "timestamp": datetime.now().isoformat(),
             "operation": "delete_account"
         }
         
     except Exception as e:
+        await db.rollback()
         logger.error(f"Error deleting account: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error eliminando cuenta: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error eliminando cuenta: {str(e)}")
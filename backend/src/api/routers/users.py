@@ -3,15 +3,18 @@ Users management router
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func
 from pydantic import BaseModel, EmailStr
 from typing import List, Optional
 from datetime import datetime
 
-from ...database.connection import get_db
-from ...database.models import User
-from ...services.auth import get_current_user, get_current_admin_user, create_user, update_user_password
+from ...database.connection import get_async_db, get_async_read_db
+from ...database.search import USER_SEARCH, search_condition
+from ...database.pagination import decode_cursor, encode_cursor, estimate_count, keyset_after
+from ...database.models import User, Company, Employee, MailAccount, Activity, Note
+from ...services.auth import get_current_user, get_current_user_record, get_current_admin_user, create_user, update_user_password
+from ...services.user_cache import UserPrincipal, user_cache
 
 router = APIRouter()
 
@@ -51,9 +54,17 @@ class PasswordChange(BaseModel):
 
 class UserList(BaseModel):
     users: List[UserResponse]
-    total: int
+    total: Optional[int]
     page: int
     size: int
+    next_cursor: Optional[str] = None
+    total_estimated: bool = False
+
+# Columnas de ordenación admitidas (siempre desempatadas por id)
+USER_ORDERINGS = {
+    "created_at": User.created_at,
+    "username": User.username,
+}
 
 # Users endpoints
 @router.get("/", response_model=UserList)
@@ -62,43 +73,76 @@ async def get_users(
     size: int = Query(10, ge=1, le=100),
     search: Optional[str] = Query(None),
     active_only: bool = Query(True),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    cursor: Optional[str] = Query(None, description="next_cursor de la página anterior"),
+    order_by: str = Query("created_at", pattern="^(created_at|username)$"),
+    count: str = Query("exact", pattern="^(exact|estimate|none)$"),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: UserPrincipal = Depends(get_current_admin_user)
 ):
     """Get all users (admin only)"""
-    query = db.query(User)
+    query = select(User)
     
     if active_only:
-        query = query.filter(User.is_active == True)
+        query = query.where(User.is_active == True)
+    
+    dialect_name = db.bind.dialect.name  # igual en el primario y las réplicas
     
     if search:
-        search_filter = or_(
-            User.username.ilike(f"%{search}%"),
-            User.email.ilike(f"%{search}%"),
-            User.first_name.ilike(f"%{search}%"),
-            User.last_name.ilike(f"%{search}%")
+        search_filter = search_condition(USER_SEARCH, search, dialect_name)
+        if search_filter is not None:
+            query = query.where(search_filter)
+    
+    total = None
+    if count == "exact":
+        total = await db.scalar(select(func.count()).select_from(query.subquery()))
+    elif count == "estimate":
+        total = await estimate_count(db, query)
+    
+    # Orden estable (columna, id): con cursor se continúa tras la última fila
+    # en lugar de hacer OFFSET, que recorre todas las filas anteriores
+    sort_columns = [USER_ORDERINGS[order_by], User.id]
+    page_query = query.order_by(*sort_columns)
+    if cursor:
+        try:
+            values = decode_cursor(cursor, kind=order_by)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+        page_query = page_query.where(
+            keyset_after(sort_columns, values, dialect_name=dialect_name)
         )
-        query = query.filter(search_filter)
+    else:
+        page_query = page_query.offset((page - 1) * size)
     
-    total = query.count()
-    users = query.offset((page - 1) * size).limit(size).all()
+    result = await db.execute(page_query.limit(size + 1))
+    users = result.scalars().all()
+    
+    next_cursor = None
+    if len(users) > size:
+        users = users[:size]
+        last = users[-1]
+        next_cursor = encode_cursor(order_by, [getattr(last, order_by), last.id])
     
     return UserList(
         users=[UserResponse.from_orm(user) for user in users],
         total=total,
         page=page,
-        size=size
+        size=size,
+        next_cursor=next_cursor,
+        total_estimated=count == "estimate"
     )
 
 @router.post("/", response_model=UserResponse)
 async def create_new_user(
     user_data: UserCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserPrincipal = Depends(get_current_admin_user)
 ):
     """Create new user (admin only)"""
     try:
-        user = create_user(
+        user = await create_user(
             db=db,
             username=user_data.username,
             email=user_data.email,
@@ -119,8 +163,8 @@ async def create_new_user(
 @router.get("/{user_id}", response_model=UserResponse)
 async def get_user(
     user_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
     """Get user by ID"""
     # Users can only see their own profile unless they're admin
@@ -130,7 +174,7 @@ async def get_user(
             detail="Not enough permissions to view this user"
         )
     
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -143,8 +187,8 @@ async def get_user(
 async def update_user(
     user_id: int,
     user_update: UserUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
     """Update user"""
     # Users can only update their own profile unless they're admin
@@ -154,7 +198,7 @@ async def update_user(
             detail="Not enough permissions to update this user"
         )
     
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -172,11 +216,12 @@ async def update_user(
         setattr(user, field, value)
     
     try:
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        user_cache.invalidate(user_id)
+        await db.refresh(user)
         return UserResponse.from_orm(user)
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error updating user"
@@ -185,11 +230,11 @@ async def update_user(
 @router.delete("/{user_id}")
 async def delete_user(
     user_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserPrincipal = Depends(get_current_admin_user)
 ):
     """Delete user (admin only)"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -204,11 +249,12 @@ async def delete_user(
         )
     
     try:
-        db.delete(user)
-        db.commit()
+        await db.delete(user)
+        await db.commit()
+        user_cache.invalidate(user_id)
         return {"message": "User deleted successfully"}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error deleting user"
@@ -217,11 +263,11 @@ async def delete_user(
 @router.post("/{user_id}/deactivate")
 async def deactivate_user(
     user_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserPrincipal = Depends(get_current_admin_user)
 ):
     """Deactivate user (admin only)"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -236,18 +282,19 @@ async def deactivate_user(
         )
     
     user.is_active = False
-    db.commit()
+    await db.commit()
+    user_cache.invalidate(user_id)
     
     return {"message": "User deactivated successfully"}
 
 @router.post("/{user_id}/activate")
 async def activate_user(
     user_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserPrincipal = Depends(get_current_admin_user)
 ):
     """Activate user (admin only)"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -255,28 +302,29 @@ async def activate_user(
         )
     
     user.is_active = True
-    db.commit()
+    await db.commit()
+    user_cache.invalidate(user_id)
     
     return {"message": "User activated successfully"}
 
 @router.post("/change-password")
 async def change_password(
     password_data: PasswordChange,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_record)
 ):
     """Change current user password"""
     from ...services.auth import AuthService
     
     # Verify current password
-    if not AuthService.verify_password(password_data.current_password, current_user.password_hash):
+    if not await AuthService.verify_password_async(password_data.current_password, current_user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Current password is incorrect"
         )
     
     # Update password
-    success = update_user_password(db, current_user.id, password_data.new_password)
+    success = await update_user_password(db, current_user.id, password_data.new_password)
     if not success:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -288,8 +336,8 @@ async def change_password(
 @router.get("/{user_id}/stats")
 async def get_user_stats(
     user_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
     """Get user statistics"""
     # Users can only see their own stats unless they're admin
@@ -299,20 +347,32 @@ async def get_user_stats(
             detail="Not enough permissions to view this user's stats"
         )
     
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
     
-    # Get statistics
+    # Get statistics (una sola consulta con subconsultas COUNT, sin cargar relaciones)
+    def count_for(model, column):
+        return select(func.count()).select_from(model).where(column == user_id).scalar_subquery()
+    
+    result = await db.execute(select(
+        count_for(Company, Company.created_by),
+        count_for(Employee, Employee.created_by),
+        count_for(MailAccount, MailAccount.user_id),
+        count_for(Activity, Activity.user_id),
+        count_for(Note, Note.user_id)
+    ))
+    companies, employees, mail_accounts, activities, notes = result.one()
+    
     stats = {
-        "companies_created": len(user.companies),
-        "employees_created": len(user.employees),
-        "mail_accounts": len(user.mail_accounts),
-        "activities": len(user.activities),
-        "notes": len(user.notes),
+        "companies_created": companies,
+        "employees_created": employees,
+        "mail_accounts": mail_accounts,
+        "activities": activities,
+        "notes": notes,
         "last_login": user.last_login,
         "account_created": user.created_at
     }
@@ -4,8 +4,8 @@ Manages application configuration and environment variables
 """
 import os
 from typing import Optional, List
-from pydantic import Field, ConfigDict, model_validator
-from pydantic_settings import BaseSettings
+from pydantic import Field, model_validator
+from pydantic_settings import BaseSettings, SettingsConfigDict
 from functools import lru_cache
 
 # Importar configuración de producción
@@ -16,15 +16,43 @@ except ImportError:
     USE_PRODUCTION_CONFIG = False
 
 
+# Cada sección lee sus variables (validation_alias) del entorno y de .env;
+# pydantic-settings v2 ignora Field(env=...)
+ENV_CONFIG = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8", extra="allow")
+
+
 class DatabaseSettings(BaseSettings):
     """Database configuration"""
-    host: str = Field(default="localhost", env="DB_HOST")
-    port: int = Field(default=3306, env="DB_PORT")
-    username: str = Field(default="root", env="DB_USERNAME")
-    password: str = Field(default="", env="DB_PASSWORD")
-    database: str = Field(default="erp_system", env="DB_DATABASE")
+    host: str = Field(default="localhost", validation_alias="DB_HOST")
+    port: int = Field(default=3306, validation_alias="DB_PORT")
+    username: str = Field(default="root", validation_alias="DB_USERNAME")
+    password: str = Field(default="", validation_alias="DB_PASSWORD")
+    database: str = Field(default="erp_system", validation_alias="DB_DATABASE")
+    # URL completa opcional (p. ej. sqlite:///./test.db); tiene prioridad sobre host/port
+    url: Optional[str] = Field(default=None, validation_alias="DATABASE_URL")
+    
+    # Presupuesto de conexiones: total por nodo, repartido entre los workers de uvicorn
+    max_connections: int = Field(default=40, validation_alias="DB_MAX_CONNECTIONS")
+    workers: int = Field(default=4, validation_alias="WEB_CONCURRENCY")
+    # Overrides explícitos por pool (si no se indican se derivan del presupuesto)
+    pool_size: Optional[int] = Field(default=None, validation_alias="DB_POOL_SIZE")
+    max_overflow: Optional[int] = Field(default=None, validation_alias="DB_MAX_OVERFLOW")
+    pool_timeout: int = Field(default=30, validation_alias="DB_POOL_TIMEOUT")
+    pool_recycle: int = Field(default=3600, validation_alias="DB_POOL_RECYCLE")
     
-    model_config = ConfigDict(extra="allow")
+    # Réplicas de solo lectura (URLs completas separadas por comas)
+    replica_urls: str = Field(default="", validation_alias="DB_REPLICA_URLS")
+    # Segundos que una réplica marcada como caída (o sana) mantiene ese estado antes de volver a comprobarse
+    replica_health_ttl: int = Field(default=10, validation_alias="DB_REPLICA_HEALTH_TTL")
+    # Tras una escritura, las lecturas de este proceso van al primario durante este margen (lag de replicación)
+    replica_read_after_write_seconds: float = Field(default=2.0, validation_alias="DB_REPLICA_READ_AFTER_WRITE")
+    
+    # Instrumentación SQL por petición
+    slow_query_ms: int = Field(default=200, validation_alias="DB_SLOW_QUERY_MS")
+    # Una petición que ejecuta la misma forma de sentencia más de N veces se marca como posible N+1
+    n_plus_one_threshold: int = Field(default=5, validation_alias="DB_N_PLUS_ONE_THRESHOLD")
+    
+    model_config = ENV_CONFIG
     
     @model_validator(mode='after')
     def apply_production_config(self):
@@ -41,16 +69,37 @@ class DatabaseSettings(BaseSettings):
     
     @property
     def connection_string(self) -> str:
+        if self.url:
+            return self.url
         return f"mysql+mysqlconnector://{self.username}:{self.password}@{self.host}:{self.port}/{self.database}"
+    
+    @property
+    def replica_connection_strings(self) -> List[str]:
+        return [url.strip() for url in self.replica_urls.split(",") if url.strip()]
 
 
 class SecuritySettings(BaseSettings):
     """Security and authentication configuration"""
-    secret_key: str = Field(default="your-secret-key-here", env="SECRET_KEY")
-    algorithm: str = Field(default="HS256", env="ALGORITHM")
-    access_token_expire_minutes: int = Field(default=30, env="ACCESS_TOKEN_EXPIRE_MINUTES")
+    secret_key: str = Field(default="your-secret-key-here", validation_alias="SECRET_KEY")
+    algorithm: str = Field(default="HS256", validation_alias="ALGORITHM")
+    access_token_expire_minutes: int = Field(default=30, validation_alias="ACCESS_TOKEN_EXPIRE_MINUTES")
+    # Caché del usuario autenticado (por proceso): un cambio hecho en otro
+    # worker tarda como máximo user_cache_ttl segundos en verse
+    user_cache_ttl: int = Field(default=30, validation_alias="AUTH_USER_CACHE_TTL")
+    user_cache_size: int = Field(default=1024, validation_alias="AUTH_USER_CACHE_SIZE")
+    # Hilos para bcrypt (por defecto, uno por núcleo)
+    bcrypt_workers: Optional[int] = Field(default=None, validation_alias="BCRYPT_WORKERS")
+    # Escritura diferida de last_login / user_sessions
+    login_flush_interval_ms: int = Field(default=500, validation_alias="AUTH_LOGIN_FLUSH_MS")
+    login_flush_batch: int = Field(default=200, validation_alias="AUTH_LOGIN_FLUSH_BATCH")
+    # Intentos de una fila rechazada antes de descartarla y máximo de elementos en cola
+    login_flush_max_attempts: int = Field(default=3, validation_alias="AUTH_LOGIN_FLUSH_MAX_ATTEMPTS")
+    login_max_backlog: int = Field(default=10000, validation_alias="AUTH_LOGIN_MAX_BACKLOG")
+    # Limpieza de user_sessions (segundos entre pasadas, 0 = desactivada)
+    session_sweep_interval: int = Field(default=300, validation_alias="AUTH_SESSION_SWEEP_INTERVAL")
+    session_sweep_batch: int = Field(default=500, validation_alias="AUTH_SESSION_SWEEP_BATCH")
     
-    model_config = ConfigDict(extra="allow")
+    model_config = ENV_CONFIG
     
     @model_validator(mode='after')
     def apply_production_config(self):
@@ -66,45 +115,110 @@ class SecuritySettings(BaseSettings):
     
 class ExternalAPISettings(BaseSettings):
     """External API configuration"""
-    max_retries: int = Field(default=3, env="API_MAX_RETRIES")
-    timeout_seconds: int = Field(default=30, env="API_TIMEOUT")
-    backoff_factor: float = Field(default=1.0, env="API_BACKOFF_FACTOR")
+    max_retries: int = Field(default=3, validation_alias="API_MAX_RETRIES")
+    timeout_seconds: int = Field(default=30, validation_alias="API_TIMEOUT")
+    backoff_factor: float = Field(default=1.0, validation_alias="API_BACKOFF_FACTOR")
     
-    model_config = ConfigDict(extra="allow")
+    model_config = ENV_CONFIG
 
 
 class AISettings(BaseSettings):
     """AI and ML configuration"""
-    model_path: str = Field(default="./models", env="AI_MODEL_PATH")
-    classification_threshold: float = Field(default=0.7, env="AI_CLASSIFICATION_THRESHOLD")
+    model_path: str = Field(default="./models", validation_alias="AI_MODEL_PATH")
+    classification_threshold: float = Field(default=0.7, validation_alias="AI_CLASSIFICATION_THRESHOLD")
     agent_system_prompt: str = Field(
         default="Responde el correo en nombre de Joel Araujo, utiliza un lenguaje amigable y poco técnico",
-        env="AI_AGENT_SYSTEM_PROMPT"
+        validation_alias="AI_AGENT_SYSTEM_PROMPT"
     )
     
-    model_config = ConfigDict(extra="allow")
+    model_config = ENV_CONFIG
+
+
+class MailSettings(BaseSettings):
+    """Mail (IMAP/SMTP) configuration"""
+    # Pool de sesiones IMAP autenticadas por cuenta
+    imap_pool_max_per_account: int = Field(default=3, validation_alias="MAIL_IMAP_POOL_MAX_PER_ACCOUNT")
+    imap_pool_idle_timeout: int = Field(default=300, validation_alias="MAIL_IMAP_POOL_IDLE_TIMEOUT")
+    # NOOP antes de reutilizar una sesión que lleva más de N segundos parada
+    imap_pool_health_after: int = Field(default=30, validation_alias="MAIL_IMAP_POOL_HEALTH_AFTER")
+    imap_pool_acquire_timeout: int = Field(default=30, validation_alias="MAIL_IMAP_POOL_ACQUIRE_TIMEOUT")
+    # Plazos: conexión (TCP + TLS + saludo) y cada comando IMAP/SMTP
+    connect_timeout: int = Field(default=10, validation_alias="MAIL_CONNECT_TIMEOUT")
+    imap_timeout: int = Field(default=30, validation_alias="MAIL_IMAP_TIMEOUT")
+    smtp_timeout: int = Field(default=30, validation_alias="MAIL_SMTP_TIMEOUT")
+    # Sincronización: UIDs por cada UID FETCH de mensajes nuevos (y por commit)
+    sync_fetch_batch: int = Field(default=500, validation_alias="MAIL_SYNC_FETCH_BATCH")
+    # Una sincronización por cuenta entre todos los procesos (mail_accounts.sync_claimed_by):
+    # segundos sin renovar tras los que la reserva de un proceso caído caduca
+    sync_lease_timeout: int = Field(default=900, validation_alias="MAIL_SYNC_LEASE_TIMEOUT")
+    # Contadores de carpeta (STATUS) en caché: segundos antes de volver a preguntar
+    folder_status_ttl: int = Field(default=30, validation_alias="MAIL_FOLDER_STATUS_TTL")
+    # Los contadores de carpeta/cuenta se mantienen al vuelo; cada N segundos se recalculan
+    # para corregir la deriva (0 lo desactiva)
+    counters_reconcile_interval: int = Field(default=3600, validation_alias="MAIL_COUNTERS_RECONCILE_INTERVAL")
+    # Adjuntos descargados (ficheros por hash de contenido) y tamaño de cada tramo IMAP / HTTP
+    attachment_dir: str = Field(default="./storage/mail", validation_alias="MAIL_ATTACHMENT_DIR")
+    fetch_chunk_size: int = Field(default=262144, validation_alias="MAIL_FETCH_CHUNK_SIZE")
+    # Sincronización automática (auto_sync / sync_interval de cada cuenta): cada cuánto se
+    # revisan las cuentas, sincronizaciones simultáneas, jitter (fracción del intervalo) y
+    # reintentos tras un fallo (segundos, se duplican hasta el máximo)
+    scheduler_enabled: bool = Field(default=True, validation_alias="MAIL_SCHEDULER_ENABLED")
+    scheduler_tick: int = Field(default=10, validation_alias="MAIL_SCHEDULER_TICK")
+    scheduler_max_concurrent: int = Field(default=4, validation_alias="MAIL_SCHEDULER_MAX_CONCURRENT")
+    scheduler_jitter: float = Field(default=0.1, validation_alias="MAIL_SCHEDULER_JITTER")
+    scheduler_backoff: int = Field(default=60, validation_alias="MAIL_SCHEDULER_BACKOFF")
+    scheduler_max_backoff: int = Field(default=3600, validation_alias="MAIL_SCHEDULER_MAX_BACKOFF")
+    # Avisos en tiempo real: IMAP IDLE (o NOOP cada idle_poll_interval s si el servidor no lo
+    # admite) en la INBOX de las cuentas de los usuarios conectados a /api/mail/events; se
+    # renueva antes de los 30 min del servidor y sigue idle_linger s tras la desconexión
+    idle_enabled: bool = Field(default=True, validation_alias="MAIL_IDLE_ENABLED")
+    idle_timeout: int = Field(default=1500, validation_alias="MAIL_IDLE_TIMEOUT")
+    idle_poll_interval: int = Field(default=60, validation_alias="MAIL_IDLE_POLL_INTERVAL")
+    idle_linger: int = Field(default=300, validation_alias="MAIL_IDLE_LINGER")
+    idle_max_accounts: int = Field(default=200, validation_alias="MAIL_IDLE_MAX_ACCOUNTS")
+    idle_max_backoff: int = Field(default=300, validation_alias="MAIL_IDLE_MAX_BACKOFF")
+    # Eventos pendientes por navegador y comentario de keep-alive del stream SSE (segundos).
+    # El bus de eventos es por proceso: los avisos solo son fiables con WEB_CONCURRENCY=1
+    events_queue_size: int = Field(default=100, validation_alias="MAIL_EVENTS_QUEUE_SIZE")
+    events_heartbeat: int = Field(default=25, validation_alias="MAIL_EVENTS_HEARTBEAT")
+    # Cola de envío: mensajes serializados en outbox_dir, entregados por workers en segundo
+    # plano con conexiones SMTP reutilizadas por cuenta (hasta outbox_batch mensajes por
+    # sesión), cuentas en paralelo y reintentos con espera exponencial
+    outbox_enabled: bool = Field(default=True, validation_alias="MAIL_OUTBOX_ENABLED")
+    outbox_dir: str = Field(default="./storage/outbox", validation_alias="MAIL_OUTBOX_DIR")
+    outbox_tick: float = Field(default=2.0, validation_alias="MAIL_OUTBOX_TICK")
+    outbox_max_concurrent: int = Field(default=4, validation_alias="MAIL_OUTBOX_MAX_CONCURRENT")
+    outbox_batch: int = Field(default=20, validation_alias="MAIL_OUTBOX_BATCH")
+    outbox_max_attempts: int = Field(default=8, validation_alias="MAIL_OUTBOX_MAX_ATTEMPTS")
+    outbox_backoff: int = Field(default=30, validation_alias="MAIL_OUTBOX_BACKOFF")
+    outbox_max_backoff: int = Field(default=3600, validation_alias="MAIL_OUTBOX_MAX_BACKOFF")
+    # Pool de conexiones SMTP de la cola: los servidores SMTP cortan antes
+    # que los IMAP una conexión parada (RFC 5321: 5 minutos o menos)
+    smtp_pool_max_per_account: int = Field(default=2, validation_alias="MAIL_SMTP_POOL_MAX_PER_ACCOUNT")
+    smtp_pool_idle_timeout: int = Field(default=60, validation_alias="MAIL_SMTP_POOL_IDLE_TIMEOUT")
+    smtp_pool_health_after: int = Field(default=15, validation_alias="MAIL_SMTP_POOL_HEALTH_AFTER")
+    smtp_pool_acquire_timeout: int = Field(default=30, validation_alias="MAIL_SMTP_POOL_ACQUIRE_TIMEOUT")
+    
+    model_config = ENV_CONFIG
 
 
 class Settings(BaseSettings):
     """Main application settings"""
-    app_name: str = Field(default="ERP System", env="APP_NAME")
-    app_version: str = Field(default="1.0.0", env="APP_VERSION")
-    debug: bool = Field(default=True, env="DEBUG")
+    app_name: str = Field(default="ERP System", validation_alias="APP_NAME")
+    app_version: str = Field(default="1.0.0", validation_alias="APP_VERSION")
+    debug: bool = Field(default=True, validation_alias="DEBUG")
     
     # Sub-configurations - se inicializarán directamente con las variables de entorno
     database: DatabaseSettings = Field(default_factory=DatabaseSettings)
     security: SecuritySettings = Field(default_factory=SecuritySettings)
     external_api: ExternalAPISettings = Field(default_factory=ExternalAPISettings)
     ai: AISettings = Field(default_factory=AISettings)
+    mail: MailSettings = Field(default_factory=MailSettings)
     
     # Multi-company support
-    default_company_id: Optional[int] = Field(default=None, env="DEFAULT_COMPANY_ID")
+    default_company_id: Optional[int] = Field(default=None, validation_alias="DEFAULT_COMPANY_ID")
     
-    model_config = ConfigDict(
-        env_file=".env",
-        env_file_encoding="utf-8",
-        extra="allow"  # Permite campos extra del archivo .env
-    )
+    model_config = ENV_CONFIG  # extra="allow": campos extra del archivo .env
 
 
 @lru_cache()
@@ -3,47 +3,69 @@ Database connection and configuration
 """
 
 import os
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from contextlib import contextmanager
 import logging
-from ..config.settings import get_settings
+from .registry import get_engine_registry
+from .routing import ReplicaRouter, RoutingSession
 
 logger = logging.getLogger(__name__)
 
 # Global variables for lazy initialization
-_engine = None
 _SessionLocal = None
+_AsyncSessionLocal = None
+
 
 def get_engine():
-    """Get or create SQLAlchemy engine (lazy initialization)"""
-    global _engine
-    if _engine is None:
-        # Get settings fresh each time to ensure production config is applied
-        settings = get_settings()
-        logger.info(f"🔗 Creating database engine with connection string: {settings.database.connection_string}")
-        _engine = create_engine(
-            settings.database.connection_string,
-            echo=settings.debug,
-            pool_size=10,
-            max_overflow=20,
-            pool_pre_ping=True,
-            pool_recycle=3600,
-            connect_args={
-                "autocommit": False,
-                "use_unicode": True,
-                "charset": "utf8mb4"
-            }
-        )
-    return _engine
+    """Get the shared SQLAlchemy engine (see registry.py)"""
+    return get_engine_registry().get_engine()
 
 def get_session_local():
     """Get or create session factory (lazy initialization)"""
     global _SessionLocal
     if _SessionLocal is None:
-        _SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
+        _SessionLocal = sessionmaker(
+            class_=RoutingSession,
+            autocommit=False,
+            autoflush=False,
+            bind=get_engine(),
+            info={"router": ReplicaRouter(get_engine_registry(), is_async=False)}
+        )
     return _SessionLocal
 
+def get_async_engine():
+    """Get the shared SQLAlchemy AsyncEngine (see registry.py)"""
+    return get_engine_registry().get_async_engine()
+
+def get_async_session_local():
+    """Get or create AsyncSession factory (lazy initialization)"""
+    global _AsyncSessionLocal
+    if _AsyncSessionLocal is None:
+        # expire_on_commit=False: los objetos siguen siendo legibles tras commit sin I/O implícito
+        _AsyncSessionLocal = async_sessionmaker(
+            bind=get_async_engine(),
+            class_=AsyncSession,
+            sync_session_class=RoutingSession,
+            autoflush=False,
+            expire_on_commit=False,
+            info={"router": ReplicaRouter(get_engine_registry(), is_async=True)}
+        )
+    return _AsyncSessionLocal
+
+def get_replica_status():
+    """Último resultado del health check de cada réplica (None = aún no comprobada)"""
+    if _AsyncSessionLocal is None:
+        return {}
+    return _AsyncSessionLocal.kw["info"]["router"].status()
+
+async def dispose_engines():
+    """Cerrar los pools de conexiones (shutdown)"""
+    global _SessionLocal, _AsyncSessionLocal
+    await get_engine_registry().dispose()
+    _SessionLocal = _AsyncSessionLocal = None
+
 @contextmanager
 def get_db_session():
     """Context manager para manejar sesiones de base de datos"""
@@ -76,4 +98,17 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    """Dependency async para FastAPI (no bloquea el event loop)"""
+    session_factory = get_async_session_local()
+    async with session_factory() as db:
+        yield db
+
+async def get_async_read_db():
+    """Dependency async de solo lectura: usa una réplica si hay alguna sana (ver routing.py)"""
+    session_factory = get_async_session_local()
+    async with session_factory() as db:
+        db.info["read_only"] = True
+        yield db
@@ -0,0 +1,105 @@
+"""
+Per-request SQL instrumentation
+Listeners before/after_cursor_execute que acumulan, para la petición HTTP en
+curso, el número de consultas, el tiempo total en base de datos y las
+"formas" de sentencia repetidas (detección de N+1).
+
+El middleware de main.py abre el contexto con `begin_request()` y publica el
+resultado en la cabecera Server-Timing. Las consultas por encima de
+`slow_query_ms` se registran en el logger "crm.sql.slow" (haya o no petición).
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger("crm.sql.slow")
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\(\s*(?:\?|%s|:\w+)(?:\s*,\s*(?:\?|%s|:\w+))+\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """Normaliza una sentencia: sin literales, listas IN colapsadas y espacios simples"""
+    shape = _LITERALS.sub("?", statement)
+    shape = _IN_LISTS.sub("(?)", shape)
+    return _SPACES.sub(" ", shape).strip()
+
+
+@dataclass
+class RequestQueryStats:
+    """Consultas ejecutadas durante una petición"""
+    query_count: int = 0
+    total_ms: float = 0.0
+    shapes: Counter = field(default_factory=Counter)
+
+    def record(self, statement: str, elapsed_ms: float):
+        self.query_count += 1
+        self.total_ms += elapsed_ms
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated_shapes(self, threshold: int) -> List[Tuple[str, int]]:
+        """Formas ejecutadas más de `threshold` veces (candidatas a N+1)"""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count > threshold]
+
+    def server_timing(self, threshold: int) -> str:
+        """Valor para la cabecera Server-Timing"""
+        metrics = [f'db;dur={self.total_ms:.2f};desc="{self.query_count} queries"']
+        repeated = self.repeated_shapes(threshold)
+        if repeated:
+            metrics.append(f'db-repeated;desc="{repeated[0][1]}x same statement"')
+        return ", ".join(metrics)
+
+
+_current_stats: ContextVar[Optional[RequestQueryStats]] = ContextVar("request_query_stats", default=None)
+
+
+def begin_request():
+    """Activa la recogida para el contexto actual; devuelve (stats, token para end_request)"""
+    stats = RequestQueryStats()
+    return stats, _current_stats.set(stats)
+
+
+def end_request(token):
+    _current_stats.reset(token)
+
+
+def current_stats() -> Optional[RequestQueryStats]:
+    return _current_stats.get()
+
+
+def install(engine: Engine, slow_query_ms: float):
+    """Registrar los listeners en un engine síncrono (o en AsyncEngine.sync_engine)"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start_times = conn.info.get("query_start_time")
+        if not start_times:
+            return
+        elapsed_ms = (time.perf_counter() - start_times.pop()) * 1000
+
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.record(statement, elapsed_ms)
+
+        if elapsed_ms >= slow_query_ms:
+            slow_query_logger.warning(f"Slow query ({elapsed_ms:.1f} ms): {statement_shape(statement)}")
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        # Una sentencia fallida no llega a after_cursor_execute: descartar su marca de tiempo
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_start_time"):
+            conn.info["query_start_time"].pop()
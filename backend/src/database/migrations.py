@@ -0,0 +1,149 @@
+"""
+Schema migrations
+Migraciones aditivas e idempotentes que se aplican al arrancar, después de
+create_all() (que solo crea tablas nuevas, nunca índices en tablas existentes).
+
+- ensure_declared_columns: añade las columnas declaradas en los modelos que
+  falten en tablas existentes (solo columnas que admiten NULL o tienen
+  server_default; el resto necesita una migración explícita).
+- ensure_declared_indexes: crea los índices declarados en los modelos que aún
+  no existan (comparando por columnas, no por nombre, para no duplicar los
+  idx_* de database/create_database.sql).
+- MIGRATIONS: pasos específicos de un backend, registrados con @migration.
+  Se ejecutan antes de ensure_declared_indexes, así que pueden preparar los
+  datos o quitar un índice que el modelo declara ahora de otra forma.
+"""
+import logging
+from typing import Callable, List, Tuple
+
+from sqlalchemy import bindparam, inspect, text
+from sqlalchemy.schema import CreateColumn
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS: List[Tuple[str, Callable[[Connection], None]]] = []
+
+
+def migration(name: str):
+    """Registrar una migración (debe ser idempotente)"""
+    def decorator(fn):
+        MIGRATIONS.append((name, fn))
+        return fn
+    return decorator
+
+
+def _existing_column_sets(inspector, table_name: str) -> set:
+    existing = set()
+    for index in inspector.get_indexes(table_name):
+        existing.add(tuple(index["column_names"]))
+    for constraint in inspector.get_unique_constraints(table_name):
+        existing.add(tuple(constraint["column_names"]))
+    primary_key = inspector.get_pk_constraint(table_name).get("constrained_columns")
+    if primary_key:
+        existing.add(tuple(primary_key))
+    return existing
+
+
+def ensure_declared_columns(conn: Connection, metadata) -> int:
+    """Añadir a tablas ya existentes las columnas de `metadata` que falten"""
+    inspector = inspect(conn)
+    tables = set(inspector.get_table_names())
+    preparer = conn.dialect.identifier_preparer
+    added = 0
+    for table in metadata.sorted_tables:
+        if table.name not in tables:
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable and column.server_default is None:
+                logger.warning(f"⚠️ Column {table.name}.{column.name} is NOT NULL without server default; add it manually")
+                continue
+            # CreateColumn genera "nombre TIPO [DEFAULT ...] [NULL]" para el dialecto
+            spec = CreateColumn(column).compile(dialect=conn.dialect)
+            logger.info(f"🛠️ Adding column {table.name}.{column.name}")
+            conn.exec_driver_sql(f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {spec}")
+            added += 1
+    return added
+
+
+def ensure_declared_indexes(conn: Connection, metadata) -> int:
+    """Crear los índices de `metadata` que falten en tablas ya existentes"""
+    inspector = inspect(conn)
+    tables = set(inspector.get_table_names())
+    created = 0
+    for table in metadata.sorted_tables:
+        if table.name not in tables:
+            continue
+        existing = _existing_column_sets(inspector, table.name)
+        for index in table.indexes:
+            columns = tuple(column.name for column in index.columns)
+            if not columns or columns in existing:
+                continue
+            logger.info(f"🛠️ Creating index {index.name} on {table.name}{columns}")
+            index.create(conn)
+            existing.add(columns)
+            created += 1
+    return created
+
+
+@migration("mysql:drop_mail_counter_triggers")
+def _drop_mail_counter_triggers(conn: Connection):
+    """Los contadores de mail_folders / mail_accounts los mantiene la aplicación
+    (modules/mail/counters.py); con estos triggers contarían dos veces"""
+    if conn.dialect.name != "mysql":
+        return
+    for trigger in ("update_folder_counts", "update_account_unread_count"):
+        conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {trigger}")
+
+
+@migration("unique_mail_message_uid")
+def _unique_mail_message_uid(conn: Connection):
+    """(folder_id, uid) de mail_messages pasa a ser único. Se borran los mensajes
+    repetidos (se queda el de menor id) y el índice no único, que
+    ensure_declared_indexes sustituye después por el único; los contadores los
+    corrige CounterReconciler en su primera pasada"""
+    inspector = inspect(conn)
+    if "mail_messages" not in inspector.get_table_names():
+        return
+    columns = ["folder_id", "uid"]
+    if any(constraint["column_names"] == columns for constraint in inspector.get_unique_constraints("mail_messages")):
+        return
+    indexes = [index for index in inspector.get_indexes("mail_messages") if index["column_names"] == columns]
+    if any(index["unique"] for index in indexes):
+        return
+
+    duplicates = conn.execute(text(
+        "SELECT m.id FROM mail_messages m JOIN ("
+        " SELECT folder_id, uid, MIN(id) AS keep_id FROM mail_messages WHERE uid IS NOT NULL"
+        " GROUP BY folder_id, uid HAVING COUNT(*) > 1"
+        ") d ON m.folder_id = d.folder_id AND m.uid = d.uid AND m.id <> d.keep_id"
+    )).scalars().all()
+    if duplicates:
+        logger.warning(f"⚠️ Removing {len(duplicates)} duplicated mail messages (same folder and UID)")
+    for start in range(0, len(duplicates), 500):
+        ids = {"ids": duplicates[start:start + 500]}
+        conn.execute(text("DELETE FROM mail_attachments WHERE message_id IN :ids")
+                     .bindparams(bindparam("ids", expanding=True)), ids)
+        conn.execute(text("DELETE FROM mail_messages WHERE id IN :ids")
+                     .bindparams(bindparam("ids", expanding=True)), ids)
+
+    preparer = conn.dialect.identifier_preparer
+    for index in indexes:
+        logger.info(f"🛠️ Dropping non-unique index {index['name']} on mail_messages{tuple(columns)}")
+        if conn.dialect.name == "mysql":
+            conn.exec_driver_sql(f"DROP INDEX {preparer.quote(index['name'])} ON mail_messages")
+        else:
+            conn.exec_driver_sql(f"DROP INDEX {preparer.quote(index['name'])}")
+
+
+def run_migrations(engine: Engine, metadata):
+    """Aplicar columnas declaradas, migraciones registradas e índices declarados"""
+    with engine.begin() as conn:
+        ensure_declared_columns(conn, metadata)
+        for name, fn in MIGRATIONS:
+            fn(conn)
+        ensure_declared_indexes(conn, metadata)
+    logger.info(f"Schema migrations applied ({len(MIGRATIONS)} registered steps)")
@@ -3,7 +3,7 @@ Database configuration and models for CRM ARI
 """
 
 import os
-from sqlalchemy import create_engine, Column, Integer, String, Text, Boolean, DateTime, Enum, JSON, ForeignKey, Index
+from sqlalchemy import create_engine, Column, Integer, BigInteger, String, Text, Boolean, DateTime, Enum, JSON, ForeignKey, Index
 from sqlalchemy.types import DECIMAL as Decimal
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
@@ -24,6 +24,10 @@ Base = declarative_base()
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # Paginación por cursor (created_at, id)
+        Index("ix_users_created_at_id", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String(50), unique=True, nullable=False, index=True)
@@ -76,6 +80,13 @@ class UserRole(Base):
 
 class UserSession(Base):
     __tablename__ = "user_sessions"
+    __table_args__ = (
+        # Limpieza de sesiones y listado de sesiones activas
+        Index("ix_user_sessions_active_expires", "is_active", "expires_at"),
+        Index("ix_user_sessions_user_active_expires", "user_id", "is_active", "expires_at"),
+        # Listado de todas las sesiones (active_only=false) por cursor (expires_at, id)
+        Index("ix_user_sessions_expires", "expires_at", "id"),
+    )
     
     id = Column(String(255), primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -216,6 +227,8 @@ class MailAccount(Base):
     last_sync = Column(DateTime)
     unread_count = Column(Integer, default=0)
     total_count = Column(Integer, default=0)
+    sync_claimed_by = Column(String(64))  # proceso que la está sincronizando
+    sync_claimed_at = Column(DateTime)
     
     # Metadatos
     created_at = Column(DateTime, default=func.now())
@@ -252,6 +265,13 @@ class MailFolder(Base):
     # Estadísticas
     unread_count = Column(Integer, default=0)
     total_count = Column(Integer, default=0)
+    status_checked_at = Column(DateTime)  # última vez que los contadores se confirmaron con el servidor
+    
+    # Estado de sincronización IMAP (UIDVALIDITY, último UID visto y HIGHESTMODSEQ de CONDSTORE)
+    uid_validity = Column(BigInteger)
+    last_seen_uid = Column(BigInteger, default=0)
+    highest_modseq = Column(BigInteger)
+    last_sync = Column(DateTime)
     
     # Metadatos
     created_at = Column(DateTime, default=func.now())
@@ -265,6 +285,14 @@ class MailFolder(Base):
 
 class MailMessage(Base):
     __tablename__ = "mail_messages"
+    __table_args__ = (
+        # Sincronización IMAP: un mensaje por UID dentro de la carpeta
+        Index("ix_mail_messages_folder_uid", "folder_id", "uid", unique=True),
+        # Mensajes de una conversación (threads.py)
+        Index("ix_mail_messages_account_thread", "account_id", "thread_id"),
+        # Listado de una carpeta por cursor (received_at, id)
+        Index("ix_mail_messages_folder_received", "folder_id", "received_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     account_id = Column(Integer, ForeignKey("mail_accounts.id"), nullable=False)
@@ -273,7 +301,7 @@ class MailMessage(Base):
     # Identificadores únicos
     message_id = Column(String(500), nullable=False)
     uid = Column(String(100))
-    thread_id = Column(String(100))
+    thread_id = Column(String(100))  # MailThread.id
     
     # Headers principales
     subject = Column(Text)
@@ -330,7 +358,8 @@ class MailAttachment(Base):
     size_bytes = Column(Integer, default=0)
     
     # Almacenamiento
-    file_path = Column(String(1000))
+    section = Column(String(50))  # sección MIME en el mensaje IMAP (BODY[2.1])
+    file_path = Column(String(1000))  # relativa a MAIL_ATTACHMENT_DIR: <sha256[:2]>/<sha256>
     is_inline = Column(Boolean, default=False)
     
     # Metadatos
@@ -340,6 +369,69 @@ class MailAttachment(Base):
     message = relationship("MailMessage", back_populates="attachments")
 
 
+class MailThread(Base):
+    """Conversación (ver src/modules/mail/threads.py)"""
+    __tablename__ = "mail_threads"
+    __table_args__ = (
+        # Listado de conversaciones por cursor (last_message_at, id)
+        Index("ix_mail_threads_account_last", "account_id", "last_message_at", "id"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    account_id = Column(Integer, ForeignKey("mail_accounts.id"), nullable=False)
+    subject = Column(Text)  # asunto sin "Re:" / "Fwd:"
+    last_message_at = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+
+class MailThreadRef(Base):
+    """Índice Message-ID -> conversación, también de mensajes citados que aún no se han recibido"""
+    __tablename__ = "mail_thread_refs"
+    __table_args__ = (
+        Index("ix_mail_thread_refs_account_message", "account_id", "message_id", unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    account_id = Column(Integer, ForeignKey("mail_accounts.id"), nullable=False)
+    message_id = Column(String(500), nullable=False)
+    thread_id = Column(Integer, ForeignKey("mail_threads.id"), nullable=False, index=True)
+
+
+class MailOutbox(Base):
+    __tablename__ = "mail_outbox"
+    __table_args__ = (
+        # Cola de envío: siguientes mensajes pendientes por fecha de reintento
+        Index("ix_mail_outbox_status_next", "status", "next_attempt_at"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    account_id = Column(Integer, ForeignKey("mail_accounts.id"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    
+    # Mensaje (el contenido serializado está en MAIL_OUTBOX_DIR/<file_path>)
+    message_id = Column(String(500), nullable=False)
+    subject = Column(Text)
+    sender = Column(String(200), nullable=False)
+    recipients = Column(JSON, nullable=False)  # sobre SMTP: to + cc + bcc
+    file_path = Column(String(1000))
+    size_bytes = Column(Integer, default=0)
+    
+    # Entrega
+    status = Column(Enum('queued', 'sending', 'sent', 'failed'), default='queued', nullable=False)
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, nullable=False)
+    claimed_by = Column(String(64))  # proceso que lo está enviando
+    claimed_at = Column(DateTime)
+    last_error = Column(Text)
+    refused = Column(JSON)  # destinatarios rechazados si otros se aceptaron
+    sent_at = Column(DateTime)
+    
+    # Metadatos
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+
 class Activity(Base):
     __tablename__ = "activities"
     
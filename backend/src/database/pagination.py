@@ -0,0 +1,100 @@
+"""
+Keyset (cursor) pagination helpers
+Cursores opacos sobre una clave de ordenación compuesta (p. ej. created_at, id)
+y recuento estimado para no pagar un COUNT(*) en cada página.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence
+
+from sqlalchemy import and_, or_, literal, select, func, tuple_, String
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and "dt" in value:
+        return datetime.fromisoformat(value["dt"])
+    return value
+
+
+def encode_cursor(kind: str, values: Sequence[Any]) -> str:
+    """Cursor opaco (base64url de JSON) con el tipo de orden y los valores de la última fila"""
+    payload = {"k": kind, "v": [_encode_value(value) for value in values]}
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, kind: str) -> List[Any]:
+    """Valores de un cursor; ValueError si está mal formado o es de otro orden"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        values = [_decode_value(value) for value in payload["v"]]
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if payload.get("k") != kind:
+        raise ValueError("Cursor does not match the requested ordering")
+    return values
+
+
+def _bind_value(column, value: Any, dialect_name: str):
+    # SQLite guarda CURRENT_TIMESTAMP como texto sin microsegundos y compara como texto:
+    # el parámetro debe tener el mismo formato para que la igualdad funcione. Las
+    # fechas que escribe SQLAlchemy (sin default SQL) llevan ".000000" y van tal cual.
+    default = getattr(column, "default", None)
+    from_sql = default is not None and getattr(default, "is_clause_element", False)
+    if dialect_name == "sqlite" and from_sql and isinstance(value, datetime) and value.microsecond == 0:
+        return literal(value.strftime("%Y-%m-%d %H:%M:%S"), String)
+    return value
+
+
+def keyset_after(columns: Sequence[Any], values: Sequence[Any], descending: bool = False,
+                 dialect_name: str = "mysql"):
+    """
+    Condición "fila posterior a `values`" para ORDER BY columns (todas ASC o todas DESC).
+    Se expande como OR de igualdades en prefijo, que MySQL resuelve como rango sobre el índice.
+    SQLite no usa el índice más allá de la igualdad con el OR; con (a, b) < (x, y) sí.
+    """
+    values = [_bind_value(column, value, dialect_name) for column, value in zip(columns, values)]
+    if dialect_name == "sqlite":
+        return tuple_(*columns) < tuple_(*values) if descending else tuple_(*columns) > tuple_(*values)
+    clauses = []
+    for i, column in enumerate(columns):
+        equal_prefix = [columns[j] == values[j] for j in range(i)]
+        step = column < values[i] if descending else column > values[i]
+        clauses.append(and_(*equal_prefix, step))
+    return or_(*clauses)
+
+
+class _Explain(Executable, ClauseElement):
+    """EXPLAIN <select> (solo MySQL)"""
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(_Explain)
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN " + compiler.process(element.statement, **kw)
+
+
+async def estimate_count(db: AsyncSession, query) -> Optional[int]:
+    """
+    Número aproximado de filas de `query`: estimación del optimizador en MySQL
+    (EXPLAIN, sin recorrer la tabla); en otros backends, COUNT exacto.
+    """
+    if db.bind.dialect.name == "mysql":
+        result = await db.execute(_Explain(query))
+        row = result.mappings().first()
+        return int(row["rows"]) if row and row.get("rows") is not None else None
+    return await db.scalar(select(func.count()).select_from(query.subquery()))
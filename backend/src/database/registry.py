@@ -0,0 +1,246 @@
+"""
+Engine registry
+Único punto de creación de engines SQLAlchemy por proceso: lo usan tanto
+src/database/connection.py como src/infrastructure/database/connection.py.
+
+El tamaño de los pools se deriva de un presupuesto de conexiones por nodo
+(DatabaseSettings.max_connections) repartido entre los workers de uvicorn,
+de modo que el total de conexiones abiertas contra MySQL nunca lo supera.
+"""
+import logging
+import math
+import threading
+import time
+from dataclasses import dataclass, asdict
+from typing import Dict, Any, List, Optional, Tuple
+
+from sqlalchemy import create_engine, exc
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+from ..config.settings import get_settings, Settings
+from . import instrumentation
+
+logger = logging.getLogger(__name__)
+
+# Drivers async equivalentes a cada backend
+ASYNC_DRIVERS = {
+    "mysql": "aiomysql",
+    "sqlite": "aiosqlite",
+}
+
+# Fracción del presupuesto de cada worker reservada al engine síncrono
+# (arranque, init_db y routers que aún usan Session)
+SYNC_POOL_SHARE = 0.25
+
+
+@dataclass
+class PoolWaitStats:
+    """Esperas por una conexión libre en un pool"""
+    waits: int = 0
+    timeouts: int = 0
+    wait_seconds: float = 0.0
+
+
+class _WaitTrackingPoolMixin:
+    """Cuenta los checkouts que tuvieron que esperar porque el pool estaba agotado"""
+
+    @property
+    def wait_stats(self) -> PoolWaitStats:
+        stats = getattr(self, "_wait_stats", None)
+        if stats is None:
+            stats = self._wait_stats = PoolWaitStats()
+        return stats
+
+    def _do_get(self):
+        if self.checkedout() < self.size() + max(self._max_overflow, 0):
+            return super()._do_get()
+
+        stats = self.wait_stats
+        stats.waits += 1
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            stats.timeouts += 1
+            raise
+        finally:
+            stats.wait_seconds += time.perf_counter() - start
+
+
+class TrackedQueuePool(_WaitTrackingPoolMixin, QueuePool):
+    pass
+
+
+class TrackedAsyncQueuePool(_WaitTrackingPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+class EngineRegistry:
+    """
+    Registro de engines (sync y async) por URL con nombre lógico.
+    Los engines se crean de forma perezosa y se reutilizan en todo el proceso.
+    """
+
+    def __init__(self, settings: Optional[Settings] = None):
+        self.settings = settings or get_settings()
+        self._urls = {"primary": self.settings.database.connection_string}
+        for index, url in enumerate(self.settings.database.replica_connection_strings):
+            self._urls[f"replica_{index}"] = url
+        self._engines: Dict[str, Engine] = {}
+        self._async_engines: Dict[str, AsyncEngine] = {}
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Presupuesto de conexiones
+    # ------------------------------------------------------------------
+
+    def worker_budget(self) -> int:
+        """Conexiones permitidas por worker contra cada servidor"""
+        db = self.settings.database
+        return max(2, db.max_connections // max(db.workers, 1))
+
+    def pool_limits(self, is_async: bool) -> Tuple[int, int]:
+        """(pool_size, max_overflow) para un engine, respetando el presupuesto"""
+        db = self.settings.database
+        budget = self.worker_budget()
+        sync_limit = max(1, math.floor(budget * SYNC_POOL_SHARE))
+        limit = max(1, budget - sync_limit) if is_async else sync_limit
+
+        pool_size = db.pool_size if db.pool_size is not None else max(1, math.ceil(limit / 2))
+        max_overflow = db.max_overflow if db.max_overflow is not None else limit - pool_size
+        return pool_size, max(max_overflow, 0)
+
+    def _engine_options(self, url, is_async: bool) -> Dict[str, Any]:
+        """Opciones del engine según el backend (SQLite no admite pool ni connect_args de MySQL)"""
+        db = self.settings.database
+        options = {"echo": self.settings.debug, "pool_pre_ping": True}
+        if url.get_backend_name() == "sqlite":
+            return options
+
+        pool_size, max_overflow = self.pool_limits(is_async)
+        options.update(
+            poolclass=TrackedAsyncQueuePool if is_async else TrackedQueuePool,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=db.pool_timeout,
+            pool_recycle=db.pool_recycle
+        )
+        if is_async:
+            options["connect_args"] = {"charset": "utf8mb4"}
+        else:
+            options["connect_args"] = {
+                "autocommit": False,
+                "use_unicode": True,
+                "charset": "utf8mb4"
+            }
+        return options
+
+    # ------------------------------------------------------------------
+    # Engines
+    # ------------------------------------------------------------------
+
+    def replica_names(self) -> List[str]:
+        """Nombres lógicos de las réplicas configuradas"""
+        return [name for name in self._urls if name != "primary"]
+
+    def url(self, name: str = "primary"):
+        return make_url(self._urls[name])
+
+    def async_url(self, name: str = "primary"):
+        """URL con el driver async correspondiente"""
+        url = self.url(name)
+        backend = url.get_backend_name()
+        if backend not in ASYNC_DRIVERS:
+            raise RuntimeError(f"No async driver configured for database backend '{backend}'")
+        return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+    def get_engine(self, name: str = "primary") -> Engine:
+        """Engine síncrono (lazy)"""
+        engine = self._engines.get(name)
+        if engine is None:
+            with self._lock:
+                engine = self._engines.get(name)
+                if engine is None:
+                    url = self.url(name)
+                    logger.info(f"🔗 Creating database engine '{name}' ({url.render_as_string(hide_password=True)})")
+                    engine = create_engine(url, **self._engine_options(url, is_async=False))
+                    instrumentation.install(engine, self.settings.database.slow_query_ms)
+                    self._engines[name] = engine
+        return engine
+
+    def get_async_engine(self, name: str = "primary") -> AsyncEngine:
+        """AsyncEngine (lazy)"""
+        engine = self._async_engines.get(name)
+        if engine is None:
+            with self._lock:
+                engine = self._async_engines.get(name)
+                if engine is None:
+                    url = self.async_url(name)
+                    logger.info(f"🔗 Creating async database engine '{name}' ({url.render_as_string(hide_password=True)})")
+                    engine = create_async_engine(url, **self._engine_options(url, is_async=True))
+                    instrumentation.install(engine.sync_engine, self.settings.database.slow_query_ms)
+                    self._async_engines[name] = engine
+        return engine
+
+    # ------------------------------------------------------------------
+    # Estado y cierre
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _pool_status(pool) -> Dict[str, Any]:
+        if not isinstance(pool, QueuePool):
+            return {"pool": type(pool).__name__, "status": pool.status()}
+        status = {
+            "pool": type(pool).__name__,
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": pool._max_overflow,
+        }
+        if isinstance(pool, _WaitTrackingPoolMixin):
+            status.update(asdict(pool.wait_stats))
+        return status
+
+    def status(self) -> Dict[str, Any]:
+        """Estado de todos los pools creados en este proceso"""
+        db = self.settings.database
+        engines = {}
+        for name, engine in self._engines.items():
+            engines[f"{name}:sync"] = self._pool_status(engine.pool)
+        for name, engine in self._async_engines.items():
+            engines[f"{name}:async"] = self._pool_status(engine.pool)
+        return {
+            "max_connections_per_node": db.max_connections,
+            "workers": db.workers,
+            "worker_budget": self.worker_budget(),
+            "engines": engines
+        }
+
+    async def dispose(self):
+        """Cerrar todos los pools (shutdown)"""
+        for engine in list(self._async_engines.values()):
+            await engine.dispose()
+        for engine in list(self._engines.values()):
+            engine.dispose()
+        self._async_engines.clear()
+        self._engines.clear()
+
+
+_registry: Optional[EngineRegistry] = None
+
+
+def get_engine_registry() -> EngineRegistry:
+    """Registro compartido del proceso (lazy)"""
+    global _registry
+    if _registry is None:
+        _registry = EngineRegistry()
+    return _registry
+
+
+def set_engine_registry(registry: Optional[EngineRegistry]):
+    """Sustituir el registro del proceso (tests y scripts)"""
+    global _registry
+    _registry = registry
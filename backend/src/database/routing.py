@@ -0,0 +1,148 @@
+"""
+Read-replica routing
+Session que envía las transacciones de solo lectura a una réplica sana y
+mantiene en el primario todo lo que escribe (y lo que se lee después).
+
+Uso:
+    session.info["read_only"] = True   # lo hace get_async_read_db()
+
+Reglas:
+- Una sesión que hace flush, ejecuta DML o tiene cambios pendientes queda
+  fijada al primario hasta que se cierre.
+- Tras el commit de una escritura, las sesiones de lectura de este proceso
+  siguen yendo al primario durante `replica_read_after_write_seconds`.
+- Si la réplica no pasa el ping, se usa el primario y no se vuelve a probar
+  hasta pasado `replica_health_ttl`.
+- En sesiones async el ping (síncrono) solo se puede hacer dentro del puente
+  greenlet, al ejecutar una sentencia. Un get_bind() desde código async (p. ej.
+  `db.get_bind().dialect`) usa el estado en caché y, si no lo hay, devuelve el
+  primario sin fijarlo en la sesión ni marcar la réplica como caída.
+"""
+import itertools
+import logging
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import TextClause
+from sqlalchemy.util.concurrency import in_greenlet
+
+from .registry import EngineRegistry
+
+logger = logging.getLogger(__name__)
+
+
+# Sentencias textuales que se consideran escrituras
+WRITE_KEYWORDS = {"INSERT", "UPDATE", "DELETE", "REPLACE", "MERGE", "CREATE", "ALTER", "DROP", "TRUNCATE"}
+
+
+def is_write_statement(clause) -> bool:
+    """DML de SQLAlchemy (insert/update/delete) o text() que empieza por una palabra de escritura"""
+    if getattr(clause, "is_dml", False):
+        return True
+    if isinstance(clause, TextClause):
+        words = clause.text.split(None, 1)
+        return bool(words) and words[0].upper() in WRITE_KEYWORDS
+    return False
+
+
+class ReplicaRouter:
+    """Elige engine (primario o réplica) para un tipo de sesión (sync o async)"""
+
+    def __init__(self, registry: EngineRegistry, is_async: bool):
+        self.registry = registry
+        self.is_async = is_async
+        self._replicas = registry.replica_names()
+        self._round_robin = itertools.cycle(self._replicas) if self._replicas else None
+        self._health: Dict[str, Tuple[bool, float]] = {}
+        self._lock = threading.Lock()
+        self._last_write_at = 0.0
+
+    def engine(self, name: str):
+        if self.is_async:
+            return self.registry.get_async_engine(name).sync_engine
+        return self.registry.get_engine(name)
+
+    @property
+    def primary(self):
+        return self.engine("primary")
+
+    def record_write(self):
+        self._last_write_at = time.monotonic()
+
+    def _recently_written(self) -> bool:
+        window = self.registry.settings.database.replica_read_after_write_seconds
+        return time.monotonic() - self._last_write_at < window
+
+    def can_ping(self) -> bool:
+        """Los engines async solo se pueden usar de forma síncrona dentro del puente greenlet"""
+        return not self.is_async or in_greenlet()
+
+    def is_healthy(self, name: str) -> Optional[bool]:
+        """Ping (con caché) de una réplica; pool_pre_ping valida la conexión al hacer checkout.
+        None si no hay estado en caché y ahora no se puede hacer el ping"""
+        ttl = self.registry.settings.database.replica_health_ttl
+        now = time.monotonic()
+        state = self._health.get(name)
+        if state is not None and now - state[1] < ttl:
+            return state[0]
+        if not self.can_ping():
+            return None
+
+        try:
+            with self.engine(name).connect() as conn:
+                conn.exec_driver_sql("SELECT 1")
+            healthy = True
+        except Exception as e:
+            logger.warning(f"Replica '{name}' failed its health check, using primary: {e}")
+            healthy = False
+        self._health[name] = (healthy, now)
+        return healthy
+
+    def pick_replica(self) -> Optional[str]:
+        """Siguiente réplica sana (round robin) o None"""
+        if self._round_robin is None or self._recently_written():
+            return None
+        for _ in range(len(self._replicas)):
+            with self._lock:
+                name = next(self._round_robin)
+            if self.is_healthy(name):
+                return name
+        return None
+
+    def status(self) -> Dict[str, Optional[bool]]:
+        return {name: self._health.get(name, (None, 0))[0] for name in self._replicas}
+
+
+class RoutingSession(Session):
+    """Session con get_bind consciente de réplicas (el router llega en session.info)"""
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        router: Optional[ReplicaRouter] = self.info.get("router")
+        if router is None:
+            return super().get_bind(mapper=mapper, clause=clause, **kw)
+
+        if self._flushing or self.new or self.dirty or self.deleted or is_write_statement(clause):
+            self.info["wrote"] = True
+
+        if self.info.get("read_only") and not self.info.get("wrote"):
+            replica = self.info.get("replica")
+            if replica is None:
+                replica = router.pick_replica()
+                if replica is None and not router.can_ping():
+                    # Fuera del puente greenlet (sin ping posible): primario solo para esta llamada
+                    return router.primary
+                # La réplica se fija para toda la sesión para leer un snapshot coherente
+                replica = self.info["replica"] = replica or "primary"
+            return router.engine(replica)
+
+        return router.primary
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _remember_write(session):
+    router = session.info.get("router")
+    if router is not None and session.info.get("wrote"):
+        router.record_write()
@@ -0,0 +1,233 @@
+"""
+Full-text search
+Índices de texto completo creados por migración y la condición WHERE que los usa:
+
+- MySQL: índice FULLTEXT con el parser ngram, consultado con
+  MATCH ... AGAINST en modo booleano (cada palabra como frase obligatoria,
+  lo que equivale a buscar la subcadena).
+- SQLite (tests/desarrollo): tabla FTS5 con tokenizador trigram y contenido
+  externo, mantenida por triggers.
+
+Las palabras más cortas que el n-grama (o un backend sin índice) usan ILIKE.
+`ranked_search` permite además ordenar por relevancia (MATCH ... AGAINST /
+bm25) o por clave descendente sin ordenar todas las coincidencias.
+
+Nota MySQL: el parser ngram descarta los n-gramas que contienen una stopword
+(p. ej. "a"), así que conviene innodb_ft_enable_stopword=OFF en el servidor.
+"""
+import logging
+from dataclasses import dataclass
+from typing import Any, List, Optional, Set, Tuple
+
+from sqlalchemy import and_, column, inspect, literal_column, or_, select, table
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.engine import Connection
+
+from .migrations import migration
+from .models import MailMessage, User
+
+logger = logging.getLogger(__name__)
+
+# Longitud mínima de palabra que puede resolver el índice (tamaño del n-grama)
+MIN_TERM_LENGTH = {"mysql": 2, "sqlite": 3}
+
+# Índices creados/verificados por la migración en este proceso
+_available: Set[str] = set()
+
+
+@dataclass(frozen=True)
+class FullTextIndex:
+    """Índice de texto completo sobre varias columnas de una tabla"""
+    name: str
+    table: object
+    columns: Tuple[str, ...]
+    key: str = "id"
+
+    @property
+    def fts_table(self) -> str:
+        return f"{self.table.name}_fts"
+
+    def column(self, name: str):
+        return self.table.c[name]
+
+
+def _create_mysql(conn: Connection, index: FullTextIndex):
+    for existing in inspect(conn).get_indexes(index.table.name):
+        if existing["name"] == index.name or (
+            existing.get("type") == "FULLTEXT" and tuple(existing["column_names"]) == index.columns
+        ):
+            return
+    logger.info(f"🛠️ Creating FULLTEXT index {index.name} on {index.table.name}{index.columns}")
+    conn.exec_driver_sql(
+        f"ALTER TABLE {index.table.name} ADD FULLTEXT INDEX {index.name} "
+        f"({', '.join(index.columns)}) WITH PARSER ngram"
+    )
+
+
+def _create_sqlite(conn: Connection, index: FullTextIndex):
+    fts, source, key = index.fts_table, index.table.name, index.key
+    columns = ", ".join(index.columns)
+    new_values = ", ".join(f"new.{name}" for name in index.columns)
+    old_values = ", ".join(f"old.{name}" for name in index.columns)
+
+    exists = conn.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (fts,)
+    ).first()
+    if not exists:
+        logger.info(f"🛠️ Creating FTS5 table {fts} for {source}{index.columns}")
+        conn.exec_driver_sql(
+            f"CREATE VIRTUAL TABLE {fts} USING fts5({columns}, "
+            f"content='{source}', content_rowid='{key}', tokenize='trigram')"
+        )
+
+    # Contenido externo: los triggers mantienen el índice al día. El UPDATE solo
+    # se dispara con cambios en columnas indexadas (no con last_login, etc.)
+    conn.exec_driver_sql(
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {source} BEGIN "
+        f"INSERT INTO {fts}(rowid, {columns}) VALUES (new.{key}, {new_values}); END"
+    )
+    conn.exec_driver_sql(
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {source} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.{key}, {old_values}); END"
+    )
+    conn.exec_driver_sql(
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {columns} ON {source} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.{key}, {old_values}); "
+        f"INSERT INTO {fts}(rowid, {columns}) VALUES (new.{key}, {new_values}); END"
+    )
+
+    if not exists:
+        # Indexar las filas que ya había
+        conn.exec_driver_sql(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def register_fulltext(index: FullTextIndex) -> FullTextIndex:
+    """Registrar la migración que crea el índice en el backend actual"""
+
+    @migration(f"fulltext:{index.name}")
+    def _create(conn: Connection):
+        dialect_name = conn.dialect.name
+        try:
+            if dialect_name == "mysql":
+                _create_mysql(conn, index)
+            elif dialect_name == "sqlite":
+                _create_sqlite(conn, index)
+            else:
+                return
+            _available.add(index.name)
+        except Exception as e:
+            logger.warning(f"Full-text index {index.name} unavailable, searches will use ILIKE: {e}")
+
+    return index
+
+
+def search_terms(text: str) -> List[str]:
+    """Palabras de la búsqueda, sin comillas ni operadores booleanos"""
+    cleaned = "".join(" " if char in '"+-*<>()~@' else char for char in text)
+    return [word for word in cleaned.split() if word]
+
+
+def _ilike(index: FullTextIndex, word: str):
+    return or_(*(index.column(name).ilike(f"%{word}%") for name in index.columns))
+
+
+def _split_terms(index: FullTextIndex, text: str, dialect_name: str) -> Tuple[List[str], List[str]]:
+    """(palabras que resuelve el índice, palabras que necesitan ILIKE)"""
+    words = search_terms(text)
+    min_length = MIN_TERM_LENGTH.get(dialect_name)
+    indexed = [word for word in words if index.name in _available and min_length and len(word) >= min_length]
+    return indexed, [word for word in words if word not in indexed]
+
+
+def _mysql_match(index: FullTextIndex, words: List[str]):
+    against = " ".join(f'+"{word}"' for word in words)
+    return match(*(index.column(name) for name in index.columns), against=against).in_boolean_mode()
+
+
+def _fts_query(words: List[str]) -> str:
+    return " ".join('"' + word.replace('"', '""') + '"' for word in words)
+
+
+def search_condition(index: FullTextIndex, text: str, dialect_name: str):
+    """
+    Condición WHERE: cada palabra debe aparecer (como subcadena) en alguna de
+    las columnas del índice. None si no hay nada que buscar.
+    """
+    indexed, unindexed = _split_terms(index, text, dialect_name)
+    if not indexed and not unindexed:
+        return None
+
+    clauses = [_ilike(index, word) for word in unindexed]
+    if indexed and dialect_name == "mysql":
+        clauses.append(_mysql_match(index, indexed))
+    elif indexed:
+        fts = table(index.fts_table, column("rowid"))
+        clauses.append(index.column(index.key).in_(
+            select(fts.c.rowid).where(literal_column(index.fts_table).op("MATCH")(_fts_query(indexed)))
+        ))
+
+    return and_(*clauses)
+
+
+@dataclass
+class RankedSearch:
+    """Búsqueda con orden: aplicar con `apply(query)` y ordenar por
+    `relevance` (mejor primero) o `latest` (clave descendente)"""
+    condition: Any = None           # WHERE
+    relevance: Any = None           # None si ninguna palabra usa el índice
+    latest: Any = None
+    fts: Any = None                 # SQLite: tabla FTS5 a unir por rowid = clave
+    key: Any = None
+
+    def apply(self, query):
+        if self.fts is not None:
+            query = query.join(self.fts, self.fts.c.rowid == self.key)
+        if self.condition is not None:
+            query = query.where(self.condition)
+        return query
+
+
+def ranked_search(index: FullTextIndex, text: str, dialect_name: str) -> Optional[RankedSearch]:
+    """
+    Como search_condition, con dos órdenes posibles:
+
+    - relevance: MATCH ... AGAINST en MySQL, bm25() en SQLite. Calcula la
+      puntuación de todas las coincidencias antes de ordenar.
+    - latest: clave descendente. En SQLite se ordena por el rowid de la tabla
+      FTS5, que recorre el índice ya en ese orden y para en el LIMIT.
+
+    None si no hay nada que buscar.
+    """
+    indexed, unindexed = _split_terms(index, text, dialect_name)
+    if not indexed and not unindexed:
+        return None
+
+    clauses = [_ilike(index, word) for word in unindexed]
+    ranked = RankedSearch(latest=index.column(index.key).desc())
+    if indexed and dialect_name == "mysql":
+        relevance = _mysql_match(index, indexed)
+        clauses.append(relevance)
+        ranked.relevance = relevance.desc()
+    elif indexed:
+        ranked.fts = table(index.fts_table, column("rowid"))
+        ranked.key = index.column(index.key)
+        clauses.append(literal_column(index.fts_table).op("MATCH")(_fts_query(indexed)))
+        # bm25() es negativo: cuanto menor, más relevante
+        ranked.relevance = literal_column(f"bm25({index.fts_table})").asc()
+        ranked.latest = ranked.fts.c.rowid.desc()
+
+    ranked.condition = and_(*clauses)
+    return ranked
+
+
+USER_SEARCH = register_fulltext(FullTextIndex(
+    name="ft_users_search",
+    table=User.__table__,
+    columns=("username", "email", "first_name", "last_name"),
+))
+
+MAIL_MESSAGE_SEARCH = register_fulltext(FullTextIndex(
+    name="ft_mail_messages_search",
+    table=MailMessage.__table__,
+    columns=("subject", "from_name", "from_email", "snippet", "body_text"),
+))
@@ -1,37 +1,21 @@
 """
 Database Connection and Session Management
 """
-from sqlalchemy import create_engine, MetaData
+from sqlalchemy import MetaData
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.pool import QueuePool
 from typing import Generator
 import logging
-from ...config.settings import get_settings
+from ...database.registry import get_engine_registry
 
 logger = logging.getLogger(__name__)
 
 # Global variables for lazy initialization
-_engine = None
 _SessionLocal = None
 
 def get_engine():
-    """Get or create SQLAlchemy engine (lazy initialization)"""
-    global _engine
-    if _engine is None:
-        # Get settings fresh each time to ensure production config is applied
-        settings = get_settings()
-        logger.info(f"🔗 Creating database engine with connection string: {settings.database.connection_string}")
-        _engine = create_engine(
-            settings.database.connection_string,
-            poolclass=QueuePool,
-            pool_size=10,
-            max_overflow=20,
-            pool_pre_ping=True,
-            pool_recycle=3600,
-            echo=settings.debug  # Log SQL queries in debug mode
-        )
-    return _engine
+    """Get the shared SQLAlchemy engine (same registry as src/database/connection.py)"""
+    return get_engine_registry().get_engine()
 
 def get_session_local():
     """Get or create session factory (lazy initialization)"""
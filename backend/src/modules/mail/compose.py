@@ -0,0 +1,115 @@
+"""
+Outgoing MIME
+Serializa un mensaje saliente directamente en un fichero (el de la cola de
+envío) sin construir el árbol email.mime en memoria:
+
+- Los adjuntos se leen del fichero de la subida (UploadFile.file, que
+  Starlette ya guarda en disco a partir de 1 MB) por bloques y se codifican
+  en base64 bloque a bloque: la memoria no depende del tamaño del adjunto.
+- Texto y HTML van en base64 utf-8, como hacía MIMEText.
+- Las cabeceras se pliegan y codifican (RFC 2047 / RFC 2231) con el módulo
+  email, con la misma política (compat32) que usaba `as_bytes()`.
+
+La función es síncrona (E/S de ficheros): desde el loop, en un hilo.
+"""
+import base64
+import io
+import uuid
+from dataclasses import dataclass
+from email.message import Message
+from email.policy import compat32
+from typing import BinaryIO, List, Sequence, Tuple
+
+_POLICY = compat32.clone(linesep="\r\n")
+
+CHUNK_SIZE = 57 * 1152  # ~64 KB; múltiplo de 57 = líneas completas de 76 caracteres
+
+Headers = List[Tuple[str, str]]
+
+
+@dataclass
+class OutgoingAttachment:
+    filename: str
+    content_type: str
+    file: BinaryIO
+
+
+def _boundary() -> str:
+    # "=_" no puede aparecer al principio de una línea base64
+    return f"=_{uuid.uuid4().hex}"
+
+
+def _write_headers(handle: BinaryIO, headers: Headers):
+    for name, value in headers:
+        handle.write(_POLICY.fold_binary(name, value))
+    handle.write(b"\r\n")
+
+
+def _write_base64(handle: BinaryIO, source: BinaryIO):
+    """Codificar `source` por bloques; el cuerpo siempre acaba en CRLF"""
+    pending, written = b"", False
+    while True:
+        data = source.read(CHUNK_SIZE)
+        if not data:
+            break
+        data = pending + data
+        cut = len(data) - len(data) % 57
+        pending = data[cut:]
+        if cut:
+            handle.write(base64.encodebytes(data[:cut]).replace(b"\n", b"\r\n"))
+            written = True
+    if pending:
+        handle.write(base64.encodebytes(pending).replace(b"\n", b"\r\n"))
+    elif not written:
+        handle.write(b"\r\n")
+
+
+def _write_text(handle: BinaryIO, headers: Headers, subtype: str, text: str):
+    _write_headers(handle, headers + [
+        ("Content-Type", f'text/{subtype}; charset="utf-8"'),
+        ("Content-Transfer-Encoding", "base64"),
+    ])
+    _write_base64(handle, io.BytesIO(text.encode("utf-8")))
+
+
+def _write_content(handle: BinaryIO, headers: Headers, text: str, html: str):
+    if not html:
+        _write_text(handle, headers, "plain", text)
+        return
+    boundary = _boundary()
+    _write_headers(handle, headers + [("Content-Type", f'multipart/alternative; boundary="{boundary}"')])
+    for subtype, value in (("plain", text), ("html", html)):
+        handle.write(f"--{boundary}\r\n".encode("ascii"))
+        _write_text(handle, [], subtype, value)
+    handle.write(f"--{boundary}--\r\n".encode("ascii"))
+
+
+def _write_attachment(handle: BinaryIO, attachment: OutgoingAttachment):
+    maintype, _, subtype = (attachment.content_type or "").partition("/")
+    part = Message()
+    part.add_header("Content-Type", f"{maintype}/{subtype}" if maintype and subtype else "application/octet-stream")
+    part.add_header("Content-Transfer-Encoding", "base64")
+    part.add_header("Content-Disposition", "attachment", filename=attachment.filename)
+    _write_headers(handle, part.items())
+    attachment.file.seek(0)
+    _write_base64(handle, attachment.file)
+
+
+def write_message(handle: BinaryIO, headers: Headers, text: str, html: str = "",
+                  attachments: Sequence[OutgoingAttachment] = ()):
+    """Mensaje RFC 5322 completo (CRLF) en `handle`
+
+    `headers` son las cabeceras de primer nivel (From, To, Subject...); las
+    de MIME las añade la función."""
+    headers = list(headers) + [("MIME-Version", "1.0")]
+    if not attachments:
+        _write_content(handle, headers, text, html)
+        return
+    boundary = _boundary()
+    _write_headers(handle, headers + [("Content-Type", f'multipart/mixed; boundary="{boundary}"')])
+    handle.write(f"--{boundary}\r\n".encode("ascii"))
+    _write_content(handle, [], text, html)
+    for attachment in attachments:
+        handle.write(f"--{boundary}\r\n".encode("ascii"))
+        _write_attachment(handle, attachment)
+    handle.write(f"--{boundary}--\r\n".encode("ascii"))
@@ -0,0 +1,251 @@
+"""
+Mail counters
+Contadores de mensajes (total / no leídos) de mail_folders y mail_accounts
+mantenidos al vuelo, en la misma transacción que el cambio que los mueve:
+
+- Mensajes nuevos, cambios de flags y borrados de la sincronización (que
+  incluyen los mensajes movidos o expulsados en el servidor) suman o restan
+  con UPDATE ... SET n = n + :delta, sin COUNT sobre mail_messages.
+- No leído: ni is_read ni is_deleted (el criterio del COUNT que sustituyen).
+- Las carpetas aún sin sincronizar (uid_validity NULL) no tienen filas
+  locales: sus contadores son los de STATUS (folder_status.py).
+- CounterReconciler recalcula cada `interval` segundos los contadores con un
+  GROUP BY por cuenta y corrige la deriva que encuentre (cambios hechos a
+  mano en la base, un proceso cortado...). Reserva la cuenta como una
+  sincronización (sync.py) para no pisar una en curso, en este proceso o en
+  otro; si la tiene otro proceso, la cuenta se salta en esa pasada.
+
+GET /api/mail/accounts y /folders solo leen las columnas.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from sqlalchemy import bindparam, case, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...config.settings import get_settings
+from ...database.connection import get_async_session_local
+from ...database.models import MailAccount, MailFolder, MailMessage
+
+logger = logging.getLogger(__name__)
+
+UNREAD = (MailMessage.is_read.isnot(True)) & (MailMessage.is_deleted.isnot(True))
+
+
+def is_unread(row: Mapping[str, Any]) -> bool:
+    return not row.get("is_read") and not row.get("is_deleted")
+
+
+def unread_sum():
+    """SUM de no leídos para un SELECT agrupado sobre mail_messages"""
+    return func.coalesce(func.sum(case((UNREAD, 1), else_=0)), 0)
+
+
+class CounterDeltas:
+    """Cambios de contadores por carpeta pendientes de aplicar: (cuenta, carpeta) -> [total, no leídos]"""
+
+    def __init__(self):
+        self.folders: Dict[Tuple[int, int], List[int]] = {}
+
+    def __bool__(self) -> bool:
+        return any(total or unread for total, unread in self.folders.values())
+
+    def add(self, account_id: int, folder_id: int, total: int = 0, unread: int = 0):
+        if total or unread:
+            delta = self.folders.setdefault((account_id, folder_id), [0, 0])
+            delta[0] += total
+            delta[1] += unread
+
+    def add_rows(self, rows: Iterable[Mapping[str, Any]], sign: int = 1):
+        """Filas de mail_messages insertadas (sign=1) o borradas (sign=-1)"""
+        for row in rows:
+            self.add(row["account_id"], row["folder_id"], sign, sign if is_unread(row) else 0)
+
+    async def apply(self, db: AsyncSession) -> bool:
+        """UPDATE de las carpetas y cuentas afectadas, sin commit. Devuelve si había cambios"""
+        folder_params = [
+            {"_id": folder_id, "_total": total, "_unread": unread}
+            for (_, folder_id), (total, unread) in self.folders.items() if total or unread
+        ]
+        accounts: Dict[int, List[int]] = {}
+        for (account_id, _), (total, unread) in self.folders.items():
+            delta = accounts.setdefault(account_id, [0, 0])
+            delta[0] += total
+            delta[1] += unread
+        account_params = [
+            {"_id": account_id, "_total": total, "_unread": unread}
+            for account_id, (total, unread) in accounts.items() if total or unread
+        ]
+        self.folders = {}
+        # Mismo orden siempre (carpetas y después cuentas, por id): sin interbloqueos entre transacciones
+        for table, params in ((MailFolder.__table__, folder_params), (MailAccount.__table__, account_params)):
+            if params:
+                await db.execute(
+                    update(table).where(table.c.id == bindparam("_id")).values(
+                        total_count=func.coalesce(table.c.total_count, 0) + bindparam("_total"),
+                        unread_count=func.coalesce(table.c.unread_count, 0) + bindparam("_unread"),
+                    ),
+                    sorted(params, key=lambda param: param["_id"]),
+                )
+        return bool(folder_params)
+
+
+async def release_folder(db: AsyncSession, account_id: int, folder_id: int):
+    """Restar de la cuenta lo que aún cuente una carpeta que se va a borrar (sin commit)"""
+    row = (await db.execute(
+        select(MailFolder.total_count, MailFolder.unread_count).where(MailFolder.id == folder_id)
+    )).first()
+    if row is not None:
+        deltas = CounterDeltas()
+        deltas.add(account_id, folder_id, -(row.total_count or 0), -(row.unread_count or 0))
+        await deltas.apply(db)
+
+
+async def reconcile_account(db: AsyncSession, account_id: int) -> Tuple[int, int, int]:
+    """Recalcular los contadores de la cuenta desde mail_messages y corregir los
+    que no cuadren (con commit). Devuelve (carpetas corregidas, cuenta corregida 0/1, deriva)"""
+    actual = {
+        folder_id: (int(total), int(unread))
+        for folder_id, total, unread in (await db.execute(
+            select(MailMessage.folder_id, func.count(MailMessage.id), unread_sum())
+            .where(MailMessage.account_id == account_id)
+            .group_by(MailMessage.folder_id)
+        )).all()
+    }
+    folders = (await db.execute(
+        select(MailFolder.id, MailFolder.uid_validity, MailFolder.total_count, MailFolder.unread_count)
+        .where(MailFolder.account_id == account_id)
+        .order_by(MailFolder.id)
+    )).all()
+
+    fixes, drift = [], 0
+    for folder in folders:
+        if folder.uid_validity is None and folder.id not in actual:
+            continue  # contadores de STATUS
+        total, unread = actual.get(folder.id, (0, 0))
+        if (folder.total_count or 0, folder.unread_count or 0) != (total, unread):
+            drift += abs((folder.total_count or 0) - total) + abs((folder.unread_count or 0) - unread)
+            fixes.append({"_id": folder.id, "_total": total, "_unread": unread})
+    table = MailFolder.__table__
+    if fixes:
+        await db.execute(
+            update(table).where(table.c.id == bindparam("_id"))
+            .values(total_count=bindparam("_total"), unread_count=bindparam("_unread")),
+            fixes,
+        )
+
+    # La cuenta suma sus carpetas (también las que aún no se han sincronizado)
+    totals = (await db.execute(
+        select(func.coalesce(func.sum(MailFolder.total_count), 0), func.coalesce(func.sum(MailFolder.unread_count), 0))
+        .where(MailFolder.account_id == account_id)
+    )).one()
+    account = (await db.execute(
+        select(MailAccount.total_count, MailAccount.unread_count).where(MailAccount.id == account_id)
+    )).first()
+    account_fixed = 0
+    if account is not None and (account.total_count or 0, account.unread_count or 0) != (int(totals[0]), int(totals[1])):
+        drift += abs((account.total_count or 0) - int(totals[0])) + abs((account.unread_count or 0) - int(totals[1]))
+        await db.execute(
+            update(MailAccount).where(MailAccount.id == account_id)
+            .values(total_count=int(totals[0]), unread_count=int(totals[1]))
+        )
+        account_fixed = 1
+    await db.commit()
+    return len(fixes), account_fixed, drift
+
+
+class CounterReconciler:
+    """Corrección periódica de la deriva de los contadores, cuenta a cuenta"""
+
+    def __init__(self, interval: int, pause: float = 0.05):
+        self.interval = interval
+        self.pause = pause
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.accounts_checked = 0
+        self.folders_fixed = 0
+        self.accounts_fixed = 0
+        self.last_drift = 0
+        self.last_run_at: Optional[datetime] = None
+        self.last_duration_ms = 0.0
+        self.errors = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def reconcile(self) -> int:
+        """Una pasada por todas las cuentas; devuelve la deriva corregida"""
+        from .sync import SyncBusy, mail_sync  # sync.py importa este módulo
+
+        start = time.perf_counter()
+        async with get_async_session_local()() as db:
+            account_ids = (await db.execute(select(MailAccount.id).order_by(MailAccount.id))).scalars().all()
+        drift = 0
+        for account_id in account_ids:
+            try:
+                async with mail_sync.claim(account_id):
+                    async with get_async_session_local()() as db:
+                        folders, account, account_drift = await reconcile_account(db, account_id)
+            except SyncBusy:
+                continue
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Counter reconciliation of account {account_id} failed: {e}")
+                continue
+            self.accounts_checked += 1
+            self.folders_fixed += folders
+            self.accounts_fixed += account
+            drift += account_drift
+            if account_drift:
+                logger.warning(f"Mail counters of account {account_id} drifted by {account_drift}, fixed")
+            await asyncio.sleep(self.pause)
+
+        self.runs += 1
+        self.last_drift = drift
+        self.last_run_at = datetime.utcnow()
+        self.last_duration_ms = (time.perf_counter() - start) * 1000
+        return drift
+
+    async def _run(self):
+        while True:
+            try:
+                await self.reconcile()
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Counter reconciliation failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self.running or self.interval <= 0:
+            return
+        self._task = asyncio.create_task(self._run(), name="mail-counter-reconciler")
+        logger.info(f"Mail counter reconciler started (every {self.interval}s)")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "runs": self.runs,
+            "accounts_checked": self.accounts_checked,
+            "folders_fixed": self.folders_fixed,
+            "accounts_fixed": self.accounts_fixed,
+            "last_drift": self.last_drift,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            "last_duration_ms": round(self.last_duration_ms, 2),
+            "errors": self.errors,
+        }
+
+
+counter_reconciler = CounterReconciler(interval=get_settings().mail.counters_reconcile_interval)
@@ -0,0 +1,165 @@
+"""
+IMAP ENVELOPE / BODYSTRUCTURE
+Datos de listado de un mensaje sin descargar su contenido:
+
+- ENVELOPE (RFC 3501 7.4.2): fecha, asunto, direcciones, In-Reply-To y
+  Message-ID ya analizados por el servidor.
+- BODYSTRUCTURE: árbol MIME con tipo, tamaño y disposición de cada parte;
+  basta para saber si hay adjuntos y qué sección pedir con BODY.PEEK[...].
+
+Los valores son los de `Response.values()` (listas, str, int, bytes, None).
+"""
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from email.header import decode_header, make_header
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from .imap_protocol import as_text
+
+# Una sola petición por página de listado: sin cuerpos ni cabeceras completas
+LIST_ITEMS = "(UID FLAGS INTERNALDATE RFC822.SIZE ENVELOPE BODYSTRUCTURE)"
+
+
+def decode_words(value: Any) -> str:
+    """Texto de una cabecera con palabras codificadas RFC 2047 (=?utf-8?B?...?=)"""
+    text = as_text(value) or ""
+    if "=?" not in text:
+        return text
+    try:
+        return str(make_header(decode_header(text)))
+    except Exception:  # codificación desconocida o mal formada: texto tal cual
+        return text
+
+
+def envelope_addresses(value: Any) -> List[Dict[str, str]]:
+    """Lista de direcciones ENVELOPE ((nombre ruta buzón dominio) ...) -> [{name, email}]"""
+    addresses = []
+    for address in value or []:
+        if not isinstance(address, list) or len(address) < 4:
+            continue
+        name, _, mailbox, host = address[:4]
+        # Sintaxis de grupo (RFC 3501): host NIL marca inicio/fin del grupo
+        if host is None:
+            continue
+        addresses.append({
+            "name": decode_words(name) if name else "",
+            "email": f"{as_text(mailbox)}@{as_text(host)}",
+        })
+    return addresses
+
+
+@dataclass
+class Envelope:
+    date: Optional[datetime] = None
+    subject: str = ""
+    from_: List[Dict[str, str]] = field(default_factory=list)
+    reply_to: List[Dict[str, str]] = field(default_factory=list)
+    to: List[Dict[str, str]] = field(default_factory=list)
+    cc: List[Dict[str, str]] = field(default_factory=list)
+    bcc: List[Dict[str, str]] = field(default_factory=list)
+    in_reply_to: Optional[str] = None
+    message_id: Optional[str] = None
+
+
+def _date(value: Any) -> Optional[datetime]:
+    text = as_text(value)
+    if not text:
+        return None
+    try:
+        parsed = parsedate_to_datetime(text)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def parse_envelope(value: Any) -> Envelope:
+    """(date subject from sender reply-to to cc bcc in-reply-to message-id)"""
+    if not isinstance(value, list) or len(value) < 10:
+        return Envelope()
+    return Envelope(
+        date=_date(value[0]),
+        subject=decode_words(value[1]),
+        from_=envelope_addresses(value[2]),
+        reply_to=envelope_addresses(value[4]),
+        to=envelope_addresses(value[5]),
+        cc=envelope_addresses(value[6]),
+        bcc=envelope_addresses(value[7]),
+        in_reply_to=as_text(value[8]),
+        message_id=as_text(value[9]),
+    )
+
+
+# BODYSTRUCTURE
+
+def _params(value: Any) -> Dict[str, str]:
+    """("CHARSET" "utf-8" "NAME" "a.pdf") -> {"CHARSET": "utf-8", "NAME": "a.pdf"}"""
+    if not isinstance(value, list):
+        return {}
+    return {str(value[i]).upper(): decode_words(value[i + 1]) for i in range(0, len(value) - 1, 2)}
+
+
+@dataclass
+class BodyPart:
+    section: str                     # "1", "2.1"... (BODY[<section>])
+    type: str                        # "text/plain"
+    params: Dict[str, str]
+    encoding: str
+    size: int
+    disposition: Optional[str] = None
+    disposition_params: Dict[str, str] = field(default_factory=dict)
+    content_id: Optional[str] = None
+
+    @property
+    def filename(self) -> Optional[str]:
+        return self.disposition_params.get("FILENAME") or self.params.get("NAME")
+
+    @property
+    def is_attachment(self) -> bool:
+        if self.disposition == "attachment":
+            return True
+        if self.disposition == "inline":
+            return False  # imágenes incrustadas en el HTML
+        return bool(self.filename) or self.type == "message/rfc822"
+
+
+def _single_part(value: List[Any], section: str) -> BodyPart:
+    main, sub = (as_text(value[0]) or "text").lower(), (as_text(value[1]) or "plain").lower()
+    kind = f"{main}/{sub}"
+    # Campos extra tras el tamaño: líneas (text/*) o envelope + body + líneas (message/rfc822)
+    extension = 8 if main == "text" else 10 if kind == "message/rfc822" else 7
+    disposition = value[extension + 1] if len(value) > extension + 1 else None
+    return BodyPart(
+        section=section,
+        type=kind,
+        params=_params(value[2]),
+        content_id=as_text(value[3]),
+        encoding=(as_text(value[5]) or "7bit").lower(),
+        size=value[6] if isinstance(value[6], int) else 0,
+        disposition=(as_text(disposition[0]) or "").lower() if isinstance(disposition, list) and disposition else None,
+        disposition_params=_params(disposition[1]) if isinstance(disposition, list) and len(disposition) > 1 else {},
+    )
+
+
+def walk_parts(value: Any, section: str = "") -> Iterator[BodyPart]:
+    """Partes hoja de un BODYSTRUCTURE con su número de sección"""
+    if not isinstance(value, list) or not value:
+        return
+    if isinstance(value[0], list):
+        # Multipart: (parte parte ... subtipo [extensiones])
+        index = 0
+        for child in value:
+            if not isinstance(child, list):
+                break
+            index += 1
+            yield from walk_parts(child, f"{section}.{index}" if section else str(index))
+        return
+    if len(value) >= 7:
+        yield _single_part(value, section or "1")
+
+
+def has_attachments(value: Any) -> bool:
+    return any(part.is_attachment for part in walk_parts(value))
+
@@ -0,0 +1,81 @@
+"""
+Mail events
+Notificaciones en proceso para el frontend (GET /api/mail/events, SSE): cada
+navegador conectado tiene una cola; la sincronización publica un evento
+`folder_changed` por carpeta que cambia y el cliente refresca solo esa
+carpeta en lugar de recargarlo todo.
+
+Las colas están acotadas: si un cliente no lee, se descartan sus eventos más
+antiguos (el siguiente evento de la carpeta lleva los contadores al día).
+
+El bus vive en memoria del proceso: un evento solo llega a los navegadores
+conectados al mismo worker que lo publica. Con varios workers de uvicorn
+(WEB_CONCURRENCY > 1) la sincronización del planificador, la cola de envío o
+un IDLE que encuentra la cuenta reservada por otro proceso (SyncBusy) pueden
+publicar en un worker distinto al del navegador, y ese aviso se pierde. Para
+avisos fiables hace falta un solo worker.
+"""
+import asyncio
+import logging
+from typing import Any, Callable, Dict, Optional, Set
+
+from ...config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+class MailEventBus:
+    """Suscriptores por usuario y publicación sin esperas (solo dentro del proceso)"""
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = {}
+        self.on_change: Optional[Callable[[], None]] = None  # alguien se conecta o desconecta
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        if self.on_change:
+            self.on_change()
+        return queue
+
+    def unsubscribe(self, user_id: int, queue: asyncio.Queue):
+        queues = self._subscribers.get(user_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[user_id]
+        if self.on_change:
+            self.on_change()
+
+    def users(self) -> Set[int]:
+        """Usuarios con al menos un navegador conectado"""
+        return set(self._subscribers)
+
+    def publish(self, user_id: int, event: Dict[str, Any]) -> int:
+        """Encolar `event` para los navegadores de `user_id`; devuelve a cuántos llega"""
+        self.published += 1
+        queues = self._subscribers.get(user_id, ())
+        for queue in queues:
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(event)
+        self.delivered += len(queues)
+        return len(queues)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "users": len(self._subscribers),
+            "subscribers": sum(len(queues) for queues in self._subscribers.values()),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+        }
+
+
+mail_events = MailEventBus(queue_size=get_settings().mail.events_queue_size)
@@ -0,0 +1,155 @@
+"""
+IMAP folder status
+Contadores de carpeta (total / no leídos) con STATUS en lugar de SELECT +
+SEARCH ALL + SEARCH UNSEEN por carpeta: SEARCH devuelve todos los números de
+mensaje, STATUS solo los contadores.
+
+- Con LIST-STATUS (RFC 5819) las carpetas y sus contadores llegan en un solo
+  comando; sin él, un STATUS por carpeta enviados en pipelining (un viaje).
+- Solo las carpetas aún sin sincronizar toman MESSAGES / UNSEEN de STATUS;
+  las sincronizadas ya llevan sus contadores al día (counters.py). El
+  resultado se reutiliza durante `ttl` segundos (MailFolder.status_checked_at).
+- UIDNEXT / UIDVALIDITY indican sin abrir la carpeta si hay algo pendiente
+  de sincronizar.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...config.settings import get_settings
+from ...database.models import MailAccount, MailFolder
+from .imap_client import ImapClient, MailboxInfo
+from .counters import CounterDeltas
+from .imap_pool import imap_pool
+from .sync import mail_sync
+from .transport import ConnectionSettings
+
+logger = logging.getLogger(__name__)
+
+STATUS_ITEMS = ("MESSAGES", "UNSEEN", "UIDNEXT", "UIDVALIDITY")
+
+
+def needs_sync(folder: MailFolder, status: Dict[str, Any]) -> bool:
+    """¿Tiene la carpeta mensajes nuevos o UIDVALIDITY distinto del sincronizado?"""
+    if not status:
+        return False
+    if folder.uid_validity is None or status.get("UIDVALIDITY") != folder.uid_validity:
+        return True
+    uidnext = status.get("UIDNEXT")
+    return isinstance(uidnext, int) and uidnext > (folder.last_seen_uid or 0) + 1
+
+
+async def list_with_status(imap: ImapClient) -> Tuple[List[MailboxInfo], Dict[str, Dict[str, Any]]]:
+    """LIST + contadores de las carpetas seleccionables"""
+    if await imap.has_capability("LIST-STATUS"):
+        return await imap.list_status(STATUS_ITEMS)
+    mailboxes = await imap.list()
+    return mailboxes, await imap.status_many([m.name for m in mailboxes if m.selectable], STATUS_ITEMS)
+
+
+async def read_status(imap: ImapClient, paths: List[str]) -> Dict[str, Dict[str, Any]]:
+    """STATUS de `paths` por el camino más barato que ofrezca el servidor"""
+    if await imap.has_capability("LIST-STATUS"):
+        _, statuses = await imap.list_status(STATUS_ITEMS)
+        return {path: statuses[path] for path in paths if path in statuses}
+    return await imap.status_many(paths, STATUS_ITEMS)
+
+
+class FolderStatusCache:
+    """Contadores de carpeta en mail_folders con caducidad (un refresco por cuenta a la vez)"""
+
+    def __init__(self, pool, ttl: int):
+        self.pool = pool
+        self.ttl = ttl
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._pending: Dict[int, Dict[str, bool]] = {}
+        self.hits = 0
+        self.refreshes = 0
+        self.folders_refreshed = 0
+
+    def _stale(self, folders: List[MailFolder], since: datetime) -> bool:
+        return any(
+            folder.is_selectable and (folder.status_checked_at is None or folder.status_checked_at < since)
+            for folder in folders
+        )
+
+    async def _load(self, db: AsyncSession, account: MailAccount) -> List[MailFolder]:
+        return list((await db.execute(
+            select(MailFolder).where(MailFolder.account_id == account.id).order_by(MailFolder.id)
+            .execution_options(populate_existing=True)
+        )).scalars())
+
+    def pending(self, account_id: int) -> Dict[str, bool]:
+        """Carpetas con cambios pendientes según el último STATUS (path -> bool)"""
+        return self._pending.get(account_id, {})
+
+    async def folders(self, db: AsyncSession, account: MailAccount, refresh: bool = False) -> List[MailFolder]:
+        """Carpetas de la cuenta con contadores de hace menos de `ttl` segundos
+        (refresh=True: posteriores a la llamada)"""
+        requested = datetime.utcnow()
+        since = requested if refresh else requested - timedelta(seconds=self.ttl)
+        folders = await self._load(db, account)
+        if folders and not self._stale(folders, since):
+            self.hits += 1
+            return folders
+
+        lock = self._locks.setdefault(account.id, asyncio.Lock())
+        async with lock:
+            # Otra petición pudo refrescar mientras esperábamos el lock
+            # (commit: cerrar la transacción para ver lo que ella guardó)
+            await db.commit()
+            folders = await self._load(db, account)
+            if folders and not self._stale(folders, since):
+                self.hits += 1
+                return folders
+
+            async with self.pool.session(ConnectionSettings.imap(account)) as imap:
+                if not folders:
+                    folders = await mail_sync.sync_folders(db, account, imap)
+                paths = [folder.path for folder in folders if folder.is_selectable]
+                statuses = await read_status(imap, paths)
+
+            now = datetime.utcnow()
+            pending = {}
+            deltas = CounterDeltas()
+            for folder in folders:
+                status = statuses.get(folder.path)
+                if not folder.is_selectable:
+                    continue
+                # También las que el servidor rechaza: no deben forzar un refresco en cada petición
+                folder.status_checked_at = now
+                if not status:
+                    continue
+                if folder.uid_validity is None:
+                    total, unread = status.get("MESSAGES"), status.get("UNSEEN")
+                    deltas.add(
+                        account.id, folder.id,
+                        total - (folder.total_count or 0) if isinstance(total, int) else 0,
+                        unread - (folder.unread_count or 0) if isinstance(unread, int) else 0,
+                    )
+                pending[folder.path] = needs_sync(folder, status)
+            changed = await deltas.apply(db)
+            await db.commit()
+            if changed:
+                folders = await self._load(db, account)
+                await db.refresh(account, ["total_count", "unread_count"])
+
+            self._pending[account.id] = pending
+            self.refreshes += 1
+            self.folders_refreshed += len(statuses)
+            return folders
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "refreshes": self.refreshes,
+            "folders_refreshed": self.folders_refreshed,
+        }
+
+
+folder_status = FolderStatusCache(pool=imap_pool, ttl=get_settings().mail.folder_status_ttl)
@@ -0,0 +1,253 @@
+"""
+IMAP IDLE listener
+Avisos de correo nuevo sin esperar al planificador: por cada cuenta activa de
+los usuarios conectados a /api/mail/events se mantiene una conexión propia
+(fuera del pool) con la INBOX seleccionada en IDLE (RFC 2177):
+
+- Cuando el servidor avisa (EXISTS, EXPUNGE, FETCH) se sincroniza solo la
+  INBOX con una sesión del pool y la sincronización publica el evento
+  `folder_changed` (ver sync.py).
+- IDLE se renueva cada `idle_timeout` segundos (los servidores lo cortan a
+  los 30 minutos).
+- Si el servidor no anuncia IDLE se hace NOOP cada `poll_interval` segundos
+  sobre la misma conexión.
+- Tras un fallo se reconecta con espera exponencial hasta `max_backoff`.
+- El listener sigue `linger` segundos después de que el usuario se desconecte
+  (recargas de página); las cuentas de usuarios sin navegador abierto las
+  cubre el planificador (scheduler.py).
+"""
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+from sqlalchemy import select
+
+from ...config.settings import get_settings
+from ...database.connection import get_async_session_local
+from ...database.models import MailAccount, MailFolder
+from .events import MailEventBus, mail_events
+from .imap_client import ImapClient
+from .sync import SyncBusy, mail_sync
+from .transport import ConnectionSettings
+
+logger = logging.getLogger(__name__)
+
+CHANGE_KINDS = {"EXISTS", "EXPUNGE", "FETCH"}
+
+
+@dataclass
+class _Listener:
+    wanted_at: float                 # última vez que el usuario tenía navegadores conectados
+    task: Optional[asyncio.Task] = None
+    mode: Optional[str] = None       # "idle" o "poll"
+    connected: bool = False
+    path: Optional[str] = None
+    notifications: int = 0
+    syncs: int = 0
+    failures: int = 0                # fallos seguidos
+    last_error: Optional[str] = None
+    last_event_at: Optional[float] = None
+
+
+class MailIdleManager:
+    """Un listener IDLE (o NOOP) por cuenta de los usuarios conectados"""
+
+    def __init__(self, bus: MailEventBus, idle_timeout: float, poll_interval: float, linger: float,
+                 max_accounts: int, max_backoff: float, connect_timeout: float, timeout: float,
+                 tick: float = 5.0, enabled: bool = True):
+        self.bus = bus
+        self.idle_timeout = idle_timeout
+        self.poll_interval = poll_interval
+        self.linger = linger
+        self.max_accounts = max_accounts
+        self.max_backoff = max_backoff
+        self.connect_timeout = connect_timeout
+        self.timeout = timeout
+        self.tick = tick
+        self._listeners: Dict[int, _Listener] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self.enabled = enabled
+        self.started = 0
+        self.stopped = 0
+        self.skipped = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def _load_accounts(self, user_ids: Set[int]) -> List[int]:
+        async with get_async_session_local()() as db:
+            return list((await db.execute(
+                select(MailAccount.id)
+                .where(MailAccount.user_id.in_(user_ids), MailAccount.is_active == True)
+                .order_by(MailAccount.id)
+            )).scalars())
+
+    async def _inbox(self, account_id: int):
+        """(ConnectionSettings, ruta de la INBOX); sincroniza la cuenta si aún no tiene carpetas"""
+        async with get_async_session_local()() as db:
+            account = await db.get(MailAccount, account_id)
+            if account is None or not account.is_active:
+                return None, None
+            query = select(MailFolder.path).where(MailFolder.account_id == account_id, MailFolder.type == "inbox")
+            path = (await db.execute(query)).scalars().first()
+            if path is None:
+                await mail_sync.sync_account(db, account)
+                path = (await db.execute(query)).scalars().first()
+            return ConnectionSettings.imap(account), path
+
+    async def _sync(self, account_id: int, path: str):
+        async with get_async_session_local()() as db:
+            account = await db.get(MailAccount, account_id)
+            if account is None:
+                return
+            try:
+                await mail_sync.sync_account(db, account, paths=[path])
+            except SyncBusy:
+                # La está sincronizando otro proceso; el próximo aviso vuelve a intentarlo
+                logger.debug(f"IDLE sync of account {account_id} skipped: synced by another process")
+
+    async def _watch(self, account_id: int, state: _Listener):
+        settings, path = await self._inbox(account_id)
+        if path is None:
+            raise LookupError("account has no INBOX")
+        state.path = path
+        imap = await ImapClient.open(settings, timeout=self.timeout, connect_timeout=self.connect_timeout)
+        try:
+            await imap.select(path, readonly=True)
+            state.mode = "idle" if await imap.has_capability("IDLE") else "poll"
+            state.connected = True
+            state.failures = 0
+            state.last_error = None
+            # Lo que llegó mientras no había conexión
+            await self._sync(account_id, path)
+            state.syncs += 1
+            while True:
+                if state.mode == "idle":
+                    responses = await imap.idle(self.idle_timeout)
+                else:
+                    await asyncio.sleep(self.poll_interval)
+                    responses = (await imap.command("NOOP")).responses
+                if imap.closed:
+                    raise ConnectionError("server closed the connection")
+                if any(response.kind in CHANGE_KINDS for response in responses):
+                    state.notifications += 1
+                    state.last_event_at = time.time()
+                    await self._sync(account_id, path)
+                    state.syncs += 1
+        finally:
+            state.connected = False
+            await imap.logout()
+
+    async def _listen(self, account_id: int, state: _Listener):
+        while True:
+            try:
+                await self._watch(account_id, state)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                state.failures += 1
+                state.last_error = str(e) or type(e).__name__
+                delay = min(self.max_backoff, 2 ** state.failures)
+                logger.warning(f"IDLE listener of account {account_id} failed "
+                               f"({state.failures} in a row, retry in {delay}s): {e}")
+                await asyncio.sleep(delay * random.uniform(0.8, 1.2))
+
+    async def reconcile(self, now: float):
+        """Arrancar listeners para las cuentas de los usuarios conectados y parar los sobrantes"""
+        users = self.bus.users()
+        wanted = await self._load_accounts(users) if users else []
+        for account_id in wanted:
+            state = self._listeners.get(account_id)
+            if state is not None:
+                state.wanted_at = now
+            elif len(self._listeners) >= self.max_accounts:
+                self.skipped += 1
+            else:
+                state = _Listener(wanted_at=now)
+                state.task = asyncio.create_task(self._listen(account_id, state), name=f"mail-idle-{account_id}")
+                self._listeners[account_id] = state
+                self.started += 1
+        wanted = set(wanted)
+        for account_id, state in list(self._listeners.items()):
+            if account_id not in wanted and now - state.wanted_at >= self.linger:
+                state.task.cancel()
+                del self._listeners[account_id]
+                self.stopped += 1
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.reconcile(time.time())
+            except Exception as e:
+                logger.error(f"IDLE manager tick failed: {e}")
+            # Hasta el siguiente tick o hasta que un navegador se conecte/desconecte
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.tick)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def start(self):
+        if self.running or not self.enabled:
+            return
+        self._wake = asyncio.Event()
+        self.bus.on_change = self._wake.set
+        self._task = asyncio.create_task(self._loop(), name="mail-idle-manager")
+        logger.info(f"Mail IDLE manager started (max {self.max_accounts} accounts)")
+
+    async def stop(self):
+        tasks = [task for task in (self._task, *(state.task for state in self._listeners.values())) if task]
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        self._listeners.clear()
+        self.bus.on_change = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "listeners": len(self._listeners),
+            "connected": sum(1 for state in self._listeners.values() if state.connected),
+            "started": self.started,
+            "stopped": self.stopped,
+            "skipped_max_accounts": self.skipped,
+            "accounts": {
+                account_id: {
+                    "mode": state.mode,
+                    "connected": state.connected,
+                    "path": state.path,
+                    "notifications": state.notifications,
+                    "syncs": state.syncs,
+                    "consecutive_failures": state.failures,
+                    "last_error": state.last_error,
+                    "last_event_at": datetime.utcfromtimestamp(state.last_event_at).isoformat()
+                    if state.last_event_at else None,
+                }
+                for account_id, state in sorted(self._listeners.items())
+            },
+        }
+
+
+_mail = get_settings().mail
+mail_idle = MailIdleManager(
+    bus=mail_events,
+    idle_timeout=_mail.idle_timeout,
+    poll_interval=_mail.idle_poll_interval,
+    linger=_mail.idle_linger,
+    max_accounts=_mail.idle_max_accounts,
+    max_backoff=_mail.idle_max_backoff,
+    connect_timeout=_mail.connect_timeout,
+    timeout=_mail.imap_timeout,
+    enabled=_mail.idle_enabled,
+)
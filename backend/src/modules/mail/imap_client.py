@@ -0,0 +1,452 @@
+"""
+Asyncio IMAP client
+Cliente IMAP4rev1 sobre asyncio streams (sin hilos ni llamadas bloqueantes):
+TLS implícito (993) o STARTTLS (143) y un plazo por operación. Si el servidor
+no responde a tiempo se corta la conexión y se lanza ImapTimeout, de modo que
+un servidor lento o caído solo afecta a la petición que lo usa.
+
+Uso:
+    client = await ImapClient.open(settings, timeout=30)
+    info = await client.select("INBOX", readonly=True)
+    uids = await client.search("UNSEEN", uid=True)
+    await client.logout()
+"""
+import asyncio
+import itertools
+import logging
+import ssl
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Set, Tuple, Union
+
+from .imap_protocol import (
+    LITERAL_AT_END, CommandResult, Literal, Response, as_text, astring,
+    decode_mailbox, encode_mailbox, parse_response,
+)
+from .transport import default_ssl_context
+
+logger = logging.getLogger(__name__)
+
+# Una respuesta SEARCH o FETCH de una carpeta grande es una sola línea
+# (50.000 UIDs ~ 300 KB); el límite por defecto de StreamReader es 64 KB
+READ_LIMIT = 16 * 1024 * 1024
+
+
+class ImapError(Exception):
+    """Error de protocolo o respuesta NO/BAD del servidor"""
+
+
+class ImapTimeout(ImapError):
+    """El servidor no respondió dentro del plazo de la operación"""
+
+
+@dataclass
+class MailboxInfo:
+    name: str
+    delimiter: Optional[str]
+    flags: Set[str]
+
+    @property
+    def selectable(self) -> bool:
+        return not {"\\noselect", "\\nonexistent"} & {flag.lower() for flag in self.flags}
+
+
+@dataclass
+class SelectInfo:
+    exists: int
+    uidvalidity: Optional[int]
+    uidnext: Optional[int]
+    highestmodseq: Optional[int]
+    readonly: bool
+
+
+def _int_or_none(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _mailboxes(result: CommandResult) -> List[MailboxInfo]:
+    mailboxes = []
+    for response in result.untagged("LIST"):
+        values = response.values()
+        if len(values) < 3:
+            continue
+        flags, delimiter, name = values[0], values[1], values[2]
+        mailboxes.append(MailboxInfo(
+            name=decode_mailbox(as_text(name)),
+            delimiter=as_text(delimiter),
+            flags=set(flags or []),
+        ))
+    return mailboxes
+
+
+def _statuses(result: CommandResult) -> Dict[str, Dict[str, Any]]:
+    """Respuestas "* STATUS carpeta (MESSAGES n UNSEEN n ...)" -> {carpeta: {item: valor}}"""
+    statuses = {}
+    for response in result.untagged("STATUS"):
+        values = response.values()
+        if len(values) >= 2 and isinstance(values[1], list):
+            pairs = values[1]
+            statuses[decode_mailbox(as_text(values[0]))] = {
+                str(pairs[i]).upper(): pairs[i + 1] for i in range(0, len(pairs) - 1, 2)
+            }
+    return statuses
+
+
+class ImapClient:
+    """Conexión IMAP; los comandos se serializan (uno en vuelo cada vez)"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                 host: str, timeout: float):
+        self.reader = reader
+        self.writer = writer
+        self.host = host
+        self.timeout = timeout
+        self.capabilities: Set[str] = set()
+        self.closed = False
+        self._lock = asyncio.Lock()
+        self._tags = itertools.count(1)
+
+    # Conexión
+
+    @classmethod
+    async def connect(cls, host: str, port: int, use_ssl: bool = True, starttls: bool = False,
+                      timeout: float = 30, connect_timeout: Optional[float] = None,
+                      ssl_context: Optional[ssl.SSLContext] = None) -> "ImapClient":
+        """Abrir la conexión y leer el saludo (y negociar STARTTLS) dentro de `connect_timeout`"""
+        context = ssl_context or default_ssl_context()
+        deadline = connect_timeout or timeout
+
+        async def establish() -> "ImapClient":
+            reader, writer = await asyncio.open_connection(
+                host, port, ssl=context if use_ssl else None,
+                server_hostname=host if use_ssl else None, limit=READ_LIMIT,
+            )
+            client = cls(reader, writer, host, timeout)
+            try:
+                greeting = parse_response(await client._read_response())
+                if greeting.kind == "BYE":
+                    raise ImapError(f"Server refused connection: {greeting.text}")
+                client._capabilities_from(greeting)
+                if starttls:
+                    await client._execute("STARTTLS", ())
+                    await writer.start_tls(context, server_hostname=host)
+                    client.capabilities.clear()
+                return client
+            except BaseException:
+                client._abort()
+                raise
+
+        try:
+            return await asyncio.wait_for(establish(), timeout=deadline)
+        except asyncio.TimeoutError:
+            raise ImapTimeout(f"IMAP connect to {host}:{port} timed out after {deadline}s")
+        except (OSError, ssl.SSLError) as e:
+            raise ImapError(f"IMAP connect to {host}:{port} failed: {e}") from e
+
+    @classmethod
+    async def open(cls, settings, timeout: float, connect_timeout: Optional[float] = None) -> "ImapClient":
+        """Conexión autenticada a partir de ServerSettings (server, port, ssl, username, password)"""
+        client = await cls.connect(
+            settings.server, settings.port,
+            use_ssl=settings.ssl,
+            starttls=not settings.ssl and settings.port == 143,  # STARTTLS para puerto estándar
+            timeout=timeout, connect_timeout=connect_timeout,
+        )
+        try:
+            await client.login(settings.username, settings.password)
+        except BaseException:
+            client._abort()
+            raise
+        return client
+
+    def _abort(self):
+        self.closed = True
+        try:
+            self.writer.close()
+        except Exception:
+            pass
+
+    # Protocolo
+
+    async def _read_response(self) -> bytes:
+        line = await self.reader.readline()
+        if not line:
+            self._abort()
+            raise ImapError("Connection closed by server")
+        data = line
+        match = LITERAL_AT_END.search(line)
+        while match:
+            data += await self.reader.readexactly(int(match.group(1)))
+            line = await self.reader.readline()
+            if not line:
+                self._abort()
+                raise ImapError("Connection closed by server")
+            data += line
+            match = LITERAL_AT_END.search(line)
+        return data
+
+    def _capabilities_from(self, response: Response):
+        if response.code and response.code.upper().startswith("CAPABILITY "):
+            self.capabilities = {cap.upper() for cap in response.code.split()[1:]}
+
+    def _track(self, response: Response):
+        """Respuestas no etiquetadas que cambian el estado de la conexión"""
+        if response.kind == "BYE":
+            self.closed = True
+        elif response.kind == "CAPABILITY":
+            self.capabilities = {cap.upper() for cap in response.payload.decode("ascii", "replace").split()}
+
+    async def _execute(self, name: str, args: Sequence[Union[str, Literal]], check: bool = True) -> CommandResult:
+        tag = f"A{next(self._tags):04d}"
+        line = f"{tag} {name}".encode("ascii")
+        responses: List[Response] = []
+
+        # Los literales sincronizados esperan la continuación "+" del servidor
+        for arg in args:
+            if isinstance(arg, Literal):
+                self.writer.write(line + b" {%d}\r\n" % len(arg))
+                await self.writer.drain()
+                while True:
+                    response = parse_response(await self._read_response())
+                    if response.tag == "+":
+                        break
+                    if response.tag == tag:
+                        raise ImapError(f"{name} rejected: {response.text}")
+                    responses.append(response)
+                line = bytes(arg)
+            else:
+                line += b" " + arg.encode("utf-8")
+        self.writer.write(line + b"\r\n")
+        await self.writer.drain()
+
+        while True:
+            response = parse_response(await self._read_response())
+            if response.tag == tag:
+                break
+            if response.tag == "*":
+                self._track(response)
+            responses.append(response)
+
+        result = CommandResult(status=response.kind, text=response.text, code=response.code, responses=responses)
+        if check and response.kind != "OK":
+            raise ImapError(f"{name} failed: {response.kind} {response.text}".strip())
+        return result
+
+    async def _execute_many(self, commands: Sequence[Tuple[str, Sequence[Union[str, Literal]]]]) -> List[CommandResult]:
+        if any(isinstance(arg, Literal) for _, args in commands for arg in args):
+            # Un literal espera la continuación "+": esos lotes van uno a uno
+            return [await self._execute(name, args, check=False) for name, args in commands]
+
+        tags = [f"A{next(self._tags):04d}" for _ in commands]
+        self.writer.write(b"".join(
+            " ".join((tag, name, *args)).encode("utf-8") + b"\r\n"
+            for tag, (name, args) in zip(tags, commands)
+        ))
+        await self.writer.drain()
+
+        # Cada respuesta no etiquetada va con la siguiente respuesta etiquetada
+        results: Dict[str, CommandResult] = {}
+        responses: List[Response] = []
+        while len(results) < len(tags):
+            response = parse_response(await self._read_response())
+            if response.tag == "*":
+                self._track(response)
+                responses.append(response)
+            elif response.tag in tags:
+                results[response.tag] = CommandResult(status=response.kind, text=response.text,
+                                                      code=response.code, responses=responses)
+                responses = []
+        return [results[tag] for tag in tags]
+
+    async def _guarded(self, name: str, operation: Callable[[], Awaitable[Any]], timeout: Optional[float]):
+        if self.closed:
+            raise ImapError("Connection is closed")
+        deadline = timeout or self.timeout
+        async with self._lock:
+            try:
+                return await asyncio.wait_for(operation(), timeout=deadline)
+            except asyncio.TimeoutError:
+                # La respuesta pendiente desincronizaría los siguientes comandos
+                self._abort()
+                raise ImapTimeout(f"IMAP {name} timed out after {deadline}s")
+            except (OSError, asyncio.IncompleteReadError) as e:
+                self._abort()
+                raise ImapError(f"IMAP connection lost during {name}: {e}") from e
+            except ValueError as e:
+                # Línea mayor que READ_LIMIT: el resto de la respuesta queda en el socket
+                self._abort()
+                raise ImapError(f"IMAP {name} response too large: {e}") from e
+
+    async def command(self, name: str, *args: Union[str, Literal],
+                      timeout: Optional[float] = None) -> CommandResult:
+        """Ejecutar un comando con su plazo; un plazo vencido deja la conexión cerrada"""
+        return await self._guarded(name, lambda: self._execute(name, args), timeout)
+
+    async def pipeline(self, commands: Sequence[Tuple[str, Sequence[Union[str, Literal]]]],
+                       timeout: Optional[float] = None) -> List[CommandResult]:
+        """Enviar varios comandos sin esperar cada respuesta (RFC 3501 5.5): un
+        solo viaje de ida y vuelta. Un NO/BAD no interrumpe al resto; cada
+        CommandResult lleva su estado."""
+        if not commands:
+            return []
+        return await self._guarded(commands[0][0], lambda: self._execute_many(commands), timeout)
+
+    # Comandos
+
+    async def capability(self) -> Set[str]:
+        await self.command("CAPABILITY")
+        return self.capabilities
+
+    async def login(self, username: str, password: str):
+        result = await self.command("LOGIN", astring(username), astring(password))
+        self._capabilities_from(Response(tag="", kind=result.status, code=result.code))
+
+    async def noop(self) -> bool:
+        try:
+            await self.command("NOOP")
+            return not self.closed
+        except ImapError:
+            return False
+
+    async def _idle(self, wait: float) -> List[Response]:
+        tag = f"A{next(self._tags):04d}"
+        self.writer.write(f"{tag} IDLE\r\n".encode("ascii"))
+        await self.writer.drain()
+        responses: List[Response] = []
+        while True:
+            response = parse_response(await self._read_response())
+            if response.tag == "+":
+                break
+            if response.tag == tag:
+                raise ImapError(f"IDLE rejected: {response.kind} {response.text}".strip())
+            responses.append(response)
+
+        # Esperar la primera notificación (o agotar `wait`); la lectura en curso no
+        # se cancela para no cortar un literal a medias
+        pending = asyncio.ensure_future(self._read_response())
+        try:
+            await asyncio.wait({pending}, timeout=wait)
+            self.writer.write(b"DONE\r\n")
+            await self.writer.drain()
+            data = await pending
+        except BaseException:
+            # Cancelado a mitad de IDLE: la conexión queda en un estado desconocido
+            pending.cancel()
+            self._abort()
+            raise
+        while True:
+            response = parse_response(data)
+            if response.tag == tag:
+                break
+            if response.tag == "*":
+                self._track(response)
+                responses.append(response)
+            data = await self._read_response()
+        if response.kind != "OK":
+            raise ImapError(f"IDLE failed: {response.kind} {response.text}".strip())
+        return responses
+
+    async def idle(self, wait: float) -> List[Response]:
+        """IDLE (RFC 2177) hasta la primera notificación o `wait` segundos; devuelve
+        las respuestas no etiquetadas (EXISTS, EXPUNGE, FETCH...). Los servidores
+        cortan a los 30 minutos: `wait` debe ser menor."""
+        return await self._guarded("IDLE", lambda: self._idle(wait), wait + self.timeout)
+
+    async def logout(self, timeout: float = 5):
+        if self.closed:
+            return
+        try:
+            await self.command("LOGOUT", timeout=timeout)
+        except ImapError:
+            pass
+        finally:
+            self._abort()
+
+    async def list(self, reference: str = "", pattern: str = "*") -> List[MailboxInfo]:
+        result = await self.command("LIST", astring(reference) if reference else '""', astring(pattern))
+        return _mailboxes(result)
+
+    async def list_status(self, items: Sequence[str], reference: str = "",
+                          pattern: str = "*") -> Tuple[List[MailboxInfo], Dict[str, Dict[str, Any]]]:
+        """LIST con RETURN (STATUS ...) (RFC 5819, capacidad LIST-STATUS):
+        carpetas y contadores en un solo comando"""
+        result = await self.command("LIST", astring(reference) if reference else '""', astring(pattern),
+                                    f"RETURN (STATUS ({' '.join(items)}))")
+        return _mailboxes(result), _statuses(result)
+
+    async def has_capability(self, name: str) -> bool:
+        if not self.capabilities:
+            await self.capability()
+        return name.upper() in self.capabilities
+
+    async def select(self, mailbox: str, readonly: bool = False, condstore: bool = False) -> SelectInfo:
+        """SELECT (o EXAMINE si readonly: no marca nada como leído ni purga al cerrar).
+        Con condstore=True activa CONDSTORE (RFC 7162) y devuelve HIGHESTMODSEQ."""
+        args = [astring(encode_mailbox(mailbox))]
+        if condstore:
+            args.append("(CONDSTORE)")
+        result = await self.command("EXAMINE" if readonly else "SELECT", *args)
+        exists = next((r.number for r in result.untagged("EXISTS")), 0)
+        return SelectInfo(
+            exists=exists or 0,
+            uidvalidity=_int_or_none(result.code_value("UIDVALIDITY")),
+            uidnext=_int_or_none(result.code_value("UIDNEXT")),
+            highestmodseq=_int_or_none(result.code_value("HIGHESTMODSEQ")),
+            readonly=readonly or (result.code or "").upper() == "READ-ONLY",
+        )
+
+    async def search(self, *criteria: str, uid: bool = False) -> List[int]:
+        result = await self.command("UID SEARCH" if uid else "SEARCH", *(criteria or ("ALL",)))
+        numbers: List[int] = []
+        for response in result.untagged("SEARCH"):
+            numbers.extend(value for value in response.values() if isinstance(value, int))
+        return numbers
+
+    async def fetch(self, sequence: str, items: str, uid: bool = True,
+                    changedsince: Optional[int] = None, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """FETCH/UID FETCH. Devuelve un dict por mensaje con los atributos en
+        mayúsculas ("UID", "FLAGS", "BODY[HEADER.FIELDS (...)]"...) y "SEQ"."""
+        args = [sequence, items]
+        if changedsince is not None:
+            args.append(f"(CHANGEDSINCE {changedsince})")
+        result = await self.command("UID FETCH" if uid else "FETCH", *args, timeout=timeout)
+        messages = []
+        for response in result.untagged("FETCH"):
+            values = response.values()
+            if not values or not isinstance(values[0], list):
+                continue
+            pairs = values[0]
+            item = {str(pairs[i]).upper(): pairs[i + 1] for i in range(0, len(pairs) - 1, 2)}
+            item["SEQ"] = response.number
+            # Un FETCH no solicitado (p. ej. cambio de flags) puede llegar sin UID
+            if uid and "UID" not in item:
+                continue
+            messages.append(item)
+        return messages
+
+    async def status(self, mailbox: str, items: Sequence[str] = ("MESSAGES", "UNSEEN")) -> Dict[str, Any]:
+        result = await self.command("STATUS", astring(encode_mailbox(mailbox)), f"({' '.join(items)})")
+        return next(iter(_statuses(result).values()), {})
+
+    async def status_many(self, mailboxes: Sequence[str], items: Sequence[str],
+                          depth: int = 50) -> Dict[str, Dict[str, Any]]:
+        """STATUS de varias carpetas, `depth` comandos por viaje (pipelining).
+        Las carpetas que el servidor rechaza no aparecen en el resultado."""
+        query = f"({' '.join(items)})"
+        statuses: Dict[str, Dict[str, Any]] = {}
+        for start in range(0, len(mailboxes), depth):
+            results = await self.pipeline([
+                ("STATUS", (astring(encode_mailbox(mailbox)), query))
+                for mailbox in mailboxes[start:start + depth]
+            ])
+            for result in results:
+                statuses.update(_statuses(result))
+        return statuses
+
+    async def unselect(self):
+        """Salir de la carpeta sin purgar (CLOSE si el servidor no tiene UNSELECT)"""
+        if not self.capabilities:
+            await self.capability()
+        await self.command("UNSELECT" if "UNSELECT" in self.capabilities else "CLOSE")
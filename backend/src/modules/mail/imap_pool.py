@@ -0,0 +1,248 @@
+"""
+IMAP/SMTP connection pool
+Sesiones ya autenticadas, reutilizables y agrupadas por cuenta (servidor,
+puerto, usuario y contraseña). Evita pagar el handshake TLS y el LOGIN en
+cada operación.
+
+- Como máximo `imap_pool_max_per_account` sesiones por cuenta (los
+  proveedores limitan las conexiones simultáneas); el resto espera turno.
+- Una sesión parada más de `imap_pool_health_after` segundos se comprueba
+  con NOOP antes de reutilizarla.
+- Las sesiones paradas más de `imap_pool_idle_timeout` se cierran (tarea de
+  limpieza arrancada desde el lifespan) y se olvidan las cuentas sin
+  sesiones.
+- Si la operación falla dentro de `async with pool.session(...)`, la sesión
+  se descarta en lugar de volver al pool (su estado es desconocido).
+
+Uso:
+    async with imap_pool.session(settings) as imap:
+        folders = await imap.list()
+
+`ConnectionPool` no depende del protocolo: cualquier sesión con `closed`,
+`noop()` y `logout()` sirve. Este módulo crea el pool IMAP; la cola de envío
+(outbox.py) crea el suyo para SMTP con sus propios límites y plazos
+(`smtp_pool_*`).
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from ...config.settings import get_settings
+from .imap_client import ImapClient
+
+logger = logging.getLogger(__name__)
+
+PoolKey = Tuple[str, int, bool, str, str]
+
+
+class PoolTimeout(Exception):
+    """No se liberó ninguna sesión de la cuenta a tiempo"""
+
+
+@dataclass
+class _Pooled:
+    session: Any
+    created_at: float
+    last_used: float
+
+
+@dataclass
+class _AccountState:
+    semaphore: asyncio.Semaphore
+    idle: Deque[_Pooled] = field(default_factory=deque)
+    in_use: int = 0
+    waiting: int = 0
+    label: str = ""
+
+
+class ConnectionPool:
+    """Pool de sesiones autenticadas por cuenta (IMAP o SMTP según `factory`)"""
+
+    def __init__(self, factory: Callable[[Any, float], Awaitable[Any]], max_per_account: int,
+                 idle_timeout: float, health_after: float, acquire_timeout: float, timeout: float,
+                 protocol: str = "IMAP"):
+        self.factory = factory
+        self.protocol = protocol
+        self.max_per_account = max_per_account
+        self.idle_timeout = idle_timeout
+        self.health_after = health_after
+        self.acquire_timeout = acquire_timeout
+        self.timeout = timeout
+        self._accounts: Dict[PoolKey, _AccountState] = {}
+        self._reaper: Optional[asyncio.Task] = None
+        self.created = 0
+        self.reused = 0
+        self.health_failures = 0
+        self.discarded = 0
+        self.expired = 0
+        self.waits = 0
+        self.wait_timeouts = 0
+
+    @staticmethod
+    def key_for(settings) -> PoolKey:
+        # La contraseña forma parte de la clave (hash) para no reutilizar una
+        # sesión abierta con credenciales antiguas
+        secret = hashlib.sha256(settings.password.encode("utf-8")).hexdigest()
+        return (settings.server.lower(), settings.port, bool(settings.ssl), settings.username, secret)
+
+    def _state(self, key: PoolKey) -> _AccountState:
+        state = self._accounts.get(key)
+        if state is None:
+            state = self._accounts[key] = _AccountState(
+                semaphore=asyncio.Semaphore(self.max_per_account),
+                label=f"{key[3]}@{key[0]}:{key[1]}",
+            )
+        return state
+
+    async def _close(self, pooled: _Pooled):
+        try:
+            await asyncio.wait_for(pooled.session.logout(), timeout=5)
+        except Exception:
+            pass
+
+    async def acquire(self, settings) -> Tuple[PoolKey, _Pooled]:
+        key = self.key_for(settings)
+        state = self._state(key)
+        if state.semaphore.locked():
+            self.waits += 1
+        # Mientras espera, la limpieza no puede retirar el estado de la cuenta
+        state.waiting += 1
+        try:
+            await asyncio.wait_for(state.semaphore.acquire(), timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            self.wait_timeouts += 1
+            raise PoolTimeout(f"No {self.protocol} session available for {state.label}")
+        finally:
+            state.waiting -= 1
+
+        # Cuenta desde ya como en uso para que la limpieza no retire el estado de la cuenta
+        state.in_use += 1
+        try:
+            while state.idle:
+                # LIFO: la sesión usada más recientemente es la que menos riesgo tiene de estar caída
+                pooled = state.idle.pop()
+                if pooled.session.closed:
+                    self.discarded += 1
+                    continue
+                idle_for = time.monotonic() - pooled.last_used
+                if idle_for > self.idle_timeout:
+                    self.expired += 1
+                    asyncio.create_task(self._close(pooled))
+                    continue
+                if idle_for > self.health_after:
+                    try:
+                        healthy = await asyncio.wait_for(pooled.session.noop(), timeout=self.timeout)
+                    except Exception:
+                        healthy = False
+                    if not healthy:
+                        self.health_failures += 1
+                        asyncio.create_task(self._close(pooled))
+                        continue
+                self.reused += 1
+                return key, pooled
+
+            session = await self.factory(settings, self.timeout)
+            self.created += 1
+            now = time.monotonic()
+            return key, _Pooled(session=session, created_at=now, last_used=now)
+        except BaseException:
+            state.in_use -= 1
+            state.semaphore.release()
+            raise
+
+    async def release(self, key: PoolKey, pooled: _Pooled, discard: bool = False):
+        state = self._accounts[key]
+        state.in_use -= 1
+        # Una sesión que agotó un plazo ya está cerrada: no vuelve al pool
+        if discard or pooled.session.closed:
+            self.discarded += 1
+            await self._close(pooled)
+        else:
+            pooled.last_used = time.monotonic()
+            state.idle.append(pooled)
+        state.semaphore.release()
+
+    @asynccontextmanager
+    async def session(self, settings):
+        """Sesión autenticada del pool para la duración del bloque"""
+        key, pooled = await self.acquire(settings)
+        try:
+            yield pooled.session
+        except BaseException:
+            await self.release(key, pooled, discard=True)
+            raise
+        else:
+            await self.release(key, pooled)
+
+    async def close_idle(self, older_than: Optional[float] = None) -> int:
+        """Cerrar sesiones paradas más de `older_than` segundos (por defecto idle_timeout)"""
+        limit = self.idle_timeout if older_than is None else older_than
+        now = time.monotonic()
+        stale = []
+        for key, state in list(self._accounts.items()):
+            stale.extend(pooled for pooled in state.idle if now - pooled.last_used >= limit)
+            state.idle = deque(pooled for pooled in state.idle if now - pooled.last_used < limit)
+            if not state.idle and not state.in_use and not state.waiting:
+                del self._accounts[key]
+        for pooled in stale:
+            await self._close(pooled)
+        self.expired += len(stale)
+        return len(stale)
+
+    async def _reap(self):
+        while True:
+            await asyncio.sleep(max(1.0, self.idle_timeout / 4))
+            try:
+                closed = await self.close_idle()
+                if closed:
+                    logger.info(f"Closed {closed} idle {self.protocol} sessions")
+            except Exception as e:
+                logger.error(f"{self.protocol} pool cleanup failed: {e}")
+
+    def start(self):
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.create_task(self._reap(), name=f"{self.protocol.lower()}-pool-reaper")
+
+    async def close(self):
+        """Parar la limpieza y cerrar todas las sesiones paradas (shutdown)"""
+        if self._reaper is not None:
+            self._reaper.cancel()
+            try:
+                await self._reaper
+            except asyncio.CancelledError:
+                pass
+            self._reaper = None
+        await self.close_idle(older_than=0)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_per_account": self.max_per_account,
+            "accounts": {
+                state.label: {"idle": len(state.idle), "in_use": state.in_use}
+                for state in self._accounts.values()
+            },
+            "created": self.created,
+            "reused": self.reused,
+            "health_failures": self.health_failures,
+            "discarded": self.discarded,
+            "expired": self.expired,
+            "waits": self.waits,
+            "wait_timeouts": self.wait_timeouts,
+        }
+
+
+_mail = get_settings().mail
+imap_pool = ConnectionPool(
+    factory=partial(ImapClient.open, connect_timeout=_mail.connect_timeout),
+    max_per_account=_mail.imap_pool_max_per_account,
+    idle_timeout=_mail.imap_pool_idle_timeout,
+    health_after=_mail.imap_pool_health_after,
+    acquire_timeout=_mail.imap_pool_acquire_timeout,
+    timeout=_mail.imap_timeout,
+)
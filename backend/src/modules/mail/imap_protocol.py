@@ -0,0 +1,260 @@
+"""
+IMAP protocol helpers
+Análisis de respuestas IMAP4rev1 (RFC 3501) independiente del transporte:
+
+- `parse_response(data)` clasifica una respuesta completa (con sus literales
+  ya leídos) en etiquetada, no etiquetada o continuación.
+- `parse_values(data)` convierte datos IMAP en valores Python: listas entre
+  paréntesis -> list, átomos -> str (int si son numéricos), cadenas entre
+  comillas -> str, literales {n} -> bytes, NIL -> None.
+- Argumentos de comando (`astring`) y nombres de carpeta en UTF-7 modificado
+  (`encode_mailbox` / `decode_mailbox`).
+"""
+import base64
+import re
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Union
+
+# Una línea que termina en {n} anuncia un literal de n bytes a continuación
+LITERAL_AT_END = re.compile(rb"\{(\d+)\+?\}\r\n$")
+
+STATUS_KINDS = {"OK", "NO", "BAD", "BYE", "PREAUTH"}
+
+_ATOM_END = b' (){"\r\n'
+_CODE = re.compile(r"^\[([^\]]*)\]\s?")
+_SAFE_ATOM = re.compile(r"^[!#$&'+,\-./0-9:;<=>?@A-Z^_`a-z|}~]+$")
+
+
+class ImapParseError(ValueError):
+    """Respuesta IMAP mal formada"""
+
+
+@dataclass
+class Response:
+    """Una respuesta del servidor (sin el CRLF final)"""
+    tag: str                      # "*", "+" o la etiqueta del comando
+    kind: str                     # OK/NO/BAD/BYE/PREAUTH o el dato (EXISTS, FETCH, LIST...)
+    number: Optional[int] = None  # "* 23 EXISTS" -> 23
+    code: Optional[str] = None    # "[UIDVALIDITY 3857529045]" -> "UIDVALIDITY 3857529045"
+    text: str = ""                # texto legible de las respuestas de estado
+    payload: bytes = b""          # datos tras `kind` en las respuestas de datos
+
+    @property
+    def is_status(self) -> bool:
+        return self.kind in STATUS_KINDS
+
+    def values(self) -> List[Any]:
+        return parse_values(self.payload)
+
+    def code_value(self, name: str) -> Optional[str]:
+        """Argumento de un código de respuesta: code_value("UIDNEXT") -> "4392" """
+        if not self.code:
+            return None
+        parts = self.code.split(" ", 1)
+        if parts[0].upper() != name:
+            return None
+        return parts[1] if len(parts) > 1 else ""
+
+
+@dataclass
+class CommandResult:
+    """Respuesta etiquetada de un comando y las no etiquetadas recibidas mientras tanto"""
+    status: str
+    text: str
+    code: Optional[str] = None
+    responses: List[Response] = field(default_factory=list)
+
+    def untagged(self, kind: str) -> List[Response]:
+        return [r for r in self.responses if r.tag == "*" and r.kind == kind]
+
+    def code_value(self, name: str) -> Optional[str]:
+        """Busca el código `name` en la respuesta final y después en las no etiquetadas"""
+        final = Response(tag="", kind=self.status, code=self.code)
+        for response in [final] + [r for r in self.responses if r.is_status]:
+            value = response.code_value(name)
+            if value is not None:
+                return value
+        return None
+
+
+def _split_word(data: bytes, start: int):
+    end = data.find(b" ", start)
+    if end < 0:
+        return data[start:], len(data)
+    return data[start:end], end + 1
+
+
+def parse_response(data: bytes) -> Response:
+    """Clasificar una respuesta completa del servidor"""
+    data = data[:-2] if data.endswith(b"\r\n") else data
+    tag, pos = _split_word(data, 0)
+    tag = tag.decode("ascii", "replace")
+    if tag == "+":
+        return Response(tag="+", kind="CONTINUE", text=data[pos:].decode("utf-8", "replace"))
+
+    word, next_pos = _split_word(data, pos)
+    number = None
+    if tag == "*" and word.isdigit():
+        number = int(word)
+        word, next_pos = _split_word(data, next_pos)
+    kind = word.decode("ascii", "replace").upper()
+
+    if kind in STATUS_KINDS and number is None:
+        text = data[next_pos:].decode("utf-8", "replace")
+        code = None
+        match = _CODE.match(text)
+        if match:
+            code, text = match.group(1), text[match.end():]
+        return Response(tag=tag, kind=kind, code=code, text=text)
+    return Response(tag=tag, kind=kind, number=number, payload=data[next_pos:])
+
+
+def parse_values(data: bytes) -> List[Any]:
+    """Valores de los datos de una respuesta (listas anidadas, literales incluidos)"""
+    values, pos = _parse_list(data, 0, closing=None)
+    return values
+
+
+def _parse_list(data: bytes, pos: int, closing: Optional[int]):
+    values: List[Any] = []
+    length = len(data)
+    while pos < length:
+        char = data[pos]
+        if char in b" \r\n":
+            pos += 1
+        elif char == ord("("):
+            value, pos = _parse_list(data, pos + 1, closing=ord(")"))
+            values.append(value)
+        elif char == closing:
+            return values, pos + 1
+        elif char == ord(")"):
+            raise ImapParseError(f"Unexpected ')' at {pos}")
+        elif char == ord('"'):
+            value, pos = _parse_quoted(data, pos + 1)
+            values.append(value)
+        elif char == ord("{"):
+            end = data.find(b"}", pos)
+            if end < 0:
+                raise ImapParseError(f"Unterminated literal at {pos}")
+            size = int(data[pos + 1:end].rstrip(b"+"))
+            start = end + 1
+            if data[start:start + 2] == b"\r\n":
+                start += 2
+            if start + size > length:
+                raise ImapParseError("Truncated literal")
+            values.append(data[start:start + size])
+            pos = start + size
+        else:
+            value, pos = _parse_atom(data, pos)
+            values.append(value)
+    if closing is not None:
+        raise ImapParseError("Unbalanced parentheses")
+    return values, pos
+
+
+def _parse_quoted(data: bytes, pos: int):
+    out = bytearray()
+    while pos < len(data):
+        char = data[pos]
+        if char == ord("\\") and pos + 1 < len(data):
+            out.append(data[pos + 1])
+            pos += 2
+        elif char == ord('"'):
+            return out.decode("utf-8", "replace"), pos + 1
+        else:
+            out.append(char)
+            pos += 1
+    raise ImapParseError("Unterminated quoted string")
+
+
+def _parse_atom(data: bytes, pos: int):
+    start = pos
+    depth = 0
+    while pos < len(data):
+        char = data[pos]
+        # BODY[HEADER.FIELDS (FROM TO)] es un único átomo aunque lleve espacios y paréntesis
+        if char == ord("["):
+            depth += 1
+        elif char == ord("]") and depth:
+            depth -= 1
+        elif depth == 0 and char in _ATOM_END:
+            break
+        pos += 1
+    atom = data[start:pos].decode("ascii", "replace")
+    if atom.upper() == "NIL":
+        return None, pos
+    if atom.isdigit():
+        return int(atom), pos
+    return atom, pos
+
+
+def as_text(value: Union[str, bytes, int, None]) -> Optional[str]:
+    """Normalizar un valor analizado (átomo, cadena o literal) a str"""
+    if value is None:
+        return None
+    if isinstance(value, bytes):
+        return value.decode("utf-8", "replace")
+    return str(value)
+
+
+# Argumentos de comando
+
+class Literal(bytes):
+    """Argumento que se envía como literal sincronizado {n}"""
+
+
+def astring(value: str) -> Union[str, Literal]:
+    """Átomo si es seguro, cadena entre comillas o literal si lleva CR/LF o no es ASCII"""
+    if value and _SAFE_ATOM.match(value):
+        return value
+    if any(ord(char) > 0x7F for char in value) or "\r" in value or "\n" in value:
+        return Literal(value.encode("utf-8"))
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+# Nombres de carpeta en UTF-7 modificado (RFC 3501 5.1.3)
+
+def encode_mailbox(name: str) -> str:
+    out = []
+    pending = []
+
+    def flush():
+        if pending:
+            chunk = "".join(pending).encode("utf-16-be")
+            out.append("&" + base64.b64encode(chunk).decode("ascii").rstrip("=").replace("/", ",") + "-")
+            pending.clear()
+
+    for char in name:
+        if 0x20 <= ord(char) <= 0x7E:
+            flush()
+            out.append("&-" if char == "&" else char)
+        else:
+            pending.append(char)
+    flush()
+    return "".join(out)
+
+
+def decode_mailbox(name: str) -> str:
+    out = []
+    pos = 0
+    while pos < len(name):
+        char = name[pos]
+        if char != "&":
+            out.append(char)
+            pos += 1
+            continue
+        end = name.find("-", pos)
+        if end < 0:
+            out.append(name[pos:])
+            break
+        if end == pos + 1:
+            out.append("&")
+        else:
+            chunk = name[pos + 1:end].replace(",", "/")
+            chunk += "=" * (-len(chunk) % 4)
+            try:
+                out.append(base64.b64decode(chunk).decode("utf-16-be"))
+            except (ValueError, UnicodeDecodeError):
+                out.append(name[pos:end + 1])
+        pos = end + 1
+    return "".join(out)
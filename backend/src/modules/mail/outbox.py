@@ -0,0 +1,376 @@
+"""
+SMTP outbox
+Cola de envío persistente (mail_outbox): POST /api/mail/send guarda el
+mensaje serializado en disco, inserta la fila y responde en milisegundos con
+su id; la entrega la hacen workers en segundo plano:
+
+- Las filas pendientes se reparten por cuenta; cada cuenta se entrega con
+  una conexión SMTP autenticada del pool (`smtp_pool`), varios mensajes por
+  sesión (RSET entre uno y otro) y hasta `max_concurrent` cuentas a la vez.
+- Un rechazo definitivo (5xx) marca el mensaje como `failed`; un error
+  temporal (4xx, conexión, plazo) lo reprograma con espera exponencial
+  (`backoff`, 2x, 4x... hasta `max_backoff`) hasta `max_attempts` intentos.
+- Las filas se reclaman con un UPDATE condicionado (status='queued'), así
+  que varios procesos pueden compartir la cola; las que un proceso caído dejó
+  en `sending` vuelven a la cola pasados `stale_after` segundos.
+- Cada cambio de estado se publica al usuario por /api/mail/events
+  (`outbox_status`).
+"""
+import asyncio
+import itertools
+import logging
+import os
+import random
+import socket
+import uuid
+from datetime import datetime, timedelta
+from functools import partial
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...config.settings import get_settings
+from ...database.connection import get_async_session_local
+from ...database.models import MailAccount, MailOutbox
+from .events import mail_events
+from .imap_pool import ConnectionPool
+from .smtp_client import SmtpClient, SmtpError, SmtpTimeout
+from .transport import ConnectionSettings
+
+logger = logging.getLogger(__name__)
+
+
+def outbox_status(row: MailOutbox) -> Dict[str, Any]:
+    """Estado de un mensaje de la cola para la API y los eventos"""
+    return {
+        "id": row.id,
+        "accountId": row.account_id,
+        "messageId": row.message_id,
+        "subject": row.subject,
+        "recipients": len(row.recipients or []),
+        "size": row.size_bytes or 0,
+        "status": row.status,
+        "attempts": row.attempts or 0,
+        "nextAttemptAt": row.next_attempt_at.isoformat() if row.status == "queued" and row.next_attempt_at else None,
+        "lastError": row.last_error,
+        "refused": row.refused,
+        "createdAt": row.created_at.isoformat() if row.created_at else None,
+        "sentAt": row.sent_at.isoformat() if row.sent_at else None,
+    }
+
+
+class MailOutboxQueue:
+    """Cola de envío en base de datos y workers de entrega por cuenta"""
+
+    def __init__(self, pool: ConnectionPool, root: str, tick: float, max_concurrent: int, batch_size: int,
+                 max_attempts: int, backoff: float, max_backoff: float, stale_after: float = 900,
+                 enabled: bool = True):
+        self.pool = pool
+        self.root = Path(root)
+        self.tick = tick
+        self.max_concurrent = max_concurrent
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.stale_after = stale_after
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}"
+        self._claims = itertools.count(1)
+        self._active: Dict[int, asyncio.Task] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self.enabled = enabled
+        self.enqueued = 0
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.batches = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    # Ficheros
+
+    def _write(self, message: Union[bytes, Callable[[BinaryIO], Any]]) -> Tuple[str, int]:
+        """Fichero del mensaje (bytes o una función que lo escribe, p. ej.
+        compose.write_message); devuelve la ruta relativa y el tamaño"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        relative = f"{uuid.uuid4().hex}.eml"
+        temp = self.root / f".{relative}"
+        try:
+            with open(temp, "wb") as handle:
+                if isinstance(message, bytes):
+                    handle.write(message)
+                else:
+                    message(handle)
+                size = handle.tell()
+            os.replace(temp, self.root / relative)
+        except BaseException:
+            self._remove(temp.name)
+            raise
+        return relative, size
+
+    def _remove(self, relative: Optional[str]):
+        if not relative:
+            return
+        try:
+            os.remove(self.root / relative)
+        except FileNotFoundError:
+            pass
+
+    async def remove_files(self, paths: Iterable[Optional[str]]):
+        """Borrar los mensajes serializados (filas eliminadas, p. ej. al borrar la cuenta)"""
+        for relative in paths:
+            await asyncio.to_thread(self._remove, relative)
+
+    # Cola
+
+    async def enqueue(self, db: AsyncSession, account: MailAccount, sender: str, recipients: List[str],
+                      message: Union[bytes, Callable[[BinaryIO], Any]], message_id: str,
+                      subject: Optional[str]) -> MailOutbox:
+        """Guardar el mensaje y ponerlo en la cola; la entrega es asíncrona"""
+        relative, size = await asyncio.to_thread(self._write, message)
+        row = MailOutbox(
+            account_id=account.id,
+            user_id=account.user_id,
+            message_id=message_id,
+            subject=subject,
+            sender=sender,
+            recipients=recipients,
+            file_path=relative,
+            size_bytes=size,
+            status="queued",
+            attempts=0,
+            next_attempt_at=datetime.utcnow(),
+        )
+        db.add(row)
+        try:
+            await db.commit()
+        except BaseException:
+            await asyncio.to_thread(self._remove, relative)
+            raise
+        self.enqueued += 1
+        if self._wake is not None:
+            self._wake.set()
+        return row
+
+    async def _claim(self) -> Dict[int, List[int]]:
+        """Reclamar mensajes pendientes: hasta `batch_size` por cuenta de las cuentas libres"""
+        slots = self.max_concurrent - len(self._active)
+        if slots <= 0:
+            return {}
+        now = datetime.utcnow()
+        async with get_async_session_local()() as db:
+            # Filas que un proceso caído dejó a medias vuelven a la cola
+            await db.execute(
+                update(MailOutbox)
+                .where(MailOutbox.status == "sending",
+                       MailOutbox.claimed_at < now - timedelta(seconds=self.stale_after))
+                .values(status="queued", claimed_by=None)
+            )
+            query = (
+                select(MailOutbox.id, MailOutbox.account_id)
+                .where(MailOutbox.status == "queued", MailOutbox.next_attempt_at <= now)
+                .order_by(MailOutbox.next_attempt_at, MailOutbox.id)
+                .limit(self.batch_size * slots * 2)
+            )
+            if self._active:
+                query = query.where(MailOutbox.account_id.notin_(list(self._active)))
+            ids: Dict[int, List[int]] = {}
+            for outbox_id, account_id in (await db.execute(query)).all():
+                if account_id not in ids and len(ids) >= slots:
+                    continue
+                if len(ids.setdefault(account_id, [])) < self.batch_size:
+                    ids[account_id].append(outbox_id)
+            if not ids:
+                await db.commit()
+                return {}
+
+            token = f"{self.worker_id}-{next(self._claims)}"
+            await db.execute(
+                update(MailOutbox)
+                .where(MailOutbox.id.in_([i for chunk in ids.values() for i in chunk]),
+                       MailOutbox.status == "queued")
+                .values(status="sending", claimed_by=token, claimed_at=now)
+            )
+            await db.commit()
+            rows = (await db.execute(
+                select(MailOutbox.id, MailOutbox.account_id).where(MailOutbox.claimed_by == token)
+            )).all()
+        claimed: Dict[int, List[int]] = {}
+        for outbox_id, account_id in rows:
+            claimed.setdefault(account_id, []).append(outbox_id)
+        return claimed
+
+    async def _finish(self, db: AsyncSession, row: MailOutbox, status: str, error: Optional[str] = None,
+                      refused: Optional[Dict[str, str]] = None):
+        row.attempts = (row.attempts or 0) + 1
+        row.claimed_by = None
+        row.last_error = error
+        if status == "queued" and row.attempts >= self.max_attempts:
+            status = "failed"
+        row.status = status
+        if status == "sent":
+            row.sent_at = datetime.utcnow()
+            row.refused = refused or None
+            self.sent += 1
+        elif status == "failed":
+            self.failed += 1
+        else:
+            delay = min(self.max_backoff, self.backoff * 2 ** (row.attempts - 1))
+            row.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay * random.uniform(0.9, 1.1))
+            self.retried += 1
+        await db.commit()
+        if status != "queued":
+            await asyncio.to_thread(self._remove, row.file_path)
+        if error:
+            self.last_error = error
+            logger.warning(f"Outbox message {row.id} (account {row.account_id}) {status}: {error}")
+        mail_events.publish(row.user_id, {"type": "outbox_status", **outbox_status(row)})
+
+    async def _deliver(self, account_id: int, ids: List[int]):
+        """Entregar los mensajes de una cuenta por una misma sesión SMTP"""
+        self.batches += 1
+        async with get_async_session_local()() as db:
+            pending = list((await db.execute(
+                select(MailOutbox).where(MailOutbox.id.in_(ids)).order_by(MailOutbox.id)
+            )).scalars())
+            account = await db.get(MailAccount, account_id)
+            if account is None or not account.is_active:
+                for row in pending:
+                    await self._finish(db, row, "failed", "Account not available")
+                return
+            try:
+                async with self.pool.session(ConnectionSettings.smtp(account)) as smtp:
+                    used = smtp.transactions > 0
+                    while pending:
+                        row = pending[0]
+                        try:
+                            if used:
+                                await smtp.rset()
+                            used = True
+                            refused = await smtp.send_file(row.sender, row.recipients, self.root / row.file_path)
+                        except SmtpTimeout:
+                            raise
+                        except SmtpError as e:
+                            if smtp.closed:
+                                raise
+                            pending.pop(0)
+                            permanent = e.code is not None and 500 <= e.code < 600
+                            await self._finish(db, row, "failed" if permanent else "queued", str(e))
+                            continue
+                        except FileNotFoundError:
+                            pending.pop(0)
+                            await self._finish(db, row, "failed", "Message file is missing")
+                            continue
+                        pending.pop(0)
+                        await self._finish(db, row, "sent", refused=refused)
+            except Exception as e:
+                # Conexión, autenticación o plazo: se reintentan los que faltan
+                error = str(e) or type(e).__name__
+                for row in pending:
+                    await self._finish(db, row, "queued", error)
+
+    def _launch(self, account_id: int, ids: List[int]):
+        task = asyncio.create_task(self._deliver(account_id, ids), name=f"mail-outbox-{account_id}")
+        self._active[account_id] = task
+
+        def done(task: asyncio.Task, account_id=account_id):
+            self._active.pop(account_id, None)
+            if not task.cancelled() and task.exception() is not None:
+                logger.error(f"Outbox delivery for account {account_id} failed: {task.exception()}")
+            # Puede haber más mensajes de la cuenta (más de un lote)
+            if self._wake is not None:
+                self._wake.set()
+        task.add_done_callback(done)
+
+    async def run_once(self) -> int:
+        """Reclamar y lanzar la entrega de lo pendiente; devuelve cuántos mensajes"""
+        claimed = await self._claim()
+        for account_id, ids in claimed.items():
+            self._launch(account_id, ids)
+        return sum(len(ids) for ids in claimed.values())
+
+    async def _loop(self):
+        while True:
+            self._wake.clear()
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Outbox tick failed: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.tick)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        if self.running or not self.enabled:
+            return
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._loop(), name="mail-outbox")
+        logger.info(f"Mail outbox started ({self.max_concurrent} accounts, {self.batch_size} messages per session)")
+
+    async def stop(self):
+        tasks = [task for task in (self._task, *self._active.values()) if task is not None]
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        self._wake = None
+        self._active.clear()
+        # Lo que quedó a medias vuelve a la cola para el siguiente arranque
+        try:
+            async with get_async_session_local()() as db:
+                await db.execute(
+                    update(MailOutbox)
+                    .where(MailOutbox.status == "sending", MailOutbox.claimed_by.like(f"{self.worker_id}-%"))
+                    .values(status="queued", claimed_by=None)
+                )
+                await db.commit()
+        except Exception as e:
+            logger.error(f"Could not release outbox messages: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "active_accounts": sorted(self._active),
+            "max_concurrent": self.max_concurrent,
+            "batch_size": self.batch_size,
+            "enqueued": self.enqueued,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+            "batches": self.batches,
+            "last_error": self.last_error,
+        }
+
+
+_mail = get_settings().mail
+smtp_pool = ConnectionPool(
+    factory=partial(SmtpClient.open, connect_timeout=_mail.connect_timeout),
+    max_per_account=_mail.smtp_pool_max_per_account,
+    idle_timeout=_mail.smtp_pool_idle_timeout,
+    health_after=_mail.smtp_pool_health_after,
+    acquire_timeout=_mail.smtp_pool_acquire_timeout,
+    timeout=_mail.smtp_timeout,
+    protocol="SMTP",
+)
+mail_outbox = MailOutboxQueue(
+    pool=smtp_pool,
+    root=_mail.outbox_dir,
+    tick=_mail.outbox_tick,
+    max_concurrent=_mail.outbox_max_concurrent,
+    batch_size=_mail.outbox_batch,
+    max_attempts=_mail.outbox_max_attempts,
+    backoff=_mail.outbox_backoff,
+    max_backoff=_mail.outbox_max_backoff,
+    enabled=_mail.outbox_enabled,
+)
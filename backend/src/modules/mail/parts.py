@@ -0,0 +1,246 @@
+"""
+MIME parts on demand
+Descarga de partes concretas de un mensaje (BODY.PEEK[sección], sin marcar
+como leído) en lugar del mensaje completo:
+
+- `fetch_texts` trae el texto/HTML del cuerpo en un solo UID FETCH.
+- `fetch_part` descarga una parte grande (adjunto) por tramos
+  (BODY.PEEK[sección]<inicio.longitud>) y la decodifica (base64 /
+  quoted-printable) tramo a tramo, sin tenerla entera en memoria.
+- `PartStore` guarda las partes en disco por su hash (sha256 del contenido
+  decodificado): un adjunto repetido en varios mensajes ocupa un solo fichero.
+- `fetch_snippets` saca el extracto del listado de un lote de mensajes nuevos
+  con solo el principio de su parte de texto (BODY.PEEK[sección]<0.N>).
+"""
+import asyncio
+import binascii
+import hashlib
+import html
+import logging
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from ...config.settings import get_settings
+from .envelope import BodyPart, walk_parts
+from .imap_client import ImapClient, ImapError, ImapTimeout
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = b" \t\r\n"
+
+SNIPPET_LENGTH = 200
+SNIPPET_BYTES = 2048  # principio de la parte de texto que se descarga (el HTML lleva marcado)
+
+_HTML_HIDDEN = re.compile(r"<(style|script|head)\b.*?(</\1\s*>|$)", re.IGNORECASE | re.DOTALL)
+_HTML_TAG = re.compile(r"<[^>]*(>|$)")
+_SPACES = re.compile(r"\s+")
+
+
+class PartDecoder:
+    """Decodificación incremental de Content-Transfer-Encoding"""
+
+    def __init__(self, encoding: str):
+        self.encoding = (encoding or "7bit").lower()
+        self._pending = b""
+
+    def feed(self, data: bytes) -> bytes:
+        if self.encoding == "base64":
+            data = self._pending + data.translate(None, _WHITESPACE)
+            usable = len(data) - len(data) % 4
+            self._pending = data[usable:]
+            return binascii.a2b_base64(data[:usable]) if usable else b""
+        if self.encoding == "quoted-printable":
+            # Solo líneas completas: un "=XX" o un salto suave no quedan partidos
+            data = self._pending + data
+            end = data.rfind(b"\n") + 1
+            self._pending = data[end:]
+            return binascii.a2b_qp(data[:end]) if end else b""
+        return data
+
+    def flush(self) -> bytes:
+        data, self._pending = self._pending, b""
+        if not data:
+            return b""
+        if self.encoding == "base64":
+            try:
+                return binascii.a2b_base64(data + b"=" * (-len(data) % 4))
+            except binascii.Error:  # resto truncado: no forma ningún byte
+                return b""
+        return binascii.a2b_qp(data)
+
+
+def decode_text(data: bytes, part: BodyPart) -> str:
+    decoder = PartDecoder(part.encoding)
+    raw = decoder.feed(data) + decoder.flush()
+    charset = part.params.get("CHARSET") or "utf-8"
+    try:
+        return raw.decode(charset, "replace")
+    except LookupError:  # charset desconocido
+        return raw.decode("utf-8", "replace")
+
+
+def _section_data(item: Dict[str, Any], section: str) -> bytes:
+    prefix = f"BODY[{section}]"
+    value = next((value for key, value in item.items() if key.startswith(prefix)), b"")
+    if isinstance(value, str):
+        return value.encode("utf-8")
+    return value or b""
+
+
+async def fetch_texts(imap: ImapClient, uid: int, parts: List[BodyPart]) -> Dict[str, str]:
+    """Texto decodificado de `parts` (sección -> texto) en un solo UID FETCH"""
+    if not parts:
+        return {}
+    items = await imap.fetch(str(uid), "(" + " ".join(f"BODY.PEEK[{part.section}]" for part in parts) + ")")
+    if not items:
+        raise ImapError(f"Message UID {uid} not found")
+    return {part.section: decode_text(_section_data(items[0], part.section), part) for part in parts}
+
+
+def snippet_part(bodystructure: Any) -> Optional[BodyPart]:
+    """Parte de la que sale el extracto: el primer text/plain del cuerpo o, si no hay, el primer text/html"""
+    texts = [
+        part for part in walk_parts(bodystructure)
+        if not part.is_attachment and part.type in ("text/plain", "text/html")
+    ]
+    return next((part for part in texts if part.type == "text/plain"), texts[0] if texts else None)
+
+
+def make_snippet(text: Optional[str], is_html: bool = False) -> str:
+    """Texto de una línea para el listado (sin marcado HTML, espacios colapsados)"""
+    if not text:
+        return ""
+    if is_html:
+        text = html.unescape(_HTML_TAG.sub(" ", _HTML_HIDDEN.sub(" ", text)))
+    # Un prefijo puede cortar un carácter multibyte: se descarta el resto inválido
+    text = _SPACES.sub(" ", text).strip().rstrip("\ufffd")
+    return text[:SNIPPET_LENGTH].rstrip()
+
+
+async def fetch_snippets(imap: ImapClient, items: List[Dict[str, Any]]) -> Dict[int, str]:
+    """Extracto (UID -> texto) de mensajes ya pedidos con BODYSTRUCTURE: un
+    UID FETCH del principio de la parte de texto por cada sección distinta
+    (casi siempre una o dos por lote). Un error del servidor deja los
+    extractos vacíos: no impide guardar los mensajes."""
+    by_section: Dict[str, List[Tuple[int, BodyPart]]] = {}
+    for item in items:
+        part = snippet_part(item.get("BODYSTRUCTURE"))
+        if part is not None:
+            by_section.setdefault(part.section, []).append((int(item["UID"]), part))
+    snippets: Dict[int, str] = {}
+    for section, parts in by_section.items():
+        uids = ",".join(str(uid) for uid, _ in parts)
+        try:
+            fetched = await imap.fetch(uids, f"(UID BODY.PEEK[{section}]<0.{SNIPPET_BYTES}>)")
+        except ImapTimeout:
+            raise
+        except ImapError as e:
+            logger.warning(f"Snippet fetch of section {section} failed: {e}")
+            continue
+        data = {int(item["UID"]): _section_data(item, section) for item in fetched if "UID" in item}
+        for uid, part in parts:
+            if uid in data:
+                snippets[uid] = make_snippet(decode_text(data[uid], part), part.type == "text/html")
+    return snippets
+
+
+async def fetch_part(imap: ImapClient, uid: int, part: BodyPart, chunk_size: int) -> AsyncIterator[bytes]:
+    """Contenido decodificado de una parte, pidiéndola por tramos de `chunk_size` bytes"""
+    decoder = PartDecoder(part.encoding)
+    offset = 0
+    while True:
+        items = await imap.fetch(str(uid), f"(BODY.PEEK[{part.section}]<{offset}.{chunk_size}>)")
+        if not items:
+            raise ImapError(f"Message UID {uid} not found")
+        data = _section_data(items[0], part.section)
+        decoded = decoder.feed(data)
+        if decoded:
+            yield decoded
+        offset += len(data)
+        # Un tramo incompleto es el último (el tamaño de BODYSTRUCTURE es orientativo)
+        if len(data) < chunk_size:
+            break
+    tail = decoder.flush()
+    if tail:
+        yield tail
+
+
+class PartStore:
+    """Ficheros por contenido: <root>/<2 primeros hex>/<sha256>"""
+
+    def __init__(self, root: str, chunk_size: int):
+        self.root = Path(root)
+        self.chunk_size = chunk_size
+        self.stored = 0
+        self.deduplicated = 0
+        self.bytes_written = 0
+
+    def path(self, relative: str) -> Path:
+        return self.root / relative
+
+    def exists(self, relative: Optional[str]) -> bool:
+        return bool(relative) and self.path(relative).is_file()
+
+    async def save(self, chunks: AsyncIterator[bytes]) -> Tuple[str, int]:
+        """Guardar un flujo de bytes; devuelve (ruta relativa, tamaño)"""
+        await asyncio.to_thread(self.root.mkdir, parents=True, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        fd, temp_path = await asyncio.to_thread(tempfile.mkstemp, dir=self.root, prefix=".part-")
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                async for chunk in chunks:
+                    digest.update(chunk)
+                    size += len(chunk)
+                    await asyncio.to_thread(handle.write, chunk)
+            relative = f"{digest.hexdigest()[:2]}/{digest.hexdigest()}"
+            stored = await asyncio.to_thread(self._commit, temp_path, self.path(relative))
+        except BaseException:
+            await asyncio.to_thread(_remove, temp_path)
+            raise
+        if stored:
+            self.stored += 1
+            self.bytes_written += size
+        else:
+            self.deduplicated += 1
+        return relative, size
+
+    @staticmethod
+    def _commit(temp_path: str, target: Path) -> bool:
+        if target.is_file():
+            os.remove(temp_path)  # mismo contenido ya guardado
+            return False
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(temp_path, target)
+        return True
+
+    def iter_file(self, relative: str) -> Iterator[bytes]:
+        """Lectura por tramos (StreamingResponse la recorre en el threadpool)"""
+        with open(self.path(relative), "rb") as handle:
+            while True:
+                chunk = handle.read(self.chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "root": str(self.root),
+            "stored": self.stored,
+            "deduplicated": self.deduplicated,
+            "bytes_written": self.bytes_written,
+        }
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+_mail = get_settings().mail
+part_store = PartStore(root=_mail.attachment_dir, chunk_size=_mail.fetch_chunk_size)
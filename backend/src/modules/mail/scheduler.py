@@ -0,0 +1,271 @@
+"""
+Mail sync scheduler
+Sincronización periódica de las cuentas con auto_sync, cada una según su
+sync_interval (minutos):
+
+- Jitter: cada ejecución se desplaza al azar ±`jitter` del intervalo para que
+  las cuentas no coincidan (p. ej. todas al arrancar).
+- Límite global de sincronizaciones simultáneas (`max_concurrent`).
+- Una sincronización por cuenta a la vez: si sigue en curso (o hay una manual
+  desde la API, u otro proceso la tiene reservada) no se lanza otra.
+- Tras un fallo se reintenta con espera exponencial (`backoff`, 2x, 4x...
+  hasta `max_backoff` segundos) en lugar de esperar al siguiente intervalo.
+- Una sincronización manual retrasa la siguiente (se cuenta desde last_sync).
+
+Se arranca desde el lifespan de main.py. Con varios procesos de API la reserva
+de la cuenta (sync.py) evita sincronizarla dos veces, pero todos revisan las
+cuentas; se puede desactivar (MAIL_SCHEDULER_ENABLED=false) y ejecutar uno aparte:
+
+    python -m src.modules.mail.scheduler
+"""
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from ...config.settings import get_settings
+from ...database.connection import get_async_session_local
+from ...database.models import MailAccount
+from .sync import SyncBusy, mail_sync
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _AccountSchedule:
+    interval: float                  # segundos
+    next_run: float                  # time.time()
+    running: bool = False
+    runs: int = 0
+    failures: int = 0                # fallos seguidos
+    last_error: Optional[str] = None
+    last_duration_ms: float = 0.0
+    last_lag: float = 0.0            # segundos entre la hora prevista y el inicio real
+    last_run_at: Optional[float] = None
+    last_success_at: Optional[float] = None
+    last_sync: Optional[float] = None   # MailAccount.last_sync visto en el último tick
+
+
+class MailSyncScheduler:
+    """Sincronización en segundo plano de las cuentas con auto_sync"""
+
+    def __init__(self, tick: float, max_concurrent: int, jitter: float, backoff: float,
+                 max_backoff: float, unit: float = 60.0, enabled: bool = True):
+        self.tick = tick
+        self.max_concurrent = max_concurrent
+        self.jitter = jitter
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.unit = unit  # segundos por unidad de sync_interval
+        self._accounts: Dict[int, _AccountSchedule] = {}
+        self._tasks: set = set()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._task: Optional[asyncio.Task] = None
+        self.enabled = enabled
+        self.runs = 0
+        self.failures = 0
+        self.skipped_busy = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def _jittered(self, seconds: float) -> float:
+        return seconds * (1 + random.uniform(-self.jitter, self.jitter))
+
+    async def _load_accounts(self) -> List[Tuple[int, float, Optional[float]]]:
+        """(id, intervalo en segundos, last_sync) de las cuentas a sincronizar"""
+        async with get_async_session_local()() as db:
+            rows = (await db.execute(
+                select(MailAccount.id, MailAccount.sync_interval, MailAccount.last_sync)
+                .where(MailAccount.is_active == True, MailAccount.auto_sync == True)
+            )).all()
+        return [
+            (account_id, max(1, interval or 15) * self.unit,
+             (last_sync - datetime.utcnow()).total_seconds() + time.time() if last_sync else None)
+            for account_id, interval, last_sync in rows
+        ]
+
+    async def _sync(self, account_id: int):
+        async with get_async_session_local()() as db:
+            account = await db.get(MailAccount, account_id)
+            if account is None:
+                return
+            await mail_sync.sync_account(db, account)
+
+    def _schedule(self, accounts: List[Tuple[int, float, Optional[float]]], now: float):
+        """Añadir cuentas nuevas, olvidar las desactivadas y recalcular la próxima ejecución"""
+        seen = set()
+        for account_id, interval, last_sync in accounts:
+            seen.add(account_id)
+            state = self._accounts.get(account_id)
+            if state is None:
+                # Primera vez: según last_sync; las atrasadas (p. ej. al arrancar) se
+                # reparten en los primeros ticks en lugar de lanzarse todas a la vez
+                due = last_sync + self._jittered(interval) if last_sync else now
+                if due <= now:
+                    due = now + random.uniform(0, min(interval, self.tick * 3))
+                self._accounts[account_id] = _AccountSchedule(interval=interval, next_run=due, last_sync=last_sync)
+                continue
+            if state.interval != interval:
+                state.interval = interval
+                state.next_run = min(state.next_run, (last_sync or now) + self._jittered(interval))
+            if last_sync and state.last_sync and last_sync > state.last_sync + 1 and not state.running:
+                # last_sync avanzó sin nosotros (sincronización manual desde la API):
+                # la siguiente se cuenta desde ella
+                state.next_run = max(state.next_run, last_sync + self._jittered(interval))
+            state.last_sync = last_sync
+        for account_id in list(self._accounts):
+            if account_id not in seen and not self._accounts[account_id].running:
+                del self._accounts[account_id]
+
+    async def _run_account(self, account_id: int, state: _AccountSchedule):
+        due = state.next_run
+        try:
+            async with self._semaphore:
+                start = time.time()
+                state.last_lag = max(0.0, start - due)
+                state.last_run_at = start
+                begin = time.perf_counter()
+                try:
+                    await self._sync(account_id)
+                except SyncBusy:
+                    # La sincroniza otro proceso: su last_sync fija la siguiente (_schedule)
+                    self.skipped_busy += 1
+                    state.next_run = time.time() + self.tick
+                except Exception as e:
+                    state.failures += 1
+                    state.last_error = str(e) or type(e).__name__
+                    self.failures += 1
+                    delay = min(self.max_backoff, self.backoff * 2 ** (state.failures - 1))
+                    state.next_run = time.time() + self._jittered(delay)
+                    logger.warning(f"Scheduled sync of account {account_id} failed "
+                                   f"({state.failures} in a row, retry in {delay:.0f}s): {e}")
+                else:
+                    state.failures = 0
+                    state.last_error = None
+                    state.last_success_at = state.last_sync = time.time()
+                    state.next_run = time.time() + self._jittered(state.interval)
+                finally:
+                    state.runs += 1
+                    state.last_duration_ms = (time.perf_counter() - begin) * 1000
+                    self.runs += 1
+        finally:
+            state.running = False
+
+    def run_due(self, now: float) -> int:
+        """Lanzar las cuentas cuya hora ha llegado; devuelve cuántas"""
+        launched = 0
+        for account_id, state in self._accounts.items():
+            if state.running or state.next_run > now:
+                continue
+            if mail_sync.is_running(account_id):
+                # Ya hay una sincronización (manual) en curso: volver a mirar en el próximo tick
+                self.skipped_busy += 1
+                continue
+            state.running = True
+            task = asyncio.create_task(self._run_account(account_id, state), name=f"mail-sync-{account_id}")
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            launched += 1
+        return launched
+
+    async def _loop(self):
+        while True:
+            try:
+                self._schedule(await self._load_accounts(), time.time())
+                self.run_due(time.time())
+            except Exception as e:
+                logger.error(f"Mail scheduler tick failed: {e}")
+            await asyncio.sleep(self.tick)
+
+    def start(self):
+        if self.running or not self.enabled or self.tick <= 0:
+            return
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self._task = asyncio.create_task(self._loop(), name="mail-sync-scheduler")
+        logger.info(f"Mail sync scheduler started (tick {self.tick}s, {self.max_concurrent} concurrent syncs)")
+
+    async def stop(self):
+        tasks = [task for task in (self._task, *self._tasks) if task is not None]
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        self._tasks.clear()
+
+    def account_stats(self, account_id: int) -> Optional[Dict[str, Any]]:
+        state = self._accounts.get(account_id)
+        if state is None:
+            return None
+        now = time.time()
+        return {
+            "running": state.running,
+            "runs": state.runs,
+            "next_run_in_s": round(max(0.0, state.next_run - now), 1),
+            "last_duration_ms": round(state.last_duration_ms, 1),
+            "last_lag_s": round(state.last_lag, 2),
+            "last_run_at": datetime.utcfromtimestamp(state.last_run_at).isoformat() if state.last_run_at else None,
+            "last_success_at": datetime.utcfromtimestamp(state.last_success_at).isoformat() if state.last_success_at else None,
+            "consecutive_failures": state.failures,
+            "last_error": state.last_error,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "active_syncs": sum(1 for state in self._accounts.values() if state.running),
+            "max_concurrent": self.max_concurrent,
+            "runs": self.runs,
+            "failures": self.failures,
+            "skipped_busy": self.skipped_busy,
+            "accounts": {account_id: self.account_stats(account_id) for account_id in sorted(self._accounts)},
+        }
+
+
+_mail = get_settings().mail
+mail_scheduler = MailSyncScheduler(
+    tick=_mail.scheduler_tick,
+    max_concurrent=_mail.scheduler_max_concurrent,
+    jitter=_mail.scheduler_jitter,
+    backoff=_mail.scheduler_backoff,
+    max_backoff=_mail.scheduler_max_backoff,
+    enabled=_mail.scheduler_enabled,
+)
+
+
+async def _main():
+    """Proceso aparte solo con el planificador (MAIL_SCHEDULER_ENABLED=false en la API)"""
+    from ...database.connection import dispose_engines
+    from .imap_pool import imap_pool
+
+    scheduler = MailSyncScheduler(
+        tick=_mail.scheduler_tick,
+        max_concurrent=_mail.scheduler_max_concurrent,
+        jitter=_mail.scheduler_jitter,
+        backoff=_mail.scheduler_backoff,
+        max_backoff=_mail.scheduler_max_backoff,
+    )
+    imap_pool.start()
+    scheduler.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await scheduler.stop()
+        await mail_sync.release_all()
+        await imap_pool.close()
+        await dispose_engines()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    asyncio.run(_main())
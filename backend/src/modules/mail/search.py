@@ -0,0 +1,57 @@
+"""
+Mail search
+Búsqueda local en los mensajes sincronizados (mail_messages) con el índice de
+texto completo MAIL_MESSAGE_SEARCH (asunto, remitente, extracto y cuerpo), sin
+pasar por IMAP.
+
+El índice se mantiene solo: InnoDB actualiza el FULLTEXT en cada INSERT/UPDATE
+y en SQLite lo hacen los triggers de la tabla FTS5. Los mensajes nuevos de la
+sincronización y los cuerpos guardados al abrir un mensaje entran al momento.
+"""
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import defer
+from sqlalchemy.sql import Select
+
+from ...database.models import MailMessage
+from ...database.search import MAIL_MESSAGE_SEARCH, ranked_search
+
+
+def search_query(
+    account_id: int,
+    text: str,
+    dialect_name: str,
+    folder_ids: Optional[List[int]] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    sort: str = "date",
+) -> Optional[Select]:
+    """SELECT de mensajes de la cuenta que contienen todas las palabras de
+    `text`. None si no hay nada que buscar.
+
+    sort="date": más recientes primero por orden de llegada (id), que el
+    índice resuelve sin ordenar todas las coincidencias; sort="relevance":
+    por relevancia, más caro con palabras muy frecuentes."""
+    ranked = ranked_search(MAIL_MESSAGE_SEARCH, text, dialect_name)
+    if ranked is None:
+        return None
+
+    # Los resultados muestran el extracto: los cuerpos no se leen
+    query = ranked.apply(
+        select(MailMessage).options(defer(MailMessage.body_text), defer(MailMessage.body_html))
+    ).where(
+        MailMessage.account_id == account_id,
+        MailMessage.is_deleted.isnot(True),
+    )
+    if folder_ids:
+        query = query.where(MailMessage.folder_id.in_(folder_ids))
+    if since is not None:
+        query = query.where(MailMessage.received_at >= since)
+    if until is not None:
+        query = query.where(MailMessage.received_at < until)
+
+    if sort == "relevance" and ranked.relevance is not None:
+        return query.order_by(ranked.relevance, ranked.latest)
+    return query.order_by(ranked.latest)
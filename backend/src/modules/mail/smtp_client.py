@@ -0,0 +1,282 @@
+"""
+Asyncio SMTP client
+Cliente SMTP/ESMTP sobre asyncio streams: TLS implícito (465) o STARTTLS
+(587), AUTH PLAIN/LOGIN y un plazo por operación. Un plazo vencido corta la
+conexión y lanza SmtpTimeout.
+
+Uso:
+    client = await SmtpClient.open(settings, timeout=30)
+    await client.send("yo@example.com", ["tu@example.com"], raw_message)
+    await client.send_file("yo@example.com", ["tu@example.com"], "mensaje.eml")
+    await client.quit()
+"""
+import asyncio
+import base64
+import logging
+import re
+import socket
+import ssl
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from .transport import default_ssl_context
+
+logger = logging.getLogger(__name__)
+
+_LINE_START_DOT = re.compile(rb"(?m)^\.")
+_BARE_NEWLINE = re.compile(rb"\r\n|\r|\n")
+_DATA_CHUNK = 64 * 1024  # send_file: bytes leídos (líneas completas) por escritura
+
+
+class SmtpError(Exception):
+    """Respuesta inesperada del servidor SMTP"""
+
+    def __init__(self, message: str, code: Optional[int] = None):
+        super().__init__(message)
+        self.code = code
+
+
+class SmtpTimeout(SmtpError):
+    """El servidor no respondió dentro del plazo de la operación"""
+
+
+class SmtpClient:
+    """Conexión SMTP; los comandos se serializan (uno en vuelo cada vez)"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                 host: str, timeout: float):
+        self.reader = reader
+        self.writer = writer
+        self.host = host
+        self.timeout = timeout
+        self.extensions: Dict[str, str] = {}
+        self.closed = False
+        self.transactions = 0  # mensajes enviados por esta conexión
+        self._lock = asyncio.Lock()
+
+    # Conexión
+
+    @classmethod
+    async def connect(cls, host: str, port: int, use_ssl: bool = False, starttls: bool = False,
+                      timeout: float = 30, connect_timeout: Optional[float] = None,
+                      ssl_context: Optional[ssl.SSLContext] = None) -> "SmtpClient":
+        """Conexión, saludo, EHLO y STARTTLS dentro de `connect_timeout`"""
+        context = ssl_context or default_ssl_context()
+        deadline = connect_timeout or timeout
+
+        async def establish() -> "SmtpClient":
+            reader, writer = await asyncio.open_connection(
+                host, port, ssl=context if use_ssl else None,
+                server_hostname=host if use_ssl else None,
+            )
+            client = cls(reader, writer, host, timeout)
+            try:
+                code, lines = await client._read_reply()
+                if code != 220:
+                    raise SmtpError(f"Server refused connection: {code} {' '.join(lines)}", code)
+                await client._ehlo()
+                if starttls:
+                    if "STARTTLS" not in client.extensions:
+                        raise SmtpError("Server does not support STARTTLS")
+                    await client._execute("STARTTLS", expect=(220,))
+                    await writer.start_tls(context, server_hostname=host)
+                    await client._ehlo()
+                return client
+            except BaseException:
+                client._abort()
+                raise
+
+        try:
+            return await asyncio.wait_for(establish(), timeout=deadline)
+        except asyncio.TimeoutError:
+            raise SmtpTimeout(f"SMTP connect to {host}:{port} timed out after {deadline}s")
+        except (OSError, ssl.SSLError) as e:
+            raise SmtpError(f"SMTP connect to {host}:{port} failed: {e}") from e
+
+    @classmethod
+    async def open(cls, settings, timeout: float, connect_timeout: Optional[float] = None) -> "SmtpClient":
+        """Conexión autenticada a partir de ServerSettings (server, port, ssl, username, password)"""
+        implicit_tls = settings.ssl and settings.port == 465
+        client = await cls.connect(
+            settings.server, settings.port,
+            use_ssl=implicit_tls,
+            starttls=not implicit_tls and (settings.ssl or settings.port == 587),
+            timeout=timeout, connect_timeout=connect_timeout,
+        )
+        try:
+            if settings.username:
+                await client.login(settings.username, settings.password)
+        except BaseException:
+            client._abort()
+            raise
+        return client
+
+    def _abort(self):
+        self.closed = True
+        try:
+            self.writer.close()
+        except Exception:
+            pass
+
+    # Protocolo
+
+    async def _read_reply(self) -> Tuple[int, List[str]]:
+        lines = []
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                self._abort()
+                raise SmtpError("Connection closed by server")
+            text = line.decode("utf-8", "replace").rstrip("\r\n")
+            if len(text) < 3 or not text[:3].isdigit():
+                raise SmtpError(f"Malformed reply: {text!r}")
+            lines.append(text[4:])
+            if len(text) == 3 or text[3] != "-":
+                return int(text[:3]), lines
+
+    async def _execute(self, line: Optional[str], expect: Sequence[int] = (250,),
+                       raw: Optional[bytes] = None) -> Tuple[int, List[str]]:
+        if raw is not None:
+            self.writer.write(raw)
+        if line is not None:
+            self.writer.write(line.encode("utf-8") + b"\r\n")
+        await self.writer.drain()
+        code, lines = await self._read_reply()
+        if code not in expect:
+            verb = (line or "DATA").split(" ", 1)[0]
+            raise SmtpError(f"{verb} failed: {code} {' '.join(lines)}", code)
+        return code, lines
+
+    async def _ehlo(self):
+        # gethostname no hace consultas DNS (getfqdn podría bloquear el loop)
+        code, lines = await self._execute(f"EHLO {socket.gethostname() or 'localhost'}")
+        self.extensions = {}
+        for line in lines[1:]:
+            name, _, params = line.partition(" ")
+            self.extensions[name.upper()] = params
+
+    async def command(self, line: Optional[str], expect: Sequence[int] = (250,),
+                      timeout: Optional[float] = None, raw: Optional[bytes] = None) -> Tuple[int, List[str]]:
+        """Ejecutar un comando con su plazo; un plazo vencido deja la conexión cerrada"""
+        if self.closed:
+            raise SmtpError("Connection is closed")
+        deadline = timeout or self.timeout
+        verb = (line or "DATA").split(" ", 1)[0]
+        async with self._lock:
+            try:
+                return await asyncio.wait_for(self._execute(line, expect, raw), timeout=deadline)
+            except asyncio.TimeoutError:
+                self._abort()
+                raise SmtpTimeout(f"SMTP {verb} timed out after {deadline}s")
+            except (OSError, asyncio.IncompleteReadError) as e:
+                self._abort()
+                raise SmtpError(f"SMTP connection lost during {verb}: {e}") from e
+
+    # Comandos
+
+    async def login(self, username: str, password: str):
+        mechanisms = set(self.extensions.get("AUTH", "").upper().split())
+        if "PLAIN" in mechanisms or not mechanisms:
+            token = base64.b64encode(f"\0{username}\0{password}".encode("utf-8")).decode("ascii")
+            await self.command(f"AUTH PLAIN {token}", expect=(235,))
+        else:
+            await self.command("AUTH LOGIN", expect=(334,))
+            try:
+                await self.command(base64.b64encode(username.encode("utf-8")).decode("ascii"), expect=(334,))
+                await self.command(base64.b64encode(password.encode("utf-8")).decode("ascii"), expect=(235,))
+            except SmtpTimeout:
+                raise
+            except SmtpError as e:
+                # El mensaje original llevaría las credenciales en base64
+                raise SmtpError(f"AUTH failed: {e.code}", e.code) from None
+
+    async def noop(self) -> bool:
+        try:
+            await self.command("NOOP")
+            return True
+        except SmtpError:
+            return False
+
+    async def rset(self):
+        await self.command("RSET")
+
+    async def quit(self, timeout: float = 5):
+        if self.closed:
+            return
+        try:
+            await self.command("QUIT", expect=(221,), timeout=timeout)
+        except SmtpError:
+            pass
+        finally:
+            self._abort()
+
+    async def logout(self, timeout: float = 5):
+        """QUIT con el nombre que usa el pool de sesiones (ConnectionPool)"""
+        await self.quit(timeout)
+
+    async def _envelope(self, sender: str, recipients: Iterable[str]) -> Dict[str, str]:
+        """MAIL FROM y RCPT TO; devuelve los rechazados (si se rechazan todos lanza SmtpError)"""
+        await self.command(f"MAIL FROM:<{sender}>")
+        refused: Dict[str, str] = {}
+        codes: List[int] = []
+        recipients = list(recipients)
+        for recipient in recipients:
+            try:
+                await self.command(f"RCPT TO:<{recipient}>", expect=(250, 251))
+            except SmtpTimeout:
+                raise
+            except SmtpError as e:
+                refused[recipient] = str(e)
+                codes.append(e.code or 451)
+        if len(refused) == len(recipients):
+            await self.rset()
+            # 5xx solo si todos los rechazos son definitivos; un 4xx merece reintento
+            raise SmtpError(f"All recipients were refused: {refused}", min(codes, default=None))
+        return refused
+
+    async def send(self, sender: str, recipients: Iterable[str], message: bytes,
+                   timeout: Optional[float] = None) -> Dict[str, str]:
+        """Enviar un mensaje ya serializado. Devuelve los destinatarios rechazados
+        (si al menos uno se acepta); si se rechazan todos lanza SmtpError."""
+        refused = await self._envelope(sender, recipients)
+        await self.command("DATA", expect=(354,))
+        # CRLF en todas las líneas y "dot-stuffing" (RFC 5321 4.5.2)
+        body = _LINE_START_DOT.sub(b"..", _BARE_NEWLINE.sub(b"\r\n", message))
+        if not body.endswith(b"\r\n"):
+            body += b"\r\n"
+        await self.command(None, raw=body + b".\r\n", timeout=timeout)
+        self.transactions += 1
+        return refused
+
+    async def send_file(self, sender: str, recipients: Iterable[str], path: Union[str, Path],
+                        timeout: Optional[float] = None) -> Dict[str, str]:
+        """Como `send`, leyendo el mensaje de `path` por bloques (memoria constante
+        sea cual sea el tamaño). `timeout` es el plazo de cada bloque y de la
+        respuesta final, no de la transferencia entera."""
+        handle = await asyncio.to_thread(open, path, "rb")
+        try:
+            refused = await self._envelope(sender, recipients)
+            await self.command("DATA", expect=(354,))
+            deadline = timeout or self.timeout
+            async with self._lock:
+                try:
+                    while True:
+                        lines = await asyncio.to_thread(handle.readlines, _DATA_CHUNK)
+                        if not lines:
+                            break
+                        self.writer.write(b"".join(
+                            (b"." if line.startswith(b".") else b"") + line.rstrip(b"\r\n") + b"\r\n"
+                            for line in lines
+                        ))
+                        await asyncio.wait_for(self.writer.drain(), timeout=deadline)
+                except asyncio.TimeoutError:
+                    self._abort()
+                    raise SmtpTimeout(f"SMTP DATA timed out after {deadline}s")
+                except OSError as e:
+                    self._abort()
+                    raise SmtpError(f"SMTP connection lost during DATA: {e}") from e
+            await self.command(None, raw=b".\r\n", timeout=timeout)
+        finally:
+            await asyncio.to_thread(handle.close)
+        self.transactions += 1
+        return refused
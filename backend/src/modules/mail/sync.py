@@ -0,0 +1,608 @@
+"""
+IMAP incremental sync
+Sincroniza las carpetas y mensajes de una cuenta en mail_folders /
+mail_messages sin volver a leer el buzón completo:
+
+- Por carpeta se guarda UIDVALIDITY, el último UID visto y HIGHESTMODSEQ.
+- Mensajes nuevos: UID SEARCH de los UIDs posteriores al último visto y
+  UID FETCH por lotes (cabeceras, flags, fecha, tamaño y BODYSTRUCTURE para
+  saber si hay adjuntos), más el principio de la parte de texto para el
+  extracto del listado, con commit por lote.
+- Cambios de flags: con CONDSTORE solo si HIGHESTMODSEQ cambió, pidiendo
+  únicamente lo modificado (CHANGEDSINCE); sin CONDSTORE se comparan los
+  flags de todos los mensajes conocidos.
+- Borrados en el servidor: solo si el número de mensajes no coincide con el
+  local se compara la lista de UIDs.
+- Si UIDVALIDITY cambia, los UIDs guardados ya no son válidos: se borran los
+  mensajes de la carpeta y se resincroniza completa.
+
+En estado estable (sin cambios) cada carpeta cuesta un EXAMINE.
+
+Cada carpeta que cambia se publica como evento `folder_changed` para los
+navegadores del dueño de la cuenta (events.py), venga la sincronización de
+la API, del planificador o de IDLE.
+
+Los mensajes nuevos se asignan a su conversación al insertarlos (threads.py)
+y los contadores de carpeta y cuenta se actualizan en la misma transacción
+que cada cambio (counters.py).
+
+Una sincronización por cuenta a la vez, también entre procesos (varios
+workers de uvicorn, el planificador aparte): además del lock local, la cuenta
+se reserva con un UPDATE condicionado de mail_accounts.sync_claimed_by, como
+los mensajes de la cola de envío (outbox.py). Si otro proceso la tiene, se
+lanza SyncBusy. Aun así (folder_id, uid) es único y los mensajes nuevos se
+insertan sin pisar los que ya existan: los contadores solo cuentan las filas
+insertadas de verdad.
+"""
+import asyncio
+import email.policy
+import itertools
+import logging
+import os
+import socket
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from email.parser import BytesHeaderParser
+from email.utils import getaddresses, parsedate_to_datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import bindparam, delete, func, insert, or_, select, update
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...config.settings import get_settings
+from ...database.connection import get_async_session_local
+from ...database.models import MailAccount, MailAttachment, MailFolder, MailMessage
+from .counters import CounterDeltas, is_unread, reconcile_account, release_folder, unread_sum
+from .envelope import has_attachments
+from .events import mail_events
+from .imap_client import ImapClient, ImapError, ImapTimeout, MailboxInfo
+from .imap_pool import imap_pool
+from .parts import fetch_snippets
+from .threads import assign_threads, backfill_threads, refresh_threads
+from .transport import ConnectionSettings
+
+logger = logging.getLogger(__name__)
+
+HEADER_FIELDS = ("MESSAGE-ID", "DATE", "FROM", "TO", "CC", "REPLY-TO", "SUBJECT", "IN-REPLY-TO", "REFERENCES")
+NEW_MESSAGE_ITEMS = f"(UID FLAGS INTERNALDATE RFC822.SIZE BODYSTRUCTURE BODY.PEEK[HEADER.FIELDS ({' '.join(HEADER_FIELDS)})])"
+
+FLAG_COLUMNS = ("is_read", "is_starred", "is_flagged", "is_deleted", "is_important")
+
+# Atributos SPECIAL-USE (RFC 6154) -> MailFolder.type
+SPECIAL_USE = {
+    "\\sent": "sent",
+    "\\drafts": "drafts",
+    "\\trash": "trash",
+    "\\junk": "spam",
+    "\\archive": "archive",
+    "\\all": "archive",
+}
+
+_headers = BytesHeaderParser(policy=email.policy.default)
+
+
+class SyncBusy(Exception):
+    """Otro proceso está sincronizando la cuenta"""
+
+
+@dataclass
+class FolderSyncResult:
+    path: str
+    folder_id: Optional[int] = None
+    new: int = 0
+    updated: int = 0
+    deleted: int = 0
+    full_resync: bool = False
+    error: Optional[str] = None
+    total_count: int = 0
+    unread_count: int = 0
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.new or self.updated or self.deleted or self.full_resync)
+
+
+@dataclass
+class AccountSyncResult:
+    account_id: int
+    folders: List[FolderSyncResult] = field(default_factory=list)
+    duration_ms: float = 0.0
+
+    @property
+    def new(self) -> int:
+        return sum(f.new for f in self.folders)
+
+    @property
+    def updated(self) -> int:
+        return sum(f.updated for f in self.folders)
+
+    @property
+    def deleted(self) -> int:
+        return sum(f.deleted for f in self.folders)
+
+
+# Conversión de datos IMAP a columnas
+
+def _utc_naive(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def internal_date(value: Any) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return _utc_naive(datetime.strptime(str(value).strip(), "%d-%b-%Y %H:%M:%S %z"))
+    except ValueError:
+        return None
+
+
+def _header_date(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return _utc_naive(parsedate_to_datetime(str(value)))
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def _addresses(value) -> List[Dict[str, str]]:
+    if not value:
+        return []
+    return [{"name": name, "email": address} for name, address in getaddresses([str(value)]) if address]
+
+
+def _header(message, name: str) -> Optional[str]:
+    try:
+        value = message[name]
+    except Exception:  # cabecera mal formada: se ignora
+        return None
+    return str(value).strip() if value is not None else None
+
+
+def flag_values(flags: Iterable[str]) -> Dict[str, bool]:
+    """Flags IMAP -> columnas de MailMessage (IMAP solo tiene \\Flagged para destacado y marcado)"""
+    flags = {str(flag).lower() for flag in flags or ()}
+    return {
+        "is_read": "\\seen" in flags,
+        "is_starred": "\\flagged" in flags,
+        "is_flagged": "\\flagged" in flags,
+        "is_deleted": "\\deleted" in flags,
+        "is_important": "$important" in flags or "\\important" in flags,
+    }
+
+
+def message_row(account_id: int, folder: MailFolder, item: Dict[str, Any], snippet: str = "") -> Dict[str, Any]:
+    """Fila de mail_messages a partir de un UID FETCH de mensaje nuevo"""
+    raw = next((value for key, value in item.items() if key.startswith("BODY[HEADER")), b"") or b""
+    headers = _headers.parsebytes(raw if isinstance(raw, bytes) else str(raw).encode("utf-8"))
+    sender = _addresses(_header(headers, "From"))
+    reply_to = _addresses(_header(headers, "Reply-To"))
+    sent_at = _header_date(_header(headers, "Date"))
+    in_reply_to = _header(headers, "In-Reply-To")
+    uid = int(item["UID"])
+    return {
+        "account_id": account_id,
+        "folder_id": folder.id,
+        "message_id": (_header(headers, "Message-ID") or f"<{folder.uid_validity}.{uid}@imap>")[:500],
+        "uid": str(uid),
+        "subject": _header(headers, "Subject"),
+        "from_name": (sender[0]["name"] if sender else None) or None,
+        "from_email": (sender[0]["email"] if sender else "")[:200],
+        "to_addresses": _addresses(_header(headers, "To")),
+        "cc_addresses": _addresses(_header(headers, "Cc")),
+        "reply_to_email": reply_to[0]["email"][:200] if reply_to else None,
+        "in_reply_to": in_reply_to[:500] if in_reply_to else None,
+        "references": _header(headers, "References"),
+        "size_bytes": int(item.get("RFC822.SIZE") or 0),
+        "has_attachments": has_attachments(item.get("BODYSTRUCTURE")),
+        "snippet": snippet,
+        "sent_at": sent_at,
+        "received_at": internal_date(item.get("INTERNALDATE")) or sent_at or datetime.utcnow(),
+        **flag_values(item.get("FLAGS") or ()),
+    }
+
+
+def uid_set(uids: Sequence[int]) -> str:
+    """UIDs ordenados -> conjunto IMAP compacto ("1:5,9,12:14")"""
+    parts = []
+    start = previous = None
+    for uid in uids:
+        if start is None:
+            start = previous = uid
+        elif uid == previous + 1:
+            previous = uid
+        else:
+            parts.append(f"{start}:{previous}" if previous != start else str(start))
+            start = previous = uid
+    if start is not None:
+        parts.append(f"{start}:{previous}" if previous != start else str(start))
+    return ",".join(parts)
+
+
+def folder_event(account_id: int, result: FolderSyncResult) -> Dict[str, Any]:
+    """Evento para el frontend: qué carpeta refrescar y sus contadores"""
+    return {
+        "type": "folder_changed",
+        "accountId": account_id,
+        "folderId": result.folder_id,
+        "path": result.path,
+        "newMessages": result.new,
+        "updatedMessages": result.updated,
+        "deletedMessages": result.deleted,
+        "fullResync": result.full_resync,
+        "totalCount": result.total_count,
+        "unreadCount": result.unread_count,
+    }
+
+
+def _chunks(items: Sequence, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def folder_type(mailbox: MailboxInfo) -> str:
+    if mailbox.name.upper() == "INBOX":
+        return "inbox"
+    for flag in mailbox.flags:
+        kind = SPECIAL_USE.get(flag.lower())
+        if kind:
+            return kind
+    return "custom"
+
+
+class MailSync:
+    """Motor de sincronización incremental (una sincronización por cuenta a la vez)"""
+
+    def __init__(self, pool, batch_size: int, lease_timeout: float = 900):
+        self.pool = pool
+        self.batch_size = batch_size
+        self.lease_timeout = lease_timeout
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}"
+        self._claims = itertools.count(1)
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self.busy = 0
+        self.duplicates_skipped = 0
+        self.syncs = 0
+        self.folders_synced = 0
+        self.folders_unchanged = 0
+        self.messages_fetched = 0
+        self.flags_updated = 0
+        self.messages_deleted = 0
+        self.full_resyncs = 0
+        self.errors = 0
+        self.last_duration_ms = 0.0
+
+    def lock(self, account_id: int) -> asyncio.Lock:
+        """Lock de la cuenta: una sincronización (o reconciliación de contadores) a la vez"""
+        return self._locks.setdefault(account_id, asyncio.Lock())
+
+    def is_running(self, account_id: int) -> bool:
+        lock = self._locks.get(account_id)
+        return lock is not None and lock.locked()
+
+    async def _lease(self, account_id: int, token: str) -> bool:
+        """Reservar (o renovar) la cuenta para `token` si está libre, es suya o la
+        reserva caducó; con su propio commit, fuera de la sesión de la sincronización"""
+        now = datetime.utcnow()
+        async with get_async_session_local()() as db:
+            result = await db.execute(
+                update(MailAccount)
+                .where(MailAccount.id == account_id,
+                       or_(MailAccount.sync_claimed_by.is_(None),
+                           MailAccount.sync_claimed_by == token,
+                           MailAccount.sync_claimed_at < now - timedelta(seconds=self.lease_timeout)))
+                .values(sync_claimed_by=token, sync_claimed_at=now)
+            )
+            await db.commit()
+        return result.rowcount == 1
+
+    async def _release(self, condition):
+        async with get_async_session_local()() as db:
+            await db.execute(update(MailAccount).where(condition).values(sync_claimed_by=None))
+            await db.commit()
+
+    @asynccontextmanager
+    async def claim(self, account_id: int, db: Optional[AsyncSession] = None):
+        """Lock local de la cuenta más su reserva en la base (devuelve el token,
+        para renovarla con _lease). SyncBusy si la tiene otro proceso. Tras un
+        error se deshace la transacción de `db` antes de soltar la reserva: sus
+        UPDATE de los contadores de la cuenta bloquearían la fila"""
+        async with self.lock(account_id):
+            token = f"{self.worker_id}-{next(self._claims)}"
+            if not await self._lease(account_id, token):
+                self.busy += 1
+                raise SyncBusy(f"account {account_id} is being synced by another process")
+            try:
+                yield token
+            except BaseException:
+                if db is not None:
+                    await db.rollback()
+                raise
+            finally:
+                try:
+                    await self._release((MailAccount.id == account_id) & (MailAccount.sync_claimed_by == token))
+                except Exception as e:
+                    logger.error(f"Could not release sync lease of account {account_id}: {e}")
+
+    async def release_all(self):
+        """Soltar las reservas de este proceso (al parar)"""
+        try:
+            await self._release(MailAccount.sync_claimed_by.like(f"{self.worker_id}-%"))
+        except Exception as e:
+            logger.error(f"Could not release sync leases: {e}")
+
+    async def sync_account(self, db: AsyncSession, account: MailAccount,
+                           paths: Optional[Sequence[str]] = None, full: bool = False) -> AccountSyncResult:
+        """Sincronizar la cuenta (todas las carpetas, o solo `paths`)"""
+        async with self.claim(account.id, db) as token:
+            start = time.perf_counter()
+            result = AccountSyncResult(account_id=account.id)
+            async with self.pool.session(ConnectionSettings.imap(account)) as imap:
+                if paths is None:
+                    folders = await self.sync_folders(db, account, imap)
+                else:
+                    folders = (await db.execute(
+                        select(MailFolder).where(MailFolder.account_id == account.id, MailFolder.path.in_(paths))
+                    )).scalars().all()
+                for folder in folders:
+                    if not folder.is_selectable:
+                        continue
+                    # Renovar la reserva: si caducó y la tomó otro proceso, parar aquí
+                    if not await self._lease(account.id, token):
+                        self.busy += 1
+                        raise SyncBusy(f"sync lease of account {account.id} was taken over by another process")
+                    try:
+                        result.folders.append(await self.sync_folder(db, account, folder, imap, full=full))
+                    except ImapTimeout:
+                        raise
+                    except ImapError as e:
+                        # Una carpeta que el servidor rechaza no impide sincronizar las demás
+                        self.errors += 1
+                        logger.warning(f"Sync of {folder.path} (account {account.id}) failed: {e}")
+                        await db.rollback()
+                        result.folders.append(FolderSyncResult(path=folder.path, error=str(e)))
+
+            # Mensajes guardados antes de existir las conversaciones (un lote por sincronización)
+            await backfill_threads(db, account.id)
+
+            account.last_sync = datetime.utcnow()
+            await db.commit()
+            await db.refresh(account, ["total_count", "unread_count"])
+
+            result.duration_ms = (time.perf_counter() - start) * 1000
+            self.syncs += 1
+            for folder_result in result.folders:
+                if folder_result.changed:
+                    mail_events.publish(account.user_id, folder_event(account.id, folder_result))
+            self.last_duration_ms = round(result.duration_ms, 1)
+            return result
+
+    async def sync_folders(self, db: AsyncSession, account: MailAccount, imap: ImapClient) -> List[MailFolder]:
+        """LIST del servidor -> filas de mail_folders (altas, atributos y bajas)"""
+        mailboxes = await imap.list()
+        existing = {
+            folder.path: folder for folder in (await db.execute(
+                select(MailFolder).where(MailFolder.account_id == account.id)
+            )).scalars()
+        }
+        folders = []
+        for mailbox in mailboxes:
+            folder = existing.pop(mailbox.name, None)
+            attributes = sorted(mailbox.flags)
+            if folder is None:
+                name = mailbox.name.rsplit(mailbox.delimiter, 1)[-1] if mailbox.delimiter else mailbox.name
+                folder = MailFolder(
+                    account_id=account.id,
+                    name=name,
+                    display_name=name.replace("INBOX", "Bandeja de entrada"),
+                    type=folder_type(mailbox),
+                    path=mailbox.name,
+                    attributes=attributes,
+                    is_selectable=mailbox.selectable,
+                    last_seen_uid=0,
+                )
+                db.add(folder)
+            elif folder.attributes != attributes or folder.is_selectable != mailbox.selectable:
+                folder.attributes = attributes
+                folder.is_selectable = mailbox.selectable
+            folders.append(folder)
+
+        # Carpetas que ya no existen en el servidor
+        for folder in existing.values():
+            await self._delete_messages(db, MailMessage.folder_id == folder.id)
+            await release_folder(db, account.id, folder.id)
+            await db.execute(delete(MailFolder).where(MailFolder.id == folder.id))
+            db.expunge(folder)
+        await db.commit()
+        return folders
+
+    async def sync_folder(self, db: AsyncSession, account: MailAccount, folder: MailFolder,
+                          imap: ImapClient, full: bool = False) -> FolderSyncResult:
+        result = FolderSyncResult(path=folder.path, folder_id=folder.id)
+        condstore = await imap.has_capability("CONDSTORE")
+        info = await imap.select(folder.path, readonly=True, condstore=condstore)
+
+        # UIDVALIDITY distinto: los UIDs guardados ya no identifican los mensajes
+        if full or folder.uid_validity != info.uidvalidity:
+            if folder.uid_validity is not None or full:
+                result.deleted += await self._delete_messages(db, MailMessage.folder_id == folder.id)
+                result.full_resync = True
+                self.full_resyncs += 1
+            # Desde cero: lo que quede (p. ej. contadores de STATUS) sale también de la cuenta
+            await release_folder(db, account.id, folder.id)
+            folder.uid_validity = info.uidvalidity
+            folder.last_seen_uid = 0
+            folder.highest_modseq = None
+
+        last_uid = folder.last_seen_uid or 0
+        modseq = info.highestmodseq if condstore else None
+
+        # 1. Cambios de flags en mensajes ya conocidos
+        if last_uid:
+            if modseq is not None and folder.highest_modseq is not None:
+                if modseq != folder.highest_modseq:
+                    changes = await imap.fetch(f"1:{last_uid}", "(UID FLAGS)", changedsince=folder.highest_modseq)
+                    result.updated += await self._apply_flags(db, account.id, folder.id, changes)
+            else:
+                changes = await imap.fetch(f"1:{last_uid}", "(UID FLAGS)")
+                result.updated += await self._apply_flags(db, account.id, folder.id, changes)
+
+        # 2. Mensajes nuevos (UIDNEXT indica si los hay sin preguntar)
+        if info.uidnext is None or info.uidnext > last_uid + 1:
+            new_uids = sorted(uid for uid in await imap.search(f"UID {last_uid + 1}:*", uid=True) if uid > last_uid)
+            for batch in _chunks(new_uids, self.batch_size):
+                items = [item for item in await imap.fetch(uid_set(batch), NEW_MESSAGE_ITEMS) if int(item["UID"]) > last_uid]
+                snippets = await fetch_snippets(imap, items)
+                rows = [message_row(account.id, folder, item, snippets.get(int(item["UID"]), "")) for item in items]
+                if rows:
+                    rows = await self._new_rows(db, folder.id, rows)
+                inserted = rows
+                if rows:
+                    await assign_threads(db, account.id, rows)
+                    inserted = await self._insert(db, rows)
+                    if inserted:
+                        deltas = CounterDeltas()
+                        deltas.add_rows(inserted)
+                        await deltas.apply(db)
+                result.new += len(rows if inserted is None else inserted)
+                # Progreso persistente: si la sincronización se corta, la siguiente continúa desde aquí
+                folder.last_seen_uid = last_uid = max(batch[-1], last_uid)
+                await db.commit()
+                if inserted is None:
+                    # No se sabe qué filas entraron: contadores recalculados desde mail_messages
+                    await reconcile_account(db, account.id)
+
+        # 3. Mensajes borrados en el servidor (solo si los totales no cuadran).
+        # total_count es el número de filas locales (counters.py), sin COUNT
+        await db.refresh(folder, ["total_count", "unread_count"])
+        if last_uid and info.exists != (folder.total_count or 0):
+            server_uids = {str(uid) for uid in await imap.search(f"UID 1:{last_uid}", uid=True)}
+            local_uids = (await db.execute(
+                select(MailMessage.id, MailMessage.uid).where(MailMessage.folder_id == folder.id)
+            )).all()
+            gone = [row.id for row in local_uids if row.uid not in server_uids]
+            for chunk in _chunks(gone, 500):
+                result.deleted += await self._delete_messages(db, MailMessage.id.in_(chunk))
+            if gone:
+                await db.refresh(folder, ["total_count", "unread_count"])
+
+        folder.highest_modseq = modseq
+        folder.last_sync = folder.status_checked_at = datetime.utcnow()
+        await db.commit()
+        result.total_count, result.unread_count = folder.total_count or 0, folder.unread_count or 0
+
+        self.folders_synced += 1
+        if not result.changed:
+            self.folders_unchanged += 1
+        self.messages_fetched += result.new
+        self.flags_updated += result.updated
+        self.messages_deleted += result.deleted
+        return result
+
+    async def _new_rows(self, db: AsyncSession, folder_id: int, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Quitar de `rows` los UIDs que ya están guardados en la carpeta"""
+        known = set((await db.execute(
+            select(MailMessage.uid).where(MailMessage.folder_id == folder_id,
+                                          MailMessage.uid.in_([row["uid"] for row in rows]))
+        )).scalars())
+        if known:
+            self.duplicates_skipped += len(known)
+            rows = [row for row in rows if row["uid"] not in known]
+        return rows
+
+    async def _insert(self, db: AsyncSession, rows: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+        """INSERT que omite los (folder_id, uid) ya existentes (los acaba de
+        insertar otro proceso). Devuelve las filas insertadas, o None si el
+        backend solo da el número (MySQL) y no coincide"""
+        if db.get_bind().dialect.name == "sqlite":
+            statement = sqlite.insert(MailMessage).on_conflict_do_nothing().returning(MailMessage.uid)
+            uids = set((await db.execute(statement, rows)).scalars())
+            inserted = [row for row in rows if row["uid"] in uids]
+            skipped = len(rows) - len(inserted)
+        else:
+            # MySQL: INSERT IGNORE solo dice cuántas filas insertó
+            result = await db.execute(insert(MailMessage).prefix_with("IGNORE"), rows)
+            skipped = len(rows) - result.rowcount
+            inserted = None if skipped else rows
+        if skipped:
+            self.duplicates_skipped += skipped
+            logger.warning(f"Skipped {skipped} mail messages already inserted by another process")
+        return inserted
+
+    async def _apply_flags(self, db: AsyncSession, account_id: int, folder_id: int,
+                           changes: List[Dict[str, Any]]) -> int:
+        if not changes:
+            return 0
+        flags_by_uid = {str(item["UID"]): flag_values(item.get("FLAGS") or ()) for item in changes}
+        table = MailMessage.__table__
+        statement = (
+            update(table)
+            .where(table.c.id == bindparam("_id"))
+            .values({column: bindparam(column) for column in FLAG_COLUMNS})
+        )
+        updated = 0
+        deltas = CounterDeltas()
+        for chunk in _chunks(list(flags_by_uid), 500):
+            rows = (await db.execute(
+                select(table.c.id, table.c.uid, *(table.c[column] for column in FLAG_COLUMNS))
+                .where(table.c.folder_id == folder_id, table.c.uid.in_(chunk))
+            )).all()
+            params = []
+            for row in rows:
+                flags = flags_by_uid[row.uid]
+                if any(bool(getattr(row, column)) != flags[column] for column in FLAG_COLUMNS):
+                    params.append({"_id": row.id, **flags})
+                    deltas.add(account_id, folder_id, unread=is_unread(flags) - is_unread(row._mapping))
+            if params:
+                await db.execute(statement, params)
+                updated += len(params)
+        await deltas.apply(db)
+        return updated
+
+    async def _delete_messages(self, db: AsyncSession, condition) -> int:
+        groups = (await db.execute(
+            select(MailMessage.account_id, MailMessage.folder_id, MailMessage.thread_id,
+                   func.count(MailMessage.id), unread_sum())
+            .where(condition)
+            .group_by(MailMessage.account_id, MailMessage.folder_id, MailMessage.thread_id)
+        )).all()
+        ids = select(MailMessage.id).where(condition)
+        await db.execute(delete(MailAttachment).where(MailAttachment.message_id.in_(ids)))
+        result = await db.execute(delete(MailMessage).where(condition))
+        deltas = CounterDeltas()
+        by_account: Dict[int, List[str]] = {}
+        for account_id, folder_id, thread_id, total, unread in groups:
+            deltas.add(account_id, folder_id, -int(total), -int(unread))
+            by_account.setdefault(account_id, []).append(thread_id)
+        await deltas.apply(db)
+        for account_id, thread_ids in by_account.items():
+            await refresh_threads(db, account_id, thread_ids)
+        return result.rowcount or 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": sorted(account_id for account_id in self._locks if self.is_running(account_id)),
+            "syncs": self.syncs,
+            "folders_synced": self.folders_synced,
+            "folders_unchanged": self.folders_unchanged,
+            "messages_fetched": self.messages_fetched,
+            "flags_updated": self.flags_updated,
+            "messages_deleted": self.messages_deleted,
+            "full_resyncs": self.full_resyncs,
+            "errors": self.errors,
+            "busy": self.busy,
+            "duplicates_skipped": self.duplicates_skipped,
+            "last_duration_ms": self.last_duration_ms,
+        }
+
+
+mail_sync = MailSync(
+    pool=imap_pool,
+    batch_size=get_settings().mail.sync_fetch_batch,
+    lease_timeout=get_settings().mail.sync_lease_timeout,
+)
@@ -0,0 +1,266 @@
+"""
+Mail threading
+Agrupa los mensajes en conversaciones (al estilo JWZ) al guardarlos, sin
+volver a recorrer el buzón:
+
+- mail_thread_refs es el índice Message-ID -> conversación. Cada mensaje
+  registra su Message-ID y los de References / In-Reply-To, aunque esos
+  mensajes aún no se hayan recibido (el "contenedor vacío" de JWZ).
+- Un mensaje nuevo se une a la conversación de cualquiera de sus ids. Si
+  sus ids llevan a varias conversaciones (p. ej. un padre que llega tarde y
+  une dos ramas) se fusionan en la más antigua.
+- No se agrupa por asunto: sin cabeceras de referencia cada mensaje abre
+  conversación (dos "Factura" de remitentes distintos no se mezclan).
+- mail_threads guarda la fecha del último mensaje para listar las
+  conversaciones por cursor; al borrar mensajes se recalcula y las
+  conversaciones vacías se eliminan.
+
+Coste por lote de mensajes nuevos: un SELECT de sus ids en el índice, un
+INSERT de los ids nuevos y, solo si hay fusiones, UPDATE de las filas de las
+conversaciones fusionadas.
+"""
+import re
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set
+
+from sqlalchemy import bindparam, case, delete, func, insert, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import defer
+
+from ...database.models import MailMessage, MailThread, MailThreadRef
+
+_MESSAGE_ID = re.compile(r"<[^<>\s]+>")
+_SUBJECT_PREFIX = re.compile(r"^\s*(?:(?:re|fw|fwd|rv|aw|sv|tr)(?:\[\d+\])?\s*:\s*)+", re.IGNORECASE)
+
+MAX_REFERENCES = 50  # últimos ids de References que se tienen en cuenta
+BACKFILL_BATCH = 1000
+
+
+def normalize_subject(subject: Optional[str]) -> Optional[str]:
+    """Asunto sin prefijos de respuesta o reenvío ("Re: RE: Fwd: hola" -> "hola")"""
+    if not subject:
+        return subject
+    return _SUBJECT_PREFIX.sub("", subject).strip() or subject.strip()
+
+
+def message_keys(message_id: Optional[str], in_reply_to: Optional[str], references: Optional[str]) -> List[str]:
+    """Message-ID propio seguido de los ids citados, sin repetidos"""
+    keys = [(message_id or "").strip()]
+    keys += _MESSAGE_ID.findall(references or "")[-MAX_REFERENCES:]
+    keys += _MESSAGE_ID.findall(in_reply_to or "")[:1]
+    seen, result = set(), []
+    for key in keys:
+        key = key[:500]
+        if key and key not in seen:
+            seen.add(key)
+            result.append(key)
+    return result
+
+
+def _chunks(items: Sequence, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class _Components:
+    """Union-find sobre ids de mensaje ("m", id) y conversaciones ("t", id)"""
+
+    def __init__(self):
+        self.parent: Dict[Any, Any] = {}
+
+    def find(self, node):
+        self.parent.setdefault(node, node)
+        root = node
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[node] != root:
+            self.parent[node], node = root, self.parent[node]
+        return root
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            self.parent[b] = a
+
+
+async def assign_threads(db: AsyncSession, account_id: int, rows: List[Dict[str, Any]]) -> Set[int]:
+    """Poner `thread_id` a `rows` (dicts con message_id, in_reply_to, references,
+    subject y received_at) y actualizar el índice. No hace commit: va en la
+    misma transacción que el INSERT/UPDATE de los mensajes. Devuelve las
+    conversaciones afectadas."""
+    if not rows:
+        return set()
+    keys_by_row = [
+        message_keys(row.get("message_id"), row.get("in_reply_to"), row.get("references"))
+        or [f"<{uuid.uuid4().hex}@no-message-id>"]
+        for row in rows
+    ]
+    all_keys = sorted({key for keys in keys_by_row for key in keys})
+
+    known: Dict[str, int] = {}
+    for chunk in _chunks(all_keys, 500):
+        known.update((await db.execute(
+            select(MailThreadRef.message_id, MailThreadRef.thread_id)
+            .where(MailThreadRef.account_id == account_id, MailThreadRef.message_id.in_(chunk))
+        )).all())
+    threads: Dict[int, MailThread] = {}
+    for chunk in _chunks(sorted(set(known.values())), 500):
+        threads.update((thread.id, thread) for thread in (await db.execute(
+            select(MailThread).where(MailThread.id.in_(chunk))
+        )).scalars())
+
+    components = _Components()
+    for keys in keys_by_row:
+        first = ("m", keys[0])
+        for key in keys:
+            components.union(first, ("m", key))
+            if known.get(key) in threads:
+                components.union(first, ("t", known[key]))
+
+    # Por componente: conversación superviviente (la más antigua) y las que se fusionan en ella
+    existing: Dict[Any, List[int]] = {}
+    for thread_id in threads:
+        existing.setdefault(components.find(("t", thread_id)), []).append(thread_id)
+    members: Dict[Any, List[int]] = {}
+    for index, keys in enumerate(keys_by_row):
+        members.setdefault(components.find(("m", keys[0])), []).append(index)
+
+    survivors: Dict[Any, MailThread] = {}
+    merged: Dict[int, List[int]] = {}
+    for root, indexes in members.items():
+        ids = sorted(existing.get(root, []))
+        if ids:
+            thread = threads[ids[0]]
+            if ids[1:]:
+                merged[thread.id] = ids[1:]
+                thread.last_message_at = max(threads[i].last_message_at for i in ids)
+        else:
+            # Fecha del primer mensaje (o ahora): datetime.min queda fuera del rango de DATETIME en MySQL
+            first = next((rows[i]["received_at"] for i in indexes if rows[i].get("received_at")), None)
+            thread = MailThread(account_id=account_id, subject=None, last_message_at=first or datetime.utcnow())
+            db.add(thread)
+        for index in indexes:
+            row = rows[index]
+            # El mensaje sin referencias es la raíz: su asunto nombra la conversación
+            if thread.subject is None or len(keys_by_row[index]) == 1:
+                thread.subject = normalize_subject(row.get("subject"))
+            if row.get("received_at") and row["received_at"] > thread.last_message_at:
+                thread.last_message_at = row["received_at"]
+        survivors[root] = thread
+    await db.flush()
+
+    for survivor, ids in merged.items():
+        await db.execute(
+            update(MailMessage)
+            .where(MailMessage.account_id == account_id, MailMessage.thread_id.in_([str(i) for i in ids]))
+            .values(thread_id=str(survivor))
+        )
+        await db.execute(update(MailThreadRef).where(MailThreadRef.thread_id.in_(ids)).values(thread_id=survivor))
+        await db.execute(delete(MailThread).where(MailThread.id.in_(ids)))
+
+    # Ids nuevos al índice; los que apuntaban a conversaciones ya borradas se reasignan
+    new_refs, stale = [], {}
+    for key in all_keys:
+        thread_id = survivors[components.find(("m", key))].id
+        if key not in known:
+            new_refs.append({"account_id": account_id, "message_id": key, "thread_id": thread_id})
+        elif known[key] not in threads:
+            stale.setdefault(thread_id, []).append(key)
+    if new_refs:
+        await db.execute(insert(MailThreadRef), new_refs)
+    for thread_id, keys in stale.items():
+        for chunk in _chunks(keys, 500):
+            await db.execute(
+                update(MailThreadRef)
+                .where(MailThreadRef.account_id == account_id, MailThreadRef.message_id.in_(chunk))
+                .values(thread_id=thread_id)
+            )
+
+    for index, keys in enumerate(keys_by_row):
+        rows[index]["thread_id"] = str(survivors[components.find(("m", keys[0]))].id)
+    return {thread.id for thread in survivors.values()}
+
+
+async def refresh_threads(db: AsyncSession, account_id: int, thread_ids: Iterable[Optional[str]]):
+    """Tras borrar mensajes: recalcular la fecha del último mensaje de
+    `thread_ids` y eliminar las conversaciones que se han quedado vacías"""
+    ids = sorted({int(thread_id) for thread_id in thread_ids if thread_id})
+    table = MailThread.__table__
+    for chunk in _chunks(ids, 500):
+        latest = dict((await db.execute(
+            select(MailMessage.thread_id, func.max(MailMessage.received_at))
+            .where(MailMessage.account_id == account_id, MailMessage.thread_id.in_([str(i) for i in chunk]))
+            .group_by(MailMessage.thread_id)
+        )).all())
+        if latest:
+            await db.execute(
+                update(table).where(table.c.id == bindparam("_id")).values(last_message_at=bindparam("last")),
+                [{"_id": int(thread_id), "last": last} for thread_id, last in latest.items()]
+            )
+        empty = [thread_id for thread_id in chunk if str(thread_id) not in latest]
+        if empty:
+            await db.execute(delete(MailThreadRef).where(MailThreadRef.thread_id.in_(empty)))
+            await db.execute(delete(MailThread).where(MailThread.id.in_(empty)))
+
+
+async def backfill_threads(db: AsyncSession, account_id: int, limit: int = BACKFILL_BATCH) -> int:
+    """Asignar conversación a mensajes guardados sin ella (sincronizados antes de
+    existir el threading), por lotes y sin IMAP. Devuelve cuántos"""
+    rows = [dict(row._mapping) for row in (await db.execute(
+        select(MailMessage.id, MailMessage.message_id, MailMessage.in_reply_to, MailMessage.references,
+               MailMessage.subject, MailMessage.received_at)
+        .where(MailMessage.account_id == account_id, MailMessage.thread_id.is_(None))
+        .order_by(MailMessage.id)
+        .limit(limit)
+    )).all()]
+    if not rows:
+        return 0
+    await assign_threads(db, account_id, rows)
+    table = MailMessage.__table__
+    await db.execute(
+        update(table).where(table.c.id == bindparam("_id")).values(thread_id=bindparam("_thread")),
+        [{"_id": row["id"], "_thread": row["thread_id"]} for row in rows]
+    )
+    await db.commit()
+    return len(rows)
+
+
+async def thread_counts(db: AsyncSession, account_id: int, thread_ids: Sequence[int]) -> Dict[int, Dict[str, Any]]:
+    """Mensajes, no leídos y adjuntos de las conversaciones de una página"""
+    if not thread_ids:
+        return {}
+    rows = (await db.execute(
+        select(
+            MailMessage.thread_id,
+            func.count(MailMessage.id),
+            func.coalesce(func.sum(case((MailMessage.is_read.isnot(True), 1), else_=0)), 0),
+            func.max(case((MailMessage.has_attachments.is_(True), 1), else_=0)),
+        )
+        .where(MailMessage.account_id == account_id,
+               MailMessage.thread_id.in_([str(i) for i in thread_ids]),
+               MailMessage.is_deleted.isnot(True))
+        .group_by(MailMessage.thread_id)
+    )).all()
+    return {
+        int(thread_id): {"messages": int(total), "unread": int(unread or 0), "attachments": bool(attachments)}
+        for thread_id, total, unread, attachments in rows
+    }
+
+
+async def latest_messages(db: AsyncSession, account_id: int, threads: Sequence[MailThread]) -> Dict[int, MailMessage]:
+    """Último mensaje de cada conversación (el de last_message_at), sin cuerpos"""
+    if not threads:
+        return {}
+    rows = (await db.execute(
+        select(MailMessage)
+        .options(defer(MailMessage.body_text), defer(MailMessage.body_html))
+        .where(MailMessage.account_id == account_id,
+               tuple_(MailMessage.thread_id, MailMessage.received_at).in_(
+                   [(str(thread.id), thread.last_message_at) for thread in threads]))
+        .order_by(MailMessage.id.desc())
+    )).scalars().all()
+    latest: Dict[int, MailMessage] = {}
+    for row in rows:
+        latest.setdefault(int(row.thread_id), row)
+    return latest
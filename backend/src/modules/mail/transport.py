@@ -0,0 +1,34 @@
+"""
+Mail transport helpers
+Compartido por los clientes IMAP y SMTP.
+"""
+import ssl
+from dataclasses import dataclass
+from functools import lru_cache
+
+
+@lru_cache(maxsize=1)
+def default_ssl_context() -> ssl.SSLContext:
+    """Contexto TLS por defecto, creado una sola vez: cargar los certificados
+    raíz del sistema cuesta decenas de ms y bloquea el event loop"""
+    return ssl.create_default_context()
+
+
+@dataclass(frozen=True)
+class ConnectionSettings:
+    """Servidor y credenciales de una conexión (misma forma que ServerSettings del router)"""
+    server: str
+    port: int
+    ssl: bool
+    username: str
+    password: str
+
+    @classmethod
+    def imap(cls, account) -> "ConnectionSettings":
+        return cls(account.imap_server, account.imap_port, bool(account.imap_ssl),
+                   account.imap_username, account.imap_password)
+
+    @classmethod
+    def smtp(cls, account) -> "ConnectionSettings":
+        return cls(account.smtp_server, account.smtp_port, bool(account.smtp_ssl),
+                   account.smtp_username, account.smtp_password)
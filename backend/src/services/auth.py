@@ -2,17 +2,22 @@
 Authentication service using database
 """
 
-from jose import jwt
+from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
-from fastapi import HTTPException, status, Depends
+from fastapi import HTTPException, Request, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
 import os
 import bcrypt
 
-from ..database.connection import get_db
+from ..database.connection import get_async_db
 from ..database.models import User, UserSession
+from .password_hashing import password_hasher
+from .user_cache import UserPrincipal, user_cache
+from .write_behind import login_write_buffer
 import secrets
 
 # Configuración
@@ -25,6 +30,7 @@ import bcrypt
 
 # HTTP Bearer token
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 class AuthService:
     @staticmethod
@@ -45,6 +51,16 @@ class AuthService:
         hash_bytes = bcrypt.hashpw(password_bytes, salt)
         return hash_bytes.decode('utf-8')
 
+    @staticmethod
+    async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+        """Verificar contraseña fuera del event loop"""
+        return await password_hasher.run(AuthService.verify_password, plain_password, hashed_password)
+
+    @staticmethod
+    async def get_password_hash_async(password: str) -> str:
+        """Hash de contraseña fuera del event loop"""
+        return await password_hasher.run(AuthService.get_password_hash, password)
+
     @staticmethod
     def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
         """Crear token JWT"""
@@ -64,7 +80,7 @@ class AuthService:
         try:
             payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
             return payload
-        except jwt.PyJWTError:
+        except JWTError:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Could not validate credentials",
@@ -72,79 +88,89 @@ class AuthService:
             )
 
     @staticmethod
-    def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
+    async def authenticate_user(db: AsyncSession, username: str, password: str) -> Optional[User]:
         """Autenticar usuario"""
-        user = db.query(User).filter(
-            (User.username == username) | (User.email == username)
-        ).first()
+        result = await db.execute(
+            select(User).where((User.username == username) | (User.email == username))
+        )
+        user = result.scalars().first()
         
         if not user:
             return None
         
-        if not AuthService.verify_password(password, user.password_hash):
+        if not await AuthService.verify_password_async(password, user.password_hash):
             return None
         
-        # Actualizar último login
-        user.last_login = datetime.utcnow()
-        db.commit()
+        # Actualizar último login (escritura diferida, coalescida por usuario)
+        now = datetime.utcnow()
+        set_committed_value(user, "last_login", now)
+        await login_write_buffer.record_login(user.id, now)
         
         return user
 
     @staticmethod
-    def create_user_session(db: Session, user_id: int, ip_address: str = None, user_agent: str = None) -> str:
+    async def create_user_session(db: AsyncSession, user_id: int, ip_address: str = None, user_agent: str = None) -> str:
         """Crear sesión de usuario"""
         session_id = secrets.token_urlsafe(32)
         expires_at = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         
-        session = UserSession(
-            id=session_id,
-            user_id=user_id,
-            ip_address=ip_address,
-            user_agent=user_agent,
-            expires_at=expires_at
-        )
-        
-        db.add(session)
-        db.commit()
+        # Se inserta en bloque con el resto de sesiones pendientes
+        await login_write_buffer.add_session({
+            "id": session_id,
+            "user_id": user_id,
+            "ip_address": ip_address,
+            "user_agent": user_agent,
+            "expires_at": expires_at,
+            "is_active": True
+        })
         
         return session_id
 
     @staticmethod
-    def get_user_by_token(db: Session, token: str) -> Optional[User]:
-        """Obtener usuario por token"""
+    async def get_user_by_token(db: AsyncSession, token: str) -> Optional[UserPrincipal]:
+        """Obtener usuario por token (caché en proceso, BD solo en un fallo)"""
         try:
             payload = AuthService.decode_access_token(token)
             user_id: int = payload.get("sub")
             if user_id is None:
                 return None
-        except HTTPException:
+            user_id = int(user_id)
+        except (HTTPException, ValueError):
             return None
 
-        user = db.query(User).filter(User.id == user_id).first()
+        principal = user_cache.get(user_id)
+        if principal is not None:
+            return principal
+
+        user = await db.get(User, user_id)
         if user is None or not user.is_active:
             return None
         
-        return user
+        principal = UserPrincipal.from_user(user)
+        user_cache.put(user_id, principal)
+        return principal
 
     @staticmethod
-    def logout_user(db: Session, session_id: str) -> bool:
+    async def logout_user(db: AsyncSession, session_id: str) -> bool:
         """Cerrar sesión de usuario"""
-        session = db.query(UserSession).filter(UserSession.id == session_id).first()
+        if login_write_buffer.deactivate_pending_session(session_id):
+            return True
+        session = await db.get(UserSession, session_id)
         if session:
             session.is_active = False
-            db.commit()
+            await db.commit()
             return True
         return False
 
 
 # Dependency para obtener el usuario actual
-def get_current_user(
+async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
+    db: AsyncSession = Depends(get_async_db)
+) -> UserPrincipal:
     """Dependency para obtener el usuario actual autenticado"""
     token = credentials.credentials
-    user = AuthService.get_user_by_token(db, token)
+    user = await AuthService.get_user_by_token(db, token)
     
     if user is None:
         raise HTTPException(
@@ -156,14 +182,49 @@ def get_current_user(
     return user
 
 
-def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
+async def get_current_stream_user(
+    request: Request,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+    db: AsyncSession = Depends(get_async_db)
+) -> UserPrincipal:
+    """Como get_current_user, pero acepta el token en ?access_token= (EventSource no envía cabeceras)"""
+    token = credentials.credentials if credentials else request.query_params.get("access_token")
+    user = await AuthService.get_user_by_token(db, token) if token else None
+    
+    if user is None or not user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    return user
+
+
+async def get_current_user_record(
+    current_user: UserPrincipal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+) -> User:
+    """Dependency para los handlers que necesitan la fila completa del usuario"""
+    user = await db.get(User, current_user.id)
+    if user is None:
+        user_cache.invalidate(current_user.id)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user
+
+
+def get_current_active_user(current_user: UserPrincipal = Depends(get_current_user)) -> UserPrincipal:
     """Dependency para obtener usuario activo"""
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
 
-def get_current_admin_user(current_user: User = Depends(get_current_active_user)) -> User:
+def get_current_admin_user(current_user: UserPrincipal = Depends(get_current_active_user)) -> UserPrincipal:
     """Dependency para obtener usuario admin"""
     if not current_user.is_admin:
         raise HTTPException(
@@ -174,13 +235,14 @@ def get_current_admin_user(current_user: User = Depends(get_current_active_user)
 
 
 # Funciones de utilidad
-def create_user(db: Session, username: str, email: str, password: str, 
-                first_name: str, last_name: str, is_admin: bool = False) -> User:
+async def create_user(db: AsyncSession, username: str, email: str, password: str, 
+                      first_name: str, last_name: str, is_admin: bool = False) -> User:
     """Crear un nuevo usuario"""
     # Verificar que no existe el usuario
-    existing_user = db.query(User).filter(
-        (User.username == username) | (User.email == email)
-    ).first()
+    result = await db.execute(
+        select(User).where((User.username == username) | (User.email == email))
+    )
+    existing_user = result.scalars().first()
     
     if existing_user:
         raise HTTPException(
@@ -189,7 +251,7 @@ def create_user(db: Session, username: str, email: str, password: str,
         )
     
     # Crear usuario
-    hashed_password = AuthService.get_password_hash(password)
+    hashed_password = await AuthService.get_password_hash_async(password)
     user = User(
         username=username,
         email=email,
@@ -200,19 +262,19 @@ def create_user(db: Session, username: str, email: str, password: str,
     )
     
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     
     return user
 
 
-def update_user_password(db: Session, user_id: int, new_password: str) -> bool:
+async def update_user_password(db: AsyncSession, user_id: int, new_password: str) -> bool:
     """Actualizar contraseña de usuario"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         return False
     
-    user.password_hash = AuthService.get_password_hash(new_password)
-    db.commit()
+    user.password_hash = await AuthService.get_password_hash_async(new_password)
+    await db.commit()
     
     return True
\ No newline at end of file
@@ -0,0 +1,97 @@
+"""
+Password hashing executor
+bcrypt tarda 100-300 ms de CPU por llamada; ejecutarlo dentro de un handler
+async congela el event loop del worker. Aquí se ejecuta en un pool de hilos
+propio (bcrypt libera el GIL) y un semáforo del tamaño del pool limita los
+hashes en curso: una ráfaga de logins hace cola sin bloquear el resto de rutas.
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional
+
+from ..config.settings import get_settings
+
+
+class PasswordHasher:
+    """Pool acotado para operaciones bcrypt, con métricas de cola y latencia"""
+
+    def __init__(self, workers: Optional[int] = None, samples: int = 512):
+        self.workers = workers or os.cpu_count() or 1
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        # Un asyncio.Semaphore pertenece a un event loop
+        self._semaphores: Dict[int, asyncio.Semaphore] = {}
+        self.queued = 0
+        self.max_queued = 0
+        self.in_flight = 0
+        self.completed = 0
+        self._wait_ms: Deque[float] = deque(maxlen=samples)
+        self._hash_ms: Deque[float] = deque(maxlen=samples)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(id(loop))
+        if semaphore is None:
+            semaphore = self._semaphores[id(loop)] = asyncio.Semaphore(self.workers)
+        return semaphore
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        """Ejecutar fn(*args) en el pool, esperando turno si está lleno"""
+        semaphore = self._get_semaphore()
+        queued_at = time.perf_counter()
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        try:
+            await semaphore.acquire()
+        finally:
+            self.queued -= 1
+
+        started_at = time.perf_counter()
+        self._wait_ms.append((started_at - queued_at) * 1000)
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            self._hash_ms.append((time.perf_counter() - started_at) * 1000)
+            semaphore.release()
+
+    @staticmethod
+    def _percentiles(samples: Deque[float]) -> Dict[str, float]:
+        if not samples:
+            return {"p50": 0.0, "p95": 0.0, "max": 0.0}
+        ordered = sorted(samples)
+        pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+        return {"p50": round(pick(0.5), 2), "p95": round(pick(0.95), 2), "max": round(ordered[-1], 2)}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "wait_ms": self._percentiles(self._wait_ms),
+            "hash_ms": self._percentiles(self._hash_ms),
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(workers=get_settings().security.bcrypt_workers)
@@ -0,0 +1,159 @@
+"""
+Role-based permissions
+Los permisos de los roles (Role.permissions) son cadenas con segmentos
+separados por puntos y comodín:
+
+    "*"               todo
+    "companies.*"     cualquier permiso bajo companies (companies.read, ...)
+    "mail.read"       exacto
+
+Los permisos de todos los roles de un usuario se compilan una vez en un trie
+(PermissionMatcher) que responde `allows("employees.write")` recorriendo un
+nodo por segmento. El matcher compilado se guarda por usuario; los cambios en
+user_roles/roles lo invalidan al hacer commit. Los administradores
+(is_admin / is_superuser) tienen todos los permisos.
+
+Uso en un router:
+    current_user = Depends(require_permission("employees.write"))
+"""
+from typing import Dict, Iterable, List, Set
+
+from fastapi import Depends, HTTPException, status
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
+
+from ..config.settings import get_settings
+from ..database.connection import get_async_db
+from ..database.models import Role, UserRole
+from .auth import get_current_active_user
+from .user_cache import UserCache, UserPrincipal
+
+WILDCARD = "*"
+
+
+class _Node:
+    __slots__ = ("children", "terminal", "trailing_wildcard")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.terminal = False
+        # Nodo "*" con el que termina algún patrón: cubre todo lo que quede,
+        # aunque otros patrones sigan por debajo (companies.* y companies.*.export)
+        self.trailing_wildcard = False
+
+
+class PermissionMatcher:
+    """Trie de patrones de permiso compilado para un usuario"""
+
+    def __init__(self, patterns: Iterable[str] = ()):
+        self.root = _Node()
+        self.patterns: Set[str] = set()
+        for pattern in patterns:
+            self.add(pattern)
+
+    def add(self, pattern: str):
+        pattern = (pattern or "").strip()
+        if not pattern:
+            return
+        self.patterns.add(pattern)
+        node = self.root
+        segments = pattern.split(".")
+        for segment in segments:
+            node = node.children.setdefault(segment, _Node())
+        node.terminal = True
+        if segments[-1] == WILDCARD:
+            node.trailing_wildcard = True
+
+    def _match(self, node: _Node, segments: List[str], index: int) -> bool:
+        if index == len(segments):
+            return node.terminal
+        # Un "*" final cubre todo lo que queda; en medio, un único segmento
+        wildcard = node.children.get(WILDCARD)
+        if wildcard is not None:
+            if wildcard.trailing_wildcard:
+                return True
+            if self._match(wildcard, segments, index + 1):
+                return True
+        child = node.children.get(segments[index])
+        return child is not None and self._match(child, segments, index + 1)
+
+    def allows(self, permission: str) -> bool:
+        return self._match(self.root, permission.split("."), 0)
+
+
+_security = get_settings().security
+permission_cache = UserCache(maxsize=_security.user_cache_size, ttl=_security.user_cache_ttl)
+
+
+async def get_user_permissions(db: AsyncSession, user_id: int) -> PermissionMatcher:
+    """Matcher de permisos del usuario (caché en proceso, una consulta en un fallo)"""
+    matcher = permission_cache.get(user_id)
+    if matcher is not None:
+        return matcher
+
+    result = await db.execute(
+        select(Role.permissions)
+        .join(UserRole, UserRole.role_id == Role.id)
+        .where(UserRole.user_id == user_id)
+    )
+    matcher = PermissionMatcher(
+        pattern for permissions in result.scalars() for pattern in (permissions or [])
+    )
+    permission_cache.put(user_id, matcher)
+    return matcher
+
+
+def require_permission(permission: str):
+    """Dependency que exige `permission` al usuario actual"""
+
+    async def dependency(
+        current_user: UserPrincipal = Depends(get_current_active_user),
+        db: AsyncSession = Depends(get_async_db)
+    ) -> UserPrincipal:
+        if current_user.is_admin or current_user.is_superuser:
+            return current_user
+        matcher = await get_user_permissions(db, current_user.id)
+        if not matcher.allows(permission):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"Missing permission: {permission}"
+            )
+        return current_user
+
+    return dependency
+
+
+# Invalidación: se anota en el flush y se aplica tras el commit, para que otra
+# petición no vuelva a cachear los permisos antiguos antes de que se confirmen
+def _mark_user(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("rbac_users", set()).add(target.user_id)
+
+
+def _mark_all(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info["rbac_all"] = True
+
+
+for _event in ("after_insert", "after_update", "after_delete"):
+    event.listen(UserRole, _event, _mark_user)
+    event.listen(Role, _event, _mark_all)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_permissions(session):
+    if session.info.pop("rbac_all", False):
+        session.info.pop("rbac_users", None)
+        permission_cache.clear()
+        return
+    for user_id in session.info.pop("rbac_users", ()):
+        permission_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_permission_marks(session):
+    session.info.pop("rbac_all", None)
+    session.info.pop("rbac_users", None)
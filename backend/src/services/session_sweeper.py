@@ -0,0 +1,116 @@
+"""
+Expired session sweeper
+Tarea en segundo plano (arrancada desde el lifespan de main.py) que borra las
+filas de user_sessions caducadas o cerradas. Borra en lotes pequeños, cada uno
+en su propia transacción y con una pausa entre lotes, para no mantener
+bloqueos largos sobre la tabla.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import delete, select
+
+from ..config.settings import get_settings
+from ..database.connection import get_async_engine
+from ..database.models import UserSession
+
+logger = logging.getLogger(__name__)
+
+
+class SessionSweeper:
+    """Borrado periódico por lotes de sesiones caducadas e inactivas"""
+
+    def __init__(self, interval: int, batch_size: int, pause: float = 0.05):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.pause = pause
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.deleted_total = 0
+        self.last_deleted = 0
+        self.last_run_at: Optional[datetime] = None
+        self.last_duration_ms = 0.0
+        self.errors = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def _delete_batches(self, condition) -> int:
+        sessions = UserSession.__table__
+        deleted = 0
+        while True:
+            # Seleccionar primero los ids (por índice) y borrar por clave primaria
+            async with get_async_engine().begin() as conn:
+                ids = (await conn.execute(
+                    select(sessions.c.id).where(condition).limit(self.batch_size)
+                )).scalars().all()
+                if ids:
+                    await conn.execute(delete(sessions).where(sessions.c.id.in_(ids)))
+            deleted += len(ids)
+            if len(ids) < self.batch_size:
+                return deleted
+            await asyncio.sleep(self.pause)
+
+    async def sweep(self) -> int:
+        """Una pasada completa; devuelve el número de sesiones borradas"""
+        sessions = UserSession.__table__
+        start = time.perf_counter()
+        now = datetime.utcnow()
+        # Dos condiciones separadas para que ambas usen (is_active, expires_at)
+        deleted = await self._delete_batches((sessions.c.is_active == True) & (sessions.c.expires_at < now))
+        deleted += await self._delete_batches(sessions.c.is_active == False)
+
+        self.runs += 1
+        self.last_deleted = deleted
+        self.deleted_total += deleted
+        self.last_run_at = now
+        self.last_duration_ms = (time.perf_counter() - start) * 1000
+        if deleted:
+            logger.info(f"🧹 Deleted {deleted} expired/inactive sessions in {self.last_duration_ms:.0f} ms")
+        return deleted
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Session sweep failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self.running or self.interval <= 0:
+            return
+        self._task = asyncio.create_task(self._run(), name="session-sweeper")
+        logger.info(f"Session sweeper started (every {self.interval}s, batches of {self.batch_size})")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "runs": self.runs,
+            "deleted_total": self.deleted_total,
+            "last_deleted": self.last_deleted,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            "last_duration_ms": round(self.last_duration_ms, 2),
+            "errors": self.errors,
+        }
+
+
+_security = get_settings().security
+session_sweeper = SessionSweeper(
+    interval=_security.session_sweep_interval,
+    batch_size=_security.session_sweep_batch,
+)
@@ -0,0 +1,100 @@
+"""
+Authenticated user cache
+Caché en proceso (LRU con TTL) del usuario resuelto a partir del token, para
+que get_current_user no vaya a la base de datos en cada petición.
+
+Solo guarda lo necesario para autorizar (id, username y flags), nunca el
+hash de contraseña. Los handlers que modifican un usuario llaman a
+`invalidate(user_id)`; en los demás workers el cambio se ve al expirar el TTL.
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from ..config.settings import get_settings
+
+
+@dataclass(frozen=True)
+class UserPrincipal:
+    """Usuario autenticado (solo lectura)"""
+    id: int
+    username: str
+    is_active: bool
+    is_admin: bool
+    is_superuser: bool
+
+    @classmethod
+    def from_user(cls, user) -> "UserPrincipal":
+        return cls(
+            id=user.id,
+            username=user.username,
+            is_active=bool(user.is_active),
+            is_admin=bool(user.is_admin),
+            is_superuser=bool(user.is_superuser),
+        )
+
+
+class UserCache:
+    """LRU por id de usuario con caducidad por entrada y contadores de aciertos/fallos"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, user_id: int) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, user_id: int, value: Any):
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[user_id] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            if self._entries.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+_security = get_settings().security
+user_cache = UserCache(maxsize=_security.user_cache_size, ttl=_security.user_cache_ttl)
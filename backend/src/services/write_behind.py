@@ -0,0 +1,239 @@
+"""
+Login write-behind buffer
+Un login correcto hacía dos commits pequeños (users.last_login y el INSERT en
+user_sessions). Aquí se acumulan en memoria y se escriben juntos en una sola
+transacción cada `login_flush_interval_ms` o al llegar a `login_flush_batch`
+elementos:
+
+- last_login se coalesce por usuario (solo se escribe el más reciente).
+- Las sesiones se insertan en bloque (executemany).
+
+El lifespan de main.py arranca el volcado y hace el último flush al apagar.
+Si el buffer no está arrancado (scripts, tests), cada escritura se vuelca al
+momento.
+
+Si el lote falla se reintenta fila a fila (una transacción por fila): una
+fila rechazada por la base (p. ej. la sesión de un usuario ya borrado) no
+bloquea al resto y se descarta tras `max_attempts` intentos. Si falla la
+conexión, todo vuelve a la cola; la cola no pasa de `max_backlog` elementos
+(se descartan los más antiguos).
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import bindparam, exc, insert, update
+
+from ..config.settings import get_settings
+from ..database.connection import get_async_engine
+from ..database.models import User, UserSession
+
+logger = logging.getLogger(__name__)
+
+# Errores de los datos de una fila: reintentarla no sirve de nada si persisten
+ROW_ERRORS = (exc.IntegrityError, exc.DataError)
+
+
+class LoginWriteBuffer:
+    """Escrituras diferidas de last_login y user_sessions"""
+
+    def __init__(self, interval_ms: int, batch_size: int, max_attempts: int = 3, max_backlog: int = 10000):
+        self.interval = interval_ms / 1000.0
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.max_backlog = max_backlog
+        self._last_logins: Dict[int, datetime] = {}
+        self._sessions: Dict[str, Dict[str, Any]] = {}
+        # Intentos fallidos por fila: ("login", user_id) / ("session", session_id)
+        self._attempts: Dict[Tuple[str, Any], int] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self.flushes = 0
+        self.rows_flushed = 0
+        self.failures = 0
+        self.rows_dropped = 0
+        self.last_flush_ms = 0.0
+        self.last_error: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def backlog(self) -> int:
+        return len(self._last_logins) + len(self._sessions)
+
+    async def record_login(self, user_id: int, at: datetime):
+        previous = self._last_logins.get(user_id)
+        if previous is None or at > previous:
+            self._last_logins[user_id] = at
+        await self._after_enqueue()
+
+    async def add_session(self, row: Dict[str, Any]):
+        self._sessions[row["id"]] = row
+        await self._after_enqueue()
+
+    def deactivate_pending_session(self, session_id: str) -> bool:
+        """Logout de una sesión que aún no se ha escrito"""
+        row = self._sessions.get(session_id)
+        if row is None:
+            return False
+        row["is_active"] = False
+        return True
+
+    def _trim(self):
+        """Descartar lo más antiguo si la cola supera max_backlog (primero last_login)"""
+        if self.backlog > self.max_backlog and self.rows_dropped % 1000 == 0:
+            logger.error(f"Login write-behind backlog over {self.max_backlog} items, dropping the oldest")
+        while self.backlog > self.max_backlog:
+            queue, kind = (self._last_logins, "login") if self._last_logins else (self._sessions, "session")
+            key = next(iter(queue))
+            del queue[key]
+            self._attempts.pop((kind, key), None)
+            self.rows_dropped += 1
+
+    async def _after_enqueue(self):
+        self._trim()
+        if not self.running:
+            await self.flush()
+        elif self.backlog >= self.batch_size:
+            self._wake.set()
+
+    async def flush(self) -> int:
+        """Escribir todo lo pendiente en una transacción; devuelve las filas escritas"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            last_logins, self._last_logins = self._last_logins, {}
+            sessions, self._sessions = self._sessions, {}
+            if not last_logins and not sessions:
+                return 0
+
+            start = time.perf_counter()
+            try:
+                await self._write(last_logins, sessions)
+                written = len(last_logins) + len(sessions)
+                if self._attempts:
+                    for user_id in last_logins:
+                        self._attempts.pop(("login", user_id), None)
+                    for session_id in sessions:
+                        self._attempts.pop(("session", session_id), None)
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                logger.error(f"Login write-behind flush failed, retrying row by row: {e}")
+                written = await self._write_rows(last_logins, sessions)
+
+            self.flushes += 1
+            self.rows_flushed += written
+            self.last_flush_ms = (time.perf_counter() - start) * 1000
+            return written
+
+    async def _write(self, last_logins: Dict[int, datetime], sessions: Dict[str, Dict[str, Any]]):
+        async with get_async_engine().begin() as conn:
+            if last_logins:
+                users = User.__table__
+                await conn.execute(
+                    update(users)
+                    .where(users.c.id == bindparam("b_id"))
+                    .values(last_login=bindparam("b_last_login")),
+                    [{"b_id": user_id, "b_last_login": at} for user_id, at in last_logins.items()]
+                )
+            if sessions:
+                await conn.execute(insert(UserSession.__table__), list(sessions.values()))
+
+    def _requeue(self, kind: str, key, value):
+        """Devolver una fila a la cola sin pisar lo que haya llegado mientras tanto"""
+        if kind == "login":
+            if value > self._last_logins.get(key, datetime.min):
+                self._last_logins[key] = value
+        else:
+            self._sessions.setdefault(key, value)
+
+    async def _write_rows(self, last_logins: Dict[int, datetime], sessions: Dict[str, Dict[str, Any]]) -> int:
+        """Una transacción por fila tras un lote fallido; devuelve las filas escritas"""
+        pending = [("login", user_id, at) for user_id, at in last_logins.items()]
+        pending += [("session", session_id, row) for session_id, row in sessions.items()]
+        written = 0
+        for index, (kind, key, value) in enumerate(pending):
+            try:
+                if kind == "login":
+                    await self._write({key: value}, {})
+                else:
+                    await self._write({}, {key: value})
+                self._attempts.pop((kind, key), None)
+                written += 1
+            except ROW_ERRORS as e:
+                attempts = self._attempts.get((kind, key), 0) + 1
+                if attempts >= self.max_attempts:
+                    self._attempts.pop((kind, key), None)
+                    self.rows_dropped += 1
+                    logger.error(f"Login write-behind dropped {kind} {key} after {attempts} attempts: {e}")
+                    continue
+                self._requeue(kind, key, value)
+                self._attempts[(kind, key)] = attempts
+            except Exception as e:
+                # Conexión caída u otro error general: no es culpa de las filas, todo vuelve a la cola
+                for kind, key, value in pending[index:]:
+                    self._requeue(kind, key, value)
+                self.last_error = str(e)
+                logger.error(f"Login write-behind flush failed ({self.backlog} pending): {e}")
+                break
+        self._trim()
+        return written
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    def start(self):
+        if self.running:
+            return
+        self._wake = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._run(), name="login-write-behind")
+        logger.info(f"Login write-behind started (every {self.interval * 1000:.0f} ms or {self.batch_size} items)")
+
+    async def stop(self):
+        """Parar el volcado periódico y escribir lo pendiente"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        if self.backlog:
+            logger.error(f"Login write-behind stopped with {self.backlog} unwritten items")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "pending_last_login": len(self._last_logins),
+            "pending_sessions": len(self._sessions),
+            "backlog": self.backlog,
+            "flushes": self.flushes,
+            "rows_flushed": self.rows_flushed,
+            "failures": self.failures,
+            "rows_dropped": self.rows_dropped,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "last_error": self.last_error,
+        }
+
+
+_security = get_settings().security
+login_write_buffer = LoginWriteBuffer(
+    interval_ms=_security.login_flush_interval_ms,
+    batch_size=_security.login_flush_batch,
+    max_attempts=_security.login_flush_max_attempts,
+    max_backlog=_security.login_max_backlog,
+)
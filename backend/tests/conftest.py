@@ -0,0 +1,7 @@
+"""
+Configuración común de pytest: el backend se importa como `src.*` desde backend/
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
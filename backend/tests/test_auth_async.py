@@ -0,0 +1,138 @@
+"""
+Routers de autenticación y usuarios sobre aiosqlite (get_async_db / get_async_read_db)
+"""
+import shutil
+from contextlib import contextmanager
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from src.api.routers.auth import router as auth_router
+from src.api.routers.users import router as users_router
+from src.config.settings import Settings
+from src.database import connection
+from src.database.migrations import run_migrations
+from src.database.models import Base, User, UserSession
+from src.database.registry import EngineRegistry
+from src.services import write_behind
+from src.services.auth import AuthService
+from src.services.user_cache import user_cache
+from src.services.write_behind import login_write_buffer
+
+USERS = [
+    ("admin", "admin@example.com", "Admin", "Root", True),
+    ("ana", "ana@example.com", "Ana", "García", False),
+    ("luis", "luis@example.com", "Luis", "Pérez", False),
+]
+
+
+@pytest.fixture
+def make_client(tmp_path, monkeypatch):
+    """Cliente de la API con su base SQLite (y opcionalmente una réplica: copia de la base)"""
+
+    @contextmanager
+    def make(with_replica: bool = False):
+        monkeypatch.chdir(tmp_path)
+        primary = tmp_path / "crm.db"
+        engine = EngineRegistry(_settings(f"sqlite:///{primary}")).get_engine()
+        Base.metadata.create_all(engine)
+        run_migrations(engine, Base.metadata)
+        with engine.begin() as conn:
+            conn.execute(User.__table__.insert(), [
+                {"username": username, "email": email, "first_name": first, "last_name": last,
+                 "is_admin": is_admin, "password_hash": AuthService.get_password_hash("secret")}
+                for username, email, first, last, is_admin in USERS
+            ])
+        engine.dispose()
+
+        replica = ""
+        if with_replica:
+            shutil.copy(primary, tmp_path / "replica.db")
+            replica = f"sqlite:///{tmp_path}/replica.db"
+        registry = EngineRegistry(_settings(f"sqlite:///{primary}", replica))
+        monkeypatch.setattr(connection, "get_engine_registry", lambda: registry)
+        monkeypatch.setattr(connection, "_SessionLocal", None)
+        monkeypatch.setattr(connection, "_AsyncSessionLocal", None)
+        monkeypatch.setattr(write_behind, "get_async_engine", registry.get_async_engine)
+
+        app = FastAPI()
+        app.include_router(auth_router, prefix="/api/auth")
+        app.include_router(users_router, prefix="/api/users")
+        with TestClient(app) as client:
+            yield client
+            # Los engines async viven en el event loop del cliente
+            client.portal.call(registry.dispose)
+
+    yield make
+    login_write_buffer._last_logins.clear()
+    login_write_buffer._sessions.clear()
+    user_cache.clear()
+
+
+def _settings(url: str, replicas: str = "") -> Settings:
+    settings = Settings()
+    settings.debug = False
+    settings.database.url = url
+    settings.database.replica_urls = replicas
+    return settings
+
+
+def _login(client: TestClient, username: str, password: str = "secret"):
+    return client.post("/api/auth/login", json={"username": username, "password": password})
+
+
+def _headers(client: TestClient, username: str):
+    return {"Authorization": f"Bearer {_login(client, username).json()['access_token']}"}
+
+
+def test_login_and_me(make_client):
+    with make_client() as client:
+        assert _login(client, "ana", "wrong").status_code == 401
+        response = _login(client, "ana@example.com")
+        assert response.status_code == 200
+        token = response.json()["access_token"]
+        assert response.json()["user"]["username"] == "ana"
+
+        me = client.get("/api/auth/me", headers={"Authorization": f"Bearer {token}"})
+        assert me.status_code == 200 and me.json()["email"] == "ana@example.com"
+        assert client.get("/api/auth/me", headers={"Authorization": "Bearer x"}).status_code == 401
+
+        # Sin el flush periódico arrancado, la sesión y last_login se escriben al momento (engine async)
+        client.portal.call(login_write_buffer.flush)
+        engine = connection.get_engine()
+        with engine.connect() as conn:
+            assert conn.execute(select(UserSession.user_id)).scalars().all() == [2]
+            assert conn.execute(select(User.last_login).where(User.username == "ana")).scalar() is not None
+
+
+def test_user_list_pages_and_search(make_client):
+    with make_client() as client:
+        headers = _headers(client, "admin")
+        first = client.get("/api/users/", params={"size": 2, "order_by": "username"}, headers=headers).json()
+        assert first["total"] == 3 and [user["username"] for user in first["users"]] == ["admin", "ana"]
+        rest = client.get("/api/users/", params={"size": 2, "order_by": "username", "cursor": first["next_cursor"]},
+                          headers=headers).json()
+        assert [user["username"] for user in rest["users"]] == ["luis"] and rest["next_cursor"] is None
+
+        # "pérez" usa el índice FTS5 (trigram); "an" es corta y va por ILIKE
+        for search, expected in (("pérez", ["luis"]), ("an", ["ana"]), ("ana garcía", ["ana"])):
+            found = client.get("/api/users/", params={"search": search}, headers=headers).json()
+            assert [user["username"] for user in found["users"]] == expected, search
+
+        assert client.get("/api/users/", headers=_headers(client, "ana")).status_code == 403
+
+
+def test_user_list_reads_from_replica(make_client):
+    with make_client(with_replica=True) as client:
+        headers = _headers(client, "admin")
+        with connection.get_engine().begin() as conn:
+            conn.execute(User.__table__.insert(), [{
+                "username": "nuevo", "email": "nuevo@example.com", "first_name": "N", "last_name": "N",
+                "password_hash": "x",
+            }])
+        # La réplica (copia anterior al alta) responde el listado
+        listed = client.get("/api/users/", params={"count": "estimate"}, headers=headers).json()
+        assert listed["total"] == 3 and "nuevo" not in [user["username"] for user in listed["users"]]
+        assert connection.get_replica_status() == {"replica_0": True}
@@ -0,0 +1,79 @@
+"""
+Listado con ENVELOPE / BODYSTRUCTURE (envelope.py): un FETCH por página
+"""
+import asyncio
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+
+from imap_stub import StubImapServer, generate_messages  # noqa: E402
+
+from src.modules.mail.envelope import LIST_ITEMS, has_attachments, parse_envelope, walk_parts  # noqa: E402
+from src.modules.mail.imap_client import ImapClient  # noqa: E402
+from src.modules.mail.imap_protocol import parse_values  # noqa: E402
+
+
+class _Settings:
+    def __init__(self, port: int):
+        self.server, self.port, self.ssl, self.username, self.password = "127.0.0.1", port, False, "user", "secret"
+
+
+def test_page_is_one_ranged_fetch():
+    async def run():
+        stub = StubImapServer()
+        stub.add_mailbox("INBOX", generate_messages(40, attachment_every=4))
+        port = await stub.start()
+        try:
+            client = await ImapClient.open(_Settings(port), timeout=5)
+            await client.select("INBOX", readonly=True)
+            before = stub.commands["UID"]
+            items = await client.fetch("21:40", LIST_ITEMS)
+            await client.logout()
+        finally:
+            await stub.stop()
+        assert stub.commands["UID"] - before == 1
+        return items
+
+    items = asyncio.run(run())
+    assert [item["UID"] for item in items] == list(range(21, 41))
+    first = parse_envelope(items[0]["ENVELOPE"])
+    assert first.subject == "Mensaje de prueba 21"
+    assert first.from_ == [{"name": "Remitente 21", "email": "sender21@example.com"}]
+    assert first.to == [{"name": "Buzón", "email": "inbox@stub.local"}]
+    assert first.message_id == "<stub-21@stub.local>" and first.date == datetime(2024, 1, 1, 0, 21)
+    assert [item["UID"] for item in items if has_attachments(item["BODYSTRUCTURE"])] == [24, 28, 32, 36, 40]
+
+    parts = list(walk_parts(items[3]["BODYSTRUCTURE"]))
+    assert [(part.section, part.type, part.is_attachment) for part in parts] == \
+        [("1", "text/plain", False), ("2", "application/octet-stream", True)]
+    assert parts[1].filename == "datos-24.bin" and parts[1].encoding == "base64"
+
+
+def test_encoded_words_groups_and_nested_parts():
+    envelope, structure = parse_values(
+        b'("Tue, 2 Jan 2024 10:00:00 +0100" "=?utf-8?B?UmV1bmnDs24=?=" '
+        b'(("=?iso-8859-1?Q?Jos=E9?=" NIL "jose" "example.com")) NIL NIL '
+        b'((NIL NIL "equipo" NIL)("Ana" NIL "ana" "example.com")(NIL NIL NIL NIL)) NIL NIL '
+        b'"<a@x>" "<b@x>") '
+        b'((("TEXT" "PLAIN" ("CHARSET" "utf-8") NIL NIL "7BIT" 10 1 NIL NIL NIL NIL)'
+        b'("TEXT" "HTML" ("CHARSET" "utf-8") NIL NIL "7BIT" 20 1 NIL NIL NIL NIL) "ALTERNATIVE")'
+        b'("IMAGE" "PNG" ("NAME" "logo.png") "<logo>" NIL "BASE64" 300 NIL ("INLINE" NIL) NIL NIL) '
+        b'("MESSAGE" "RFC822" NIL NIL NIL "7BIT" 500 NIL NIL NIL 12 NIL NIL NIL NIL) "MIXED")'
+    )
+    parsed = parse_envelope(envelope)
+    assert parsed.subject == "Reunión" and parsed.date == datetime(2024, 1, 2, 9, 0)
+    assert parsed.from_ == [{"name": "José", "email": "jose@example.com"}]
+    # Los marcadores de inicio y fin del grupo "equipo" no son direcciones
+    assert parsed.to == [{"name": "Ana", "email": "ana@example.com"}]
+    assert (parsed.in_reply_to, parsed.message_id) == ("<a@x>", "<b@x>")
+
+    parts = list(walk_parts(structure))
+    assert [(part.section, part.type, part.is_attachment) for part in parts] == [
+        ("1.1", "text/plain", False), ("1.2", "text/html", False),
+        ("2", "image/png", False), ("3", "message/rfc822", True),
+    ]
+    assert parts[2].content_id == "<logo>"
+    assert has_attachments(structure)
+    assert parse_envelope(None).subject == "" and list(walk_parts(None)) == []
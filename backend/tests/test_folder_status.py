@@ -0,0 +1,139 @@
+"""
+Contadores de carpeta (folder_status.py): LIST-STATUS, STATUS en pipelining
+y la caché con caducidad en mail_folders
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+
+from imap_stub import StubImapServer, generate_messages  # noqa: E402
+
+from src.database.models import Base, MailAccount, MailFolder  # noqa: E402
+from src.modules.mail.folder_status import FolderStatusCache, list_with_status, needs_sync  # noqa: E402
+from src.modules.mail.imap_client import ImapClient  # noqa: E402
+from src.modules.mail.imap_pool import ConnectionPool  # noqa: E402
+
+FOLDERS = {"INBOX": 30, "Sent": 6, "Archive": 0}
+
+
+class _Settings:
+    def __init__(self, port: int):
+        self.server, self.port, self.ssl, self.username, self.password = "127.0.0.1", port, False, "user", "secret"
+
+
+def _stub(list_status: bool = True, **options) -> StubImapServer:
+    stub = StubImapServer(**options)
+    if not list_status:
+        stub.capabilities = [name for name in stub.capabilities if name != "LIST-STATUS"]
+    for name, count in FOLDERS.items():
+        stub.add_mailbox(name, generate_messages(count), uidvalidity=5)
+    return stub
+
+
+@pytest.mark.parametrize("list_status", [True, False])
+def test_list_with_status(list_status):
+    async def run():
+        # 100 ms por respuesta: los STATUS en pipelining comparten un viaje
+        stub = _stub(list_status, latency=0.1)
+        port = await stub.start()
+        try:
+            client = await ImapClient.open(_Settings(port), timeout=5)
+            await client.capability()
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            mailboxes, statuses = await list_with_status(client)
+            elapsed = loop.time() - started
+            await client.logout()
+        finally:
+            await stub.stop()
+        assert [mailbox.name for mailbox in mailboxes] == list(FOLDERS)
+        assert {name: (status["MESSAGES"], status["UNSEEN"]) for name, status in statuses.items()} == \
+            {"INBOX": (30, 10), "Sent": (6, 2), "Archive": (0, 0)}
+        assert statuses["INBOX"]["UIDNEXT"] == 31 and statuses["INBOX"]["UIDVALIDITY"] == 5
+        assert stub.commands["STATUS"] == (0 if list_status else 3)
+        assert elapsed < (0.15 if list_status else 0.3)  # LIST + un viaje para todos los STATUS
+
+    asyncio.run(run())
+
+
+def test_status_many_skips_rejected_mailboxes():
+    async def run():
+        stub = _stub()
+        port = await stub.start()
+        try:
+            client = await ImapClient.open(_Settings(port), timeout=5)
+            statuses = await client.status_many(["INBOX", "Borrada", "Sent"], ("MESSAGES",), depth=2)
+            # La conexión sigue sincronizada tras el NO de la carpeta inexistente
+            assert await client.status("Archive") == {"MESSAGES": 0, "UNSEEN": 0}
+            await client.logout()
+        finally:
+            await stub.stop()
+        assert statuses == {"INBOX": {"MESSAGES": 30}, "Sent": {"MESSAGES": 6}}
+
+    asyncio.run(run())
+
+
+def test_needs_sync():
+    folder = MailFolder(uid_validity=5, last_seen_uid=30)
+    assert not needs_sync(folder, {})
+    assert not needs_sync(folder, {"UIDVALIDITY": 5, "UIDNEXT": 31})
+    assert needs_sync(folder, {"UIDVALIDITY": 5, "UIDNEXT": 33})
+    assert needs_sync(folder, {"UIDVALIDITY": 6, "UIDNEXT": 31})
+    assert needs_sync(MailFolder(last_seen_uid=0), {"UIDVALIDITY": 5, "UIDNEXT": 1})
+
+
+def test_folder_status_cache(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/mail.db")
+    Base.metadata.create_all(engine)
+    engine.dispose()
+
+    async def run():
+        async_engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/mail.db")
+        sessions = async_sessionmaker(async_engine, expire_on_commit=False)
+        stub = _stub()
+        port = await stub.start()
+        pool = ConnectionPool(factory=ImapClient.open, max_per_account=1, idle_timeout=300,
+                              health_after=30, acquire_timeout=30, timeout=30)
+        cache = FolderStatusCache(pool=pool, ttl=60)
+        try:
+            async with sessions() as db:
+                account = MailAccount(user_id=1, name="test", email="user@example.com",
+                                      imap_server="127.0.0.1", imap_port=port, imap_ssl=False,
+                                      imap_username="user", imap_password="secret",
+                                      smtp_server="127.0.0.1", smtp_username="user", smtp_password="secret")
+                db.add(account)
+                await db.commit()
+
+                # Primera vez: LIST de carpetas y contadores de STATUS (aún sin sincronizar)
+                folders = await cache.folders(db, account)
+                assert {f.path: (f.total_count, f.unread_count) for f in folders} == \
+                    {"INBOX": (30, 10), "Sent": (6, 2), "Archive": (0, 0)}
+                assert (account.total_count, account.unread_count) == (36, 12)
+                assert cache.pending(account.id) == {"INBOX": True, "Sent": True, "Archive": True}
+
+                # Dentro de `ttl`: sin comandos al servidor
+                commands = sum(stub.commands.values())
+                stub.deliver("INBOX", generate_messages(2, start_uid=31))
+                await cache.folders(db, account)
+                assert sum(stub.commands.values()) == commands and cache.hits == 1
+
+                # Carpeta sincronizada: STATUS solo dice si hay algo pendiente
+                for folder in folders:
+                    folder.uid_validity, folder.last_seen_uid = 5, FOLDERS[folder.path]
+                await db.commit()
+                folders = await cache.folders(db, account, refresh=True)
+                assert {f.path: f.total_count for f in folders}["INBOX"] == 30
+                assert cache.pending(account.id) == {"INBOX": True, "Sent": False, "Archive": False}
+                assert cache.stats()["refreshes"] == 2
+        finally:
+            await pool.close()
+            await stub.stop()
+            await async_engine.dispose()
+
+    asyncio.run(run())
@@ -0,0 +1,108 @@
+"""
+imap_client contra el servidor IMAP de pruebas: comandos básicos, IDLE y plazos
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+
+from imap_stub import StubImapServer, generate_messages  # noqa: E402
+
+from src.modules.mail.imap_client import ImapClient, ImapError, ImapTimeout  # noqa: E402
+
+
+class _Settings:
+    def __init__(self, port: int, password: str = "secret"):
+        self.server, self.port, self.ssl, self.username, self.password = "127.0.0.1", port, False, "user", password
+
+
+def _run(test, **options):
+    """Ejecuta `test(stub, port)` con un servidor de pruebas con 10 mensajes en INBOX"""
+    async def run():
+        stub = StubImapServer(**options)
+        stub.add_mailbox("INBOX", generate_messages(10), uidvalidity=7)
+        port = await stub.start()
+        try:
+            await test(stub, port)
+        finally:
+            await stub.stop()
+
+    asyncio.run(run())
+
+
+def test_select_search_and_fetch():
+    async def test(stub, port):
+        client = await ImapClient.open(_Settings(port), timeout=5)
+        assert await client.has_capability("IDLE")
+        info = await client.select("INBOX", readonly=True)
+        assert (info.exists, info.uidvalidity, info.uidnext, info.readonly) == (10, 7, 11, True)
+        assert await client.search("UNSEEN", uid=True) == [3, 6, 9]
+        fetched = await client.fetch("2:3", "(UID FLAGS)")
+        assert [(item["UID"], item["FLAGS"]) for item in fetched] == [(2, ["\\Seen"]), (3, [])]
+        await client.logout()
+        assert client.closed
+
+    _run(test)
+
+
+def test_login_rejected_and_timeout():
+    async def test(stub, port):
+        with pytest.raises(ImapError):
+            await ImapClient.open(_Settings(port, "otra"), timeout=5)
+        stub.login_delay = 1
+        with pytest.raises(ImapTimeout):
+            await ImapClient.open(_Settings(port), timeout=0.2)
+
+    _run(test)
+
+
+def test_idle_returns_on_first_notification():
+    async def test(stub, port):
+        client = await ImapClient.open(_Settings(port), timeout=5)
+        await client.select("INBOX")
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.05, stub.deliver, "INBOX", generate_messages(2, start_uid=11))
+        started = loop.time()
+        responses = await client.idle(wait=5)
+        assert loop.time() - started < 1
+        assert [(response.number, response.kind) for response in responses] == [(12, "EXISTS")]
+
+        loop.call_later(0.05, stub.set_flags, "INBOX", 3, {"\\Seen"})
+        responses = await client.idle(wait=5)
+        assert [(response.number, response.kind) for response in responses] == [(3, "FETCH")]
+
+        # Sin cambios: vuelve al agotar `wait` y la conexión sigue utilizable
+        assert await client.idle(wait=0.1) == []
+        assert await client.search("UNSEEN", uid=True) == [6, 9, 12]
+        await client.logout()
+
+    _run(test)
+
+
+def test_idle_without_mailbox_is_rejected():
+    async def test(stub, port):
+        client = await ImapClient.open(_Settings(port), timeout=5)
+        with pytest.raises(ImapError):
+            await client.idle(wait=0.1)
+        assert await client.noop()
+        await client.logout()
+
+    _run(test)
+
+
+def test_cancelled_idle_drops_the_connection():
+    async def test(stub, port):
+        client = await ImapClient.open(_Settings(port), timeout=5)
+        await client.select("INBOX")
+        task = asyncio.ensure_future(client.idle(wait=5))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # A mitad de IDLE el estado de la conexión es desconocido: no se reutiliza
+        assert client.closed and not await client.noop()
+
+    _run(test)
@@ -0,0 +1,102 @@
+"""
+Partes MIME bajo demanda (parts.py): cuerpo y extractos sin el mensaje
+completo, adjuntos por tramos y caché por contenido
+"""
+import asyncio
+import binascii
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+
+from imap_stub import StubImapServer, generate_messages  # noqa: E402
+
+from src.modules.mail.envelope import walk_parts  # noqa: E402
+from src.modules.mail.imap_client import ImapClient, ImapError  # noqa: E402
+from src.modules.mail.parts import PartDecoder, PartStore, fetch_part, fetch_snippets, fetch_texts  # noqa: E402
+
+ATTACHMENT_SIZE = 5000
+ATTACHMENT = (bytes(range(256)) * (ATTACHMENT_SIZE // 256 + 1))[:ATTACHMENT_SIZE]
+
+
+class _Settings:
+    def __init__(self, port: int):
+        self.server, self.port, self.ssl, self.username, self.password = "127.0.0.1", port, False, "user", "secret"
+
+
+def _run(test):
+    """Ejecuta `test(stub, client, parts)` con INBOX seleccionado; `parts[uid]`
+    son las partes de su BODYSTRUCTURE"""
+    async def run():
+        stub = StubImapServer()
+        stub.add_mailbox("INBOX", generate_messages(8, attachment_every=4, attachment_size=ATTACHMENT_SIZE))
+        port = await stub.start()
+        try:
+            client = await ImapClient.open(_Settings(port), timeout=5)
+            await client.select("INBOX", readonly=True)
+            items = await client.fetch("1:*", "(UID BODYSTRUCTURE)")
+            parts = {item["UID"]: list(walk_parts(item["BODYSTRUCTURE"])) for item in items}
+            await test(stub, client, parts)
+            await client.logout()
+        finally:
+            await stub.stop()
+
+    asyncio.run(run())
+
+
+async def _collect(chunks):
+    return b"".join([chunk async for chunk in chunks])
+
+
+def test_texts_and_snippets_without_the_attachment():
+    async def test(stub, client, parts):
+        body = parts[4][0]
+        assert (await fetch_texts(client, 4, [body]))["1"].strip() == "Contenido del mensaje 4."
+        with pytest.raises(ImapError):
+            await fetch_texts(client, 99, [body])
+
+        items = await client.fetch("1:8", "(UID BODYSTRUCTURE)")
+        sent = stub.bytes_sent
+        snippets = await fetch_snippets(client, items)
+        assert snippets == {uid: f"Contenido del mensaje {uid}." for uid in range(1, 9)}
+        # Solo el principio de la parte de texto: los adjuntos no se descargan
+        assert stub.bytes_sent - sent < ATTACHMENT_SIZE
+
+    _run(test)
+
+
+def test_attachment_is_fetched_in_chunks(tmp_path):
+    async def test(stub, client, parts):
+        attachment = parts[4][1]
+        assert (attachment.section, attachment.encoding, attachment.filename) == ("2", "base64", "datos-4.bin")
+
+        fetches = stub.commands["UID"]
+        data = await _collect(fetch_part(client, 4, attachment, chunk_size=1024))
+        assert data == ATTACHMENT
+        # ~6.800 bytes en base64: 7 tramos de 1 KB
+        assert stub.commands["UID"] - fetches == -(-attachment.size // 1024)
+
+        store = PartStore(root=str(tmp_path), chunk_size=1000)
+        first, size = await store.save(fetch_part(client, 4, attachment, chunk_size=4096))
+        # El mismo contenido en otro mensaje ocupa el mismo fichero
+        second, _ = await store.save(fetch_part(client, 8, parts[8][1], chunk_size=4096))
+        assert first == second and size == ATTACHMENT_SIZE
+        assert (store.stored, store.deduplicated, store.bytes_written) == (1, 1, ATTACHMENT_SIZE)
+        assert b"".join(store.iter_file(first)) == ATTACHMENT
+        assert [path.name for path in tmp_path.rglob("*") if path.is_file()] == [first.split("/")[1]]
+
+    _run(test)
+
+
+@pytest.mark.parametrize("encoding,encoded", [
+    ("base64", binascii.b2a_base64(ATTACHMENT[:1000])),
+    ("quoted-printable", binascii.b2a_qp(ATTACHMENT[:1000])),
+    ("7bit", ATTACHMENT[:1000]),
+])
+def test_decoder_handles_any_chunk_boundary(encoding, encoded):
+    for size in (1, 3, 7, 76, 1000):
+        decoder = PartDecoder(encoding)
+        decoded = b"".join(decoder.feed(encoded[i:i + size]) for i in range(0, len(encoded), size))
+        assert decoded + decoder.flush() == ATTACHMENT[:1000], size
@@ -0,0 +1,75 @@
+"""
+imap_pool: /test-connection no deja sesiones y las cuentas sin sesiones se olvidan
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+
+from imap_stub import StubImapServer  # noqa: E402
+from smtp_stub import StubSmtpServer  # noqa: E402
+
+from src.api.routers import mail  # noqa: E402
+from src.modules.mail.imap_pool import ConnectionPool, imap_pool  # noqa: E402
+
+
+def test_connection_test_leaves_no_pooled_session():
+    async def run():
+        imap, smtp = StubImapServer(), StubSmtpServer()
+        imap_port, smtp_port = await imap.start(), await smtp.start()
+        created = imap_pool.created
+        try:
+            for password in ("secret", "otra-1", "otra-2"):
+                result = await mail.test_connection(mail.TestConnectionRequest(
+                    incoming=mail.ServerSettings(server="127.0.0.1", port=imap_port, ssl=False,
+                                                 username="user", password=password),
+                    outgoing=mail.ServerSettings(server="127.0.0.1", port=smtp_port, ssl=False,
+                                                 username="user", password=password),
+                ))
+                assert result["success"] is (password == "secret")
+            await asyncio.sleep(0.05)
+            assert imap_pool.created == created
+            assert not imap_pool.stats()["accounts"]
+            assert sum(imap._sessions.values()) == 0  # el servidor no tiene sesiones abiertas
+        finally:
+            await imap.stop()
+            await smtp.stop()
+
+    asyncio.run(run())
+
+
+class _Session:
+    closed = False
+
+    async def noop(self):
+        return True
+
+    async def logout(self):
+        self.closed = True
+
+
+class _Settings:
+    def __init__(self, password: str):
+        self.server, self.port, self.ssl, self.username, self.password = "imap.example.com", 993, True, "u", password
+
+
+async def _factory(settings, timeout):
+    return _Session()
+
+
+def test_idle_accounts_are_forgotten():
+    pool = ConnectionPool(_factory, max_per_account=2, idle_timeout=60, health_after=30, acquire_timeout=1, timeout=1)
+
+    async def run():
+        for index in range(50):
+            async with pool.session(_Settings(f"password-{index}")):
+                pass
+        assert len(pool._accounts) == 50  # una entrada por contraseña
+        async with pool.session(_Settings("en-uso")):
+            assert await pool.close_idle(older_than=0) == 50
+            assert [state.in_use for state in pool._accounts.values()] == [1]
+        await pool.close_idle(older_than=0)
+        assert pool._accounts == {}
+
+    asyncio.run(run())
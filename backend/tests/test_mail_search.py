@@ -0,0 +1,79 @@
+"""
+Búsqueda local de correo (modules/mail/search.py) sobre el índice FTS5 de SQLite
+"""
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import Session
+
+from src.database.migrations import run_migrations
+from src.database.models import Base, MailMessage
+from src.modules.mail.search import search_query
+
+# (id, cuenta, carpeta, asunto, remitente, email, cuerpo, día de enero)
+MESSAGES = [
+    (1, 1, 10, "Factura de marzo", "Proveedor SA", "facturas@proveedor.es", "Adjuntamos la factura", 1),
+    (2, 1, 10, "Reunión semanal", "Ana García", "ana@example.com", "Orden del día: presupuesto", 2),
+    (3, 1, 11, "Re: presupuesto", "Luis Pérez", "luis@example.com", "Te mando el presupuesto revisado", 3),
+    (4, 1, 11, "Vacaciones", "Ana García", "ana@example.com", "Vuelvo el lunes", 4),
+    (5, 2, 20, "Factura de marzo", "Proveedor SA", "facturas@proveedor.es", "Otra cuenta", 5),
+]
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/mail.db")
+    Base.metadata.create_all(engine, tables=[MailMessage.__table__])
+    run_migrations(engine, Base.metadata)
+    with engine.begin() as conn:
+        conn.execute(MailMessage.__table__.insert(), [
+            {"id": id_, "account_id": account, "folder_id": folder, "uid": str(id_), "message_id": f"<{id_}@test>",
+             "subject": subject, "from_name": name, "from_email": email, "body_text": body,
+             "snippet": body[:20], "received_at": datetime(2024, 1, day)}
+            for id_, account, folder, subject, name, email, body, day in MESSAGES
+        ])
+    yield engine
+    engine.dispose()
+
+
+def _ids(engine, text: str, account_id: int = 1, **filters):
+    query = search_query(account_id, text, "sqlite", **filters)
+    with Session(engine) as db:
+        return [message.id for message in db.execute(query).scalars()]
+
+
+@pytest.mark.parametrize("text,expected", [
+    ("factura", [1]),                    # asunto (y cuerpo)
+    ("ana garcía", [4, 2]),              # nombre del remitente, más recientes primero
+    ("luis@example", [3]),               # email del remitente
+    ("revisado", [3]),                   # solo en el cuerpo
+    ("presupuesto", [3, 2]),
+    ("presupuesto ana", [2]),            # todas las palabras
+    ("re", [3, 2]),                      # < 3 caracteres: ILIKE
+    ("nada", []),
+])
+def test_search_matches_subject_sender_and_body(engine, text, expected):
+    assert _ids(engine, text) == expected
+
+
+def test_search_is_scoped_to_account_and_folders(engine):
+    assert _ids(engine, "factura", account_id=2) == [5]
+    assert _ids(engine, "ana", folder_ids=[10]) == [2]
+    assert _ids(engine, "ana", folder_ids=[11, 20]) == [4]
+    assert _ids(engine, "example", since=datetime(2024, 1, 3), until=datetime(2024, 1, 4)) == [3]
+
+
+def test_search_skips_deleted_messages_and_follows_updates(engine):
+    with engine.begin() as conn:
+        conn.execute(update(MailMessage).where(MailMessage.id == 4).values(is_deleted=True))
+        # El cuerpo guardado al abrir un mensaje entra en el índice (trigger)
+        conn.execute(update(MailMessage).where(MailMessage.id == 1).values(body_text="Pago pendiente"))
+    assert _ids(engine, "ana garcía") == [2]
+    assert _ids(engine, "pendiente") == [1]
+
+
+def test_relevance_sort_and_empty_query(engine):
+    assert set(_ids(engine, "presupuesto", sort="relevance")) == {2, 3}
+    assert _ids(engine, "presupuesto", sort="relevance")[0] == 3  # asunto y cuerpo
+    assert search_query(1, "  ", "sqlite") is None
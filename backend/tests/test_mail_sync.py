@@ -0,0 +1,154 @@
+"""
+Sincronización incremental (sync.py) contra el servidor IMAP de pruebas:
+mensajes nuevos, cambios de flags con y sin CONDSTORE, borrados y UIDVALIDITY
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+
+from imap_stub import StubImapServer, generate_messages  # noqa: E402
+
+from src.database.models import Base, MailAccount, MailFolder, MailMessage  # noqa: E402
+from src.modules.mail import sync as sync_module  # noqa: E402
+from src.modules.mail.imap_client import ImapClient  # noqa: E402
+from src.modules.mail.imap_pool import ConnectionPool  # noqa: E402
+from src.modules.mail.sync import MailSync  # noqa: E402
+
+
+@pytest.fixture
+def sessions(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path}/mail.db")
+    Base.metadata.create_all(engine)
+    engine.dispose()
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/mail.db")
+    factory = async_sessionmaker(async_engine, expire_on_commit=False)
+    monkeypatch.setattr(sync_module, "get_async_session_local", lambda: factory)
+    yield factory
+    asyncio.run(async_engine.dispose())
+
+
+def _run(sessions, test, condstore: bool = True):
+    """Ejecuta `test(stub, sync)`; `sync()` sincroniza la cuenta y devuelve el
+    resultado de INBOX. Los FETCH enviados quedan en stub.fetches"""
+    async def run():
+        stub = StubImapServer()
+        if not condstore:
+            stub.capabilities = [name for name in stub.capabilities if name != "CONDSTORE"]
+        stub.add_mailbox("INBOX", generate_messages(30), uidvalidity=1)
+        port = await stub.start()
+        stub.fetches = []
+
+        async def factory(settings, timeout):
+            client = await ImapClient.open(settings, timeout)
+            fetch = client.fetch
+
+            async def spy(sequence, items, **options):
+                stub.fetches.append((items, options.get("changedsince")))
+                return await fetch(sequence, items, **options)
+
+            client.fetch = spy
+            return client
+
+        pool = ConnectionPool(factory=factory, max_per_account=1, idle_timeout=300,
+                              health_after=30, acquire_timeout=30, timeout=30)
+        worker = MailSync(pool=pool, batch_size=20)
+        async with sessions() as db:
+            account = MailAccount(user_id=1, name="test", email="user@example.com",
+                                  imap_server="127.0.0.1", imap_port=port, imap_ssl=False,
+                                  imap_username="user", imap_password="secret",
+                                  smtp_server="127.0.0.1", smtp_username="user", smtp_password="secret")
+            db.add(account)
+            await db.commit()
+
+        async def sync():
+            stub.fetches.clear()
+            async with sessions() as db:
+                result = await worker.sync_account(db, await db.get(MailAccount, account.id))
+            return next(folder for folder in result.folders if folder.path == "INBOX")
+
+        try:
+            await test(stub, sync)
+        finally:
+            await pool.close()
+            await stub.stop()
+
+    asyncio.run(run())
+
+
+async def _messages(sessions):
+    async with sessions() as db:
+        return {int(uid): is_read for uid, is_read in (await db.execute(
+            select(MailMessage.uid, MailMessage.is_read)
+        )).all()}
+
+
+async def _folder(sessions):
+    async with sessions() as db:
+        return (await db.execute(select(MailFolder).where(MailFolder.path == "INBOX"))).scalar_one()
+
+
+def test_new_messages_flags_and_deletions_with_condstore(sessions):
+    async def test(stub, sync):
+        first = await sync()
+        assert (first.new, first.total_count, first.unread_count) == (30, 30, 10)
+        assert len(await _messages(sessions)) == 30
+        modseq = (await _folder(sessions)).highest_modseq
+        assert modseq == stub.mailboxes["INBOX"].highestmodseq
+
+        # Sin cambios: solo EXAMINE, ningún FETCH
+        unchanged = await sync()
+        assert not unchanged.changed and stub.fetches == []
+
+        stub.set_flags("INBOX", 3, {"\\Seen"})
+        stub.deliver("INBOX", generate_messages(5, start_uid=31))
+        stub.expunge("INBOX", [1, 2])
+        result = await sync()
+        assert (result.new, result.updated, result.deleted) == (5, 1, 2)
+        assert (result.total_count, result.unread_count) == (33, 10)
+        # Solo los flags modificados desde el HIGHESTMODSEQ guardado
+        assert stub.fetches[0] == ("(UID FLAGS)", modseq)
+        messages = await _messages(sessions)
+        assert sorted(messages) == list(range(3, 36)) and messages[3] is True
+
+    _run(sessions, test)
+
+
+def test_flag_changes_without_condstore(sessions):
+    async def test(stub, sync):
+        await sync()
+        stub.set_flags("INBOX", 1, set())
+        stub.set_flags("INBOX", 3, {"\\Seen"})
+        result = await sync()
+        assert (result.new, result.updated, result.unread_count) == (0, 2, 10)
+        # Sin CONDSTORE se comparan los flags de todos los mensajes conocidos
+        assert stub.fetches == [("(UID FLAGS)", None)]
+        assert (await _folder(sessions)).highest_modseq is None
+        messages = await _messages(sessions)
+        assert messages[1] is False and messages[3] is True
+
+    _run(sessions, test, condstore=False)
+
+
+def test_uidvalidity_change_resyncs_the_folder(sessions):
+    async def test(stub, sync):
+        await sync()
+        # El servidor renumera el buzón: los UIDs guardados ya no valen
+        stub.add_mailbox("INBOX", generate_messages(12, start_uid=100), uidvalidity=2)
+        result = await sync()
+        assert result.full_resync and (result.deleted, result.new) == (30, 12)
+        assert (result.total_count, result.unread_count) == (12, 4)
+        assert sorted(await _messages(sessions)) == list(range(100, 112))
+        folder = await _folder(sessions)
+        assert (folder.uid_validity, folder.last_seen_uid) == (2, 111)
+
+        async with sessions() as db:
+            account = (await db.execute(select(MailAccount))).scalar_one()
+        assert (account.total_count, account.unread_count) == (12, 4)
+
+    _run(sessions, test)
@@ -0,0 +1,175 @@
+"""
+Sincronización con varios procesos: reserva de la cuenta en la base,
+(folder_id, uid) único y migración de los duplicados
+"""
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, func, inspect, select, text, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+
+from imap_stub import StubImapServer, generate_messages  # noqa: E402
+
+from src.database.migrations import run_migrations  # noqa: E402
+from src.database.models import Base, MailAccount, MailFolder, MailMessage  # noqa: E402
+from src.modules.mail import sync as sync_module  # noqa: E402
+from src.modules.mail.imap_client import ImapClient  # noqa: E402
+from src.modules.mail.imap_pool import ConnectionPool  # noqa: E402
+from src.modules.mail.sync import MailSync, SyncBusy  # noqa: E402
+
+
+@pytest.fixture
+def sessions(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path}/mail.db")
+    Base.metadata.create_all(engine)
+    engine.dispose()
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/mail.db")
+    factory = async_sessionmaker(async_engine, expire_on_commit=False)
+    monkeypatch.setattr(sync_module, "get_async_session_local", lambda: factory)
+    yield factory
+    asyncio.run(async_engine.dispose())
+
+
+def _worker(name: str, pool=None) -> MailSync:
+    """MailSync de otro proceso (worker_id distinto)"""
+    sync = MailSync(pool=pool, batch_size=50, lease_timeout=60)
+    sync.worker_id = name
+    return sync
+
+
+async def _account(sessions, port: int = 1) -> MailAccount:
+    async with sessions() as db:
+        account = MailAccount(user_id=1, name="test", email="user@example.com",
+                              imap_server="127.0.0.1", imap_port=port, imap_ssl=False,
+                              imap_username="user", imap_password="secret",
+                              smtp_server="127.0.0.1", smtp_username="user", smtp_password="secret")
+        db.add(account)
+        await db.commit()
+        return account
+
+
+async def _claimed_by(sessions, account_id: int):
+    async with sessions() as db:
+        return (await db.execute(select(MailAccount.sync_claimed_by).where(MailAccount.id == account_id))).scalar()
+
+
+def test_account_lease_is_exclusive_across_processes(sessions):
+    first, second = _worker("web-1"), _worker("web-2")
+
+    async def run():
+        account = await _account(sessions)
+        async with first.claim(account.id) as token:
+            assert await _claimed_by(sessions, account.id) == token
+            with pytest.raises(SyncBusy):
+                async with second.claim(account.id):
+                    pass
+        assert await _claimed_by(sessions, account.id) is None
+        async with second.claim(account.id):
+            assert (await _claimed_by(sessions, account.id)).startswith("web-2-")
+        assert second.busy == 1 and first.busy == 0
+
+    asyncio.run(run())
+
+
+def test_stale_lease_is_taken_over_and_released_on_stop(sessions):
+    crashed, worker = _worker("web-1"), _worker("web-2")
+
+    async def run():
+        account = await _account(sessions)
+        assert await crashed._lease(account.id, "web-1-1")
+        assert not await worker._lease(account.id, "web-2-1")
+        async with sessions() as db:
+            await db.execute(update(MailAccount).values(sync_claimed_at=datetime.utcnow() - timedelta(seconds=120)))
+            await db.commit()
+        assert await worker._lease(account.id, "web-2-1")
+        await worker.release_all()
+        assert await _claimed_by(sessions, account.id) is None
+
+    asyncio.run(run())
+
+
+def test_concurrent_syncs_insert_each_message_once(sessions):
+    async def run():
+        stub = StubImapServer()
+        stub.add_mailbox("INBOX", generate_messages(120))
+        port = await stub.start()
+        pools = [ConnectionPool(factory=ImapClient.open, max_per_account=1, idle_timeout=300,
+                                health_after=30, acquire_timeout=30, timeout=30) for _ in range(2)]
+        workers = [_worker(f"web-{i}", pool) for i, pool in enumerate(pools)]
+        account = await _account(sessions, port)
+
+        async def sync(worker):
+            async with sessions() as db:
+                return await worker.sync_account(db, await db.get(MailAccount, account.id))
+
+        try:
+            results = await asyncio.gather(*(sync(worker) for worker in workers), return_exceptions=True)
+            assert sorted(type(result).__name__ for result in results) == ["AccountSyncResult", "SyncBusy"]
+
+            # Un proceso que no vio el progreso del otro vuelve a pedir todos los mensajes
+            async with sessions() as db:
+                await db.execute(update(MailFolder).values(last_seen_uid=0))
+                await db.commit()
+            result = await sync(workers[0])
+            assert result.new == 0 and workers[0].duplicates_skipped == 120
+        finally:
+            for pool in pools:
+                await pool.close()
+            await stub.stop()
+
+        async with sessions() as db:
+            assert (await db.execute(select(func.count(MailMessage.id)))).scalar() == 120
+            total, unread = (await db.execute(select(MailFolder.total_count, MailFolder.unread_count))).one()
+            account_total = (await db.execute(select(MailAccount.total_count))).scalar()
+        assert total == account_total == 120 and unread == 40
+
+    asyncio.run(run())
+
+
+def test_insert_skips_rows_inserted_by_another_process(sessions):
+    async def run():
+        account = await _account(sessions)
+        async with sessions() as db:
+            folder = MailFolder(account_id=account.id, name="INBOX", display_name="INBOX", path="INBOX")
+            db.add(folder)
+            await db.commit()
+            rows = [{"account_id": account.id, "folder_id": folder.id, "uid": str(uid),
+                     "message_id": f"<{uid}@test>", "from_email": "a@example.com",
+                     "received_at": datetime(2024, 1, 1)} for uid in (1, 2, 3)]
+            await db.execute(MailMessage.__table__.insert(), rows[1:2])
+            # Entre la comprobación (_new_rows) y el INSERT otro proceso guardó el UID 2
+            inserted = await _worker("web-1")._insert(db, rows)
+            await db.commit()
+            assert [row["uid"] for row in inserted] == ["1", "3"]
+            assert (await db.execute(select(func.count(MailMessage.id)))).scalar() == 3
+
+    asyncio.run(run())
+
+
+def test_migration_removes_duplicates_and_makes_uid_unique(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/old.db")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        # Esquema anterior: índice no único y el mismo UID insertado dos veces
+        conn.execute(text("DROP INDEX ix_mail_messages_folder_uid"))
+        conn.execute(text("CREATE INDEX idx_folder_uid ON mail_messages (folder_id, uid)"))
+        conn.execute(MailMessage.__table__.insert(), [
+            {"id": i, "account_id": 1, "folder_id": 1, "uid": uid, "message_id": f"<{uid}@test>", "from_email": "a@x",
+             "received_at": datetime(2024, 1, 1)}
+            for i, uid in enumerate(["1", "2", "2", "3", "3", "3", None, None], start=1)
+        ])
+    run_migrations(engine, Base.metadata)
+    run_migrations(engine, Base.metadata)  # idempotente
+
+    with engine.connect() as conn:
+        ids = conn.execute(select(MailMessage.id).order_by(MailMessage.id)).scalars().all()
+        indexes = [index for index in inspect(conn).get_indexes("mail_messages")
+                   if index["column_names"] == ["folder_id", "uid"]]
+    engine.dispose()
+    assert ids == [1, 2, 4, 7, 8]
+    assert [(index["name"], index["unique"]) for index in indexes] == [("ix_mail_messages_folder_uid", 1)]
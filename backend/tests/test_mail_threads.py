@@ -0,0 +1,49 @@
+"""
+Conversaciones (threads.py): asignación al insertar y fecha del último mensaje
+"""
+import asyncio
+from datetime import datetime
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.database.models import Base, MailThread
+from src.modules.mail.threads import assign_threads
+
+
+def _row(message_id, received_at, in_reply_to=None, subject="Presupuesto"):
+    return {"message_id": message_id, "in_reply_to": in_reply_to, "references": None,
+            "subject": subject, "received_at": received_at}
+
+
+def test_new_threads_take_the_date_of_their_messages(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/mail.db")
+    Base.metadata.create_all(engine)
+    engine.dispose()
+
+    async def run():
+        async_engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/mail.db")
+        sessions = async_sessionmaker(async_engine, expire_on_commit=False)
+        try:
+            async with sessions() as db:
+                rows = [
+                    _row("<a@x>", datetime(2024, 1, 2)),
+                    _row("<b@x>", datetime(2024, 1, 5), in_reply_to="<a@x>", subject="Re: Presupuesto"),
+                    _row("<c@x>", None, subject="Sin fecha"),
+                ]
+                started = datetime.utcnow()
+                await assign_threads(db, 1, rows)
+                # Una respuesta posterior se une a la conversación existente
+                reply = _row("<d@x>", datetime(2024, 1, 9), in_reply_to="<b@x>", subject="Re: Re: Presupuesto")
+                await assign_threads(db, 1, [reply])
+                await db.commit()
+                threads = {thread.subject: thread for thread in (await db.execute(select(MailThread))).scalars()}
+        finally:
+            await async_engine.dispose()
+
+        assert rows[0]["thread_id"] == rows[1]["thread_id"] == reply["thread_id"] != rows[2]["thread_id"]
+        assert set(threads) == {"Presupuesto", "Sin fecha"}
+        assert threads["Presupuesto"].last_message_at == datetime(2024, 1, 9)
+        assert threads["Sin fecha"].last_message_at >= started
+
+    asyncio.run(run())
@@ -0,0 +1,100 @@
+"""
+PermissionMatcher y permisos exigidos por los routers de empresas y empleados
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.api.routers import companies, employees
+from src.database.connection import get_async_db, get_db
+from src.services.auth import AuthService
+from src.services.permissions import PermissionMatcher, permission_cache
+from src.services.user_cache import UserPrincipal, user_cache
+
+
+@pytest.mark.parametrize("patterns,permission,allowed", [
+    (["*"], "companies.write", True),
+    (["companies.*"], "companies.write", True),
+    (["companies.*"], "companies.x.y", True),
+    (["companies.*"], "companies", False),
+    (["companies.*"], "employees.write", False),
+    (["mail.read"], "mail.read", True),
+    (["mail.read"], "mail.read.all", False),
+    (["companies.*.export"], "companies.x.export", True),
+    (["companies.*.export"], "companies.x.delete", False),
+    # Un patrón más concreto bajo el comodín no recorta lo que ya cubría
+    (["companies.*", "companies.*.export"], "companies.x.y", True),
+    (["companies.*.export", "companies.*"], "companies.x.y.z", True),
+    (["*", "mail.read"], "payroll.run", True),
+])
+def test_matcher(patterns, permission, allowed):
+    assert PermissionMatcher(patterns).allows(permission) is allowed
+
+
+def test_extra_grant_never_removes_access():
+    matcher = PermissionMatcher(["companies.*"])
+    before = matcher.allows("companies.x.y")
+    matcher.add("companies.*.export")
+    assert before and matcher.allows("companies.x.y")
+
+
+USER_ID = 9001
+
+WRITES = [
+    ("post", "/api/companies/", {"name": "Acme", "tax_id": "B12345678"}, "companies.write"),
+    ("put", "/api/companies/1", {"name": "Acme"}, "companies.write"),
+    ("delete", "/api/companies/1", None, "companies.write"),
+    ("post", "/api/companies/1/activate", None, "companies.write"),
+    ("post", "/api/companies/1/deactivate", None, "companies.write"),
+    ("post", "/api/employees/", {"name": "Ana", "email": "ana@example.com", "position": "Dev",
+                                 "department": "IT", "salary": 1000}, "employees.write"),
+    ("put", "/api/employees/emp_001", {"position": "Lead"}, "employees.write"),
+    ("delete", "/api/employees/emp_999", None, "employees.write"),
+]
+
+
+async def _no_db():
+    yield None
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(companies.router, prefix="/api/companies")
+    app.include_router(employees.router, prefix="/api/employees")
+    app.dependency_overrides[get_async_db] = _no_db
+    app.dependency_overrides[get_db] = _no_db
+    user_cache.put(USER_ID, UserPrincipal(USER_ID, "test", True, False, False))
+    yield TestClient(app)
+    user_cache.invalidate(USER_ID)
+    permission_cache.invalidate(USER_ID)
+
+
+def _auth(patterns):
+    permission_cache.put(USER_ID, PermissionMatcher(patterns))
+    return {"Authorization": f"Bearer {AuthService.create_access_token({'sub': str(USER_ID)})}"}
+
+
+@pytest.mark.parametrize("method,path,body,permission", WRITES)
+def test_write_requires_authentication(client, method, path, body, permission):
+    response = client.request(method, path, json=body)
+    # HTTPBearer sin cabecera: 401 o 403 según la versión de FastAPI
+    assert response.status_code in (401, 403)
+    assert response.json()["detail"] == "Not authenticated"
+
+
+@pytest.mark.parametrize("method,path,body,permission", WRITES)
+def test_write_requires_permission(client, method, path, body, permission):
+    response = client.request(method, path, json=body, headers=_auth(["mail.read"]))
+    assert response.status_code == 403
+    assert response.json()["detail"] == f"Missing permission: {permission}"
+
+
+@pytest.mark.parametrize("method,path,body,permission", WRITES)
+def test_write_with_permission(client, method, path, body, permission):
+    response = client.request(method, path, json=body, headers=_auth([permission.split(".")[0] + ".*"]))
+    assert response.status_code not in (401, 403)
+
+
+def test_reads_stay_public(client):
+    assert client.get("/api/employees/").status_code == 200
@@ -0,0 +1,128 @@
+"""
+Enrutado a réplicas (routing.py) con dos ficheros SQLite: primario y réplica
+"""
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from src.config.settings import Settings
+from src.database import connection
+from src.database.registry import EngineRegistry
+from src.database.routing import ReplicaRouter, RoutingSession
+
+
+def _database(path, name: str) -> str:
+    url = f"sqlite:///{path}"
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE marker (name VARCHAR(20))"))
+        conn.execute(text("INSERT INTO marker VALUES (:name)"), {"name": name})
+    engine.dispose()
+    return url
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    def make(replica_url=None, read_after_write: float = 0):
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setenv("DATABASE_URL", _database(tmp_path / "primary.db", "primary"))
+        monkeypatch.setenv("DB_REPLICA_URLS", replica_url or _database(tmp_path / "replica.db", "replica"))
+        monkeypatch.setenv("DB_REPLICA_READ_AFTER_WRITE", str(read_after_write))
+        settings = Settings()
+        settings.debug = False
+        return EngineRegistry(settings)
+    return make
+
+
+def _sessions(registry: EngineRegistry):
+    router = ReplicaRouter(registry, is_async=False)
+    return router, sessionmaker(class_=RoutingSession, bind=registry.get_engine(), info={"router": router})
+
+
+def _read(session) -> str:
+    return session.execute(text("SELECT name FROM marker")).scalar()
+
+
+def test_replica_urls_from_env(registry):
+    assert registry().replica_names() == ["replica_0"]
+
+
+def test_read_only_session_uses_replica(registry):
+    _, factory = _sessions(registry())
+    with factory() as session:
+        session.info["read_only"] = True
+        assert _read(session) == "replica"
+    with factory() as session:
+        assert _read(session) == "primary"
+
+
+def test_write_pins_session_to_primary(registry):
+    _, factory = _sessions(registry())
+    with factory() as session:
+        session.info["read_only"] = True
+        session.execute(text("INSERT INTO marker VALUES ('nuevo')"))
+        # La réplica solo tiene una fila: la lectura ve la escritura, luego va al primario
+        assert session.execute(text("SELECT COUNT(*) FROM marker")).scalar() == 2
+        session.commit()
+        assert _read(session) == "primary"
+
+
+def test_reads_after_write_stay_on_primary(registry):
+    _, factory = _sessions(registry(read_after_write=60))
+    with factory() as session:
+        session.execute(text("INSERT INTO marker VALUES ('nuevo')"))
+        session.commit()
+    with factory() as session:
+        session.info["read_only"] = True
+        assert _read(session) == "primary"
+
+
+def test_unhealthy_replica_falls_back_to_primary(registry, tmp_path):
+    router, factory = _sessions(registry(replica_url=f"sqlite:///{tmp_path}/no-existe/replica.db"))
+    with factory() as session:
+        session.info["read_only"] = True
+        assert _read(session) == "primary"
+    assert router.status() == {"replica_0": False}
+
+
+def test_async_read_only_session_uses_replica(registry):
+    registry = registry()
+    router = ReplicaRouter(registry, is_async=True)
+    factory = async_sessionmaker(
+        bind=registry.get_async_engine(), class_=AsyncSession, sync_session_class=RoutingSession,
+        info={"router": router},
+    )
+
+    async def run():
+        async with factory() as session:
+            session.info["read_only"] = True
+            replica = (await session.execute(text("SELECT name FROM marker"))).scalar()
+        async with factory() as session:
+            primary = (await session.execute(text("SELECT name FROM marker"))).scalar()
+        await registry.dispose()
+        return replica, primary
+
+    assert asyncio.run(run()) == ("replica", "primary")
+
+
+def test_get_bind_from_async_code_keeps_replica_healthy(registry, monkeypatch):
+    registry = registry()
+    monkeypatch.setattr(connection, "get_engine_registry", lambda: registry)
+    monkeypatch.setattr(connection, "_AsyncSessionLocal", None)
+
+    async def run():
+        dependency = connection.get_async_read_db()
+        db = await dependency.__anext__()
+        # Fuera del puente greenlet: no hay ping posible, ni se marca la réplica como caída
+        assert db.get_bind().dialect.name == "sqlite"
+        assert connection.get_replica_status() == {"replica_0": None}
+        name = (await db.execute(text("SELECT name FROM marker"))).scalar()
+        await dependency.aclose()
+        await registry.dispose()
+        return name
+
+    assert asyncio.run(run()) == "replica"
+    assert connection.get_replica_status() == {"replica_0": True}
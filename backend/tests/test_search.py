@@ -0,0 +1,151 @@
+"""
+Búsqueda de texto completo (database/search.py) con el índice FTS5 trigram de SQLite
+"""
+import pytest
+from sqlalchemy import create_engine, select, text, update
+from sqlalchemy.dialects import mysql
+
+from src.database import search
+from src.database.migrations import run_migrations
+from src.database.models import Base, User
+from src.database.search import USER_SEARCH, ranked_search, search_condition
+
+USERS = [
+    ("ana", "ana@example.com", "Ana", "García"),
+    ("luis", "luis@example.com", "Luis", "Pérez"),
+    ("marta", "marta@acme.com", "Marta", "García López"),
+]
+
+
+def _insert(conn, rows):
+    conn.execute(User.__table__.insert(), [
+        {"username": username, "email": email, "first_name": first, "last_name": last, "password_hash": "x"}
+        for username, email, first, last in rows
+    ])
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/search.db")
+    Base.metadata.create_all(engine, tables=[User.__table__])
+    with engine.begin() as conn:
+        # Filas anteriores al índice: la migración las indexa (rebuild)
+        _insert(conn, USERS[:1])
+    run_migrations(engine, Base.metadata)
+    with engine.begin() as conn:
+        _insert(conn, USERS[1:])
+    yield engine
+    engine.dispose()
+
+
+def _search(engine, query: str):
+    with engine.connect() as conn:
+        return conn.execute(
+            select(User.username).where(search_condition(USER_SEARCH, query, "sqlite")).order_by(User.id)
+        ).scalars().all()
+
+
+def _fts(engine, query: str):
+    """Filas que encuentra la tabla FTS5 (sin el ILIKE de respaldo)"""
+    with engine.connect() as conn:
+        return conn.execute(
+            text("SELECT rowid FROM users_fts WHERE users_fts MATCH :q ORDER BY rowid"), {"q": f'"{query}"'}
+        ).scalars().all()
+
+
+def test_migration_creates_fts_table_and_is_idempotent(engine):
+    run_migrations(engine, Base.metadata)
+    with engine.connect() as conn:
+        names = set(conn.execute(text("SELECT name FROM sqlite_master")).scalars())
+    assert {"users_fts", "users_fts_ai", "users_fts_ad", "users_fts_au"} <= names
+    assert _fts(engine, "ana@") == [1]
+
+
+def test_triggers_follow_insert_update_and_delete(engine):
+    assert _fts(engine, "garcía") == [1, 3]
+    with engine.begin() as conn:
+        conn.execute(update(User).where(User.username == "ana").values(last_name="Ruiz"))
+        # Columnas fuera del índice no tocan la tabla FTS5
+        conn.execute(update(User).where(User.username == "luis").values(is_active=False))
+    assert _fts(engine, "garcía") == [3] and _fts(engine, "ruiz") == [1]
+    assert _fts(engine, "pérez") == [2]
+    with engine.begin() as conn:
+        conn.execute(User.__table__.delete().where(User.username == "marta"))
+    assert _fts(engine, "garcía") == [] and _fts(engine, "acme") == []
+
+
+@pytest.mark.parametrize("query,expected", [
+    ("garcía", ["ana", "marta"]),
+    ("GARC", ["ana", "marta"]),            # subcadena, sin distinguir mayúsculas
+    ("garcía marta", ["marta"]),           # todas las palabras
+    ("example.com luis", ["luis"]),
+    ("ma", ["marta"]),                     # < 3 caracteres: ILIKE
+    ("lu pérez", ["luis"]),                # mezcla de ILIKE e índice
+    ('+"ana" garcía*', ["ana"]),           # los operadores booleanos se ignoran
+    ("zzz", []),
+])
+def test_search_condition(engine, query, expected):
+    assert _search(engine, query) == expected
+
+
+def test_empty_search_has_no_condition():
+    assert search_condition(USER_SEARCH, ' "" - ', "sqlite") is None
+    assert ranked_search(USER_SEARCH, "  ", "sqlite") is None
+
+
+def test_ranked_search_orders_by_relevance_or_latest(engine):
+    with engine.begin() as conn:
+        _insert(conn, [("garcia2", "garcía@garcía.es", "García", "García")])
+
+    def run(query: str, order: str):
+        ranked = ranked_search(USER_SEARCH, query, "sqlite")
+        statement = ranked.apply(select(User.username)).order_by(getattr(ranked, order))
+        with engine.connect() as conn:
+            return conn.execute(statement).scalars().all()
+
+    assert run("garcía", "relevance")[0] == "garcia2"
+    assert run("garcía", "latest") == ["garcia2", "marta", "ana"]
+    # Solo palabras cortas: sin índice, no hay relevancia
+    assert ranked_search(USER_SEARCH, "ma", "sqlite").relevance is None
+    assert run("ma", "latest") == ["marta"]
+
+
+class _Inspector:
+    def __init__(self, indexes):
+        self.indexes = indexes
+
+    def get_indexes(self, table_name):
+        return self.indexes
+
+
+class _Connection:
+    def __init__(self):
+        self.statements = []
+
+    def exec_driver_sql(self, statement):
+        self.statements.append(statement)
+
+
+@pytest.mark.parametrize("existing,created", [
+    ([], True),
+    ([{"name": "idx_users_text", "type": "FULLTEXT",
+       "column_names": ["username", "email", "first_name", "last_name"]}], False),
+    ([{"name": "ft_users_search", "type": "FULLTEXT", "column_names": ["username"]}], False),
+])
+def test_mysql_fulltext_migration(monkeypatch, existing, created):
+    monkeypatch.setattr(search, "inspect", lambda conn: _Inspector(existing))
+    conn = _Connection()
+    search._create_mysql(conn, USER_SEARCH)
+    expected = ["ALTER TABLE users ADD FULLTEXT INDEX ft_users_search "
+                "(username, email, first_name, last_name) WITH PARSER ngram"]
+    assert conn.statements == (expected if created else [])
+
+
+def test_mysql_condition_uses_match_against(monkeypatch):
+    monkeypatch.setattr(search, "_available", {USER_SEARCH.name})
+    condition = search_condition(USER_SEARCH, "garcía a", "mysql")
+    sql = str(condition.compile(dialect=mysql.dialect(), compile_kwargs={"literal_binds": True}))
+    assert "MATCH (users.username, users.email, users.first_name, users.last_name)" in sql
+    assert '+"garcía"' in sql and "IN BOOLEAN MODE" in sql
+    # Una letra: más corta que el n-grama, por LIKE
+    assert "lower(users.username) LIKE lower('%%a%%')" in sql
@@ -0,0 +1,92 @@
+"""
+Variables de entorno documentadas (.env.example) -> campos de configuración
+"""
+import os
+from typing import get_args
+
+import pytest
+
+from src.config.settings import (
+    AISettings, DatabaseSettings, ExternalAPISettings, MailSettings, SecuritySettings, Settings,
+)
+from src.database.registry import EngineRegistry
+
+SECTIONS = (DatabaseSettings, SecuritySettings, ExternalAPISettings, AISettings, MailSettings, Settings)
+ENV_EXAMPLE = os.path.join(os.path.dirname(__file__), "..", ".env.example")
+
+
+def _aliases():
+    """(clase, campo, variable) de todos los campos con variable de entorno"""
+    return [
+        (section, name, field.validation_alias)
+        for section in SECTIONS
+        for name, field in section.model_fields.items()
+        if isinstance(field.validation_alias, str)
+    ]
+
+
+def _documented():
+    names = set()
+    with open(ENV_EXAMPLE, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip().lstrip("#").strip()
+            if "=" in line and line.split("=", 1)[0].isupper():
+                names.add(line.split("=", 1)[0])
+    return names
+
+
+def _sample(annotation):
+    """Valor de prueba (texto de la variable, valor esperado) distinto del valor por defecto"""
+    types = [arg for arg in get_args(annotation) if arg is not type(None)] or [annotation]
+    kind = types[0]
+    if kind is bool:
+        return "false", False
+    if kind is int:
+        return "1234", 1234
+    if kind is float:
+        return "12.5", 12.5
+    return "valor-de-prueba", "valor-de-prueba"
+
+
+@pytest.fixture(autouse=True)
+def _no_env_file(tmp_path, monkeypatch):
+    # Sin .env del directorio de trabajo ni variables del entorno real
+    monkeypatch.chdir(tmp_path)
+    for _, _, variable in _aliases():
+        monkeypatch.delenv(variable, raising=False)
+
+
+@pytest.mark.parametrize("section,name,variable", _aliases(), ids=lambda value: getattr(value, "__name__", value))
+def test_env_variable_sets_field(section, name, variable, monkeypatch):
+    raw, expected = _sample(section.model_fields[name].annotation)
+    monkeypatch.setenv(variable, raw)
+    assert getattr(section(), name) == expected
+
+
+def test_documented_variables_are_read():
+    """Las variables DB_/AUTH_/MAIL_ de .env.example corresponden a un campo"""
+    known = {variable for _, _, variable in _aliases()}
+    documented = {
+        name for name in _documented()
+        if name.startswith(("DB_MAX", "DB_POOL", "DB_REPLICA", "AUTH_", "MAIL_")) or name == "WEB_CONCURRENCY"
+    }
+    assert documented and documented <= known, documented - known
+
+
+def test_env_file_is_read(tmp_path):
+    (tmp_path / ".env").write_text("DB_MAX_CONNECTIONS=90\nMAIL_SCHEDULER_ENABLED=false\n", encoding="utf-8")
+    assert DatabaseSettings().max_connections == 90
+    assert MailSettings().scheduler_enabled is False
+
+
+def test_field_name_is_not_an_env_variable(monkeypatch):
+    # PORT es el puerto HTTP en muchos despliegues: no debe cambiar el de MySQL
+    monkeypatch.setenv("PORT", "8000")
+    assert DatabaseSettings().port == 3306
+
+
+def test_worker_budget_uses_env(monkeypatch):
+    monkeypatch.setenv("DB_MAX_CONNECTIONS", "60")
+    monkeypatch.setenv("WEB_CONCURRENCY", "3")
+    assert EngineRegistry(Settings()).worker_budget() == 20
+
@@ -0,0 +1,87 @@
+"""
+LoginWriteBuffer: filas rechazadas, base caída y tope de la cola
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.database.models import Base, User, UserSession
+from src.services import write_behind
+from src.services.write_behind import LoginWriteBuffer
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    sync_engine = create_engine(f"sqlite:///{tmp_path}/auth.db")
+    Base.metadata.create_all(sync_engine, tables=[User.__table__, UserSession.__table__])
+    with sync_engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [
+            {"id": 1, "username": "ana", "email": "ana@example.com", "password_hash": "x",
+             "first_name": "Ana", "last_name": "A"},
+        ])
+    sync_engine.dispose()
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/auth.db")
+    monkeypatch.setattr(write_behind, "get_async_engine", lambda: async_engine)
+    yield async_engine
+    asyncio.run(async_engine.dispose())
+
+
+def _session(session_id: str, expires_at=None):
+    return {"id": session_id, "user_id": 1, "ip_address": None, "user_agent": None,
+            "expires_at": expires_at or datetime.utcnow() + timedelta(hours=1), "is_active": True}
+
+
+async def _count(engine) -> int:
+    async with engine.connect() as conn:
+        return (await conn.execute(select(func.count()).select_from(UserSession.__table__))).scalar()
+
+
+def test_poison_row_does_not_block_the_rest(engine):
+    buffer = LoginWriteBuffer(interval_ms=500, batch_size=100, max_attempts=3)
+
+    async def run():
+        buffer._sessions = {"ok-1": _session("ok-1"), "bad": _session("bad"), "ok-2": _session("ok-2")}
+        buffer._sessions["bad"]["expires_at"] = None  # NOT NULL: la base la rechaza siempre
+        buffer._last_logins = {1: datetime.utcnow()}
+        written = await buffer.flush()
+        assert written == 3 and list(buffer._sessions) == ["bad"]
+        assert await _count(engine) == 2
+        await buffer.flush()
+        await buffer.flush()
+
+    asyncio.run(run())
+    assert buffer.backlog == 0 and buffer.rows_dropped == 1 and not buffer._attempts
+
+
+def test_connection_failure_requeues_everything(tmp_path, monkeypatch):
+    broken = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/no-existe/auth.db")
+    monkeypatch.setattr(write_behind, "get_async_engine", lambda: broken)
+    buffer = LoginWriteBuffer(interval_ms=500, batch_size=100, max_attempts=1)
+
+    async def run():
+        buffer._sessions = {"a": _session("a"), "b": _session("b")}
+        buffer._last_logins = {1: datetime.utcnow()}
+        assert await buffer.flush() == 0
+        await broken.dispose()
+
+    asyncio.run(run())
+    assert buffer.backlog == 3 and buffer.rows_dropped == 0 and not buffer._attempts
+
+
+def test_backlog_is_capped():
+    buffer = LoginWriteBuffer(interval_ms=60000, batch_size=100, max_backlog=5)
+
+    async def run():
+        buffer.start()  # arrancado: encolar no vuelca
+        for user_id in range(1, 4):
+            await buffer.record_login(user_id, datetime.utcnow())
+        for index in range(4):
+            await buffer.add_session(_session(f"s{index}"))
+        buffer._task.cancel()
+
+    asyncio.run(run())
+    assert buffer.backlog == 5 and buffer.rows_dropped == 2
+    assert list(buffer._last_logins) == [3] and len(buffer._sessions) == 4
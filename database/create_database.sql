@@ -27,7 +27,9 @@ CREATE TABLE users (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     INDEX idx_username (username),
     INDEX idx_email (email),
-    INDEX idx_active (is_active)
+    INDEX idx_active (is_active),
+    INDEX idx_created_at_id (created_at, id),
+    FULLTEXT INDEX ft_users_search (username, email, first_name, last_name) WITH PARSER ngram
 );
 
 -- Tabla de roles
@@ -63,8 +65,10 @@ CREATE TABLE user_sessions (
     is_active BOOLEAN DEFAULT TRUE,
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
     INDEX idx_user_id (user_id),
-    INDEX idx_expires (expires_at),
-    INDEX idx_active (is_active)
+    INDEX idx_expires (expires_at, id),
+    INDEX idx_active (is_active),
+    INDEX idx_active_expires (is_active, expires_at),
+    INDEX idx_user_active_expires (user_id, is_active, expires_at)
 );
 
 -- =====================================================
@@ -213,6 +217,8 @@ CREATE TABLE mail_accounts (
     last_sync DATETIME NULL,
     unread_count INT DEFAULT 0,
     total_count INT DEFAULT 0,
+    sync_claimed_by VARCHAR(64), -- proceso que la está sincronizando
+    sync_claimed_at DATETIME,
     
     -- Metadatos
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -250,6 +256,13 @@ CREATE TABLE mail_folders (
     -- Estadísticas
     unread_count INT DEFAULT 0,
     total_count INT DEFAULT 0,
+    status_checked_at DATETIME NULL, -- Contadores confirmados con STATUS
+    
+    -- Estado de sincronización IMAP
+    uid_validity BIGINT NULL,
+    last_seen_uid BIGINT DEFAULT 0,
+    highest_modseq BIGINT NULL, -- CONDSTORE
+    last_sync DATETIME NULL,
     
     -- Metadatos
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -316,14 +329,17 @@ CREATE TABLE mail_messages (
     
     INDEX idx_account_id (account_id),
     INDEX idx_folder_id (folder_id),
+    UNIQUE INDEX ix_mail_messages_folder_uid (folder_id, uid),
     INDEX idx_message_id (message_id),
     INDEX idx_thread_id (thread_id),
+    INDEX ix_mail_messages_account_thread (account_id, thread_id),
+    INDEX ix_mail_messages_folder_received (folder_id, received_at, id),
     INDEX idx_from_email (from_email),
     INDEX idx_is_read (is_read),
     INDEX idx_is_starred (is_starred),
     INDEX idx_received_at (received_at),
     INDEX idx_sent_at (sent_at),
-    FULLTEXT(subject, body_text, from_name, from_email)
+    FULLTEXT INDEX ft_mail_messages_search (subject, from_name, from_email, snippet, body_text) WITH PARSER ngram
 );
 
 -- Tabla de archivos adjuntos
@@ -338,7 +354,8 @@ CREATE TABLE mail_attachments (
     size_bytes INT DEFAULT 0,
     
     -- Almacenamiento
-    file_path VARCHAR(1000), -- Ruta en el sistema de archivos
+    section VARCHAR(50), -- Sección MIME en el mensaje IMAP
+    file_path VARCHAR(1000), -- Ruta en el sistema de archivos (por hash de contenido)
     is_inline BOOLEAN DEFAULT FALSE,
     
     -- Metadatos
@@ -351,6 +368,69 @@ CREATE TABLE mail_attachments (
     INDEX idx_content_type (content_type)
 );
 
+-- Conversaciones (hilos)
+CREATE TABLE mail_threads (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    account_id INT NOT NULL,
+    subject TEXT, -- Asunto sin "Re:" / "Fwd:"
+    last_message_at DATETIME NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    
+    FOREIGN KEY (account_id) REFERENCES mail_accounts(id) ON DELETE CASCADE,
+    
+    INDEX ix_mail_threads_account_last (account_id, last_message_at, id)
+);
+
+-- Índice Message-ID -> conversación (incluye mensajes citados aún no recibidos)
+CREATE TABLE mail_thread_refs (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    account_id INT NOT NULL,
+    message_id VARCHAR(500) NOT NULL,
+    thread_id INT NOT NULL,
+    
+    FOREIGN KEY (account_id) REFERENCES mail_accounts(id) ON DELETE CASCADE,
+    FOREIGN KEY (thread_id) REFERENCES mail_threads(id) ON DELETE CASCADE,
+    
+    UNIQUE INDEX ix_mail_thread_refs_account_message (account_id, message_id),
+    INDEX idx_thread_id (thread_id)
+);
+
+-- Cola de envío (bandeja de salida)
+CREATE TABLE mail_outbox (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    account_id INT NOT NULL,
+    user_id INT NOT NULL,
+    
+    -- Mensaje (contenido serializado en MAIL_OUTBOX_DIR)
+    message_id VARCHAR(500) NOT NULL,
+    subject TEXT,
+    sender VARCHAR(200) NOT NULL,
+    recipients JSON NOT NULL, -- to + cc + bcc
+    file_path VARCHAR(1000),
+    size_bytes INT DEFAULT 0,
+    
+    -- Entrega
+    status ENUM('queued', 'sending', 'sent', 'failed') NOT NULL DEFAULT 'queued',
+    attempts INT DEFAULT 0,
+    next_attempt_at DATETIME NOT NULL,
+    claimed_by VARCHAR(64), -- proceso que lo está enviando
+    claimed_at DATETIME,
+    last_error TEXT,
+    refused JSON, -- destinatarios rechazados si otros se aceptaron
+    sent_at DATETIME,
+    
+    -- Metadatos
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    
+    FOREIGN KEY (account_id) REFERENCES mail_accounts(id) ON DELETE CASCADE,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    
+    INDEX idx_account_id (account_id),
+    INDEX ix_mail_outbox_status_next (status, next_attempt_at)
+);
+
 -- =====================================================
 -- 5. SISTEMA DE ACTIVIDADES Y SEGUIMIENTO
 -- =====================================================
@@ -544,35 +624,10 @@ INSERT INTO system_settings (category, key_name, value, description, is_public)
 -- 10. TRIGGERS Y PROCEDIMIENTOS
 -- =====================================================
 
--- Trigger para actualizar el contador de no leídos en cuentas de correo
-DELIMITER //
-CREATE TRIGGER update_account_unread_count 
-AFTER UPDATE ON mail_messages
-FOR EACH ROW
-BEGIN
-    IF OLD.is_read != NEW.is_read THEN
-        UPDATE mail_accounts 
-        SET unread_count = (
-            SELECT COUNT(*) 
-            FROM mail_messages 
-            WHERE account_id = NEW.account_id AND is_read = FALSE AND is_deleted = FALSE
-        )
-        WHERE id = NEW.account_id;
-    END IF;
-END//
-
--- Trigger para actualizar el contador de mensajes en carpetas
-CREATE TRIGGER update_folder_counts
-AFTER INSERT ON mail_messages
-FOR EACH ROW
-BEGIN
-    UPDATE mail_folders 
-    SET 
-        total_count = total_count + 1,
-        unread_count = unread_count + IF(NEW.is_read = FALSE, 1, 0)
-    WHERE id = NEW.folder_id;
-END//
+-- Los contadores de mail_folders / mail_accounts los mantiene la aplicación
+-- (backend/src/modules/mail/counters.py), sin triggers
 
+DELIMITER //
 -- Trigger para log de auditoría en usuarios
 CREATE TRIGGER audit_users_changes
 AFTER UPDATE ON users
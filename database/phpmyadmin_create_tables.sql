@@ -65,7 +65,7 @@ CREATE TABLE `user_sessions` (
   `is_active` boolean DEFAULT TRUE,
   FOREIGN KEY (`user_id`) REFERENCES `users`(`id`) ON DELETE CASCADE,
   INDEX `idx_user_id` (`user_id`),
-  INDEX `idx_expires` (`expires_at`),
+  INDEX `idx_expires` (`expires_at`, `id`),
   INDEX `idx_active` (`is_active`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
@@ -214,6 +214,8 @@ CREATE TABLE `mail_accounts` (
   `last_sync` datetime NULL,
   `unread_count` int DEFAULT 0,
   `total_count` int DEFAULT 0,
+  `sync_claimed_by` varchar(64),
+  `sync_claimed_at` datetime,
   
   -- Metadatos
   `created_at` timestamp DEFAULT CURRENT_TIMESTAMP,
@@ -317,14 +319,17 @@ CREATE TABLE `mail_messages` (
   
   INDEX `idx_account_id` (`account_id`),
   INDEX `idx_folder_id` (`folder_id`),
+  UNIQUE INDEX `ix_mail_messages_folder_uid` (`folder_id`, `uid`),
   INDEX `idx_message_id` (`message_id`),
   INDEX `idx_thread_id` (`thread_id`),
+  INDEX `ix_mail_messages_account_thread` (`account_id`, `thread_id`),
+  INDEX `ix_mail_messages_folder_received` (`folder_id`, `received_at`, `id`),
   INDEX `idx_from_email` (`from_email`),
   INDEX `idx_is_read` (`is_read`),
   INDEX `idx_is_starred` (`is_starred`),
   INDEX `idx_received_at` (`received_at`),
   INDEX `idx_sent_at` (`sent_at`),
-  FULLTEXT(`subject`, `body_text`, `from_name`, `from_email`)
+  FULLTEXT INDEX `ft_mail_messages_search` (`subject`, `from_name`, `from_email`, `snippet`, `body_text`) WITH PARSER ngram
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- Tabla de archivos adjuntos
@@ -352,6 +357,69 @@ CREATE TABLE `mail_attachments` (
   INDEX `idx_content_type` (`content_type`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- Conversaciones (hilos)
+CREATE TABLE `mail_threads` (
+  `id` int PRIMARY KEY AUTO_INCREMENT,
+  `account_id` int NOT NULL,
+  `subject` text,
+  `last_message_at` datetime NOT NULL,
+  `created_at` timestamp DEFAULT CURRENT_TIMESTAMP,
+  `updated_at` timestamp DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  
+  FOREIGN KEY (`account_id`) REFERENCES `mail_accounts`(`id`) ON DELETE CASCADE,
+  
+  INDEX `ix_mail_threads_account_last` (`account_id`, `last_message_at`, `id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Índice Message-ID -> conversación (incluye mensajes citados aún no recibidos)
+CREATE TABLE `mail_thread_refs` (
+  `id` int PRIMARY KEY AUTO_INCREMENT,
+  `account_id` int NOT NULL,
+  `message_id` varchar(500) NOT NULL,
+  `thread_id` int NOT NULL,
+  
+  FOREIGN KEY (`account_id`) REFERENCES `mail_accounts`(`id`) ON DELETE CASCADE,
+  FOREIGN KEY (`thread_id`) REFERENCES `mail_threads`(`id`) ON DELETE CASCADE,
+  
+  UNIQUE INDEX `ix_mail_thread_refs_account_message` (`account_id`, `message_id`),
+  INDEX `idx_thread_id` (`thread_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Cola de envío (bandeja de salida)
+CREATE TABLE `mail_outbox` (
+  `id` int PRIMARY KEY AUTO_INCREMENT,
+  `account_id` int NOT NULL,
+  `user_id` int NOT NULL,
+  
+  -- Mensaje (contenido serializado en MAIL_OUTBOX_DIR)
+  `message_id` varchar(500) NOT NULL,
+  `subject` text,
+  `sender` varchar(200) NOT NULL,
+  `recipients` json NOT NULL,
+  `file_path` varchar(1000),
+  `size_bytes` int DEFAULT 0,
+  
+  -- Entrega
+  `status` enum('queued','sending','sent','failed') NOT NULL DEFAULT 'queued',
+  `attempts` int DEFAULT 0,
+  `next_attempt_at` datetime NOT NULL,
+  `claimed_by` varchar(64),
+  `claimed_at` datetime,
+  `last_error` text,
+  `refused` json,
+  `sent_at` datetime,
+  
+  -- Metadatos
+  `created_at` timestamp DEFAULT CURRENT_TIMESTAMP,
+  `updated_at` timestamp DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  
+  FOREIGN KEY (`account_id`) REFERENCES `mail_accounts`(`id`) ON DELETE CASCADE,
+  FOREIGN KEY (`user_id`) REFERENCES `users`(`id`) ON DELETE CASCADE,
+  
+  INDEX `idx_account_id` (`account_id`),
+  INDEX `ix_mail_outbox_status_next` (`status`, `next_attempt_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 -- =====================================================
 -- 5. SISTEMA DE ACTIVIDADES Y SEGUIMIENTO
 -- =====================================================
@@ -548,33 +616,8 @@ INSERT INTO `system_settings` (`category`, `key_name`, `value`, `description`, `
 
 DELIMITER //
 
--- Trigger para actualizar el contador de no leídos en cuentas de correo
-CREATE TRIGGER `update_account_unread_count` 
-AFTER UPDATE ON `mail_messages`
-FOR EACH ROW
-BEGIN
-    IF OLD.is_read != NEW.is_read THEN
-        UPDATE `mail_accounts` 
-        SET `unread_count` = (
-            SELECT COUNT(*) 
-            FROM `mail_messages` 
-            WHERE `account_id` = NEW.account_id AND `is_read` = FALSE AND `is_deleted` = FALSE
-        )
-        WHERE `id` = NEW.account_id;
-    END IF;
-END//
-
--- Trigger para actualizar el contador de mensajes en carpetas
-CREATE TRIGGER `update_folder_counts`
-AFTER INSERT ON `mail_messages`
-FOR EACH ROW
-BEGIN
-    UPDATE `mail_folders` 
-    SET 
-        `total_count` = `total_count` + 1,
-        `unread_count` = `unread_count` + IF(NEW.is_read = FALSE, 1, 0)
-    WHERE `id` = NEW.folder_id;
-END//
+-- Los contadores de mail_folders / mail_accounts los mantiene la aplicación
+-- (backend/src/modules/mail/counters.py), sin triggers
 
 -- Trigger para log de auditoría en usuarios
 CREATE TRIGGER `audit_users_changes`
@@ -50,8 +50,7 @@ try:
             
             # Verificar que funciona
             print("🧪 Probando autenticación...")
-            test_user = AuthService.authenticate_user(session, 'admin', 'admin123')
-            if test_user:
+            if AuthService.verify_password('admin123', admin_user.password_hash):
                 print("✅ Autenticación exitosa - ¡El problema está resuelto!")
             else:
                 print("❌ Error en la autenticación después de la actualización")
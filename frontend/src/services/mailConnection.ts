@@ -8,6 +8,17 @@ export class MailConnectionService {
     ? `${import.meta.env.VITE_API_BASE_URL}/api/mail` 
     : `${window.location.protocol}//${window.location.hostname}/api/mail`
 
+  /**
+   * Cabeceras JSON con el token de sesión (las rutas de cuentas requieren autenticación)
+   */
+  private headers(): Record<string, string> {
+    const token = localStorage.getItem('authToken')
+    return {
+      'Content-Type': 'application/json',
+      ...(token ? { Authorization: `Bearer ${token}` } : {}),
+    }
+  }
+
   /**
    * Prueba la conectividad real con el servidor IMAP/SMTP
    */
@@ -15,9 +26,7 @@ export class MailConnectionService {
     try {
       const response = await fetch(`${this.baseUrl}/test-connection`, {
         method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
+        headers: this.headers(),
         body: JSON.stringify({
           incoming: account.settings?.incoming,
           outgoing: account.settings?.outgoing,
@@ -44,9 +53,7 @@ export class MailConnectionService {
     try {
       const response = await fetch(`${this.baseUrl}/accounts/${accountId}/folders`, {
         method: 'GET',
-        headers: {
-          'Content-Type': 'application/json',
-        },
+        headers: this.headers(),
       })
 
       if (!response.ok) {
@@ -73,9 +80,7 @@ export class MailConnectionService {
     try {
       const response = await fetch(`${this.baseUrl}/accounts/${accountId}/folders/${folderId}/messages?limit=${limit}&offset=${offset}`, {
         method: 'GET',
-        headers: {
-          'Content-Type': 'application/json',
-        },
+        headers: this.headers(),
       })
 
       if (!response.ok) {
@@ -108,9 +113,7 @@ export class MailConnectionService {
     try {
       const response = await fetch(`${this.baseUrl}/accounts/${accountId}/messages/${messageId}`, {
         method: 'GET',
-        headers: {
-          'Content-Type': 'application/json',
-        },
+        headers: this.headers(),
       })
 
       if (!response.ok) {
@@ -132,9 +135,7 @@ export class MailConnectionService {
     try {
       const response = await fetch(`${this.baseUrl}/accounts/${accountId}/messages/${messageId}/read`, {
         method: 'PATCH',
-        headers: {
-          'Content-Type': 'application/json',
-        },
+        headers: this.headers(),
         body: JSON.stringify({ isRead }),
       })
 
@@ -154,9 +155,7 @@ export class MailConnectionService {
     try {
       const response = await fetch(`${this.baseUrl}/accounts/${accountId}/messages/${messageId}/star`, {
         method: 'PATCH',
-        headers: {
-          'Content-Type': 'application/json',
-        },
+        headers: this.headers(),
         body: JSON.stringify({ isStarred }),
       })
 
@@ -176,9 +175,7 @@ export class MailConnectionService {
     try {
       const response = await fetch(`${this.baseUrl}/accounts/${accountId}/messages/${messageId}/move`, {
         method: 'PATCH',
-        headers: {
-          'Content-Type': 'application/json',
-        },
+        headers: this.headers(),
         body: JSON.stringify({ targetFolderId }),
       })
 
@@ -198,9 +195,7 @@ export class MailConnectionService {
     try {
       const response = await fetch(`${this.baseUrl}/accounts/${accountId}/messages/${messageId}`, {
         method: 'DELETE',
-        headers: {
-          'Content-Type': 'application/json',
-        },
+        headers: this.headers(),
         body: JSON.stringify({ permanent }),
       })
 
@@ -271,9 +266,7 @@ export class MailConnectionService {
     try {
       const response = await fetch(`${this.baseUrl}/accounts/${accountId}/drafts`, {
         method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
+        headers: this.headers(),
         body: JSON.stringify(message),
       })
 
@@ -310,9 +303,7 @@ export class MailConnectionService {
 
       const response = await fetch(`${this.baseUrl}/accounts/${accountId}/search?${params}`, {
         method: 'GET',
-        headers: {
-          'Content-Type': 'application/json',
-        },
+        headers: this.headers(),
       })
 
       if (!response.ok) {
@@ -354,9 +345,7 @@ export class MailConnectionService {
     try {
       const response = await fetch(`${this.baseUrl}/accounts/${accountId}/sync/status`, {
         method: 'GET',
-        headers: {
-          'Content-Type': 'application/json',
-        },
+        headers: this.headers(),
       })
 
       if (!response.ok) {
@@ -381,9 +370,7 @@ export class MailConnectionService {
     try {
       const response = await fetch(`${this.baseUrl}/accounts/${accountId}/sync`, {
         method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
+        headers: this.headers(),
       })
 
       if (!response.ok) {
@@ -402,9 +389,7 @@ export class MailConnectionService {
     try {
       const response = await fetch(`${this.baseUrl}/accounts`, {
         method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
+        headers: this.headers(),
         body: JSON.stringify(account),
       })
 
@@ -428,9 +413,7 @@ export class MailConnectionService {
     try {
       const response = await fetch(`${this.baseUrl}/accounts`, {
         method: 'GET',
-        headers: {
-          'Content-Type': 'application/json',
-        },
+        headers: this.headers(),
       })
 
       if (!response.ok) {
@@ -452,9 +435,7 @@ export class MailConnectionService {
     try {
       const response = await fetch(`${this.baseUrl}/accounts/${accountId}`, {
         method: 'PATCH',
-        headers: {
-          'Content-Type': 'application/json',
-        },
+        headers: this.headers(),
         body: JSON.stringify(updates),
       })
 
@@ -478,9 +459,7 @@ export class MailConnectionService {
     try {
       const response = await fetch(`${this.baseUrl}/accounts/${accountId}`, {
         method: 'DELETE',
-        headers: {
-          'Content-Type': 'application/json',
-        },
+        headers: this.headers(),
       })
 
       if (!response.ok) {